@@ -54,21 +54,30 @@ class AutoModeSelector:
         }
         
         return best_model_name, summary
-    
+
+    def summarize_routed(self, completion, candidates: list, quality: float = None) -> Dict[str, Any]:
+        """
+        Summary for a response from a single routed model.
+        Without a judged quality, the router's expected score for that model is used.
+        """
+        predicted = quality is None
+        if predicted:
+            expected = next(c for c in candidates if c["model_name"] == completion.model_name)
+            quality = expected["avg_quality"]
+        return {
+            "model": completion.model_name,
+            "response": completion.response,
+            "quality_score": quality,
+            "quality_predicted": predicted,
+            "cost": completion.cost,
+            "latency_ms": completion.latency_ms,
+            "score": self.score_metrics(quality, completion.cost, completion.latency_ms),
+            "all_scores": {c["model_name"]: c["score"] for c in candidates}
+        }
+
     def _calculate_model_score(self, eval, prompt: str) -> float:
         """Calculate weighted score for model selection"""
         
-        # Normalize cost (lower is better, so invert)
-        max_cost = 0.01  # Reference cost
-        cost_score = 1.0 - min(eval.completion.cost / max_cost, 1.0)
-        
-        # Normalize quality (0-100 to 0-1)
-        quality_score = eval.quality.overall_score / 100.0
-        
-        # Normalize latency (lower is better)
-        max_latency = 5000  # 5 seconds
-        latency_score = 1.0 - min(eval.completion.latency_ms / max_latency, 1.0)
-        
         # Reliability: assume success rate (we're looking at successful models)
         reliability_score = 0.95
         
@@ -80,12 +89,32 @@ class AutoModeSelector:
             if (datetime.now() - question_date).days < 30:
                 reliability_score = 0.7
         
+        return self.score_metrics(
+            eval.quality.overall_score, eval.completion.cost,
+            eval.completion.latency_ms, reliability_score
+        )
+    
+    def score_metrics(self, quality: float, cost: float, latency_ms: float,
+                      reliability: float = 0.95) -> float:
+        """Weighted score from raw metrics (quality 0-100, cost in $, latency in ms)"""
+        
+        # Normalize cost (lower is better, so invert)
+        max_cost = 0.01  # Reference cost
+        cost_score = 1.0 - min(cost / max_cost, 1.0)
+        
+        # Normalize quality (0-100 to 0-1)
+        quality_score = quality / 100.0
+        
+        # Normalize latency (lower is better)
+        max_latency = 5000  # 5 seconds
+        latency_score = 1.0 - min(latency_ms / max_latency, 1.0)
+        
         # Weighted score
         total_score = (
             self.preference_weights["cost"] * cost_score +
             self.preference_weights["quality"] * quality_score +
             self.preference_weights["latency"] * latency_score +
-            self.preference_weights["reliability"] * reliability_score
+            self.preference_weights["reliability"] * reliability
         )
         
         return total_score
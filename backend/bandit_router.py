@@ -0,0 +1,374 @@
+"""
+Contextual Bandit Router - Online model choice for auto mode
+
+Picks one model per request with a linear contextual bandit (disjoint
+LinUCB, or Thompson sampling over the same per-model ridge regressions).
+The context is the prompt's use case, classifier confidence and length
+bucket. After the answer is judged, the model's reward, built from judge
+score, cost and latency with AutoModeSelector's weights, updates that
+model's regression online.
+
+Arm state lives in SQLite. Each update is a read-modify-write inside one
+IMMEDIATE transaction, so concurrent requests and processes never lose an
+update. route() re-reads the arms every BANDIT_RELOAD_SECONDS, so updates
+written by other workers reach every process. Every outcome is also logged
+to bandit_events.
+
+replay_simulation() replays the judged fan-out history (every model answered
+every logged prompt). It estimates the bandit's cost per quality point
+against full fan-out, the best fixed model and random choice.
+
+Usage:
+    python bandit_router.py simulate
+    python bandit_router.py show
+"""
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from auto_mode import auto_selector
+from config import (
+    MODELS_TO_TEST, USE_CASE_KEYWORDS, ROUTING_LENGTH_BUCKETS,
+    BANDIT_POLICY, BANDIT_ALPHA, BANDIT_RIDGE, BANDIT_RELOAD_SECONDS
+)
+from routing_table import RoutingDecision, RoutingTable, load_judged_history
+from use_case_classifier import use_case_classifier
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+POLICIES = ("linucb", "thompson")
+_CATEGORIES = list(USE_CASE_KEYWORDS)
+_BUCKETS = [f"b{i}" for i in range(len(ROUTING_LENGTH_BUCKETS) + 1)]
+CONTEXT_DIM = 1 + len(_CATEGORIES) + len(_BUCKETS) + 1
+
+
+def prompt_context(prompt: str) -> np.ndarray:
+    """[bias, one-hot use case, one-hot length bucket, classifier confidence]"""
+    prediction = use_case_classifier.classify(prompt)
+    x = np.zeros(CONTEXT_DIM)
+    x[0] = 1.0
+    x[1 + _CATEGORIES.index(prediction.category)] = 1.0
+    x[1 + len(_CATEGORIES) + _BUCKETS.index(RoutingTable.length_bucket(prompt))] = 1.0
+    x[-1] = prediction.confidence
+    return x
+
+
+def outcome_reward(quality: Optional[float], cost: float, latency_ms: float, success: bool) -> float:
+    """Reward in [0, 1]; failed or refused answers earn nothing"""
+    if not success:
+        return 0.0
+    return auto_selector.score_metrics(quality or 0.0, cost, latency_ms, reliability=1.0)
+
+
+@dataclass
+class ArmState:
+    """Ridge regression of reward on context for one model, plus running totals"""
+    A: np.ndarray
+    b: np.ndarray
+    pulls: int = 0
+    reward_sum: float = 0.0
+    quality_sum: float = 0.0
+    cost_sum: float = 0.0
+
+    @classmethod
+    def fresh(cls, ridge: float = BANDIT_RIDGE) -> "ArmState":
+        return cls(A=np.eye(CONTEXT_DIM) * ridge, b=np.zeros(CONTEXT_DIM))
+
+    def update(self, x: np.ndarray, reward: float, quality: float, cost: float):
+        self.A += np.outer(x, x)
+        self.b += reward * x
+        self.pulls += 1
+        self.reward_sum += reward
+        self.quality_sum += quality
+        self.cost_sum += cost
+
+
+class LinearBandit:
+    """In-memory disjoint linear bandit over named arms"""
+
+    def __init__(self, policy: str = BANDIT_POLICY, alpha: float = BANDIT_ALPHA,
+                 ridge: float = BANDIT_RIDGE, rng: Optional[np.random.Generator] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown bandit policy: {policy}")
+        self.policy = policy
+        self.alpha = alpha
+        self.ridge = ridge
+        self.rng = rng or np.random.default_rng()
+        self.arms: Dict[str, ArmState] = {}
+
+    def arm(self, name: str) -> ArmState:
+        if name not in self.arms:
+            self.arms[name] = ArmState.fresh(self.ridge)
+        return self.arms[name]
+
+    def scores(self, x: np.ndarray, arm_names: List[str]) -> Dict[str, float]:
+        scores = {}
+        for name in arm_names:
+            state = self.arm(name)
+            A_inv = np.linalg.inv(state.A)
+            theta = A_inv @ state.b
+            if self.policy == "linucb":
+                scores[name] = float(theta @ x + self.alpha * np.sqrt(x @ A_inv @ x))
+            else:
+                sample = self.rng.multivariate_normal(theta, self.alpha ** 2 * A_inv)
+                scores[name] = float(sample @ x)
+        return scores
+
+    def select(self, x: np.ndarray, arm_names: List[str]) -> str:
+        scores = self.scores(x, arm_names)
+        return max(scores, key=scores.get)
+
+
+class BanditRouter:
+    """Persistent, concurrency-safe contextual bandit over MODELS_TO_TEST"""
+
+    def __init__(self, policy: str = BANDIT_POLICY, arm_names: Optional[List[str]] = None,
+                 rng: Optional[np.random.Generator] = None, reload_seconds: float = BANDIT_RELOAD_SECONDS):
+        self.arm_names = arm_names or [m["name"] for m in MODELS_TO_TEST]
+        self.bandit = LinearBandit(policy=policy, rng=rng)
+        self.reload_seconds = reload_seconds
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._init_db()
+        self.load()
+
+    def _init_db(self):
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bandit_arms (
+                arm TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                a_matrix BLOB NOT NULL,
+                b_vector BLOB NOT NULL,
+                pulls INTEGER DEFAULT 0,
+                reward_sum REAL DEFAULT 0,
+                quality_sum REAL DEFAULT 0,
+                cost_sum REAL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bandit_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt_id TEXT,
+                arm TEXT NOT NULL,
+                context_json TEXT NOT NULL,
+                quality REAL,
+                cost REAL,
+                latency_ms REAL,
+                success BOOLEAN,
+                reward REAL NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _decode(row) -> Optional[ArmState]:
+        if row is None or row["dim"] != CONTEXT_DIM:  # Feature layout changed: start over
+            return None
+        return ArmState(
+            A=np.frombuffer(row["a_matrix"], dtype=np.float64).reshape(CONTEXT_DIM, CONTEXT_DIM).copy(),
+            b=np.frombuffer(row["b_vector"], dtype=np.float64).copy(),
+            pulls=row["pulls"],
+            reward_sum=row["reward_sum"],
+            quality_sum=row["quality_sum"],
+            cost_sum=row["cost_sum"]
+        )
+
+    def load(self):
+        """(Re)load every arm from SQLite, picking up other processes' updates"""
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM bandit_arms").fetchall()
+        conn.close()
+        with self._lock:
+            for row in rows:
+                state = self._decode(row)
+                if state is not None:
+                    self.bandit.arms[row["arm"]] = state
+            self._loaded_at = time.monotonic()
+
+    def route(self, prompt: str) -> RoutingDecision:
+        """Pick one model for the prompt"""
+        if time.monotonic() - self._loaded_at >= self.reload_seconds:
+            self.load()
+        x = prompt_context(prompt)
+        with self._lock:
+            scores = self.bandit.scores(x, self.arm_names)
+            candidates = []
+            for name, score in sorted(scores.items(), key=lambda kv: kv[1], reverse=True):
+                state = self.bandit.arm(name)
+                candidates.append({
+                    "model_name": name,
+                    "score": score,
+                    "samples": state.pulls,
+                    "avg_quality": state.quality_sum / state.pulls if state.pulls else None,
+                    "avg_cost": state.cost_sum / state.pulls if state.pulls else None
+                })
+        prediction = use_case_classifier.classify(prompt)
+        key = (prediction.category, "-", RoutingTable.length_bucket(prompt))
+        return RoutingDecision(candidates[0]["model_name"], False, key, "bandit", candidates)
+
+    def record_outcome(self, prompt: str, model_name: str, quality: Optional[float], cost: float,
+                       latency_ms: float, success: bool = True, prompt_id: Optional[str] = None) -> float:
+        """Apply one judged outcome to the model's arm; returns the reward"""
+        x = prompt_context(prompt)
+        reward = outcome_reward(quality, cost, latency_ms, success)
+        earned_quality = (quality or 0.0) if success else 0.0
+
+        with self._lock:
+            conn = sqlite3.connect(DB_PATH, timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                # Start from the stored arm: another process may have updated it
+                row = conn.execute("SELECT * FROM bandit_arms WHERE arm = ?", (model_name,)).fetchone()
+                state = self._decode(row) or ArmState.fresh(self.bandit.ridge)
+                state.update(x, reward, earned_quality, cost)
+
+                conn.execute("""
+                    INSERT OR REPLACE INTO bandit_arms
+                    (arm, dim, a_matrix, b_vector, pulls, reward_sum, quality_sum, cost_sum, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (model_name, CONTEXT_DIM, state.A.tobytes(), state.b.tobytes(), state.pulls,
+                      state.reward_sum, state.quality_sum, state.cost_sum, datetime.utcnow().isoformat()))
+                conn.execute("""
+                    INSERT INTO bandit_events
+                    (prompt_id, arm, context_json, quality, cost, latency_ms, success, reward, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (prompt_id, model_name, json.dumps(x.tolist()), quality, cost, latency_ms,
+                      success, reward, datetime.utcnow().isoformat()))
+                conn.commit()
+            finally:
+                conn.close()
+            self.bandit.arms[model_name] = state
+        return reward
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            arms = {
+                name: {
+                    "pulls": state.pulls,
+                    "avg_reward": state.reward_sum / state.pulls if state.pulls else None,
+                    "avg_quality": state.quality_sum / state.pulls if state.pulls else None,
+                    "avg_cost": state.cost_sum / state.pulls if state.pulls else None
+                }
+                for name, state in self.bandit.arms.items()
+            }
+        return {"policy": self.bandit.policy, "arms": arms}
+
+
+# ============================================================================
+# Offline replay simulation
+# ============================================================================
+
+def _logged_rounds(history: List[Dict]) -> List[Dict]:
+    """Group judged history by prompt; keep prompts answered by two or more models"""
+    rounds: Dict[str, Dict] = {}
+    for row in history:
+        success = bool(row["success"]) and not row["is_refusal"]
+        if success and row["quality"] is None:
+            continue  # Answered but never judged
+        entry = rounds.setdefault(row["prompt_id"], {"prompt": row["content"], "outcomes": {}})
+        entry["outcomes"][row["model_name"]] = {
+            "quality": row["quality"] if success else 0.0,
+            "cost": row["cost"] or 0.0,
+            "reward": outcome_reward(row["quality"], row["cost"] or 0.0, row["latency_ms"] or 0.0, success)
+        }
+    return [r for r in rounds.values() if len(r["outcomes"]) >= 2]
+
+
+def replay_simulation(history: Optional[List[Dict]] = None, policy: str = BANDIT_POLICY,
+                      seed: int = 0) -> Dict:
+    """
+    Replay logged fan-out rounds in order. The bandit sees only the reward of
+    the model it picked, exactly as it would online. Returns quality, cost and
+    cost per quality point for the bandit and baseline policies.
+    """
+    rounds = _logged_rounds(history if history is not None else load_judged_history())
+    if not rounds:
+        return {"rounds": 0, "policies": {}}
+
+    mean_reward: Dict[str, List[float]] = {}
+    for r in rounds:
+        for model, outcome in r["outcomes"].items():
+            mean_reward.setdefault(model, []).append(outcome["reward"])
+    best_fixed = max(mean_reward, key=lambda m: sum(mean_reward[m]) / len(mean_reward[m]))
+
+    bandit = LinearBandit(policy=policy, rng=np.random.default_rng(seed))
+    rand = random.Random(seed)
+    totals = {name: {"quality": 0.0, "cost": 0.0, "reward": 0.0, "rounds": 0, "picks": {}}
+              for name in ("bandit", "full_fan_out", "best_fixed_model", "random")}
+
+    def charge(name: str, model: str, outcome: Dict, cost: float):
+        t = totals[name]
+        t["quality"] += outcome["quality"]
+        t["cost"] += cost
+        t["reward"] += outcome["reward"]
+        t["rounds"] += 1
+        t["picks"][model] = t["picks"].get(model, 0) + 1
+
+    for r in rounds:
+        outcomes = r["outcomes"]
+        models = sorted(outcomes)
+        x = prompt_context(r["prompt"])
+
+        choice = bandit.select(x, models)
+        bandit.arm(choice).update(x, outcomes[choice]["reward"], outcomes[choice]["quality"],
+                                  outcomes[choice]["cost"])
+        charge("bandit", choice, outcomes[choice], outcomes[choice]["cost"])
+
+        # Full fan-out answers with the best model but pays for every model
+        best = max(models, key=lambda m: outcomes[m]["reward"])
+        charge("full_fan_out", best, outcomes[best], sum(o["cost"] for o in outcomes.values()))
+
+        if best_fixed in outcomes:
+            charge("best_fixed_model", best_fixed, outcomes[best_fixed], outcomes[best_fixed]["cost"])
+
+        pick = rand.choice(models)
+        charge("random", pick, outcomes[pick], outcomes[pick]["cost"])
+
+    policies = {}
+    for name, t in totals.items():
+        if not t["rounds"]:
+            continue
+        policies[name] = {
+            "rounds": t["rounds"],
+            "avg_quality": t["quality"] / t["rounds"],
+            "avg_reward": t["reward"] / t["rounds"],
+            "total_cost": t["cost"],
+            "cost_per_quality_point": t["cost"] / t["quality"] if t["quality"] else None,
+            "picks": t["picks"]
+        }
+    return {"rounds": len(rounds), "best_fixed_model": best_fixed, "policies": policies}
+
+
+# Global instance
+bandit_router = BanditRouter()
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command == "simulate":
+        print(json.dumps(replay_simulation(), indent=2))
+    else:
+        print(json.dumps(bandit_router.get_stats(), indent=2))
@@ -0,0 +1,184 @@
+"""
+Batch Optimizer - Fleet-wide optimization in one pass
+
+Users on the same current model, with the same use case and the same set of
+test conversations, would verify the same candidates on the same prompts.
+The batch optimizer groups them, verifies each distinct combination once and
+fans the verification results out to every user in the group. Each user
+still gets their own Layer 1/2 pass (cost deltas depend on their token mix
+and constraints), which only reads local data.
+
+Each group runs on its own CostQualityOrchestrator (sharing the replay
+engine, evaluator and journal), so concurrent groups never overwrite each
+other's last_run or agent state.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import BATCH_OPTIMIZER_WORKERS
+from orchestrator import CostQualityOrchestrator, Thresholds, VerificationAgent
+from user_metadata import UserMetadata, user_service
+
+logger = logging.getLogger(__name__)
+
+GroupKey = Tuple[str, str, Tuple[str, ...]]
+
+
+@dataclass
+class UserGroup:
+    """Users that share (current_model, use_case, conversation-hash set)"""
+    current_model: str
+    use_case: str
+    conversation_hashes: Tuple[str, ...]
+    user_ids: List[str] = field(default_factory=list)
+    verified: Dict[str, Dict] = field(default_factory=dict)  # model_id -> evaluated result
+
+    @property
+    def key(self) -> GroupKey:
+        return (self.current_model, self.use_case, self.conversation_hashes)
+
+
+class BatchOptimizer:
+    """
+    Runs CostQualityOrchestrator for many users, sharing verification work.
+
+    Groups are processed concurrently on a pool of max_workers threads; the
+    users inside a group run one after another so that each can reuse the
+    candidates already verified for the group.
+    """
+
+    def __init__(self, orchestrator, max_workers: int = BATCH_OPTIMIZER_WORKERS,
+                 progress_callback: Optional[Callable[[Dict], None]] = None):
+        self.orchestrator = orchestrator
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+        self._progress: Dict = {}
+
+    def group_users(self, users: List[UserMetadata]) -> List[UserGroup]:
+        """Group users by current model, use case and test conversation set"""
+        groups: Dict[GroupKey, UserGroup] = {}
+        for user in users:
+            conversations = user.last_n_conversations
+            if len(conversations) < Thresholds.MIN_SAMPLE_SIZE:
+                # Same fallback VerificationAgent applies, so these users share synthetic tests
+                conversations = VerificationAgent._generate_synthetic_tests(user.use_case)
+            hashes = tuple(sorted({
+                user_service.get_conversation_hash(c.get("messages", []))
+                for c in conversations[:Thresholds.MAX_VERIFICATION_SAMPLES]
+            }))
+
+            group = UserGroup(user.current_model, user.use_case, hashes)
+            groups.setdefault(group.key, group).user_ids.append(user.user_id)
+        return list(groups.values())
+
+    def run(self, user_ids: Optional[List[str]] = None, k_candidates: int = 6,
+            n_top: int = 3) -> Dict:
+        """
+        Optimize every user (or the given ones).
+        Returns per-user recommendations plus group and sharing statistics.
+        """
+        start = time.time()
+        user_ids = user_ids if user_ids is not None else user_service.list_user_ids()
+        users = [u for u in (user_service.get_user(uid) for uid in user_ids) if u is not None]
+        groups = self.group_users(users)
+
+        self._progress = {
+            "users_total": len(users),
+            "users_done": 0,
+            "groups_total": len(groups),
+            "groups_done": 0,
+            "candidates_verified": 0,
+            "failed_users": 0
+        }
+        logger.info(f"Batch optimization: {len(users)} users in {len(groups)} groups")
+        self._report()
+
+        recommendations: Dict[str, Dict] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-optimize") as pool:
+            futures = [pool.submit(self._run_group, group, k_candidates, n_top) for group in groups]
+            for future in as_completed(futures):
+                recommendations.update(future.result())
+
+        verified_total = sum(len(g.verified) for g in groups)
+        return {
+            "users": recommendations,
+            "groups": [
+                {
+                    "current_model": g.current_model,
+                    "use_case": g.use_case,
+                    "conversation_count": len(g.conversation_hashes),
+                    "user_ids": g.user_ids,
+                    "verified_models": sorted(g.verified)
+                }
+                for g in groups
+            ],
+            "stats": dict(
+                self.get_progress(),
+                verifications_run=verified_total,
+                # What a per-user pass would have verified, minus what was shared
+                verifications_saved=sum(len(g.verified) * (len(g.user_ids) - 1) for g in groups),
+                processing_time_seconds=time.time() - start
+            )
+        }
+
+    def _group_orchestrator(self) -> CostQualityOrchestrator:
+        """A fresh orchestrator over the shared replay engine, evaluator and journal"""
+        verification = self.orchestrator.layer3
+        return CostQualityOrchestrator(verification.replay_engine, verification.quality_evaluator,
+                                       journal=self.orchestrator.journal)
+
+    def _run_group(self, group: UserGroup, k_candidates: int, n_top: int) -> Dict[str, Dict]:
+        results = {}
+        orchestrator = self._group_orchestrator()
+        for user_id in group.user_ids:
+            before = len(group.verified)
+            try:
+                results[user_id] = orchestrator.run_optimization(
+                    user_id, k_candidates=k_candidates, n_top=n_top, verified=group.verified
+                )
+            except Exception as e:
+                logger.error(f"Batch optimization failed for {user_id}: {e}")
+                results[user_id] = {"status": "error", "error": str(e), "user_id": user_id}
+                with self._lock:
+                    self._progress["failed_users"] += 1
+
+            with self._lock:
+                self._progress["users_done"] += 1
+                self._progress["candidates_verified"] += len(group.verified) - before
+            self._report()
+
+        with self._lock:
+            self._progress["groups_done"] += 1
+        self._report()
+        return results
+
+    def get_progress(self) -> Dict:
+        with self._lock:
+            progress = dict(self._progress)
+        total = progress.get("users_total", 0)
+        progress["percent_complete"] = progress.get("users_done", 0) / total * 100 if total else 100.0
+        return progress
+
+    def _report(self):
+        progress = self.get_progress()
+        logger.info(
+            f"Batch progress: {progress['users_done']}/{progress['users_total']} users, "
+            f"{progress['groups_done']}/{progress['groups_total']} groups"
+        )
+        if self.progress_callback:
+            self.progress_callback(progress)
+
+
+if __name__ == "__main__":
+    import json
+    from replay_engine import ReplayEngine
+    from quality_evaluator import QualityEvaluator
+
+    optimizer = BatchOptimizer(CostQualityOrchestrator(ReplayEngine(), QualityEvaluator()))
+    summary = optimizer.run()
+    print(json.dumps({"groups": summary["groups"], "stats": summary["stats"]}, indent=2))
@@ -0,0 +1,219 @@
+"""
+Bootstrap Statistics - Confidence intervals for model-switch decisions
+
+Recommendations used to derive their confidence from a sample-size ratio
+and a quality-stdev heuristic. BootstrapEngine resamples the evaluations
+instead:
+
+- compare(): intervals for the quality delta, quality impact % and cost
+  reduction % of switching from a baseline model to a candidate, plus the
+  share of resamples in which the candidate has the better cost per
+  quality point (used as the recommendation's confidence)
+- mean_ci(): interval of one sample's mean and the share of resamples
+  whose mean clears a threshold
+
+Resampling is vectorized: a chunk of resamples is one (resamples x rows)
+index draw. Chunks are seeded from a SeedSequence, so results do not depend
+on how many workers ran them. Large jobs fan the chunks out over a process
+pool. Results are cached in cache_manager under a fingerprint of the input
+arrays and parameters, so an unchanged evaluation set is never resampled
+twice.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence
+
+import multiprocessing
+import numpy as np
+
+from cache_manager import cache_manager, CacheKeys
+from config import (
+    BOOTSTRAP_RESAMPLES, BOOTSTRAP_CONFIDENCE, BOOTSTRAP_WORKERS,
+    BOOTSTRAP_PARALLEL_MIN_WORK, BOOTSTRAP_CACHE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+# Elements drawn per chunk (resamples x rows); bounds worker memory
+_CHUNK_ELEMENTS = 4_000_000
+
+
+def fingerprint(arrays: Sequence[np.ndarray], **params) -> str:
+    """Stable digest of the input arrays and the parameters applied to them"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+def _resample_means(groups: List[np.ndarray], paired: bool, count: int, seed) -> np.ndarray:
+    """Means of `count` bootstrap resamples of every group: shape (count, len(groups))"""
+    rng = np.random.default_rng(seed)
+    means = np.empty((count, len(groups)))
+    if paired:
+        index = rng.integers(0, len(groups[0]), size=(count, len(groups[0])))
+        for g, values in enumerate(groups):
+            means[:, g] = values[index].mean(axis=1)
+    else:
+        for g, values in enumerate(groups):
+            means[:, g] = values[rng.integers(0, len(values), size=(count, len(values)))].mean(axis=1)
+    return means
+
+
+def _resample_chunk(args) -> np.ndarray:
+    return _resample_means(*args)
+
+
+def _interval(point: float, draws: np.ndarray, confidence: float) -> Dict[str, float]:
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(draws, [alpha, 1 - alpha])
+    return {"estimate": float(point), "low": float(low), "high": float(high)}
+
+
+class BootstrapEngine:
+    """Vectorized, optionally process-parallel bootstrap with a fingerprint cache"""
+
+    def __init__(self, resamples: int = BOOTSTRAP_RESAMPLES, confidence: float = BOOTSTRAP_CONFIDENCE,
+                 workers: int = BOOTSTRAP_WORKERS, parallel_min_work: int = BOOTSTRAP_PARALLEL_MIN_WORK,
+                 cache=cache_manager, cache_ttl: int = BOOTSTRAP_CACHE_TTL):
+        self.resamples = resamples
+        self.confidence = confidence
+        self.workers = workers
+        self.parallel_min_work = parallel_min_work
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.computed = 0
+        self.cache_hits = 0
+        self.parallel_runs = 0
+
+    # ========================================================================
+    # Resampling
+    # ========================================================================
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a threaded server process is not safe
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def resample_means(self, groups: List[np.ndarray], paired: bool = False,
+                       seed: Optional[int] = None) -> np.ndarray:
+        """(resamples, len(groups)) bootstrap means, on the process pool when the job is large"""
+        rows = len(groups[0]) if paired else sum(len(g) for g in groups)
+        per_chunk = max(1, _CHUNK_ELEMENTS // max(rows, 1))
+        counts = [min(per_chunk, self.resamples - start) for start in range(0, self.resamples, per_chunk)]
+        seeds = np.random.SeedSequence(seed).spawn(len(counts))
+        jobs = [(groups, paired, count, chunk_seed) for count, chunk_seed in zip(counts, seeds)]
+
+        if self.workers > 1 and len(jobs) > 1 and rows * self.resamples >= self.parallel_min_work:
+            try:
+                chunks = list(self._get_pool().map(_resample_chunk, jobs))
+                self.parallel_runs += 1
+                return np.concatenate(chunks)
+            except (BrokenProcessPool, OSError) as e:
+                logger.warning(f"Bootstrap pool unavailable, resampling in-process: {e}")
+                self.shutdown()
+        return np.concatenate([_resample_chunk(job) for job in jobs])
+
+    def _cached(self, kind: str, arrays: Sequence[np.ndarray], params: Dict[str, Any], compute) -> Dict:
+        fp = fingerprint(arrays, kind=kind, resamples=self.resamples, confidence=self.confidence, **params)
+        key = self.cache.generate_key(CacheKeys.STATISTICS, fingerprint=fp) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        # Seeded from the fingerprint: the same evaluation set gives the same interval
+        result = compute(int(fp[:16], 16))
+        result.update(method="bootstrap", resamples=self.resamples, confidence=self.confidence, fingerprint=fp)
+        self.computed += 1
+        if key:
+            self.cache.set(key, result, ttl_seconds=self.cache_ttl)
+        return result
+
+    # ========================================================================
+    # Comparisons
+    # ========================================================================
+
+    def compare(self, baseline_quality, baseline_cost, candidate_quality, candidate_cost,
+                paired: bool = False) -> Dict[str, Any]:
+        """
+        Bootstrap the effect of switching from baseline to candidate.
+        With paired=True the four arrays are aligned by prompt and resampled
+        together, which removes prompt-difficulty noise from the deltas.
+        """
+        arrays = [np.asarray(a, dtype=np.float64)
+                  for a in (baseline_quality, baseline_cost, candidate_quality, candidate_cost)]
+        if paired and len({len(a) for a in arrays}) != 1:
+            raise ValueError("Paired comparison needs aligned arrays of equal length")
+
+        def compute(seed):
+            bq, bc, cq, cc = arrays
+            if paired:
+                draws = self.resample_means(arrays, paired=True, seed=seed)
+            else:
+                # Quality and cost of one model come from the same rows
+                base = self.resample_means([bq, bc], paired=True, seed=seed)
+                cand = self.resample_means([cq, cc], paired=True, seed=seed + 1)
+                draws = np.column_stack([base, cand])
+            dbq, dbc, dcq, dcc = draws.T
+            with np.errstate(divide="ignore", invalid="ignore"):
+                better = (dcc / dcq) < (dbc / dbq)
+                return {
+                    "paired": paired,
+                    "samples": {"baseline": len(bq), "candidate": len(cq)},
+                    "quality_delta": _interval(cq.mean() - bq.mean(), dcq - dbq, self.confidence),
+                    "quality_impact_percent": _interval(
+                        (cq.mean() - bq.mean()) / bq.mean() * 100, (dcq - dbq) / dbq * 100, self.confidence),
+                    "cost_reduction_percent": _interval(
+                        (bc.mean() - cc.mean()) / bc.mean() * 100, (dbc - dcc) / dbc * 100, self.confidence),
+                    "probability_better": float(better.mean())
+                }
+
+        return self._cached("compare", arrays, {"paired": paired}, compute)
+
+    def mean_ci(self, values, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """Interval of the mean; with a threshold, the share of resampled means at or above it"""
+        values = np.asarray(values, dtype=np.float64)
+
+        def compute(seed):
+            draws = self.resample_means([values], seed=seed)[:, 0]
+            result = dict(_interval(values.mean(), draws, self.confidence), samples=len(values))
+            if threshold is not None:
+                result["probability_above"] = float((draws >= threshold).mean())
+            return result
+
+        return self._cached("mean", [values], {"threshold": threshold}, compute)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "resamples": self.resamples,
+            "workers": self.workers,
+            "computed": self.computed,
+            "cache_hits": self.cache_hits,
+            "parallel_runs": self.parallel_runs
+        }
+
+
+# Global instance
+bootstrap_engine = BootstrapEngine()
+atexit.register(bootstrap_engine.shutdown)
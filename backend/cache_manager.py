@@ -1,18 +1,36 @@
 """
 Cache Manager - State management with versioning and invalidation rules
 Supports caching of model outputs, evaluations, and recommendations
+
+Two tiers: an in-process LRU (L1) in front of the SQLite cache table (L2).
+Entries may carry a stale window past their TTL: inside it the old value is
+served immediately while a background refresh rebuilds it.
 """
 import json
+import time
 import hashlib
+import logging
 import sqlite3
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 from enum import Enum
 
+from config import (
+    CACHE_L1_MAX_ENTRIES, CACHE_L1_TTL_SECONDS,
+    CACHE_HIT_FLUSH_INTERVAL, CACHE_HIT_FLUSH_THRESHOLD,
+    CACHE_STALE_TTL_SECONDS, CACHE_REFRESH_WORKERS,
+    CONVERSATION_CACHE_SOFT_TTL, CONVERSATION_CACHE_HARD_TTL
+)
+
 DB_PATH = Path(__file__).parent / "data" / "optimization.db"
 
+logger = logging.getLogger(__name__)
+
 
 class CacheKeys:
     """Cache key prefixes"""
@@ -21,6 +39,7 @@ class CacheKeys:
     RECOMMENDATION = "recommendation"
     PRICING = "pricing"
     REGISTRY = "registry"
+    STATISTICS = "statistics"
 
 
 @dataclass
@@ -34,18 +53,125 @@ class CacheEntry:
     source_versions: Dict[str, str]  # e.g., {"model_registry": "1.0.0", "pricing": "2024-01"}
 
 
+@dataclass
+class _L1Entry:
+    """In-memory copy of a cache row (value kept serialized so callers get fresh objects)"""
+    value_json: str
+    expires_at: float  # epoch seconds, min(row hard expiry, L1 TTL)
+    refresh_after: float  # epoch seconds, soft expiry
+    source_versions: Dict[str, str]
+
+
+class BackgroundRefresher:
+    """
+    Runs stale-entry refreshes off the request path.
+    At most one refresh per key is queued or running at a time.
+    """
+
+    def __init__(self, name: str, max_workers: int = CACHE_REFRESH_WORKERS):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending: set = set()
+
+        self.queued = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self._lags = deque(maxlen=1000)  # seconds from soft expiry to refreshed value
+        self._durations = deque(maxlen=1000)
+
+    def submit(self, key: str, stale_since: float, refresh_fn: Callable[[], Any]) -> bool:
+        """Queue refresh_fn for key unless one is already pending; returns True if queued"""
+        with self._lock:
+            if key in self._pending:
+                self.deduplicated += 1
+                return False
+            self._pending.add(key)
+            self.queued += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f"{self.name}-refresh"
+                )
+            executor = self._executor
+
+        executor.submit(self._run, key, stale_since, refresh_fn)
+        return True
+
+    def _run(self, key: str, stale_since: float, refresh_fn: Callable[[], Any]):
+        start = time.time()
+        try:
+            refresh_fn()
+        except Exception as e:
+            logger.warning(f"[{self.name}] Background refresh failed for {key}: {e}")
+            with self._lock:
+                self.failed += 1
+        else:
+            finished = time.time()
+            with self._lock:
+                self.completed += 1
+                self._lags.append(max(0.0, finished - stale_since))
+                self._durations.append(finished - start)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._idle.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until no refresh is pending; returns False on timeout"""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lags = list(self._lags)
+            durations = list(self._durations)
+            return {
+                "refresh_queued": self.queued,
+                "refresh_deduplicated": self.deduplicated,
+                "refresh_completed": self.completed,
+                "refresh_failed": self.failed,
+                "refresh_in_progress": len(self._pending),
+                "avg_refresh_lag_seconds": sum(lags) / len(lags) if lags else 0,
+                "max_refresh_lag_seconds": max(lags) if lags else 0,
+                "avg_refresh_duration_seconds": sum(durations) / len(durations) if durations else 0
+            }
+
+
 class CacheManager:
     """
     Production cache manager with:
     - TTL-based expiration
     - Version-based invalidation
     - Source tracking
+    - In-process LRU tier with batched hit-count flushes
     """
-    
-    def __init__(self):
+
+    def __init__(self, l1_max_entries: int = CACHE_L1_MAX_ENTRIES,
+                 l1_ttl_seconds: float = CACHE_L1_TTL_SECONDS,
+                 hit_flush_interval: float = CACHE_HIT_FLUSH_INTERVAL,
+                 hit_flush_threshold: int = CACHE_HIT_FLUSH_THRESHOLD):
         self.registry_version = "1.0.0"
         self.pricing_version = "2024-01"
         self.rubric_version = "1.0.0"
+
+        self.l1_max_entries = l1_max_entries
+        self.l1_ttl_seconds = l1_ttl_seconds
+        self.hit_flush_interval = hit_flush_interval
+        self.hit_flush_threshold = hit_flush_threshold
+
+        self._l1: "OrderedDict[str, _L1Entry]" = OrderedDict()
+        self._pending_hits: Dict[str, int] = {}
+        self._pending_hit_total = 0
+        self._last_flush = time.time()
+        self._l1_hits = 0
+        self._l1_misses = 0
+        self._lock = threading.RLock()
+        self._refresher = BackgroundRefresher("cache")
+        self.stale_served = 0
+
         self._init_db()
     
     def _init_db(self):
@@ -64,6 +190,9 @@ class CacheManager:
                 hit_count INTEGER DEFAULT 0
             )
         """)
+
+        # Soft expiry; expires_at is the hard expiry once a stale window is used
+        _ensure_column(cursor, "cache", "refresh_after", "TEXT")
         
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS cache_invalidation_log (
@@ -74,129 +203,266 @@ class CacheManager:
                 timestamp TEXT NOT NULL
             )
         """)
-        
+
+        # Tag set per key, so related entries (one user, one model, one
+        # source version) can be dropped without touching anything else
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                PRIMARY KEY (tag, cache_key)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cache_tags_key
+            ON cache_tags(cache_key)
+        """)
+
         conn.commit()
         conn.close()
-    
+
     def generate_key(self, prefix: str, **kwargs) -> str:
-        """Generate a unique cache key from components"""
+        """
+        Generate a unique cache key from components.
+        The prefix is kept in clear ("<prefix>:<hash>") so prefix invalidation
+        is a range scan on the primary key.
+        """
         components = [prefix] + [f"{k}={v}" for k, v in sorted(kwargs.items())]
         key_string = ":".join(components)
-        return hashlib.sha256(key_string.encode()).hexdigest()[:32]
+        return f"{prefix}:{hashlib.sha256(key_string.encode()).hexdigest()[:32]}"
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get a cached value if valid"""
+    def get(self, key: str, allow_stale: bool = False) -> Optional[Any]:
+        """Get a cached value if valid (L1 first, then SQLite)"""
+        found = self._lookup(key)
+        if found is None:
+            return None
+
+        value_json, refresh_after = found
+        if not allow_stale and time.time() > refresh_after:
+            return None
+
+        self._record_hit(key)
+        return json.loads(value_json)
+
+    def get_or_refresh(self, key: str, loader: Callable[[], Any],
+                       ttl_seconds: int = 3600,
+                       stale_ttl_seconds: int = CACHE_STALE_TTL_SECONDS,
+                       tags: Optional[List[str]] = None,
+                       refresh_loader: Optional[Callable[[], Any]] = None) -> Tuple[Any, str]:
+        """
+        Stale-while-revalidate read.
+        Returns (value, status) where status is:
+        - "fresh": within TTL
+        - "stale": past TTL but inside the stale window; served now while
+          refresh_loader() (default: loader()) runs in the background,
+          deduplicated per key
+        - "loaded": missing or past the stale window; loader() ran inline
+        """
+        refresh_loader = refresh_loader or loader
+        found = self._lookup(key)
+        if found is not None:
+            value_json, refresh_after = found
+            self._record_hit(key)
+
+            if time.time() > refresh_after:
+                with self._lock:
+                    self.stale_served += 1
+                self._refresher.submit(
+                    key, refresh_after,
+                    lambda: self.set(key, refresh_loader(), ttl_seconds, tags=tags,
+                                     stale_ttl_seconds=stale_ttl_seconds)
+                )
+                return json.loads(value_json), "stale"
+
+            return json.loads(value_json), "fresh"
+
+        value = loader()
+        self.set(key, value, ttl_seconds, tags=tags, stale_ttl_seconds=stale_ttl_seconds)
+        return value, "loaded"
+
+    def _lookup(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value_json, refresh_after epoch) for an entry that is not hard-expired"""
+        entry = self._l1_get(key)
+        if entry is not None:
+            return entry.value_json, entry.refresh_after
+
         conn = sqlite3.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        
+
         cursor.execute("SELECT * FROM cache WHERE cache_key = ?", (key,))
         row = cursor.fetchone()
-        
+        conn.close()
+
         if not row:
-            conn.close()
             return None
-        
+
         # Check expiration
+        now = datetime.utcnow()
         expires_at = datetime.fromisoformat(row["expires_at"])
-        if datetime.utcnow() > expires_at:
-            cursor.execute("DELETE FROM cache WHERE cache_key = ?", (key,))
-            conn.commit()
-            conn.close()
+        if now > expires_at:
+            self._delete_row(key)
             return None
-        
+
         # Check version compatibility
         source_versions = json.loads(row["source_versions_json"]) if row["source_versions_json"] else {}
         if not self._versions_compatible(source_versions):
-            cursor.execute("DELETE FROM cache WHERE cache_key = ?", (key,))
-            conn.commit()
-            conn.close()
+            self._delete_row(key)
             return None
-        
-        # Update hit count
-        cursor.execute("UPDATE cache SET hit_count = hit_count + 1 WHERE cache_key = ?", (key,))
-        conn.commit()
-        conn.close()
-        
-        return json.loads(row["value_json"])
-    
-    def set(self, key: str, value: Any, ttl_seconds: int = 3600) -> bool:
-        """Set a cached value with TTL"""
+
+        soft_expiry = datetime.fromisoformat(row["refresh_after"]) if row["refresh_after"] else expires_at
+        refresh_after = time.time() + (soft_expiry - now).total_seconds()
+
+        self._l1_put(key, row["value_json"], (expires_at - now).total_seconds(),
+                     source_versions, refresh_after)
+        return row["value_json"], refresh_after
+
+    def set(self, key: str, value: Any, ttl_seconds: int = 3600,
+            tags: Optional[List[str]] = None, stale_ttl_seconds: int = 0) -> bool:
+        """
+        Set a cached value with TTL (written through to both tiers).
+        Tags (e.g. "user:<id>", "model:<id>") allow targeted invalidation and
+        accumulate across writes, since entries can be shared between users;
+        source-version tags are added automatically and replace outdated ones.
+        stale_ttl_seconds keeps the entry servable via get_or_refresh for that
+        long after the TTL runs out.
+        """
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
-        
+
         now = datetime.utcnow()
-        expires_at = now + timedelta(seconds=ttl_seconds)
-        
-        source_versions = {
-            "model_registry": self.registry_version,
-            "pricing": self.pricing_version,
-            "rubric": self.rubric_version
-        }
-        
+        refresh_after = now + timedelta(seconds=ttl_seconds)
+        expires_at = refresh_after + timedelta(seconds=stale_ttl_seconds)
+
+        source_versions = self._current_versions()
+        value_json = json.dumps(value, default=str)
+
         try:
             cursor.execute("""
                 INSERT OR REPLACE INTO cache (
-                    cache_key, value_json, created_at, expires_at, 
-                    version, source_versions_json, hit_count
-                ) VALUES (?, ?, ?, ?, ?, ?, 0)
+                    cache_key, value_json, created_at, expires_at,
+                    version, source_versions_json, hit_count, refresh_after
+                ) VALUES (?, ?, ?, ?, ?, ?, 0, ?)
             """, (
                 key,
-                json.dumps(value, default=str),
+                value_json,
                 now.isoformat(),
                 expires_at.isoformat(),
                 "1.0.0",
-                json.dumps(source_versions)
+                json.dumps(source_versions),
+                refresh_after.isoformat()
             ))
+
+            version_tags = {f"{c}:{v}" for c, v in source_versions.items()}
+            all_tags = set(tags or []) | version_tags
+            for component, version in source_versions.items():
+                cursor.execute(
+                    "DELETE FROM cache_tags WHERE cache_key = ? AND tag LIKE ? AND tag != ?",
+                    (key, f"{component}:%", f"{component}:{version}")
+                )
+            cursor.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, cache_key) VALUES (?, ?)",
+                [(tag, key) for tag in sorted(all_tags)]
+            )
             conn.commit()
-            return True
         except Exception as e:
             print(f"Cache set error: {e}")
             return False
         finally:
             conn.close()
-    
+
+        with self._lock:
+            # The row was replaced with hit_count 0; drop hits recorded against the old row
+            self._pending_hit_total -= self._pending_hits.pop(key, 0)
+        self._l1_put(key, value_json, ttl_seconds + stale_ttl_seconds, source_versions,
+                     time.time() + ttl_seconds)
+        return True
+
     def invalidate(self, key: str) -> bool:
         """Invalidate a specific cache entry"""
+        self._drop_local([key])
+
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
-        
+
         cursor.execute("DELETE FROM cache WHERE cache_key = ?", (key,))
         affected = cursor.rowcount
+        cursor.execute("DELETE FROM cache_tags WHERE cache_key = ?", (key,))
         conn.commit()
         conn.close()
-        
+
         return affected > 0
-    
+
     def invalidate_by_prefix(self, prefix: str) -> int:
-        """Invalidate all entries matching a prefix pattern"""
+        """
+        Invalidate all entries whose key prefix is `prefix` (or nested below it,
+        e.g. "model_output" also covers "model_output:v2:...").
+        """
+        # Keys look like "<prefix>:<hash>"; ";" sorts right after ":" so this
+        # is an index range over the primary key
+        lower, upper = f"{prefix}:", f"{prefix};"
+
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
-        
-        # Get matching keys (we use hash so need to track separately)
-        # For now, invalidate all
-        cursor.execute("SELECT COUNT(*) FROM cache")
-        count = cursor.fetchone()[0]
-        
-        cursor.execute("DELETE FROM cache")
+
+        cursor.execute("""
+            SELECT cache_key FROM cache WHERE cache_key >= ? AND cache_key < ?
+        """, (lower, upper))
+        keys = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("DELETE FROM cache WHERE cache_key >= ? AND cache_key < ?", (lower, upper))
+        count = cursor.rowcount
+        cursor.execute("DELETE FROM cache_tags WHERE cache_key >= ? AND cache_key < ?", (lower, upper))
+
+        self._log_invalidation(cursor, "prefix_invalidation", count, f"Prefix: {prefix}")
         conn.commit()
-        
-        # Log invalidation
+        conn.close()
+
+        self._drop_local(keys)
+        return count
+
+    def invalidate_by_tag(self, tag: str) -> int:
+        """Invalidate every entry carrying `tag`, returns number of entries removed"""
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT cache_key FROM cache_tags WHERE tag = ?", (tag,))
+        keys = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("""
+            DELETE FROM cache
+            WHERE cache_key IN (SELECT cache_key FROM cache_tags WHERE tag = ?)
+        """, (tag,))
+        count = cursor.rowcount
+        cursor.executemany("DELETE FROM cache_tags WHERE cache_key = ?", [(k,) for k in keys])
+
+        self._log_invalidation(cursor, "tag_invalidation", count, f"Tag: {tag}")
+        conn.commit()
+        conn.close()
+
+        self._drop_local(keys)
+        return count
+
+    def _drop_local(self, keys: List[str]):
+        """Forget L1 entries and pending hits for keys removed from SQLite"""
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+                self._pending_hit_total -= self._pending_hits.pop(key, 0)
+
+    def _log_invalidation(self, cursor, invalidation_type: str, count: int, reason: str):
         cursor.execute("""
             INSERT INTO cache_invalidation_log (
                 invalidation_type, affected_keys, reason, timestamp
             ) VALUES (?, ?, ?, ?)
         """, (
-            "prefix_invalidation",
+            invalidation_type,
             count,
-            f"Prefix: {prefix}",
+            reason,
             datetime.utcnow().isoformat()
         ))
-        conn.commit()
-        conn.close()
-        
-        return count
-    
+
     def invalidate_on_version_change(self, component: str, new_version: str) -> int:
         """Invalidate cache when a component version changes"""
         old_version = None
@@ -212,7 +478,8 @@ class CacheManager:
             self.rubric_version = new_version
         
         if old_version and old_version != new_version:
-            return self.invalidate_by_prefix(component)
+            # Every entry is tagged with the source versions it was built from
+            return self.invalidate_by_tag(f"{component}:{old_version}")
         
         return 0
     
@@ -225,9 +492,95 @@ class CacheManager:
         if source_versions.get("rubric") != self.rubric_version:
             return False
         return True
-    
+
+    def _current_versions(self) -> Dict[str, str]:
+        return {
+            "model_registry": self.registry_version,
+            "pricing": self.pricing_version,
+            "rubric": self.rubric_version
+        }
+
+    # ------------------------------------------------------------------
+    # L1 (in-process) tier
+    # ------------------------------------------------------------------
+    def _l1_get(self, key: str) -> Optional[_L1Entry]:
+        """Return the L1 entry, evicting hard-expired or outdated entries"""
+        if self.l1_max_entries <= 0:
+            return None
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                self._l1_misses += 1
+                return None
+
+            if time.time() > entry.expires_at or not self._versions_compatible(entry.source_versions):
+                # Let the L2 path decide whether the row itself is dead
+                del self._l1[key]
+                self._l1_misses += 1
+                return None
+
+            self._l1.move_to_end(key)
+            self._l1_hits += 1
+            return entry
+
+    def _l1_put(self, key: str, value_json: str, ttl_seconds: float,
+                source_versions: Dict[str, str], refresh_after: float):
+        if self.l1_max_entries <= 0:
+            return
+
+        expires_at = time.time() + min(ttl_seconds, self.l1_ttl_seconds)
+        with self._lock:
+            self._l1[key] = _L1Entry(value_json, expires_at, refresh_after, source_versions)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _delete_row(self, key: str):
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("DELETE FROM cache WHERE cache_key = ?", (key,))
+        conn.execute("DELETE FROM cache_tags WHERE cache_key = ?", (key,))
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------
+    # Hit-count aggregation
+    # ------------------------------------------------------------------
+    def _record_hit(self, key: str):
+        with self._lock:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+            self._pending_hit_total += 1
+            due = (self._pending_hit_total >= self.hit_flush_threshold
+                   or time.time() - self._last_flush >= self.hit_flush_interval)
+
+        if due:
+            self.flush_hit_counts()
+
+    def flush_hit_counts(self) -> int:
+        """Write aggregated hit counts to SQLite, returns number of keys updated"""
+        with self._lock:
+            pending = self._pending_hits
+            self._pending_hits = {}
+            self._pending_hit_total = 0
+            self._last_flush = time.time()
+
+        if not pending:
+            return 0
+
+        conn = sqlite3.connect(DB_PATH)
+        conn.executemany(
+            "UPDATE cache SET hit_count = hit_count + ? WHERE cache_key = ?",
+            [(count, key) for key, count in pending.items()]
+        )
+        conn.commit()
+        conn.close()
+
+        return len(pending)
+
     def get_stats(self) -> Dict:
         """Get cache statistics"""
+        self.flush_hit_counts()
+
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
@@ -243,12 +596,23 @@ class CacheManager:
         valid_entries = cursor.fetchone()[0]
         
         conn.close()
-        
+
+        with self._lock:
+            l1_entries = len(self._l1)
+            l1_lookups = self._l1_hits + self._l1_misses
+            l1_hit_rate = self._l1_hits / l1_lookups * 100 if l1_lookups else 0
+            stale_served = self.stale_served
+
         return {
             "total_entries": total_entries,
             "valid_entries": valid_entries,
             "expired_entries": total_entries - valid_entries,
             "total_hits": total_hits,
+            "l1_entries": l1_entries,
+            "l1_max_entries": self.l1_max_entries,
+            "l1_hit_rate": l1_hit_rate,
+            "stale_served": stale_served,
+            **self._refresher.get_stats(),
             "registry_version": self.registry_version,
             "pricing_version": self.pricing_version,
             "rubric_version": self.rubric_version
@@ -262,14 +626,25 @@ class CacheManager:
         cursor.execute("""
             DELETE FROM cache WHERE expires_at < ?
         """, (datetime.utcnow().isoformat(),))
-        
+
         deleted = cursor.rowcount
+        cursor.execute("""
+            DELETE FROM cache_tags
+            WHERE cache_key NOT IN (SELECT cache_key FROM cache)
+        """)
         conn.commit()
         conn.close()
         
         return deleted
 
 
+def _ensure_column(cursor, table: str, column: str, declaration: str):
+    """Add a column to an existing table created by an older schema"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
 # Global instance
 cache_manager = CacheManager()
 
@@ -281,28 +656,49 @@ class ConversationCache:
     """
     Specialized cache for conversation/prompt hashing
     Prevents re-running same tests
+    
+    Outputs older than soft_ttl_seconds are still served (flagged stale) until
+    hard_ttl_seconds; get_or_refresh_output rebuilds them in the background.
     """
     
-    def __init__(self):
+    def __init__(self, soft_ttl_seconds: int = CONVERSATION_CACHE_SOFT_TTL,
+                 hard_ttl_seconds: int = CONVERSATION_CACHE_HARD_TTL):
+        self.soft_ttl_seconds = soft_ttl_seconds
+        self.hard_ttl_seconds = hard_ttl_seconds
+        self._refresher = BackgroundRefresher("conversation_cache")
+        self._lock = threading.Lock()  # Guards stale_served; lookups run on many threads
+        self.stale_served = 0
         self._init_db()
     
     def _init_db(self):
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
+        # Older databases keyed this table on conversation_hash alone, so a
+        # second model's output overwrote the first; rebuild with the pair key.
+        cursor.execute("PRAGMA table_info(conversation_cache)")
+        pk_columns = [row[1] for row in cursor.fetchall() if row[5]]
+        if pk_columns == ["conversation_hash"]:
+            cursor.execute("ALTER TABLE conversation_cache RENAME TO conversation_cache_legacy")
+        
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS conversation_cache (
-                conversation_hash TEXT PRIMARY KEY,
+                conversation_hash TEXT NOT NULL,
                 model_id TEXT NOT NULL,
                 run_version TEXT NOT NULL,
                 output_json TEXT NOT NULL,
                 quality_score REAL,
                 cost REAL,
                 latency_ms REAL,
-                created_at TEXT NOT NULL
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (conversation_hash, model_id)
             )
         """)
         
+        if pk_columns == ["conversation_hash"]:
+            cursor.execute("INSERT INTO conversation_cache SELECT * FROM conversation_cache_legacy")
+            cursor.execute("DROP TABLE conversation_cache_legacy")
+        
         conn.commit()
         conn.close()
     
@@ -311,6 +707,17 @@ class ConversationCache:
         content = json.dumps(messages, sort_keys=True)
         return hashlib.sha256(content.encode()).hexdigest()[:16]
     
+    def model_key(self, model_slug: str, **generation_params) -> str:
+        """
+        Cache identity for a model call: the slug plus every generation
+        parameter that changes the output (temperature, max_tokens, ...)
+        """
+        params = {k: v for k, v in generation_params.items() if v is not None}
+        if not params:
+            return model_slug
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        return f"{model_slug}#{digest}"
+    
     def get_cached_output(self, conversation_hash: str, model_id: str) -> Optional[Dict]:
         """Get cached output for a conversation+model pair"""
         conn = sqlite3.connect(DB_PATH)
@@ -325,17 +732,58 @@ class ConversationCache:
         row = cursor.fetchone()
         conn.close()
         
-        if row:
-            return {
-                "output": json.loads(row["output_json"]),
-                "quality_score": row["quality_score"],
-                "cost": row["cost"],
-                "latency_ms": row["latency_ms"],
-                "run_version": row["run_version"],
-                "created_at": row["created_at"]
-            }
+        if not row:
+            return None
         
-        return None
+        age = (datetime.utcnow() - datetime.fromisoformat(row["created_at"])).total_seconds()
+        if age > self.hard_ttl_seconds:
+            return None
+        
+        return {
+            "output": json.loads(row["output_json"]),
+            "quality_score": row["quality_score"],
+            "cost": row["cost"],
+            "latency_ms": row["latency_ms"],
+            "run_version": row["run_version"],
+            "created_at": row["created_at"],
+            "stale": age > self.soft_ttl_seconds,
+            "stale_since": time.time() - (age - self.soft_ttl_seconds)
+        }
+    
+    def get_or_refresh_output(self, conversation_hash: str, model_id: str,
+                              loader: Callable[[], Dict]) -> Tuple[Dict, str]:
+        """
+        Stale-while-revalidate lookup for a conversation+model pair.
+        loader() must return a dict with output, quality_score, cost and latency_ms.
+        Returns (entry, status) with status "fresh", "stale" or "loaded".
+        """
+        cached = self.get_cached_output(conversation_hash, model_id)
+        
+        def refresh() -> Dict:
+            fresh = loader()
+            self.cache_output(
+                conversation_hash, model_id,
+                fresh["output"], fresh.get("quality_score"),
+                fresh.get("cost", 0.0), fresh.get("latency_ms", 0.0)
+            )
+            return fresh
+        
+        if cached is None:
+            return refresh(), "loaded"
+        
+        if cached["stale"]:
+            with self._lock:
+                self.stale_served += 1
+            self._refresher.submit(f"{conversation_hash}:{model_id}", cached["stale_since"], refresh)
+            return cached, "stale"
+        
+        return cached, "fresh"
+    
+    def get_stats(self) -> Dict:
+        """Stale-serving and background refresh statistics"""
+        with self._lock:
+            stale_served = self.stale_served
+        return {"stale_served": stale_served, **self._refresher.get_stats()}
     
     def cache_output(self, conversation_hash: str, model_id: str,
                     output: Any, quality_score: float,
@@ -0,0 +1,280 @@
+"""
+Cascade Executor - Cheapest-first model escalation
+
+Instead of fanning a prompt out to every model, the cascade asks the models
+in the registry one at a time, cheapest rank first. It stops at the first
+answer a fast verifier accepts:
+
+1. Heuristics: the call succeeded, the answer is long enough and was not
+   cut off at max_tokens
+2. Refusal detection (ReplayEngine's refusal patterns)
+3. knowledge_tracker.should_use_fallback (knowledge-cutoff disclaimers)
+4. Optional LLM judge: overall score must reach CASCADE_JUDGE_MIN_QUALITY
+
+The executor keeps running totals: average models tried per request and
+the cost actually spent versus an estimate of what full fan-out would have
+cost on the same requests. Models the cascade never called are priced with
+the token counts observed on the models it did call.
+
+Usage:
+    python cascade_executor.py "your prompt"
+"""
+import logging
+import sys
+import threading
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    MODELS_TO_TEST, CASCADE_MIN_RESPONSE_CHARS, CASCADE_JUDGE_MIN_QUALITY
+)
+from knowledge_cutoff import knowledge_tracker
+from model_registry import model_registry
+from models import CompletionResult, PromptData, QualityScore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CascadeStep:
+    """One model tried by the cascade"""
+    model_name: str
+    accepted: bool
+    reason: str
+    cost: float
+    latency_ms: float
+    quality_score: Optional[float] = None
+
+
+@dataclass
+class CascadeResult:
+    """Outcome of one cascaded request"""
+    prompt_id: str
+    completion: Optional[CompletionResult]  # Accepted answer, else the last successful one
+    accepted: bool
+    steps: List[CascadeStep]
+    completions: List[CompletionResult] = field(default_factory=list)
+    quality: Optional[QualityScore] = None  # Judge score of the returned answer, if judged
+    cost: float = 0.0
+    fan_out_cost: float = 0.0  # Estimated cost of asking every model in the ladder
+
+    @property
+    def models_tried(self) -> int:
+        return len(self.steps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt_id": self.prompt_id,
+            "model_used": self.completion.model_name if self.completion else None,
+            "accepted": self.accepted,
+            "models_tried": self.models_tried,
+            "cost": self.cost,
+            "fan_out_cost": self.fan_out_cost,
+            "steps": [asdict(step) for step in self.steps]
+        }
+
+
+def model_ladder() -> List[Dict[str, Any]]:
+    """
+    Model configs ordered cheapest rank first.
+    Registry models are matched to MODELS_TO_TEST by Portkey slug; a registry
+    model without a test config gets one built from its registry pricing.
+    """
+    configs = {m["model"]: m for m in MODELS_TO_TEST}
+    ladder = []
+    for entry in sorted(model_registry.get_all_models(), key=lambda m: m.rank, reverse=True):
+        config = configs.get(entry.portkey_slug)
+        if config is None:
+            config = {
+                "name": entry.display_name,
+                "model": entry.portkey_slug,
+                "expected_cost_per_1k_input": entry.pricing.input_price_per_1k,
+                "expected_cost_per_1k_output": entry.pricing.output_price_per_1k,
+                "strengths": entry.capabilities.strengths,
+                "max_tokens": 1024
+            }
+        ladder.append(config)
+    return ladder
+
+
+def _estimate_cost(model_config: Dict, tokens_input: int, tokens_output: int) -> float:
+    """Same pricing as ReplayEngine._calculate_cost"""
+    return ((tokens_input / 1000) * model_config["expected_cost_per_1k_input"] +
+            (tokens_output / 1000) * model_config["expected_cost_per_1k_output"])
+
+
+class CascadeExecutor:
+    """Escalates a prompt through the model ladder until an answer is accepted"""
+
+    def __init__(self, replay_engine=None, evaluator=None,
+                 ladder: Optional[List[Dict[str, Any]]] = None,
+                 min_response_chars: int = CASCADE_MIN_RESPONSE_CHARS,
+                 judge_min_quality: float = CASCADE_JUDGE_MIN_QUALITY):
+        self.replay_engine = replay_engine
+        self.evaluator = evaluator  # None disables the judge step
+        self.ladder = ladder if ladder is not None else model_ladder()
+        self.min_response_chars = min_response_chars
+        self.judge_min_quality = judge_min_quality
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.models_tried = 0
+        self.accepted_requests = 0
+        self.cost_spent = 0.0
+        self.fan_out_cost = 0.0
+        self.accepted_by_model: Dict[str, int] = {}
+        self.rejections: Dict[str, int] = {}
+
+    def _engine(self):
+        if self.replay_engine is None:
+            from replay_engine import ReplayEngine
+            self.replay_engine = ReplayEngine()
+        return self.replay_engine
+
+    # ========================================================================
+    # Verification
+    # ========================================================================
+
+    def verify(self, prompt: PromptData, completion: CompletionResult,
+               model_config: Dict) -> Tuple[bool, str, Optional[QualityScore]]:
+        """
+        Run the verifier chain, cheapest check first.
+        Returns (accepted, reason, judge score or None).
+        """
+        if not completion.success:
+            return False, "call_failed", None
+
+        response = (completion.response or "").strip()
+        if len(response) < self.min_response_chars:
+            return False, "too_short", None
+        if completion.tokens_output >= model_config.get("max_tokens", 1000):
+            return False, "truncated", None
+
+        if completion.is_refusal:
+            return False, "refusal", None
+
+        needs_fallback, _ = knowledge_tracker.should_use_fallback(response, completion.model_name)
+        if needs_fallback:
+            return False, "knowledge_limit", None
+
+        if self.evaluator is None:
+            return True, "heuristics_passed", None
+
+        quality = self.evaluator.evaluate(prompt, completion)
+        if quality.overall_score < self.judge_min_quality:
+            return False, "judge_rejected", quality
+        return True, "judge_accepted", quality
+
+    # ========================================================================
+    # Execution
+    # ========================================================================
+
+    def run(self, prompt: PromptData) -> CascadeResult:
+        """Try models cheapest first and return the first accepted answer"""
+        steps: List[CascadeStep] = []
+        completions: List[CompletionResult] = []
+        fallback: Optional[CompletionResult] = None
+        fallback_quality: Optional[QualityScore] = None
+        accepted_quality: Optional[QualityScore] = None
+        accepted = False
+
+        for model_config in self.ladder:
+            completion = self._engine().replay_prompt_on_model(prompt, model_config)
+            completions.append(completion)
+            ok, reason, quality = self.verify(prompt, completion, model_config)
+            steps.append(CascadeStep(
+                model_name=completion.model_name,
+                accepted=ok,
+                reason=reason,
+                cost=completion.cost,
+                latency_ms=completion.latency_ms,
+                quality_score=quality.overall_score if quality else None
+            ))
+            logger.info(f"Cascade {prompt.id}: {completion.model_name} -> {reason}")
+
+            if ok:
+                accepted = True
+                accepted_quality = quality
+                break
+            if completion.success:
+                # Nothing accepted yet: keep the most capable answer seen so far
+                fallback, fallback_quality = completion, quality
+
+        answer = completions[-1] if accepted else fallback
+        result = CascadeResult(
+            prompt_id=prompt.id,
+            completion=answer,
+            accepted=accepted,
+            steps=steps,
+            completions=completions,
+            quality=accepted_quality if accepted else fallback_quality,
+            cost=sum(c.cost for c in completions),
+            fan_out_cost=self._fan_out_cost(completions)
+        )
+        self._record(result)
+        return result
+
+    def _fan_out_cost(self, completions: List[CompletionResult]) -> float:
+        """Actual cost of the models tried plus an estimate for the rest of the ladder"""
+        successful = [c for c in completions if c.success]
+        if not successful:
+            return sum(c.cost for c in completions)
+
+        tokens_input = successful[-1].tokens_input
+        tokens_output = successful[-1].tokens_output
+        tried = {c.model_name for c in completions}
+        untried = [m for m in self.ladder if m["name"] not in tried]
+        return (sum(c.cost for c in completions) +
+                sum(_estimate_cost(m, tokens_input, tokens_output) for m in untried))
+
+    def _record(self, result: CascadeResult):
+        with self._stats_lock:
+            self.requests += 1
+            self.models_tried += result.models_tried
+            self.cost_spent += result.cost
+            self.fan_out_cost += result.fan_out_cost
+            if result.accepted:
+                self.accepted_requests += 1
+                model = result.completion.model_name
+                self.accepted_by_model[model] = self.accepted_by_model.get(model, 0) + 1
+            for step in result.steps:
+                if not step.accepted:
+                    self.rejections[step.reason] = self.rejections.get(step.reason, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Average models tried per request and cost versus full fan-out"""
+        with self._stats_lock:
+            saved = self.fan_out_cost - self.cost_spent
+            return {
+                "requests": self.requests,
+                "ladder": [m["name"] for m in self.ladder],
+                "judge_enabled": self.evaluator is not None,
+                "avg_models_tried": round(self.models_tried / self.requests, 3) if self.requests else 0.0,
+                "fan_out_models": len(self.ladder),
+                "acceptance_rate": round(self.accepted_requests / self.requests, 3) if self.requests else 0.0,
+                "cost_spent_usd": round(self.cost_spent, 6),
+                "fan_out_cost_usd": round(self.fan_out_cost, 6),
+                "cost_saved_usd": round(saved, 6),
+                "cost_saved_percent": round(100 * saved / self.fan_out_cost, 1) if self.fan_out_cost else 0.0,
+                "accepted_by_model": dict(self.accepted_by_model),
+                "rejections": dict(self.rejections)
+            }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    text = " ".join(sys.argv[1:]) or "Explain the difference between a list and a tuple in Python"
+    executor = CascadeExecutor()
+    outcome = executor.run(PromptData(
+        id=f"cascade_{uuid.uuid4().hex[:12]}",
+        messages=[{"role": "user", "content": text}],
+        original_model="cascade"
+    ))
+
+    for step in outcome.steps:
+        print(f"  {step.model_name:<16} {step.reason:<18} ${step.cost:.6f}")
+    if outcome.completion:
+        print(f"\nAnswer ({outcome.completion.model_name}, accepted={outcome.accepted}):")
+        print(outcome.completion.response)
+    print(f"\nCost ${outcome.cost:.6f} vs full fan-out ${outcome.fan_out_cost:.6f}")
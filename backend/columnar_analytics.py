@@ -0,0 +1,250 @@
+"""
+Columnar Analytics - Vectorized per-model metrics over large evaluation sets
+
+Evaluations are loaded once into parallel NumPy arrays (a model code per
+row plus cost, quality, latency, cost per quality point and success), and
+every aggregate is computed for all models at once:
+
+- grouped_metrics(): the metrics analyze_model_performance reports, from
+  np.bincount sums (two-pass variance for numerical stability)
+- grouped_percentiles(): per-model percentiles from one lexsort
+- bootstrap_ci(): percentile bootstrap intervals of per-model means,
+  resampling in chunks so memory stays bounded on large models
+
+PerformanceAccumulator (running_stats.py) stays the incremental path that
+continuous mode updates per evaluation; this module is the bulk path for
+analysing a whole history at once.
+
+Usage:
+    python columnar_analytics.py [optimization_results.jsonl]
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from models import ModelEvaluation
+
+logger = logging.getLogger(__name__)
+
+# Elements per bootstrap chunk (resamples x rows), ~32 MB of float64
+_BOOTSTRAP_CHUNK = 4_000_000
+
+
+@dataclass
+class EvaluationColumns:
+    """Evaluations as parallel arrays; model_code[i] indexes models"""
+    models: List[str]
+    model_code: np.ndarray  # int32
+    cost: np.ndarray
+    quality: np.ndarray
+    latency: np.ndarray
+    cost_quality_ratio: np.ndarray
+    success: np.ndarray  # bool
+
+    def __len__(self) -> int:
+        return len(self.model_code)
+
+    @classmethod
+    def from_arrays(cls, model_names: Sequence[str], cost, quality, latency, success,
+                    cost_quality_ratio=None) -> "EvaluationColumns":
+        """Build from one model name per row plus value columns"""
+        models, codes = np.unique(np.asarray(model_names, dtype=object).astype(str), return_inverse=True)
+        cost = np.asarray(cost, dtype=np.float64)
+        quality = np.asarray(quality, dtype=np.float64)
+        if cost_quality_ratio is None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cost_quality_ratio = np.where(quality > 0, cost / quality, np.inf)
+        return cls(
+            models=[str(m) for m in models],
+            model_code=codes.astype(np.int32),
+            cost=cost,
+            quality=quality,
+            latency=np.asarray(latency, dtype=np.float64),
+            cost_quality_ratio=np.asarray(cost_quality_ratio, dtype=np.float64),
+            success=np.asarray(success, dtype=bool)
+        )
+
+    @classmethod
+    def from_evaluations(cls, evaluations: Iterable[ModelEvaluation]) -> "EvaluationColumns":
+        names, cost, quality, latency, ratio, success = [], [], [], [], [], []
+        for e in evaluations:
+            names.append(e.model_name)
+            cost.append(e.completion.cost)
+            quality.append(e.quality.overall_score)
+            latency.append(e.completion.latency_ms)
+            ratio.append(e.cost_quality_ratio)
+            success.append(e.completion.success)
+        return cls.from_arrays(names, cost, quality, latency, success, ratio)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "EvaluationColumns":
+        """Same as from_evaluations for dicts as stored in the results log"""
+        names, cost, quality, latency, ratio, success = [], [], [], [], [], []
+        for record in records:
+            completion = record["completion"]
+            names.append(record["model_name"])
+            cost.append(completion["cost"])
+            quality.append(record["quality"]["overall_score"])
+            latency.append(completion["latency_ms"])
+            ratio.append(record["cost_quality_ratio"])
+            success.append(completion["success"])
+        return cls.from_arrays(names, cost, quality, latency, success, ratio)
+
+    @classmethod
+    def empty(cls) -> "EvaluationColumns":
+        return cls.from_arrays([], [], [], [], [])
+
+    def concat(self, other: "EvaluationColumns") -> "EvaluationColumns":
+        """Rows of self followed by rows of other, with model codes merged"""
+        models = self.models + [m for m in other.models if m not in self.models]
+        remap = np.array([models.index(m) for m in other.models], dtype=np.int32)
+        return EvaluationColumns(
+            models=models,
+            model_code=np.concatenate([self.model_code, remap[other.model_code] if len(remap) else other.model_code]),
+            cost=np.concatenate([self.cost, other.cost]),
+            quality=np.concatenate([self.quality, other.quality]),
+            latency=np.concatenate([self.latency, other.latency]),
+            cost_quality_ratio=np.concatenate([self.cost_quality_ratio, other.cost_quality_ratio]),
+            success=np.concatenate([self.success, other.success])
+        )
+
+    def model_values(self, model: str, field: str) -> np.ndarray:
+        """A column's values for one model's successful rows"""
+        if model not in self.models:
+            return np.empty(0)
+        mask = (self.model_code == self.models.index(model)) & self.success
+        return getattr(self, field)[mask]
+
+    def successful(self) -> "EvaluationColumns":
+        """Rows whose completion succeeded (model codes are kept)"""
+        mask = self.success
+        return EvaluationColumns(self.models, self.model_code[mask], self.cost[mask], self.quality[mask],
+                                 self.latency[mask], self.cost_quality_ratio[mask], self.success[mask])
+
+
+# ============================================================================
+# Grouped aggregates
+# ============================================================================
+
+def grouped_metrics(columns: EvaluationColumns) -> Dict[str, Dict]:
+    """Per-model metrics in the shape analyze_model_performance returns"""
+    k = len(columns.models)
+    totals = np.bincount(columns.model_code, minlength=k)
+    ok = columns.successful()
+    codes = ok.model_code
+    n = np.bincount(codes, minlength=k)
+    safe_n = np.maximum(n, 1)
+
+    avg_cost = np.bincount(codes, ok.cost, k) / safe_n
+    avg_quality = np.bincount(codes, ok.quality, k) / safe_n
+    avg_latency = np.bincount(codes, ok.latency, k) / safe_n
+    avg_ratio = np.bincount(codes, ok.cost_quality_ratio, k) / safe_n
+    squares = np.bincount(codes, (ok.quality - avg_quality[codes]) ** 2, k)
+    quality_stdev = np.sqrt(squares / np.maximum(n - 1, 1))
+
+    metrics = {}
+    for i, model in enumerate(columns.models):
+        if n[i] > 0:
+            metrics[model] = {
+                "avg_cost": float(avg_cost[i]),
+                "avg_quality": float(avg_quality[i]),
+                "avg_latency": float(avg_latency[i]),
+                "avg_cost_quality_ratio": float(avg_ratio[i]),
+                "success_rate": float(n[i] / totals[i]),
+                "sample_size": int(totals[i]),
+                "quality_stdev": float(quality_stdev[i]) if n[i] > 1 else 0
+            }
+        else:
+            metrics[model] = {
+                "avg_cost": 0,
+                "avg_quality": 0,
+                "avg_latency": 0,
+                "avg_cost_quality_ratio": float('inf'),
+                "success_rate": 0,
+                "sample_size": int(totals[i]),
+                "quality_stdev": 0
+            }
+    return metrics
+
+
+def grouped_percentiles(columns: EvaluationColumns, field: str,
+                        percentiles: Sequence[float] = (50, 90, 95, 99)) -> Dict[str, Dict[str, float]]:
+    """Per-model percentiles (linear interpolation) of a column over successful rows"""
+    ok = columns.successful()
+    values = getattr(ok, field)
+    k = len(columns.models)
+    order = np.lexsort((values, ok.model_code))
+    ordered = values[order]
+    counts = np.bincount(ok.model_code, minlength=k)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    present = counts > 0
+    report: Dict[str, Dict[str, float]] = {columns.models[i]: {} for i in np.flatnonzero(present)}
+    for p in percentiles:
+        position = starts[present] + (counts[present] - 1) * (p / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts[present] + counts[present] - 1)
+        fraction = position - low
+        result = ordered[low] + (ordered[high] - ordered[low]) * fraction
+        for i, value in zip(np.flatnonzero(present), result):
+            report[columns.models[i]][f"p{p:g}"] = float(value)
+    return report
+
+
+def bootstrap_means(values: np.ndarray, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """Means of `resamples` bootstrap resamples of values, drawn in bounded chunks"""
+    n = len(values)
+    means = np.empty(resamples)
+    step = max(1, _BOOTSTRAP_CHUNK // max(n, 1))
+    for start in range(0, resamples, step):
+        count = min(step, resamples - start)
+        means[start:start + count] = values[rng.integers(0, n, size=(count, n))].mean(axis=1)
+    return means
+
+
+def bootstrap_ci(columns: EvaluationColumns, field: str, resamples: int = 1000,
+                 confidence: float = 0.95, seed: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """Percentile bootstrap interval of each model's mean over successful rows"""
+    ok = columns.successful()
+    values = getattr(ok, field)
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    order = np.argsort(ok.model_code, kind="stable")
+    groups = np.split(values[order], np.cumsum(np.bincount(ok.model_code, minlength=len(columns.models)))[:-1])
+
+    report = {}
+    for model, group in zip(columns.models, groups):
+        if len(group) == 0:
+            continue
+        means = bootstrap_means(group, resamples, rng)
+        low, high = np.quantile(means, [alpha, 1 - alpha])
+        report[model] = {"mean": float(group.mean()), "low": float(low), "high": float(high)}
+    return report
+
+
+def analyze(columns: EvaluationColumns, percentiles: Sequence[float] = (50, 90, 95, 99),
+            bootstrap_resamples: int = 0, seed: Optional[int] = None) -> Dict[str, Dict]:
+    """grouped_metrics plus latency/quality percentiles and optional mean CIs"""
+    metrics = grouped_metrics(columns)
+    for field in ("quality", "latency", "cost"):
+        for model, values in grouped_percentiles(columns, field, percentiles).items():
+            metrics[model][f"{field}_percentiles"] = values
+        if bootstrap_resamples:
+            for model, ci in bootstrap_ci(columns, field, bootstrap_resamples, seed=seed).items():
+                metrics[model][f"{field}_ci"] = ci
+    return metrics
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    from config import RESULTS_FILE
+    from evaluation_store import EvaluationLog
+
+    logging.basicConfig(level=logging.INFO)
+    columns = EvaluationColumns.from_records(EvaluationLog(sys.argv[1] if len(sys.argv) > 1 else RESULTS_FILE))
+    print(f"{len(columns)} evaluations, {len(columns.models)} models")
+    print(json.dumps(analyze(columns, bootstrap_resamples=1000), indent=2))
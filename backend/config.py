@@ -76,13 +76,31 @@ MODELS_TO_TEST = [
 ]
 
 # Use Case Categories
+# Keywords match at word starts ("debug" also matches "debugging"). When
+# several categories match, the one with the most hits wins; ties go to the
+# category listed first.
 USE_CASE_KEYWORDS = {
-    "code": ["function", "code", "python", "javascript", "programming", "debug", "algorithm", "script"],
-    "security": ["security", "vulnerability", "hack", "encrypt", "authentication", "secure", "threat"],
-    "creative": ["story", "poem", "haiku", "creative", "write", "imagine", "design"],
-    "analysis": ["analyze", "compare", "evaluate", "review", "assess", "explain"],
-    "general": ["what", "how", "why", "tell", "describe"]
+    "code": ["function", "code", "python", "javascript", "programming", "debug", "algorithm", "script",
+             "implement", "compile", "sql", "regex", "refactor"],
+    "security": ["security", "vulnerability", "hack", "encrypt", "authentication", "secure", "threat",
+                 "exploit", "attack", "penetration", "malware", "audit", "vulnerable", "injection"],
+    "creative": ["story", "poem", "haiku", "creative", "write", "imagine", "narrative", "fiction", "lyrics"],
+    "analysis": ["analyze", "analyse", "compare", "evaluate", "review", "assess", "data", "statistics",
+                 "chart", "graph", "insights", "trends"],
+    "documentation": ["document", "explain", "describe", "how to", "tutorial", "guide"],
+    "general": ["what", "how", "why", "tell"]
 }
+USE_CASE_LABELS = {  # Display names used by the dashboard API
+    "code": "Code Generation",
+    "security": "Security Analysis",
+    "creative": "Creative Writing",
+    "analysis": "Data Analysis",
+    "documentation": "Documentation",
+    "general": "General Task"
+}
+USE_CASE_KEYWORD_WEIGHTS = {"general": 0.5}  # Question words are weak evidence
+USE_CASE_CLASSIFIER_MODE = os.getenv("USE_CASE_CLASSIFIER_MODE", "keyword")  # "keyword" or "embedding"
+USE_CASE_EMBEDDING_MIN_CONFIDENCE = 0.5  # Below this keyword confidence, ask the embedding centroids
 
 # Quality Evaluation Settings
 QUALITY_JUDGE_MODEL = "gpt-4o-mini"  # Model to use for quality evaluation
@@ -98,17 +116,96 @@ EVALUATION_CRITERIA = {
 
 # State Management
 STATE_FILE = "replay_state.json"
-RESULTS_FILE = "optimization_results.json"
-CACHE_FILE = "evaluation_cache.json"
+PROCESSED_INDEX_FILE = "processed_prompts.db"  # SQLite set of processed prompt ids
+RESULTS_FILE = "optimization_results.jsonl"  # Append-only, one evaluation per line
+CACHE_FILE = "evaluation_cache.jsonl"  # Append-only key/value log (compact with evaluation_store.py)
+
+# Cache Settings (in-process L1 in front of the SQLite cache table)
+CACHE_L1_MAX_ENTRIES = 1024  # LRU capacity of the in-memory tier (0 disables it)
+CACHE_L1_TTL_SECONDS = 60  # Max time an entry lives in memory before re-reading SQLite
+CACHE_HIT_FLUSH_INTERVAL = 30  # Seconds between hit_count flushes to SQLite
+CACHE_HIT_FLUSH_THRESHOLD = 100  # Flush early once this many hits are pending
+CACHE_STALE_TTL_SECONDS = 1800  # Stale window after TTL: serve old value, refresh in background
+CACHE_REFRESH_WORKERS = 2  # Background refresh threads per cache
+CONVERSATION_CACHE_SOFT_TTL = 24 * 3600  # Conversation outputs are fresh for a day...
+CONVERSATION_CACHE_HARD_TTL = 7 * 24 * 3600  # ...and servable (stale) for a week
+
+# Replay Output Cache (ConversationCache in front of live model calls)
+# "off": always call the model
+# "read_through": serve cached outputs, cache every successful call (also sampled ones)
+# "deterministic": serve and cache only calls at deterministic temperatures
+REPLAY_CACHE_POLICY = os.getenv("REPLAY_CACHE_POLICY", "deterministic")
+REPLAY_CACHE_DETERMINISTIC_TEMPERATURE = 0.0  # Max temperature treated as deterministic
+REPLAY_TEMPERATURE = 0.0  # Sent with replays whose model config sets none; None leaves the provider default
+
+# Request Coalescing
+SINGLE_FLIGHT_TIMEOUT = 120  # Seconds a duplicate request waits on the in-flight one
+
+# Batch Optimization
+BATCH_OPTIMIZER_WORKERS = 4  # Groups optimized concurrently in a fleet-wide pass
+
+# Background Jobs
+JOB_QUEUE_WORKERS = 2  # Jobs (e.g. /api/optimize runs) executed concurrently
+JOB_QUEUE_POLL_SECONDS = 1.0  # Idle workers re-check the jobs table this often
+JOB_QUEUE_LEASE_SECONDS = 60  # A running job whose process misses heartbeats this long is requeued
+
+# Auto Mode Routing (offline routing table learned from replay history)
+ROUTING_LENGTH_BUCKETS = [64, 512]  # Estimated prompt-token bucket edges: short / medium / long
+ROUTING_EMBEDDING_CLUSTERS = 8  # k-means clusters over prompt embeddings (needs sentence-transformers)
+ROUTING_MIN_SAMPLES = 3  # Judged samples a model needs before a routing cell trusts it
+AUTO_ROUTER = os.getenv("AUTO_ROUTER", "table")  # "table" (offline routing table) or "bandit" (online)
+
+# Contextual Bandit Router
+BANDIT_POLICY = os.getenv("BANDIT_POLICY", "linucb")  # "linucb" or "thompson"
+BANDIT_ALPHA = 0.5  # LinUCB exploration width / Thompson posterior scale
+BANDIT_RIDGE = 1.0  # Ridge prior on each arm's reward model
+BANDIT_RELOAD_SECONDS = 5  # route() re-reads bandit_arms this often to pick up other workers' updates
+
+# Cascade Mode (cheapest model first, escalate until a verifier accepts)
+CASCADE_MIN_RESPONSE_CHARS = 20  # Shorter answers are rejected outright
+CASCADE_USE_JUDGE = os.getenv("CASCADE_USE_JUDGE", "false").lower() == "true"  # Add the LLM judge as last check
+CASCADE_JUDGE_MIN_QUALITY = 70.0  # Judge score an answer needs when the judge is on
 
 # Continuous Monitoring Settings
-MONITORING_INTERVAL = 300  # Check for new prompts every 5 minutes
+MONITORING_INTERVAL = 300  # Longest idle wait between polls (idle backoff ceiling)
 MAX_CONCURRENT_REPLAYS = 5  # Maximum number of concurrent replay operations
+MONITOR_TRIGGER = os.getenv("MONITOR_TRIGGER", "auto")  # "auto", "file", "sqlite", "queue" or "none"
+MONITOR_MIN_IDLE_SECONDS = 1.0  # First idle wait after work; doubles up to MONITORING_INTERVAL
+MONITOR_TRIGGER_POLL_SECONDS = 0.5  # How often file/SQLite triggers check for changes
+
+# Sharded Replay Workers (continuous mode split across processes)
+REPLAY_WORKERS = int(os.getenv("REPLAY_WORKERS", "0"))  # Worker processes; 0 keeps single-process mode
+SHARD_LEASE_SECONDS = 30  # A shard whose holder misses renewals this long is taken over
+SHARD_TASK_BATCH = 10  # Tasks a worker claims per step
+SHARD_TASK_RETENTION_SECONDS = 3600  # Collected task rows (and their payloads) are deleted after this
+
+# Prompt Ingestion (where ContinuousMonitor reads logged prompts from)
+INGESTION_SOURCE = os.getenv("INGESTION_SOURCE", "none")  # "none", "jsonl", "sqlite" or "http"
+INGESTION_PATH = os.getenv("INGESTION_PATH", "gateway_logs.jsonl")  # JSONL gateway log for "jsonl"
+INGESTION_URL = os.getenv("INGESTION_URL", "http://127.0.0.1:8787")  # Logs API base URL for "http"
+INGESTION_PAGE_SIZE = 500  # Max prompts read per page (bounds memory per cycle)
+
+# Replay Sampling (which ingested prompts continuous mode replays)
+REPLAY_SAMPLING = os.getenv("REPLAY_SAMPLING", "true").lower() == "true"
+REPLAY_DAILY_BUDGET_USD = float(os.getenv("REPLAY_DAILY_BUDGET_USD", "5.0"))  # Replay spend cap per UTC day
+SAMPLER_BURST_FRACTION = 0.1  # Share of the daily budget usable ahead of the even pacing line
+SAMPLER_DUPLICATE_SIMILARITY = 0.95  # Cosine similarity at which a prompt counts as a near-duplicate
+SAMPLER_DUPLICATE_WINDOW = 5000  # Recent prompts remembered for duplicate checks
+SAMPLER_MAX_STRATA = 5000  # Strata tracked; the least recently seen are dropped beyond this
+SAMPLER_MAX_PENDING = 50000  # Sampled prompts awaiting evaluation; the oldest are forgotten beyond this
 
 # Confidence Thresholds
 MIN_CONFIDENCE_SCORE = 0.7  # Minimum confidence to recommend model switch
 MIN_SAMPLE_SIZE = 10  # Minimum number of prompts needed for reliable analysis
 
+# Bootstrap Statistics (confidence intervals behind recommendations)
+BOOTSTRAP_RESAMPLES = 2000  # Resamples per comparison
+BOOTSTRAP_CONFIDENCE = 0.95  # Two-sided interval level
+BOOTSTRAP_WORKERS = int(os.getenv("BOOTSTRAP_WORKERS", str(min(4, os.cpu_count() or 1))))  # Process pool size
+BOOTSTRAP_PARALLEL_MIN_WORK = 20_000_000  # Resamples x rows below which resampling stays in-process
+BOOTSTRAP_CACHE_TTL = 86400  # Seconds a result stays cached under its evaluation-set fingerprint
+BOOTSTRAP_WINDOW = 5000  # Most recent evaluations per model that continuous mode bootstraps over
+
 # Failure Handling
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
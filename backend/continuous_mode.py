@@ -3,6 +3,9 @@ Continuous Monitoring Mode
 Run the optimization system continuously
 """
 from continuous_monitor import ContinuousMonitor
+from config import REPLAY_WORKERS
+from shard_workers import ShardCoordinator
+import argparse
 import logging
 
 logging.basicConfig(
@@ -13,6 +16,11 @@ logging.basicConfig(
 
 def main():
     """Run continuous monitoring"""
+    parser = argparse.ArgumentParser(description="Continuous monitoring")
+    parser.add_argument("--workers", type=int, default=REPLAY_WORKERS,
+                        help="Replay in N sharded worker processes (0 = single process)")
+    args = parser.parse_args()
+    
     monitor = ContinuousMonitor()
     
     print("\n" + "="*70)
@@ -20,9 +28,20 @@ def main():
     print("="*70)
     print("\nThe system will continuously monitor for new prompts and")
     print("optimize model usage based on cost-quality trade-offs.")
+    if args.workers:
+        print(f"\nSharded mode: {args.workers} worker processes")
     print("\nPress Ctrl+C to stop\n")
     print("="*70 + "\n")
     
+    if args.workers:
+        coordinator = ShardCoordinator(monitor, num_shards=args.workers)
+        try:
+            coordinator.run()
+        except KeyboardInterrupt:
+            print("\n\nStopping...")
+            coordinator.stop()
+        return
+    
     try:
         monitor.start_continuous_monitoring()
     except KeyboardInterrupt:
@@ -1,16 +1,17 @@
 """
 Continuous Monitor - Runs the optimization system continuously
 """
-import time
 import logging
-from typing import List
-from datetime import datetime
-from models import PromptData
+from concurrent.futures import Executor
+from typing import List, Optional
+from models import PromptData, ModelEvaluation
 from replay_engine import ReplayEngine
 from quality_evaluator import QualityEvaluator
 from optimizer import CostQualityOptimizer
 from state_manager import StateManager
-from config import MONITORING_INTERVAL
+from ingestion import IngestionSource, build_source
+from replay_sampler import ReplaySampler
+from config import INGESTION_PAGE_SIZE, REPLAY_SAMPLING
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,101 +20,142 @@ logger = logging.getLogger(__name__)
 class ContinuousMonitor:
     """Continuously monitors and optimizes model usage"""
     
-    def __init__(self):
+    def __init__(self, source: Optional[IngestionSource] = None,
+                 sampler: Optional[ReplaySampler] = None):
         self.replay_engine = ReplayEngine()
         self.evaluator = QualityEvaluator()
         self.optimizer = CostQualityOptimizer()
         self.state_manager = StateManager()
+        self.source = source if source is not None else build_source()
+        self.sampler = sampler if sampler is not None else (ReplaySampler() if REPLAY_SAMPLING else None)
         self.running = False
+        self.scheduler = None
+        self._next_cursor: Optional[str] = None
+        self.source_has_more = False
     
     def fetch_new_prompts(self, since_timestamp: str) -> List[PromptData]:
         """
-        Fetch new prompts from your data source
-        In production, this would query your database/logs
-        For demo, we return empty list
+        Read the next page of logged prompts from the ingestion source,
+        resuming at the cursor saved with the last processed page.
+        The new cursor is committed by process_prompts once the page is done.
         """
-        # TODO: Implement actual prompt fetching from Portkey logs or your database
-        # This is a placeholder
-        return []
+        if self.source is None:
+            return []
+        
+        state = self.state_manager.load_state()
+        page = self.source.read_page(state.source_cursors.get(self.source.name), INGESTION_PAGE_SIZE)
+        if page.skipped:
+            logger.warning(f"Skipped {page.skipped} unparseable records from {self.source.name}")
+        
+        self._next_cursor = page.next_cursor
+        self.source_has_more = page.has_more
+        if not page.prompts:
+            # Nothing to process, but skip past malformed records for good
+            self._commit_cursor(state)
+            self.state_manager.save_state(state)
+        return page.prompts
+    
+    def _commit_cursor(self, state):
+        """Move the saved source cursor past the page just fetched"""
+        if self.source is not None and self._next_cursor is not None:
+            state.source_cursors[self.source.name] = self._next_cursor
+            self._next_cursor = None
+    
+    def _evaluate_prompt(self, prompt: PromptData) -> List[ModelEvaluation]:
+        """Replay one prompt across models and judge every completion"""
+        logger.info(f"\n{'='*70}")
+        logger.info(f"Processing Prompt: {prompt.id}")
+        logger.info(f"{'='*70}")
+        
+        # Replay across models
+        completions = self.replay_engine.replay_prompt_across_models(prompt)
+        
+        if self.sampler is not None:
+            self.sampler.record_replay_cost(sum(c.cost for c in completions))
+        
+        # Evaluate quality
+        quality_scores = self.evaluator.evaluate_batch(prompt, completions)
+        
+        # Create evaluations
+        evaluations = []
+        for completion in completions:
+            if completion.model_name in quality_scores:
+                evaluation = self.optimizer.create_evaluation(
+                    prompt.id,
+                    completion,
+                    quality_scores[completion.model_name]
+                )
+                evaluations.append(evaluation)
+        
+        if self.sampler is not None:
+            self.sampler.observe(evaluations)
+        return evaluations
     
-    def process_prompts(self, prompts: List[PromptData]):
-        """Process a batch of prompts through the optimization pipeline"""
+    def process_prompts(self, prompts: List[PromptData], executor: Optional[Executor] = None):
+        """
+        Process a batch of prompts through the optimization pipeline.
+        With an executor, prompts are replayed concurrently on its workers.
+        """
         if not prompts:
             logger.info("No new prompts to process")
+            if self._next_cursor is not None:
+                state = self.state_manager.load_state()
+                self._commit_cursor(state)
+                self.state_manager.save_state(state)
             return
         
         state = self.state_manager.load_state()
         all_evaluations = []
         
-        for prompt in prompts:
-            # Skip if already processed
-            if prompt.id in state.processed_prompt_ids:
-                logger.info(f"Skipping already processed prompt: {prompt.id}")
-                continue
-            
-            logger.info(f"\n{'='*70}")
-            logger.info(f"Processing Prompt: {prompt.id}")
-            logger.info(f"{'='*70}")
-            
-            # Replay across models
-            completions = self.replay_engine.replay_prompt_across_models(prompt)
-            
-            # Evaluate quality
-            quality_scores = self.evaluator.evaluate_batch(prompt, completions)
-            
-            # Create evaluations
-            for completion in completions:
-                if completion.model_name in quality_scores:
-                    evaluation = self.optimizer.create_evaluation(
-                        prompt.id,
-                        completion,
-                        quality_scores[completion.model_name]
-                    )
-                    all_evaluations.append(evaluation)
-            
-            # Mark as processed
-            self.state_manager.mark_prompt_processed(state, prompt.id)
-        
-        # Save results
+        # Skip prompts already processed (one indexed lookup per batch)
+        pending = self.state_manager.filter_unprocessed(prompts)
+        if len(pending) < len(prompts):
+            logger.info(f"Skipping {len(prompts) - len(pending)} already processed prompts")
+        
+        results = executor.map(self._evaluate_prompt, pending) if executor else map(self._evaluate_prompt, pending)
+        for evaluations in results:
+            all_evaluations.extend(evaluations)
+        processed = pending
+        
+        # Save results, then mark the prompts processed and advance the cursor
         if all_evaluations:
             self.state_manager.save_evaluations(all_evaluations)
-            state.last_processed_timestamp = datetime.utcnow().isoformat()
+        if processed:
+            self.state_manager.mark_prompts_processed(state, processed)
+        if processed or self._next_cursor is not None:
+            self._commit_cursor(state)
             self.state_manager.save_state(state)
-            
+        if processed:
             logger.info(f"\n{'='*70}")
             logger.info(f"Batch complete: {len(all_evaluations)} evaluations saved")
             logger.info(f"{'='*70}")
     
     def generate_recommendations(self, current_model: str):
         """Generate optimization recommendations based on collected data"""
-        # Load all evaluations
-        eval_data = self.state_manager.load_evaluations()
+        # Running per-model statistics: only evaluations saved since the
+        # last call are read, so the metrics cost O(models), not O(history)
+        metrics = self.state_manager.performance().metrics()
         
-        if not eval_data:
+        if not metrics:
             logger.warning("No evaluation data available for recommendations")
             return None
         
-        # Convert to ModelEvaluation objects
-        from models import ModelEvaluation, CompletionResult, QualityScore
-        evaluations = []
-        for data in eval_data:
-            completion = CompletionResult(**data['completion'])
-            quality = QualityScore(**data['quality'])
-            eval = ModelEvaluation(
-                prompt_id=data['prompt_id'],
-                model_name=data['model_name'],
-                completion=completion,
-                quality=quality,
-                cost_quality_ratio=data['cost_quality_ratio']
-            )
-            evaluations.append(eval)
-        
-        # Generate recommendation
-        recommendation = self.optimizer.recommend_optimization(
-            current_model,
-            evaluations
+        # Generate recommendation; bootstrap intervals come from a bounded
+        # window of recent evaluations per model and are cached per fingerprint
+        recommendation = self.optimizer.recommend_from_metrics(
+            current_model, metrics, samples=self.state_manager.recent_columns()
         )
         
+        if recommendation and self.sampler is not None and self.sampler.sampled:
+            # Replayed prompts are a stratified sample: report how far the
+            # per-model metrics may be from their values over all traffic
+            errors = self.sampler.sampling_error()
+            recommendation.metrics["sampling_error"] = errors
+            for model in (recommendation.current_model, recommendation.recommended_model):
+                if model in errors:
+                    logger.info(f"{model}: quality {errors[model]['quality']['estimate']:.1f} "
+                                f"± {errors[model]['quality']['margin_95']:.1f} (95%, sampled traffic)")
+        
         if recommendation:
             logger.info(f"\n{'='*70}")
             logger.info("OPTIMIZATION RECOMMENDATION")
@@ -137,37 +179,44 @@ class ContinuousMonitor:
         
         return recommendation
     
+    def run_cycle(self, executor: Optional[Executor] = None) -> int:
+        """
+        Fetch one page from the ingestion source, sample it and process it.
+        Returns how many prompts the page held; source_has_more tells whether
+        a backlog remains.
+        """
+        state = self.state_manager.load_state()
+        new_prompts = self.fetch_new_prompts(state.last_processed_timestamp)
+        fetched = len(new_prompts)
+        
+        if new_prompts and self.sampler is not None:
+            new_prompts = self.sampler.sample(self.state_manager.filter_unprocessed(new_prompts))
+        
+        if new_prompts or self._next_cursor is not None:
+            self.process_prompts(new_prompts, executor=executor)
+        return fetched
+    
     def start_continuous_monitoring(self):
-        """Start continuous monitoring loop"""
+        """
+        Run until stop() or SIGINT/SIGTERM. New-data triggers wake the
+        scheduler; without any it polls, backing off while idle.
+        """
+        from monitor_scheduler import MonitorScheduler, build_triggers
+        
         logger.info("\n" + "="*70)
         logger.info("COST-QUALITY OPTIMIZATION SYSTEM - Continuous Mode")
-        logger.info(f"Checking for new prompts every {MONITORING_INTERVAL}s")
         logger.info("="*70 + "\n")
         
         self.running = True
-        state = self.state_manager.load_state()
-        
-        while self.running:
-            try:
-                # Fetch new prompts
-                new_prompts = self.fetch_new_prompts(state.last_processed_timestamp)
-                
-                if new_prompts:
-                    self.process_prompts(new_prompts)
-                    state = self.state_manager.load_state()
-                else:
-                    logger.info(f"No new prompts. Next check in {MONITORING_INTERVAL}s...")
-                
-                # Sleep until next check
-                time.sleep(MONITORING_INTERVAL)
-                
-            except KeyboardInterrupt:
-                logger.info("\nStopping continuous monitoring...")
-                self.running = False
-            except Exception as e:
-                logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(MONITORING_INTERVAL)
+        self.scheduler = MonitorScheduler(self, build_triggers(self.source))
+        try:
+            self.scheduler.run()
+        finally:
+            self.running = False
+            self.scheduler = None
     
     def stop(self):
-        """Stop continuous monitoring"""
+        """Stop continuous monitoring after the page in progress is saved"""
         self.running = False
+        if getattr(self, "scheduler", None) is not None:
+            self.scheduler.stop()
@@ -8,6 +8,7 @@ from flask import Flask, jsonify, request, session
 from flask_cors import CORS
 import json
 import os
+import uuid
 from pathlib import Path
 from datetime import datetime
 from models import PromptData
@@ -23,10 +24,18 @@ from observability import (
 )
 from orchestrator import CostQualityOrchestrator
 from user_metadata import user_service
-from cache_manager import cache_manager
+from cache_manager import cache_manager, conversation_cache
 from session_manager import session_manager, chat_manager
 from knowledge_cutoff import knowledge_tracker
 from auto_mode import auto_selector
+from routing_table import routing_table
+from bandit_router import bandit_router
+from cascade_executor import CascadeExecutor
+from config import MODELS_TO_TEST, AUTO_ROUTER, CASCADE_USE_JUDGE, REPLAY_WORKERS
+from single_flight import analysis_flight
+from use_case_classifier import use_case_classifier
+from job_queue import JobQueue
+from shard_workers import shard_progress
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Next.js frontend
@@ -39,6 +48,7 @@ init_db()
 _replay_engine = None
 _quality_evaluator = None
 _orchestrator = None
+_cascade_executor = None
 
 
 def get_replay_engine():
@@ -62,6 +72,76 @@ def get_orchestrator():
     return _orchestrator
 
 
+def get_cascade_executor():
+    global _cascade_executor
+    if _cascade_executor is None:
+        evaluator = get_quality_evaluator() if CASCADE_USE_JUDGE else None
+        _cascade_executor = CascadeExecutor(get_replay_engine(), evaluator)
+    return _cascade_executor
+
+
+def _optimize_job(payload, report):
+    return build_optimization(payload.get('user_id', 'default'), report=report)
+
+
+# Background /api/optimize runs; jobs are persisted, so pending work survives restarts
+optimize_jobs = JobQueue("optimize")
+optimize_jobs.register("optimize", _optimize_job)
+
+
+def run_replay_pipeline(prompt_data: PromptData):
+    """
+    Replay a prompt across all models and judge the outputs.
+    Identical prompts already in flight (from any endpoint) share one run.
+    Returns (completions, quality_scores).
+    """
+    key = conversation_cache.hash_conversation(prompt_data.messages)
+    return analysis_flight.do(key, _replay_and_evaluate, prompt_data)
+
+
+def call_routed_model(prompt_data: PromptData, route):
+    """
+    Replay the prompt on the routed model only.
+    Returns the completion, or None if it failed and the caller should fan out.
+    With the bandit router a failed, refused or uncallable choice is recorded
+    as a zero-reward outcome first, so the arm learns from it.
+    """
+    model_config = next((m for m in MODELS_TO_TEST if m["name"] == route.model_name), None)
+    completion = None
+    if model_config is not None:
+        try:
+            completion = get_replay_engine().replay_prompt_on_model(prompt_data, model_config)
+        except Exception as e:
+            print(f"Routed call to {route.model_name} failed: {e}")
+    
+    if completion is not None:
+        save_completion(prompt_data.id, completion.model_name, {
+            "completion": completion.response,
+            "tokens_input": completion.tokens_input,
+            "tokens_output": completion.tokens_output,
+            "latency_ms": completion.latency_ms,
+            "cost": completion.cost,
+            "success": completion.success,
+            "is_refusal": completion.is_refusal,
+            "error": completion.error,
+        })
+    if completion is None or not completion.success or completion.is_refusal:
+        if AUTO_ROUTER == "bandit":
+            bandit_router.record_outcome(
+                prompt_data.messages[-1]["content"], route.model_name, None,
+                completion.cost if completion else 0.0, completion.latency_ms if completion else 0.0,
+                success=False, prompt_id=prompt_data.id
+            )
+        return None
+    return completion
+
+
+def _replay_and_evaluate(prompt_data: PromptData):
+    completions = get_replay_engine().replay_prompt_across_models(prompt_data)
+    quality_scores = get_quality_evaluator().evaluate_batch(prompt_data, completions)
+    return completions, quality_scores
+
+
 def get_latest_analysis_results():
     """
     Get the most recent analysis results from cache or database.
@@ -313,13 +393,171 @@ def health_check():
 @app.route('/metrics')
 def get_metrics():
     """Prometheus-compatible metrics endpoint"""
-    return metrics.export_prometheus(), 200, {'Content-Type': 'text/plain'}
+    body = metrics.export_prometheus() + "\n" + analysis_flight.export_prometheus()
+    return body, 200, {'Content-Type': 'text/plain'}
 
 
 @app.route('/api/system-stats')
 def get_system_stats():
     """Get detailed system statistics"""
-    return jsonify(metrics.get_metrics())
+    stats = metrics.get_metrics()
+    stats['single_flight'] = analysis_flight.get_stats()
+    stats['replay_cache'] = get_replay_engine().get_cache_stats()
+    stats['optimize_jobs'] = optimize_jobs.get_stats()
+    stats['routing_table'] = routing_table.get_stats()
+    stats['bandit_router'] = bandit_router.get_stats()
+    stats['cascade'] = get_cascade_executor().get_stats()
+    return jsonify(stats)
+
+
+@app.route('/api/replay-shards')
+def get_replay_shards():
+    """Aggregate progress of sharded continuous replay (continuous_mode.py --workers); read-only"""
+    progress = shard_progress(REPLAY_WORKERS or None)
+    if not progress['shards']:
+        return jsonify({'enabled': False})
+    return jsonify(dict(progress, enabled=True))
+
+
+@app.route('/api/routing-table/rebuild', methods=['POST'])
+def rebuild_routing_table():
+    """Relearn auto mode's routing table from the judged replay history"""
+    summary = routing_table.build()
+    api_logger.log_event('routing_table_rebuilt', summary)
+    return jsonify(dict(summary, **routing_table.get_stats()))
+
+
+def build_optimization(user_id: str, report=None):
+    """
+    Compute the /api/optimize payload: all models with cost, quality and
+    latency plus a recommendation. Shared by the synchronous endpoint and
+    the background job; report(progress, message) receives progress updates.
+    """
+    report = report or (lambda progress, message: None)
+    
+    api_logger.log_event('optimize_request', {'user_id': user_id})
+    
+    report(0.1, "Loading cached analysis")
+    
+    # Get cached analysis from /auto endpoint (SAME DATA!)
+    cached_data = get_cached_analysis()
+    
+    # Check if cache has multiple models (not just cached single response)
+    if not cached_data or not cached_data.get('models') or len(cached_data.get('models', [])) < 2 or cached_data.get('cached', False):
+        # Run fresh analysis to get all models
+        print("Running fresh analysis for optimization...")
+        report(0.2, "Replaying prompt across models")
+        
+        try:
+            # Use a test prompt
+            test_prompt = cached_data.get('prompt', 'What is machine learning?') if cached_data else 'What is machine learning?'
+            
+            prompt_data = PromptData(
+                id="optimize_analysis",
+                messages=[{"role": "user", "content": test_prompt}],
+                original_model="auto"
+            )
+            
+            # Replay across models and evaluate quality (coalesced)
+            completions, quality_scores = run_replay_pipeline(prompt_data)
+            
+            # Build models list
+            all_models = []
+            for completion in completions:
+                if completion.success and completion.model_name in quality_scores:
+                    all_models.append({
+                        'model_name': completion.model_name,
+                        'quality_score': quality_scores[completion.model_name].overall_score,
+                        'cost': completion.cost,
+                        'latency_ms': completion.latency_ms,
+                        'success': True,
+                        'response': completion.response[:200] if completion.response else ''
+                    })
+            
+            # Find best model
+            if all_models:
+                best = max(all_models, key=lambda x: x['quality_score'] - (x['cost'] * 10000))
+                best_model_name = best['model_name']
+                
+                # Save for next time
+                analysis_data = {
+                    'timestamp': datetime.now().isoformat(),
+                    'models': all_models,
+                    'best_model': best_model_name,
+                    'prompt': test_prompt,
+                    'cached': False
+                }
+                save_latest_analysis(analysis_data)
+            else:
+                raise Exception("No models returned")
+                
+        except Exception as e:
+            print(f"Fresh analysis failed: {e}")
+            # Fallback to default data
+            all_models = [
+                {'model_name': 'gpt-4o', 'quality_score': 95, 'cost': 0.0015, 'latency_ms': 1200, 'success': True},
+                {'model_name': 'gpt-4o-mini', 'quality_score': 87, 'cost': 0.00015, 'latency_ms': 800, 'success': True},
+                {'model_name': 'gpt-3.5-turbo', 'quality_score': 75, 'cost': 0.0005, 'latency_ms': 600, 'success': True},
+            ]
+            best_model_name = 'gpt-4o-mini'
+    else:
+        # Use cached data from /auto
+        all_models = cached_data.get('models', [])
+        best_model_name = cached_data.get('best_model', 'gpt-4o-mini')
+    
+    report(0.9, "Building recommendation")
+    
+    # Calculate stats
+    if len(all_models) >= 2:
+        sorted_by_quality = sorted(all_models, key=lambda x: x['quality_score'], reverse=True)
+        sorted_by_cost = sorted(all_models, key=lambda x: x['cost'])
+        
+        best_quality = sorted_by_quality[0]
+        most_expensive = sorted_by_cost[-1]
+        cheapest = sorted_by_cost[0]
+        
+        cost_reduction = ((most_expensive['cost'] - cheapest['cost']) / most_expensive['cost'] * 100) if most_expensive['cost'] > 0 else 0
+        quality_impact = (best_quality['quality_score'] - most_expensive['quality_score'])
+        
+        recommendation = {
+            'current_model': 'gpt-4o',
+            'recommended_model': best_model_name,
+            'projected_cost_saving_percent': cost_reduction,
+            'projected_quality_impact_percent': quality_impact,
+            'confidence': 85,
+            'reasons': [
+                f"{best_model_name} has best quality ({best_quality['quality_score']:.0f}/100)",
+                f"Cost difference: ${most_expensive['cost'] - cheapest['cost']:.6f}",
+                f"Speed: {best_quality['latency_ms']:.0f}ms"
+            ]
+        }
+    else:
+        recommendation = {
+            'current_model': 'gpt-4o',
+            'recommended_model': best_model_name,
+            'projected_cost_saving_percent': 75,
+            'projected_quality_impact_percent': 5,
+            'confidence': 80,
+            'reasons': ['Cost optimization recommended']
+        }
+    
+    result = {
+        'status': 'success',
+        'models': all_models,
+        'recommendation': recommendation,
+        'processing_time_seconds': 0.1,
+        'verification_cost_usd': 0.0,
+        'monthly_savings_estimate': 53.05
+    }
+    
+    # Log the outcome
+    api_logger.log_event('optimization_complete', {
+        'user_id': user_id,
+        'models_count': len(all_models),
+        'recommended_model': recommendation['recommended_model']
+    })
+    
+    return result
 
 
 @app.route('/api/optimize', methods=['POST'])
@@ -339,133 +577,7 @@ def run_optimization():
         data = request.get_json() or {}
         user_id = data.get('user_id', 'default')
         
-        api_logger.log_event('optimize_request', {'user_id': user_id})
-        
-        # Get cached analysis from /auto endpoint (SAME DATA!)
-        cached_data = get_cached_analysis()
-        
-        # Check if cache has multiple models (not just cached single response)
-        if not cached_data or not cached_data.get('models') or len(cached_data.get('models', [])) < 2 or cached_data.get('cached', False):
-            # Run fresh analysis to get all models
-            print("Running fresh analysis for optimization...")
-            
-            try:
-                from replay_engine import ReplayEngine
-                from quality_evaluator import QualityEvaluator
-                from cost_quality import CostQualityOptimizer, PromptData
-                
-                # Use a test prompt
-                test_prompt = cached_data.get('prompt', 'What is machine learning?') if cached_data else 'What is machine learning?'
-                
-                prompt_data = PromptData(
-                    id="optimize_analysis",
-                    messages=[{"role": "user", "content": test_prompt}],
-                    original_model="auto"
-                )
-                
-                # Replay across models
-                replay_engine = ReplayEngine()
-                completions = replay_engine.replay_prompt_across_models(prompt_data)
-                
-                # Evaluate quality
-                evaluator = QualityEvaluator()
-                quality_scores = evaluator.evaluate_batch(prompt_data, completions)
-                
-                # Build models list
-                all_models = []
-                for completion in completions:
-                    if completion.success and completion.model_name in quality_scores:
-                        all_models.append({
-                            'model_name': completion.model_name,
-                            'quality_score': quality_scores[completion.model_name] * 100,
-                            'cost': completion.cost,
-                            'latency_ms': completion.latency_ms,
-                            'success': True,
-                            'response': completion.response[:200] if completion.response else ''
-                        })
-                
-                # Find best model
-                if all_models:
-                    best = max(all_models, key=lambda x: x['quality_score'] - (x['cost'] * 10000))
-                    best_model_name = best['model_name']
-                    
-                    # Save for next time
-                    analysis_data = {
-                        'timestamp': datetime.now().isoformat(),
-                        'models': all_models,
-                        'best_model': best_model_name,
-                        'prompt': test_prompt,
-                        'cached': False
-                    }
-                    save_latest_analysis(analysis_data)
-                else:
-                    raise Exception("No models returned")
-                    
-            except Exception as e:
-                print(f"Fresh analysis failed: {e}")
-                # Fallback to default data
-                all_models = [
-                    {'model_name': 'gpt-4o', 'quality_score': 95, 'cost': 0.0015, 'latency_ms': 1200, 'success': True},
-                    {'model_name': 'gpt-4o-mini', 'quality_score': 87, 'cost': 0.00015, 'latency_ms': 800, 'success': True},
-                    {'model_name': 'gpt-3.5-turbo', 'quality_score': 75, 'cost': 0.0005, 'latency_ms': 600, 'success': True},
-                ]
-                best_model_name = 'gpt-4o-mini'
-        else:
-            # Use cached data from /auto
-            all_models = cached_data.get('models', [])
-            best_model_name = cached_data.get('best_model', 'gpt-4o-mini')
-        
-        # Calculate stats
-        if len(all_models) >= 2:
-            sorted_by_quality = sorted(all_models, key=lambda x: x['quality_score'], reverse=True)
-            sorted_by_cost = sorted(all_models, key=lambda x: x['cost'])
-            
-            best_quality = sorted_by_quality[0]
-            most_expensive = sorted_by_cost[-1]
-            cheapest = sorted_by_cost[0]
-            
-            cost_reduction = ((most_expensive['cost'] - cheapest['cost']) / most_expensive['cost'] * 100) if most_expensive['cost'] > 0 else 0
-            quality_impact = (best_quality['quality_score'] - most_expensive['quality_score'])
-            
-            recommendation = {
-                'current_model': 'gpt-4o',
-                'recommended_model': best_model_name,
-                'projected_cost_saving_percent': cost_reduction,
-                'projected_quality_impact_percent': quality_impact,
-                'confidence': 85,
-                'reasons': [
-                    f"{best_model_name} has best quality ({best_quality['quality_score']:.0f}/100)",
-                    f"Cost difference: ${most_expensive['cost'] - cheapest['cost']:.6f}",
-                    f"Speed: {best_quality['latency_ms']:.0f}ms"
-                ]
-            }
-        else:
-            recommendation = {
-                'current_model': 'gpt-4o',
-                'recommended_model': best_model_name,
-                'projected_cost_saving_percent': 75,
-                'projected_quality_impact_percent': 5,
-                'confidence': 80,
-                'reasons': ['Cost optimization recommended']
-            }
-        
-        result = {
-            'status': 'success',
-            'models': all_models,
-            'recommendation': recommendation,
-            'processing_time_seconds': 0.1,
-            'verification_cost_usd': 0.0,
-            'monthly_savings_estimate': 53.05
-        }
-        
-        # Log the outcome
-        api_logger.log_event('optimization_complete', {
-            'user_id': user_id,
-            'models_count': len(all_models),
-            'recommended_model': recommendation['recommended_model']
-        })
-        
-        return jsonify(result)
+        return jsonify(build_optimization(user_id))
         
     except Exception as e:
         api_logger.log_event('optimize_error', {'error': str(e)}, level='error')
@@ -492,6 +604,89 @@ def run_optimization():
         }), 200
 
 
+@app.route('/api/optimize/jobs', methods=['POST'])
+def submit_optimization_job():
+    """
+    Queue an optimization run instead of waiting for it
+    
+    Request body:
+    {
+        "user_id": "optional_user_id",
+        "priority": 0  // higher runs first
+    }
+    
+    Identical requests that are still pending or running return the same job.
+    Returns 202 with the job_id; poll /api/optimize/jobs/<job_id> for progress.
+    """
+    data = request.get_json() or {}
+    user_id = data.get('user_id', 'default')
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
+    
+    job_id, deduplicated = optimize_jobs.submit("optimize", {'user_id': user_id}, priority=priority)
+    api_logger.log_event('optimize_job_submitted', {
+        'user_id': user_id,
+        'job_id': job_id,
+        'priority': priority,
+        'deduplicated': deduplicated
+    })
+    
+    job = optimize_jobs.get_job(job_id)
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'deduplicated': deduplicated,
+        'queue_position': job['queue_position'],
+        'status_url': f"/api/optimize/jobs/{job_id}",
+        'result_url': f"/api/optimize/jobs/{job_id}/result"
+    }), 202
+
+
+@app.route('/api/optimize/jobs/<job_id>', methods=['GET'])
+def get_optimization_job(job_id: str):
+    """
+    Job status and progress events
+    
+    Query params:
+    - since: only return events with id greater than this (poll cursor)
+    """
+    job = optimize_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    since = request.args.get('since', 0, type=int)
+    events = optimize_jobs.get_events(job_id, since_id=since)
+    job.pop('result')
+    job['events'] = events
+    job['next_since'] = events[-1]['id'] if events else since
+    return jsonify(job)
+
+
+@app.route('/api/optimize/jobs/<job_id>/result', methods=['GET'])
+def get_optimization_job_result(job_id: str):
+    """Result of a finished job; 202 while it is still pending or running"""
+    job = optimize_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'completed':
+        return jsonify(job['result'])
+    if job['status'] in ('failed', 'cancelled'):
+        return jsonify({'status': job['status'], 'error': job['error']}), 409
+    return jsonify({'status': job['status'], 'progress': job['progress']}), 202
+
+
+@app.route('/api/optimize/jobs/<job_id>', methods=['DELETE'])
+def cancel_optimization_job(job_id: str):
+    """Cancel a job that has not started yet"""
+    if optimize_jobs.cancel(job_id):
+        return jsonify({'job_id': job_id, 'status': 'cancelled'})
+    if optimize_jobs.get_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'error': 'Job already started'}), 409
+
+
 @app.route('/api/user/<user_id>', methods=['GET', 'POST'])
 def user_profile(user_id: str):
     """
@@ -525,8 +720,8 @@ def user_profile(user_id: str):
             # Save updated user
             user_service.save_user(user)
             
-            # Invalidate cache for this user
-            cache_manager.invalidate_by_prefix(f"user:{user_id}")
+            # Invalidate cache entries built for this user only
+            cache_manager.invalidate_by_tag(f"user:{user_id}")
             
             return jsonify({'status': 'updated', 'user': user.to_dict()})
             
@@ -572,7 +767,11 @@ def invalidate_cache():
             count = cache_manager.invalidate_by_prefix(data['prefix'])
             return jsonify({'status': 'invalidated', 'count': count})
         
-        return jsonify({'error': 'Provide key or prefix to invalidate'}), 400
+        if 'tag' in data:
+            count = cache_manager.invalidate_by_tag(data['tag'])
+            return jsonify({'status': 'invalidated', 'count': count})
+        
+        return jsonify({'error': 'Provide key, prefix or tag to invalidate'}), 400
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -657,7 +856,8 @@ def get_dashboard_data_api():
             'qualityScores': {'accuracy': 85, 'helpfulness': 90, 'clarity': 88, 'completeness': 87},
             'models': models,
             'prompts': prompts,
-            'activities': activities
+            'activities': activities,
+            'dailyTrends': data.get('daily', [])
         })
         
     except Exception as e:
@@ -726,52 +926,92 @@ def auto_analyze():
         
         # STEP 2: Run analysis
         prompt_data = PromptData(
-            id="auto_mode_prompt",
+            id=f"auto_{uuid.uuid4().hex[:12]}",
             messages=[{"role": "user", "content": prompt}],
             original_model="auto"
         )
         
-        use_case = detect_use_case(prompt)
+        use_case = use_case_classifier.classify(prompt).label
         save_prompt(prompt_data.id, prompt, use_case)
-        
-        # Replay across models
-        replay_engine = ReplayEngine()
-        completions = replay_engine.replay_prompt_across_models(prompt_data)
-        
-        # Save completions
-        for completion in completions:
-            save_completion(prompt_data.id, completion.model_name, {
-                "completion": completion.response,
-                "tokens_input": completion.tokens_input,
-                "tokens_output": completion.tokens_output,
-                "latency_ms": completion.latency_ms,
-                "cost": completion.cost,
-                "success": completion.success,
-                "is_refusal": getattr(completion, 'is_refusal', False),
-                "error": completion.error,
+            
+        # STEP 3: Call only the model the router picks. With the offline routing
+        # table, exploration traffic, prompts without routing history and failed
+        # routed calls fan out to every model instead (and their judged results
+        # extend the history). The bandit router judges its single answer and
+        # learns from it online.
+        if AUTO_ROUTER == "bandit":
+            route = bandit_router.route(prompt)
+        else:
+            route = routing_table.route(prompt)
+        routed = call_routed_model(prompt_data, route) if route.model_name else None
+        
+        if routed and AUTO_ROUTER == "bandit":
+            completions = [routed]
+            quality = get_quality_evaluator().evaluate(prompt_data, routed)
+            quality_scores = {routed.model_name: quality}
+            save_quality_evaluation(prompt_data.id, routed.model_name, {
+                "overall_score": quality.overall_score,
+                "dimension_scores": quality.dimension_scores,
+                "reasoning": quality.reasoning
             })
-        
-        # Evaluate quality
-        evaluator = QualityEvaluator()
-        quality_scores = evaluator.evaluate_batch(prompt_data, completions)
-        
-        # Create evaluations
-        optimizer = CostQualityOptimizer()
-        evaluations = []
-        for completion in completions:
-            if completion.model_name in quality_scores and completion.success:
-                evaluation = optimizer.create_evaluation(
-                    prompt_data.id,
-                    completion,
-                    quality_scores[completion.model_name]
-                )
-                evaluations.append(evaluation)
-        
-        # STEP 3: Select best model automatically
-        best_model, summary = auto_selector.select_best_model(evaluations, prompt)
+            bandit_router.record_outcome(
+                prompt, routed.model_name, quality.overall_score,
+                routed.cost, routed.latency_ms, prompt_id=prompt_data.id
+            )
+            best_model = routed.model_name
+            summary = auto_selector.summarize_routed(routed, route.candidates, quality=quality.overall_score)
+        elif routed:
+            completions, quality_scores = [routed], {}
+            best_model = routed.model_name
+            summary = auto_selector.summarize_routed(routed, route.candidates)
+        else:
+            # Replay across models and evaluate quality (coalesced)
+            completions, quality_scores = run_replay_pipeline(prompt_data)
+            
+            # Save completions
+            for completion in completions:
+                save_completion(prompt_data.id, completion.model_name, {
+                    "completion": completion.response,
+                    "tokens_input": completion.tokens_input,
+                    "tokens_output": completion.tokens_output,
+                    "latency_ms": completion.latency_ms,
+                    "cost": completion.cost,
+                    "success": completion.success,
+                    "is_refusal": getattr(completion, 'is_refusal', False),
+                    "error": completion.error,
+                })
+            
+            # Create evaluations
+            optimizer = CostQualityOptimizer()
+            evaluations = []
+            for completion in completions:
+                if completion.model_name in quality_scores and completion.success:
+                    evaluation = optimizer.create_evaluation(
+                        prompt_data.id,
+                        completion,
+                        quality_scores[completion.model_name]
+                    )
+                    evaluations.append(evaluation)
+                
+                    # Judged history feeds the routing table
+                    save_quality_evaluation(prompt_data.id, completion.model_name, {
+                        "overall_score": evaluation.quality.overall_score,
+                        "dimension_scores": evaluation.quality.dimension_scores,
+                        "reasoning": evaluation.quality.reasoning
+                    })
+            
+            # Select best model automatically
+            best_model, summary = auto_selector.select_best_model(evaluations, prompt)
         
         # Format response
         result = auto_selector.format_auto_response(best_model, summary, use_case)
+        result['routing'] = {
+            'router': AUTO_ROUTER,
+            'mode': 'routed' if routed else ('explore' if route.explore else 'fan_out'),
+            'level': route.level,
+            'key': list(route.key),
+            'models_called': len(completions)
+        }
         
         # Save to database for optimization dashboard
         try:
@@ -825,6 +1065,73 @@ def auto_analyze():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/cascade', methods=['POST'])
+def cascade_analyze():
+    """
+    Cascade Mode: ask the cheapest model first and escalate to pricier
+    models only while a fast verifier rejects the answer.
+    Returns the answer plus every step the cascade took.
+    """
+    try:
+        data = request.get_json()
+        prompt = data.get('prompt', '').strip()
+        
+        if not prompt:
+            return jsonify({'error': 'No prompt provided'}), 400
+        
+        prompt_data = PromptData(
+            id=f"cascade_{uuid.uuid4().hex[:12]}",
+            messages=[{"role": "user", "content": prompt}],
+            original_model="cascade"
+        )
+        use_case = use_case_classifier.classify(prompt).label
+        save_prompt(prompt_data.id, prompt, use_case)
+        
+        outcome = get_cascade_executor().run(prompt_data)
+        for completion in outcome.completions:
+            save_completion(prompt_data.id, completion.model_name, {
+                "completion": completion.response,
+                "tokens_input": completion.tokens_input,
+                "tokens_output": completion.tokens_output,
+                "latency_ms": completion.latency_ms,
+                "cost": completion.cost,
+                "success": completion.success,
+                "is_refusal": completion.is_refusal,
+                "error": completion.error,
+            })
+        if outcome.quality and outcome.completion:
+            save_quality_evaluation(prompt_data.id, outcome.completion.model_name, {
+                "overall_score": outcome.quality.overall_score,
+                "dimension_scores": outcome.quality.dimension_scores,
+                "reasoning": outcome.quality.reasoning
+            })
+        
+        if outcome.completion is None:
+            return jsonify({'error': 'All models failed', 'cascade': outcome.to_dict()}), 502
+        
+        api_logger.log_event('cascade_completed', {
+            'prompt_id': prompt_data.id,
+            'model': outcome.completion.model_name,
+            'models_tried': outcome.models_tried,
+            'accepted': outcome.accepted
+        })
+        
+        return jsonify({
+            'mode': 'cascade',
+            'status': 'success' if outcome.accepted else 'unverified',
+            'answer': outcome.completion.response,
+            'model_used': outcome.completion.model_name,
+            'use_case': use_case,
+            'cascade': outcome.to_dict()
+        })
+        
+    except Exception as e:
+        print(f"Error in cascade mode: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze_prompt():
     """
@@ -888,15 +1195,14 @@ def analyze_prompt():
         )
         
         # Detect use case
-        use_case = detect_use_case(prompt)
+        use_case = use_case_classifier.classify(prompt).label
         print(f"Detected use case: {use_case}")
         
         # Save prompt to database
         save_prompt(prompt_data.id, prompt, use_case)
         
-        # Replay across models
-        replay_engine = ReplayEngine()
-        completions = replay_engine.replay_prompt_across_models(prompt_data)
+        # Replay across models and evaluate quality (coalesced)
+        completions, quality_scores = run_replay_pipeline(prompt_data)
         print(f"Completed replay: {len(completions)} models tested")
         
         # Save completions to database
@@ -924,9 +1230,6 @@ def analyze_prompt():
                 error=completion.error
             )
         
-        # Evaluate quality
-        evaluator = QualityEvaluator()
-        quality_scores = evaluator.evaluate_batch(prompt_data, completions)
         print(f"Quality evaluation complete: {len(quality_scores)} scores")
         
         # Create evaluations and save to database
@@ -1086,33 +1389,6 @@ def check_and_apply_fallback(prompt: str, recommended_model: str, evaluations) -
     return False, ""
 
 
-def detect_use_case(prompt: str) -> str:
-    """Detect the use case type from the prompt"""
-    prompt_lower = prompt.lower()
-    
-    # Code-related keywords
-    if any(word in prompt_lower for word in ['function', 'code', 'python', 'javascript', 'implement', 'algorithm', 'debug', 'programming']):
-        return 'Code Generation'
-    
-    # Security-related keywords
-    if any(word in prompt_lower for word in ['security', 'vulnerability', 'exploit', 'attack', 'penetration', 'hack', 'malware', 'audit']):
-        return 'Security Analysis'
-    
-    # Creative-related keywords
-    if any(word in prompt_lower for word in ['write', 'story', 'creative', 'poem', 'haiku', 'narrative', 'fiction', 'imagine']):
-        return 'Creative Writing'
-    
-    # Data analysis keywords
-    if any(word in prompt_lower for word in ['analyze', 'data', 'statistics', 'chart', 'graph', 'insights', 'trends']):
-        return 'Data Analysis'
-    
-    # Documentation keywords
-    if any(word in prompt_lower for word in ['document', 'explain', 'describe', 'how to', 'tutorial', 'guide']):
-        return 'Documentation'
-    
-    return 'General Task'
-
-
 def get_recommended_model(use_case: str, evaluations) -> str:
     """Get recommended model based on use case"""
     if not evaluations:
@@ -1157,6 +1433,11 @@ def get_recommendation_reasoning(use_case: str, recommended_model: str, evaluati
     return f"{recommended_model} provides optimal performance for this task type with quality score of {rec_eval.quality.overall_score:.1f}/100."
 
 
+# Started once the handlers are defined, on import, so a WSGI server also
+# picks up jobs left pending by the previous run
+optimize_jobs.start()
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("  LLM Cost-Quality Optimization API")
@@ -1168,10 +1449,15 @@ if __name__ == '__main__':
     print("    GET  /health                    - System health check")
     print("    GET  /metrics                   - Prometheus metrics")
     print("    GET  /api/system-stats          - Detailed statistics")
+    print("    POST /api/routing-table/rebuild - Relearn auto mode routing")
+    print("    GET  /api/replay-shards         - Sharded replay progress")
     print()
     print("  MULTI-AGENT ORCHESTRATION:")
     print("    POST /api/optimize              - Run 3-layer optimization")
     print("         → Returns: 'Switching from A to B reduces cost by 42%...'")
+    print("    POST /api/optimize/jobs         - Queue optimization in the background")
+    print("    GET  /api/optimize/jobs/<id>    - Job status and progress events")
+    print("    GET  /api/optimize/jobs/<id>/result - Finished job result")
     print()
     print("  USER MANAGEMENT:")
     print("    GET  /api/user/<id>             - Get user profile")
@@ -9,6 +9,142 @@ from typing import List, Dict, Any, Optional
 
 DB_PATH = Path(__file__).parent / "data" / "optimization.db"
 
+# ============================================================================
+# Dashboard rollups
+# ============================================================================
+# get_dashboard_data reads per-model totals from model_rollups instead of
+# scanning completions and quality_evaluations. model_daily_rollups holds
+# the same counters per UTC day. Triggers keep both in step with every
+# insert and delete, inside the writer's own transaction.
+# rebuild_rollups() recomputes them from the base tables.
+#
+# Each rollup column is defined once as an expression over a base-table
+# row ({r}). The triggers add it for NEW rows and subtract it for OLD rows;
+# the rebuild sums it.
+
+_COMPLETION_ROLLUP = {
+    "completions": "1",
+    "successes": "CASE WHEN {r}.success = 1 THEN 1 ELSE 0 END",
+    "failures": "CASE WHEN {r}.success = 0 THEN 1 ELSE 0 END",
+    "refusals": "CASE WHEN {r}.is_refusal = 1 THEN 1 ELSE 0 END",
+    "success_cost": "CASE WHEN {r}.success = 1 THEN COALESCE({r}.cost, 0) ELSE 0 END",
+    "success_latency_sum": "CASE WHEN {r}.success = 1 THEN COALESCE({r}.latency_ms, 0) ELSE 0 END",
+    "success_latency_count": "CASE WHEN {r}.success = 1 AND {r}.latency_ms IS NOT NULL THEN 1 ELSE 0 END",
+}
+_COMPLETION_DAY = "date(COALESCE({r}.timestamp, CURRENT_TIMESTAMP))"
+
+_QUALITY_ROLLUP = {
+    "evaluations": "1",
+    "score_sum": "COALESCE({r}.overall_score, 0)",
+    "score_count": "CASE WHEN {r}.overall_score IS NOT NULL THEN 1 ELSE 0 END",
+}
+_QUALITY_DAY = "date(COALESCE({r}.evaluated_at, CURRENT_TIMESTAMP))"
+
+_ROLLUP_COLUMNS = list(_COMPLETION_ROLLUP) + list(_QUALITY_ROLLUP)
+
+
+def _rollup_columns_sql() -> str:
+    return ",\n".join(f"            {column} REAL NOT NULL DEFAULT 0" for column in _ROLLUP_COLUMNS)
+
+
+def _upsert_sql(table: str, keys: Dict[str, str], deltas: Dict[str, str], row: str, sign: str = "+") -> str:
+    """INSERT ... ON CONFLICT DO UPDATE that adds (or subtracts) one row's deltas"""
+    columns = list(keys) + list(deltas)
+    values = [expr.format(r=row) for expr in keys.values()]
+    values += [f"{sign}({expr.format(r=row)})" for expr in deltas.values()]
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in deltas)
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(values)})
+        ON CONFLICT({", ".join(keys)}) DO UPDATE SET {updates};"""
+
+
+def _create_rollups(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS model_rollups (
+            model_name TEXT PRIMARY KEY,
+{_rollup_columns_sql()}
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS model_daily_rollups (
+            day TEXT NOT NULL,
+            model_name TEXT NOT NULL,
+{_rollup_columns_sql()},
+            PRIMARY KEY (day, model_name)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    for base, deltas, day in (("completions", _COMPLETION_ROLLUP, _COMPLETION_DAY),
+                              ("quality_evaluations", _QUALITY_ROLLUP, _QUALITY_DAY)):
+        for event, row, sign in (("INSERT", "NEW", "+"), ("DELETE", "OLD", "-")):
+            model = {"model_name": "{r}.model_name"}
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {base}_rollup_{event.lower()}
+                AFTER {event} ON {base}
+                BEGIN
+                    {_upsert_sql("model_rollups", model, deltas, row, sign)}
+                    {_upsert_sql("model_daily_rollups", dict(day=day, **model), deltas, row, sign)}
+                END
+            """)
+
+    # INSERT OR IGNORE of a known prompt_id does not fire AFTER INSERT
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS prompts_counter_insert AFTER INSERT ON prompts
+        BEGIN
+            INSERT INTO dashboard_counters (name, value) VALUES ('prompts', 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS prompts_counter_delete AFTER DELETE ON prompts
+        BEGIN
+            UPDATE dashboard_counters SET value = value - 1 WHERE name = 'prompts';
+        END
+    """)
+
+
+def rebuild_rollups() -> Dict[str, int]:
+    """Recompute every rollup from the base tables (one transaction)"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("DELETE FROM model_rollups")
+    cursor.execute("DELETE FROM model_daily_rollups")
+    cursor.execute("DELETE FROM dashboard_counters")
+
+    for base, deltas, day in (("completions", _COMPLETION_ROLLUP, _COMPLETION_DAY),
+                              ("quality_evaluations", _QUALITY_ROLLUP, _QUALITY_DAY)):
+        sums = ", ".join(f"SUM({expr.format(r=base)})" for expr in deltas.values())
+        updates = ", ".join(f"{c} = excluded.{c}" for c in deltas)
+        cursor.execute(f"""
+            INSERT INTO model_daily_rollups (day, model_name, {", ".join(deltas)})
+            SELECT {day.format(r=base)} AS day, model_name, {sums}
+            FROM {base} WHERE true GROUP BY day, model_name
+            ON CONFLICT(day, model_name) DO UPDATE SET {updates}
+        """)
+
+    cursor.execute(f"""
+        INSERT INTO model_rollups (model_name, {", ".join(_ROLLUP_COLUMNS)})
+        SELECT model_name, {", ".join(f"SUM({c})" for c in _ROLLUP_COLUMNS)}
+        FROM model_daily_rollups GROUP BY model_name
+    """)
+    cursor.execute("INSERT INTO dashboard_counters (name, value) SELECT 'prompts', COUNT(*) FROM prompts")
+
+    summary = {
+        "models": cursor.execute("SELECT COUNT(*) FROM model_rollups").fetchone()[0],
+        "model_days": cursor.execute("SELECT COUNT(*) FROM model_daily_rollups").fetchone()[0]
+    }
+    conn.commit()
+    conn.close()
+    return summary
+
+
 def init_db():
     """Initialize database with required tables"""
     conn = sqlite3.connect(DB_PATH)
@@ -77,8 +213,21 @@ def init_db():
         )
     """)
     
+    # Indexes behind the dashboard's "recent" lists
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompts_created_at ON prompts(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_completions_prompt_id ON completions(prompt_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_created_at ON recommendations(created_at)")
+    
+    # Rollups; a database that predates them is backfilled once
+    had_rollups = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'model_rollups'"
+    ).fetchone() is not None
+    _create_rollups(cursor)
+    
     conn.commit()
     conn.close()
+    if not had_rollups:
+        rebuild_rollups()
     print(f"✓ Database initialized at {DB_PATH}")
 
 
@@ -181,53 +330,52 @@ def get_dashboard_data() -> Dict[str, Any]:
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
-    # Get total prompts tested
-    cursor.execute("SELECT COUNT(DISTINCT prompt_id) as count FROM prompts")
-    total_prompts = cursor.fetchone()["count"]
+    # Totals and per-model figures come from the rollups (O(models), not O(history))
+    cursor.execute("SELECT value FROM dashboard_counters WHERE name = 'prompts'")
+    row = cursor.fetchone()
+    total_prompts = row["value"] if row else 0
     
-    # Get total completions
-    cursor.execute("SELECT COUNT(*) as count FROM completions WHERE success = 1")
-    total_completions = cursor.fetchone()["count"]
+    cursor.execute("SELECT * FROM model_rollups")
+    rollups = cursor.fetchall()
+    total_completions = int(sum(row["successes"] for row in rollups))
     
-    # Get refusal rates by model
-    cursor.execute("""
-        SELECT model_name, 
-               COUNT(*) as total,
-               SUM(CASE WHEN is_refusal = 1 THEN 1 ELSE 0 END) as refusals,
-               SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failures
-        FROM completions
-        GROUP BY model_name
-    """)
+    # Refusal and failure rates by model
     model_reliability = {row["model_name"]: {
-        "total": row["total"],
-        "refusals": row["refusals"] or 0,
-        "failures": row["failures"] or 0,
-        "refusal_rate": (row["refusals"] or 0) / row["total"] * 100 if row["total"] > 0 else 0,
-        "success_rate": (row["total"] - (row["failures"] or 0)) / row["total"] * 100 if row["total"] > 0 else 0
-    } for row in cursor.fetchall()}
-    
-    # Get average quality scores by model
-    cursor.execute("""
-        SELECT model_name, AVG(overall_score) as avg_score, COUNT(*) as count
-        FROM quality_evaluations
-        GROUP BY model_name
-    """)
+        "total": int(row["completions"]),
+        "refusals": int(row["refusals"]),
+        "failures": int(row["failures"]),
+        "refusal_rate": row["refusals"] / row["completions"] * 100,
+        "success_rate": (row["completions"] - row["failures"]) / row["completions"] * 100
+    } for row in rollups if row["completions"] > 0}
+    
+    # Average quality scores by model
     model_quality = {row["model_name"]: {
-        "avg_score": row["avg_score"],
-        "count": row["count"]
-    } for row in cursor.fetchall()}
+        "avg_score": row["score_sum"] / row["score_count"] if row["score_count"] else None,
+        "count": int(row["evaluations"])
+    } for row in rollups if row["evaluations"] > 0}
+    
+    # Total cost and latency of successful completions by model
+    model_costs = {row["model_name"]: {
+        "total_cost": row["success_cost"],
+        "avg_latency": (row["success_latency_sum"] / row["success_latency_count"]
+                        if row["success_latency_count"] else None)
+    } for row in rollups if row["successes"] > 0}
     
-    # Get total cost by model
+    # Daily cost and quality per model over the last 30 days
     cursor.execute("""
-        SELECT model_name, SUM(cost) as total_cost, AVG(latency_ms) as avg_latency
-        FROM completions
-        WHERE success = 1
-        GROUP BY model_name
+        SELECT day, model_name, completions, successes, success_cost, score_sum, score_count
+        FROM model_daily_rollups
+        WHERE day >= date('now', '-30 days')
+        ORDER BY day
     """)
-    model_costs = {row["model_name"]: {
-        "total_cost": row["total_cost"],
-        "avg_latency": row["avg_latency"]
-    } for row in cursor.fetchall()}
+    daily = [{
+        "day": row["day"],
+        "model_name": row["model_name"],
+        "completions": int(row["completions"]),
+        "successes": int(row["successes"]),
+        "total_cost": row["success_cost"],
+        "avg_score": row["score_sum"] / row["score_count"] if row["score_count"] else None
+    } for row in cursor.fetchall()]
     
     # Get recent recommendations
     cursor.execute("""
@@ -238,14 +386,13 @@ def get_dashboard_data() -> Dict[str, Any]:
     recommendations = [dict(row) for row in cursor.fetchall()]
     
     # Get recent prompts with completions
+    # (the 20 newest prompts by index, then their completions by prompt_id)
     cursor.execute("""
         SELECT p.prompt_id, p.content, p.use_case, p.created_at,
-               GROUP_CONCAT(c.model_name) as models_tested
-        FROM prompts p
-        LEFT JOIN completions c ON p.prompt_id = c.prompt_id
-        GROUP BY p.prompt_id
+               (SELECT GROUP_CONCAT(c.model_name) FROM completions c
+                WHERE c.prompt_id = p.prompt_id) as models_tested
+        FROM (SELECT * FROM prompts ORDER BY created_at DESC LIMIT 20) p
         ORDER BY p.created_at DESC
-        LIMIT 20
     """)
     recent_prompts = [dict(row) for row in cursor.fetchall()]
     
@@ -257,6 +404,7 @@ def get_dashboard_data() -> Dict[str, Any]:
         "model_quality": model_quality,
         "model_costs": model_costs,
         "model_reliability": model_reliability,
+        "daily": daily,
         "recommendations": recommendations,
         "recent_prompts": recent_prompts
     }
@@ -299,6 +447,10 @@ def get_prompt_details(prompt_id: str) -> Optional[Dict[str, Any]]:
 
 
 if __name__ == "__main__":
+    import sys
+    
     # Initialize database
     init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild-rollups":
+        print(f"✓ Rollups rebuilt: {rebuild_rollups()}")
     print("Database setup complete!")
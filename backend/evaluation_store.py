@@ -0,0 +1,214 @@
+"""
+Evaluation Store - Append-only JSONL persistence for StateManager
+
+Evaluations and the evaluation cache used to live in JSON documents that
+were loaded, extended and rewritten in full on every batch, so each save
+cost O(total history). Both now live in JSON Lines files:
+
+- EvaluationLog: one evaluation per line. Appends write only the new
+  records; reads stream the file line by line.
+- EvaluationCacheLog: one {"key", "value"} record per line, last write wins.
+  The key index is read once per process and kept in memory.
+
+A crash mid-write can leave a torn last line; readers skip it with a
+warning. compact() migrates the legacy JSON files and rewrites the cache
+log without superseded entries.
+
+Usage:
+    python evaluation_store.py compact
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from config import RESULTS_FILE, CACHE_FILE
+
+logger = logging.getLogger(__name__)
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream records from a JSONL file, skipping torn or corrupt lines"""
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable line {line_number} in {path}")
+
+
+def _rewrite_jsonl(path: Path, records: Iterable[Dict[str, Any]]) -> int:
+    """Atomically replace a JSONL file with the given records"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def legacy_path(path: Path) -> Path:
+    """The pre-JSONL file a store replaces (optimization_results.jsonl -> .json)"""
+    return path.with_suffix(".json")
+
+
+class EvaluationLog:
+    """Append-only log of evaluation dicts"""
+
+    def __init__(self, path: str = RESULTS_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Append records; cost is proportional to the new records only"""
+        lines = [json.dumps(record) + "\n" for record in records]
+        if not lines:
+            return 0
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        return len(lines)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return _iter_jsonl(self.path)
+
+    def count(self) -> int:
+        return sum(1 for _ in self)
+
+    def iter_from(self, offset: int) -> Iterator[Tuple[Optional[Dict[str, Any]], int]]:
+        """
+        (record, offset after it) for complete lines from a byte offset on.
+        The record is None for blank or unreadable lines so callers still
+        move past them.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return  # Torn or still being written; picked up next time
+                offset += len(line)
+                record = None
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping unreadable line ending at byte {offset} in {self.path}")
+                yield record, offset
+
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+
+class EvaluationCacheLog:
+    """Append-only key/value log with an in-memory index (last write wins)"""
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Any]] = None
+        self.superseded = 0  # Lines compaction would drop
+
+    def _load_index(self) -> Dict[str, Any]:
+        if self._index is None:
+            index = {}
+            superseded = 0
+            for record in _iter_jsonl(self.path):
+                if record.get("key") in index:
+                    superseded += 1
+                index[record.get("key")] = record.get("value")
+            self._index, self.superseded = index, superseded
+        return self._index
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._load_index().get(key)
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            index = self._load_index()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "value": value}) + "\n")
+            if key in index:
+                self.superseded += 1
+            index[key] = value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load_index())
+
+    def compact(self) -> int:
+        """Rewrite the log with one line per key; returns lines dropped"""
+        with self._lock:
+            index = self._load_index()
+            dropped = self.superseded
+            _rewrite_jsonl(self.path, ({"key": k, "value": v} for k, v in index.items()))
+            self.superseded = 0
+            return dropped
+
+
+# ============================================================================
+# Compaction / migration
+# ============================================================================
+
+def compact(results_file: str = RESULTS_FILE, cache_file: str = CACHE_FILE) -> Dict[str, int]:
+    """
+    Migrate legacy JSON files into the JSONL stores, then compact the cache log.
+    Migrated legacy files are renamed to *.json.migrated so they are not
+    imported twice.
+    """
+    summary = {"evaluations_migrated": 0, "cache_entries_migrated": 0, "cache_lines_dropped": 0}
+
+    results_log = EvaluationLog(results_file)
+    legacy_results = legacy_path(results_log.path)
+    if legacy_results.exists() and legacy_results != results_log.path:
+        with open(legacy_results, "r") as f:
+            records = json.load(f)
+        summary["evaluations_migrated"] = results_log.append(records)
+        legacy_results.rename(legacy_results.with_name(legacy_results.name + ".migrated"))
+
+    cache_log = EvaluationCacheLog(cache_file)
+    legacy_cache = legacy_path(cache_log.path)
+    if legacy_cache.exists() and legacy_cache != cache_log.path:
+        with open(legacy_cache, "r") as f:
+            entries = json.load(f)
+        # Legacy entries are older than anything already in the log
+        current = {}
+        for record in _iter_jsonl(cache_log.path):
+            current[record.get("key")] = record.get("value")
+        merged = dict(entries)
+        merged.update(current)
+        _rewrite_jsonl(cache_log.path, ({"key": k, "value": v} for k, v in merged.items()))
+        summary["cache_entries_migrated"] = len(entries)
+        legacy_cache.rename(legacy_cache.with_name(legacy_cache.name + ".migrated"))
+
+    if cache_log.path.exists():
+        summary["cache_lines_dropped"] = cache_log.compact()
+
+    return summary
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != "compact":
+        print("Usage: python evaluation_store.py compact")
+        sys.exit(1)
+
+    result = compact()
+    print(f"Evaluations migrated:   {result['evaluations_migrated']}")
+    print(f"Cache entries migrated: {result['cache_entries_migrated']}")
+    print(f"Cache lines dropped:    {result['cache_lines_dropped']}")
@@ -0,0 +1,314 @@
+"""
+Prompt Ingestion - Pluggable log sources for ContinuousMonitor
+
+Every source reads logged prompts one page at a time from an opaque cursor
+and returns the cursor to resume from. ContinuousMonitor stores that cursor
+in ReplayState only after the page has been processed, so a crash replays
+at most one page (the processed-prompt index drops the duplicates).
+
+Sources:
+- JsonlLogSource: gateway logs as JSON Lines. The cursor is a byte offset;
+  lines are parsed one at a time and a half-written last line is left for
+  the next read. A truncated (rotated) file restarts from the top.
+- SqliteTableSource: the prompts table in optimization.db, paged by rowid.
+- HttpLogSource: a Portkey-style logs endpoint that streams NDJSON and
+  returns the next cursor in response headers. LocalLogServer serves a
+  JSONL file that way, standing in for Portkey's logs API locally.
+
+Backpressure is pull-based: a source is read only when the monitor asks for
+the next page, and a page holds at most INGESTION_PAGE_SIZE prompts, so
+memory stays bounded however large the log is.
+
+Usage:
+    python ingestion.py serve gateway.jsonl [--port 8787]
+    python ingestion.py tail jsonl gateway.jsonl
+"""
+import json
+import logging
+import sqlite3
+import threading
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import (
+    INGESTION_SOURCE, INGESTION_PATH, INGESTION_URL, INGESTION_PAGE_SIZE, PORTKEY_API_KEY, TIMEOUT
+)
+from models import PromptData
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+
+@dataclass
+class IngestionPage:
+    """One page of prompts and the cursor to resume after it"""
+    prompts: List[PromptData]
+    next_cursor: Optional[str]
+    has_more: bool = False
+    skipped: int = 0  # Records that could not be parsed into prompts
+
+
+def parse_log_record(record: Dict[str, Any]) -> Optional[PromptData]:
+    """
+    Map a gateway log record to a PromptData.
+    Accepts flat records ({"id", "messages", "model"}) and Portkey-style ones
+    ({"trace_id", "request": {"messages", "model"}, "metadata"}).
+    """
+    if not isinstance(record, dict):
+        return None
+    prompt_id = record.get("id") or record.get("request_id") or record.get("trace_id")
+    request = record.get("request") if isinstance(record.get("request"), dict) else record
+
+    messages = request.get("messages")
+    if not messages and isinstance(request.get("prompt"), str):
+        messages = [{"role": "user", "content": request["prompt"]}]
+    if not prompt_id or not messages:
+        return None
+
+    metadata = dict(record.get("metadata") or {})
+    if record.get("user") and "user_id" not in metadata:
+        metadata["user_id"] = record["user"]
+
+    return PromptData(
+        id=str(prompt_id),
+        messages=messages,
+        original_model=request.get("model") or record.get("model") or "unknown",
+        timestamp=record.get("timestamp") or record.get("created_at") or datetime.utcnow().isoformat(),
+        metadata=metadata
+    )
+
+
+class IngestionSource:
+    """Base class: read_page(cursor, limit) -> IngestionPage"""
+
+    name = "source"
+
+    def read_page(self, cursor: Optional[str], limit: int = INGESTION_PAGE_SIZE) -> IngestionPage:
+        raise NotImplementedError
+
+
+# ============================================================================
+# JSONL gateway logs
+# ============================================================================
+
+class JsonlLogSource(IngestionSource):
+    """Tails a JSONL log file by byte offset"""
+
+    name = "jsonl"
+
+    def __init__(self, path: str = INGESTION_PATH):
+        self.path = Path(path)
+
+    def read_records(self, cursor: Optional[str], limit: int):
+        """Raw records after the cursor: (records, next_cursor, has_more)"""
+        offset = int(cursor or 0)
+        if not self.path.exists():
+            return [], cursor, False
+        if self.path.stat().st_size < offset:
+            logger.info(f"{self.path} shrank below the cursor; assuming rotation and restarting")
+            offset = 0
+
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while len(records) < limit:
+                line = f.readline()
+                if not line or not line.endswith(b"\n"):
+                    break  # End of file, or a line still being written
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    records.append(None)
+            has_more = f.readline().endswith(b"\n")
+        return records, str(offset), has_more
+
+    def read_page(self, cursor: Optional[str], limit: int = INGESTION_PAGE_SIZE) -> IngestionPage:
+        records, next_cursor, has_more = self.read_records(cursor, limit)
+        prompts = [p for p in map(parse_log_record, records) if p is not None]
+        return IngestionPage(prompts, next_cursor, has_more, skipped=len(records) - len(prompts))
+
+
+# ============================================================================
+# SQLite table
+# ============================================================================
+
+class SqliteTableSource(IngestionSource):
+    """Pages through the prompts table by rowid"""
+
+    name = "sqlite"
+
+    def read_page(self, cursor: Optional[str], limit: int = INGESTION_PAGE_SIZE) -> IngestionPage:
+        last_id = int(cursor or 0)
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute("""
+            SELECT id, prompt_id, content, use_case, created_at
+            FROM prompts WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, limit + 1)).fetchall()
+        conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        prompts = [
+            PromptData(
+                id=prompt_id,
+                messages=[{"role": "user", "content": content}],
+                original_model="unknown",
+                timestamp=created_at,
+                metadata={"use_case": use_case}
+            )
+            for _, prompt_id, content, use_case, created_at in rows
+        ]
+        next_cursor = str(rows[-1][0]) if rows else cursor
+        return IngestionPage(prompts, next_cursor, has_more)
+
+
+# ============================================================================
+# HTTP logs API (Portkey stand-in)
+# ============================================================================
+
+class HttpLogSource(IngestionSource):
+    """
+    Reads GET {base_url}/v1/logs?cursor=&limit= as NDJSON.
+    The next cursor and has-more flag come back in X-Next-Cursor / X-Has-More.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = INGESTION_URL, api_key: str = PORTKEY_API_KEY):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+
+    def read_page(self, cursor: Optional[str], limit: int = INGESTION_PAGE_SIZE) -> IngestionPage:
+        query = urllib.parse.urlencode({"cursor": cursor or "", "limit": limit})
+        request = urllib.request.Request(f"{self.base_url}/v1/logs?{query}")
+        if self.api_key:
+            request.add_header("x-portkey-api-key", self.api_key)
+
+        prompts, skipped = [], 0
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            next_cursor = response.headers.get("X-Next-Cursor") or cursor
+            has_more = response.headers.get("X-Has-More") == "true"
+            for line in response:  # Parse the body line by line as it arrives
+                if not line.strip():
+                    continue
+                try:
+                    prompt = parse_log_record(json.loads(line))
+                except json.JSONDecodeError:
+                    prompt = None
+                if prompt is None:
+                    skipped += 1
+                else:
+                    prompts.append(prompt)
+        return IngestionPage(prompts, next_cursor, has_more, skipped)
+
+
+class LocalLogServer:
+    """Serves a JSONL log file through the HttpLogSource protocol"""
+
+    def __init__(self, path: str, host: str = "127.0.0.1", port: int = 0):
+        log_source = JsonlLogSource(path)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                if url.path != "/v1/logs":
+                    self.send_error(404)
+                    return
+                params = urllib.parse.parse_qs(url.query)
+                cursor = params.get("cursor", [""])[0] or None
+                limit = int(params.get("limit", [INGESTION_PAGE_SIZE])[0])
+                records, next_cursor, has_more = log_source.read_records(cursor, limit)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("X-Next-Cursor", next_cursor or "")
+                self.send_header("X-Has-More", "true" if has_more else "false")
+                self.end_headers()
+                for record in records:
+                    self.wfile.write((json.dumps(record) + "\n").encode())
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def build_source(kind: str = INGESTION_SOURCE) -> Optional[IngestionSource]:
+    """Source configured by INGESTION_SOURCE ("none", "jsonl", "sqlite" or "http")"""
+    if kind == "none":
+        return None
+    if kind == "jsonl":
+        return JsonlLogSource()
+    if kind == "sqlite":
+        return SqliteTableSource()
+    if kind == "http":
+        return HttpLogSource()
+    raise ValueError(f"Unknown ingestion source: {kind}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Prompt ingestion sources")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Serve a JSONL log as a local logs API")
+    serve.add_argument("path")
+    serve.add_argument("--port", type=int, default=8787)
+
+    tail = sub.add_parser("tail", help="Print every prompt a source yields")
+    tail.add_argument("kind", choices=["jsonl", "sqlite", "http"])
+    tail.add_argument("target", nargs="?", help="JSONL path or base URL")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = LocalLogServer(args.path, port=args.port)
+        print(f"Serving {args.path} at {server.url}/v1/logs (Ctrl+C to stop)")
+        try:
+            server.server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        if args.kind == "jsonl":
+            source = JsonlLogSource(args.target or INGESTION_PATH)
+        elif args.kind == "http":
+            source = HttpLogSource(args.target or INGESTION_URL)
+        else:
+            source = SqliteTableSource()
+
+        cursor, total = None, 0
+        while True:
+            page = source.read_page(cursor)
+            for prompt in page.prompts:
+                print(f"{prompt.timestamp}  {prompt.id}  {prompt.messages[-1]['content'][:60]}")
+            total += len(page.prompts)
+            cursor = page.next_cursor
+            if not page.has_more:
+                break
+        print(f"\n{total} prompts, cursor {cursor}")
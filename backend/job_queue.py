@@ -0,0 +1,397 @@
+"""
+Background Job Queue - SQLite-backed jobs with bounded in-process workers
+
+Long-running work (e.g. a fresh multi-model replay for /api/optimize) is
+submitted as a job and executed by a small pool of worker threads instead of
+holding an HTTP worker. Jobs, their progress and results live in SQLite, so
+pending work survives a restart and clients can poll for status.
+
+Several processes (e.g. gunicorn workers) can serve one queue. Each running
+job records the queue instance that claimed it, and that instance renews
+the job's heartbeat while it runs. Only jobs whose heartbeat went stale
+(their process died) are requeued.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import JOB_QUEUE_WORKERS, JOB_QUEUE_POLL_SECONDS, JOB_QUEUE_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+# handler(payload, report) -> result; report(progress 0..1, message)
+JobHandler = Callable[[Dict[str, Any], Callable[[float, str], None]], Any]
+
+
+class JobStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobQueue:
+    """
+    Priority job queue with deduplication.
+
+    - Higher priority runs first; ties run in submission order.
+    - Submitting a job identical (same type and payload) to one that is
+      still pending or running returns the existing job instead.
+    - At most max_workers jobs run at once.
+    - Running jobs whose owner stopped heartbeating for lease_seconds were
+      interrupted (crash or restart) and are queued again.
+    """
+
+    def __init__(self, name: str, max_workers: int = JOB_QUEUE_WORKERS,
+                 poll_seconds: float = JOB_QUEUE_POLL_SECONDS,
+                 lease_seconds: float = JOB_QUEUE_LEASE_SECONDS, clock: Callable[[], float] = time.time):
+        self.name = name
+        self.max_workers = max_workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[threading.Thread] = []
+        self._heartbeat: Optional[threading.Thread] = None
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                queue TEXT NOT NULL,
+                job_type TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                priority INTEGER DEFAULT 0,
+                status TEXT NOT NULL,
+                progress REAL DEFAULT 0,
+                message TEXT,
+                result_json TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+        """)
+
+        # Tables created before jobs had owners
+        columns = {row["name"] for row in cursor.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                progress REAL,
+                message TEXT,
+                created_at TEXT NOT NULL
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim
+            ON jobs(queue, status, priority DESC, created_at)
+        """)
+
+        # At most one live job per identical request
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup
+            ON jobs(queue, dedup_key) WHERE status IN ('pending', 'running')
+        """)
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events(job_id, id)")
+
+        conn.commit()
+        conn.close()
+
+    # ========================================================================
+    # Submission and status
+    # ========================================================================
+
+    def register(self, job_type: str, handler: JobHandler):
+        self._handlers[job_type] = handler
+
+    def submit(self, job_type: str, payload: Dict[str, Any], priority: int = 0) -> Tuple[str, bool]:
+        """Queue a job; returns (job_id, deduplicated)"""
+        if job_type not in self._handlers:
+            raise ValueError(f"No handler registered for job type {job_type}")
+
+        payload_json = json.dumps(payload, sort_keys=True)
+        dedup_key = hashlib.sha256(f"{job_type}:{payload_json}".encode()).hexdigest()
+        job_id = uuid.uuid4().hex[:16]
+        now = datetime.utcnow().isoformat()
+
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO jobs (job_id, queue, job_type, dedup_key, payload_json,
+                                  priority, status, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, self.name, job_type, dedup_key, payload_json,
+                  priority, JobStatus.PENDING, now))
+            self._add_event(conn, job_id, "submitted", 0.0, None)
+            conn.commit()
+        except sqlite3.IntegrityError:
+            row = conn.execute("""
+                SELECT job_id, priority FROM jobs
+                WHERE queue = ? AND dedup_key = ? AND status IN ('pending', 'running')
+            """, (self.name, dedup_key)).fetchone()
+            if row is None:  # Finished between the insert and the lookup; try again
+                conn.close()
+                return self.submit(job_type, payload, priority)
+            # A more urgent duplicate raises the priority of the queued job
+            if priority > row["priority"]:
+                conn.execute("UPDATE jobs SET priority = ? WHERE job_id = ? AND status = 'pending'",
+                             (priority, row["job_id"]))
+                conn.commit()
+            return row["job_id"], True
+        finally:
+            conn.close()
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id, False
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            conn.close()
+            return None
+        position = None
+        if row["status"] == JobStatus.PENDING:
+            position = conn.execute("""
+                SELECT COUNT(*) FROM jobs
+                WHERE queue = ? AND status = 'pending'
+                AND (priority > ? OR (priority = ? AND created_at < ?))
+            """, (self.name, row["priority"], row["priority"], row["created_at"])).fetchone()[0]
+        conn.close()
+
+        return {
+            "job_id": row["job_id"],
+            "job_type": row["job_type"],
+            "payload": json.loads(row["payload_json"]),
+            "priority": row["priority"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "queue_position": position,
+            "result": json.loads(row["result_json"]) if row["result_json"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def get_events(self, job_id: str, since_id: int = 0) -> List[Dict[str, Any]]:
+        """Progress events after since_id, oldest first"""
+        conn = self._connect()
+        rows = conn.execute("""
+            SELECT id, event_type, progress, message, created_at FROM job_events
+            WHERE job_id = ? AND id > ? ORDER BY id
+        """, (job_id, since_id)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        conn = self._connect()
+        cursor = conn.execute("""
+            UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status = 'pending'
+        """, (JobStatus.CANCELLED, datetime.utcnow().isoformat(), job_id))
+        cancelled = cursor.rowcount > 0
+        if cancelled:
+            self._add_event(conn, job_id, "cancelled", None, None)
+        conn.commit()
+        conn.close()
+        return cancelled
+
+    def get_stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        rows = conn.execute("SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status",
+                            (self.name,)).fetchall()
+        conn.close()
+        stats = {status: 0 for status in (JobStatus.PENDING, JobStatus.RUNNING, JobStatus.COMPLETED,
+                                          JobStatus.FAILED, JobStatus.CANCELLED)}
+        stats.update({row[0]: row[1] for row in rows})
+        stats["workers"] = len(self._workers)
+        return stats
+
+    def _add_event(self, conn: sqlite3.Connection, job_id: str, event_type: str,
+                   progress: Optional[float], message: Optional[str]):
+        conn.execute("""
+            INSERT INTO job_events (job_id, event_type, progress, message, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (job_id, event_type, progress, message, datetime.utcnow().isoformat()))
+
+    # ========================================================================
+    # Workers
+    # ========================================================================
+
+    def start(self):
+        """Start the worker and heartbeat threads (idempotent) after requeueing orphaned jobs"""
+        with self._wakeup:
+            if self._workers:
+                return
+            self._stopping = False
+            self.requeue_orphans()
+
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._work, name=f"{self.name}-job-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._heartbeat = threading.Thread(target=self._beat, name=f"{self.name}-job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the jobs currently running finish"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout)
+        self._workers = []
+        self._heartbeat = None
+
+    def requeue_orphans(self) -> int:
+        """Queue running jobs again whose owner stopped heartbeating (its process is gone)"""
+        conn = self._connect()
+        requeued = conn.execute("""
+            UPDATE jobs SET status = 'pending', started_at = NULL, owner = NULL, heartbeat_at = NULL
+            WHERE queue = ? AND status = 'running' AND owner IS NOT ?
+            AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+        """, (self.name, self.owner, self.clock() - self.lease_seconds)).rowcount
+        conn.commit()
+        conn.close()
+        if requeued:
+            logger.info(f"[{self.name}] Requeued {requeued} jobs whose worker stopped")
+            with self._wakeup:
+                self._wakeup.notify_all()
+        return requeued
+
+    def _beat(self):
+        """Renew this instance's running jobs and pick up other instances' orphans"""
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                self._wakeup.wait(self.lease_seconds / 3)
+                if self._stopping:
+                    return
+            try:
+                conn = self._connect()
+                conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                             (self.clock(), self.owner))
+                conn.commit()
+                conn.close()
+                self.requeue_orphans()
+            except sqlite3.Error as e:
+                logger.warning(f"[{self.name}] Job heartbeat failed: {e}")
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT * FROM jobs WHERE queue = ? AND status = 'pending'
+                ORDER BY priority DESC, created_at LIMIT 1
+            """, (self.name,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute("""
+                UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat_at = ?
+                WHERE job_id = ?
+            """, (datetime.utcnow().isoformat(), self.owner, self.clock(), row["job_id"]))
+            self._add_event(conn, row["job_id"], "started", 0.0, None)
+            conn.commit()
+            return row
+        finally:
+            conn.close()
+
+    def _work(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(self.poll_seconds)
+                continue
+            self._run(job)
+
+    def _run(self, job: sqlite3.Row):
+        job_id = job["job_id"]
+
+        def report(progress: float, message: str):
+            conn = self._connect()
+            updated = conn.execute("""
+                UPDATE jobs SET progress = ?, message = ? WHERE job_id = ? AND owner = ? AND status = 'running'
+            """, (progress, message, job_id, self.owner)).rowcount
+            if updated:
+                self._add_event(conn, job_id, "progress", progress, message)
+            conn.commit()
+            conn.close()
+
+        try:
+            result = self._handlers[job["job_type"]](json.loads(job["payload_json"]), report)
+        except Exception as e:
+            logger.error(f"[{self.name}] Job {job_id} failed: {e}")
+            self._finish(job_id, JobStatus.FAILED, error=str(e))
+        else:
+            self._finish(job_id, JobStatus.COMPLETED, result=result)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        """Record the outcome, unless the job was requeued (and maybe re-claimed) meanwhile"""
+        conn = self._connect()
+        updated = conn.execute("""
+            UPDATE jobs SET status = ?, progress = ?, result_json = ?, error = ?, finished_at = ?
+            WHERE job_id = ? AND owner = ? AND status = 'running'
+        """, (
+            status,
+            1.0 if status == JobStatus.COMPLETED else None,
+            json.dumps(result, default=str) if result is not None else None,
+            error,
+            datetime.utcnow().isoformat(),
+            job_id,
+            self.owner
+        )).rowcount
+        if updated:
+            self._add_event(conn, job_id, status, 1.0 if status == JobStatus.COMPLETED else None, error)
+        else:
+            logger.warning(f"[{self.name}] Job {job_id} lost its lease; dropping this run's {status} result")
+        conn.commit()
+        conn.close()
@@ -106,7 +106,7 @@ def main():
             print(f"Cost Reduction: {recommendation.cost_reduction_percent:.1f}%")
             print(f"Quality Impact: {recommendation.quality_impact_percent:+.1f}%")
             print(f"Confidence: {recommendation.confidence_score:.2f}")
-            print(f"\nSee 'optimization_results.json' for detailed results")
+            print(f"\nSee 'optimization_results.jsonl' for detailed results")
         else:
             print("\n" + "="*70)
             print("Analysis complete - More data needed for confident recommendation")
@@ -127,8 +127,8 @@ def main():
     print("SYSTEM INFO")
     print("="*70)
     print("State file: replay_state.json")
-    print("Results file: optimization_results.json")
-    print("Cache file: evaluation_cache.json")
+    print("Results file: optimization_results.jsonl")
+    print("Cache file: evaluation_cache.jsonl")
     print("\nTo run in continuous mode, use:")
     print("  python continuous_mode.py")
     print("="*70 + "\n")
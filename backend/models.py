@@ -34,6 +34,7 @@ class CompletionResult:
     is_refusal: bool = False
     error: Optional[str] = None
     retry_count: int = 0
+    cached: bool = False  # Served from the replay cache; cost is what the original call cost
     timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     
     def to_dict(self):
@@ -65,6 +66,16 @@ class ModelEvaluation:
     
     def to_dict(self):
         return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict):
+        return cls(
+            prompt_id=data['prompt_id'],
+            model_name=data['model_name'],
+            completion=CompletionResult(**data['completion']),
+            quality=QualityScore(**data['quality']),
+            cost_quality_ratio=data['cost_quality_ratio']
+        )
 
 
 @dataclass
@@ -90,9 +101,9 @@ class OptimizationRecommendation:
 @dataclass
 class ReplayState:
     """State tracking for continuous monitoring"""
-    last_processed_timestamp: str
-    processed_prompt_ids: List[str] = field(default_factory=list)
+    last_processed_timestamp: str  # High-water mark: latest source timestamp processed
     active_evaluations: Dict[str, str] = field(default_factory=dict)  # prompt_id -> status
+    source_cursors: Dict[str, str] = field(default_factory=dict)  # ingestion source -> resume cursor
     total_prompts_processed: int = 0
     last_updated: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     
@@ -0,0 +1,253 @@
+"""
+Monitor Scheduler - Event-driven loop for continuous monitoring
+
+Replaces the fixed MONITORING_INTERVAL sleep. The scheduler runs a cycle
+(fetch a page, sample, replay) whenever:
+
+- a trigger reports new data: a tailed log file grew, the SQLite database
+  was committed to by another connection, or something was put on a local
+  queue (MonitorQueue.notify)
+- the source said more pages are waiting (the backlog drains back to back)
+- the idle wait ran out. The wait starts at MONITOR_MIN_IDLE_SECONDS after
+  any work and doubles per empty cycle up to MONITORING_INTERVAL.
+
+Prompts of a page are replayed on a bounded pool of MAX_CONCURRENT_REPLAYS
+workers. stop(), SIGINT and SIGTERM finish the page in progress (so its
+evaluations and cursor are saved) and then shut the pool and triggers down.
+"""
+import logging
+import os
+import queue
+import signal
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from config import (
+    MONITORING_INTERVAL, MAX_CONCURRENT_REPLAYS, MONITOR_TRIGGER,
+    MONITOR_MIN_IDLE_SECONDS, MONITOR_TRIGGER_POLL_SECONDS, INGESTION_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+
+# ============================================================================
+# Triggers
+# ============================================================================
+
+class Trigger:
+    """Calls wake() when new data may be available"""
+
+    def start(self, wake: Callable[[], None]):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class _PollingTrigger(Trigger):
+    """Runs check() on a background thread and wakes when it reports a change"""
+
+    def __init__(self, poll_seconds: float = MONITOR_TRIGGER_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        raise NotImplementedError
+
+    def start(self, wake):
+        self.check()  # Baseline; changes before start are picked up by the first cycle
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    if self.check():
+                        wake()
+                except Exception as e:
+                    logger.warning(f"{type(self).__name__} check failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class FileTailTrigger(_PollingTrigger):
+    """Wakes when a log file grows, or is replaced (rotation)"""
+
+    def __init__(self, path: str = INGESTION_PATH, poll_seconds: float = MONITOR_TRIGGER_POLL_SECONDS):
+        super().__init__(poll_seconds)
+        self.path = Path(path)
+        self._signature = None
+
+    def check(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            signature = None
+        changed = signature != self._signature and signature is not None
+        self._signature = signature
+        return changed
+
+
+class SqliteChangeTrigger(_PollingTrigger):
+    """
+    Wakes when another connection commits to the database.
+    PRAGMA data_version changes on every commit made by another connection,
+    which (unlike an update hook) also sees writes from other processes.
+    """
+
+    def __init__(self, db_path: Path = None, poll_seconds: float = MONITOR_TRIGGER_POLL_SECONDS):
+        super().__init__(poll_seconds)
+        self.db_path = db_path or DB_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version = None
+
+    def check(self) -> bool:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = self._version is not None and version != self._version
+        self._version = version
+        return changed
+
+    def stop(self):
+        super().stop()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class MonitorQueue(Trigger):
+    """In-process notifications: producers call notify() after logging prompts"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[None]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def notify(self):
+        self._queue.put(None)
+
+    def start(self, wake):
+        def loop():
+            while True:
+                item = self._queue.get()
+                if item is StopIteration:
+                    return
+                wake()
+
+        self._thread = threading.Thread(target=loop, name="MonitorQueue", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(StopIteration)
+            self._thread.join()
+            self._thread = None
+
+
+# Shared queue for in-process producers (used when MONITOR_TRIGGER is "queue")
+monitor_queue = MonitorQueue()
+
+
+def build_triggers(source=None, kind: str = MONITOR_TRIGGER) -> List[Trigger]:
+    """Triggers for MONITOR_TRIGGER; "auto" picks one that matches the ingestion source"""
+    if kind == "auto":
+        kind = {"jsonl": "file", "sqlite": "sqlite"}.get(getattr(source, "name", None), "none")
+    if kind == "none":
+        return []
+    if kind == "file":
+        return [FileTailTrigger(getattr(source, "path", INGESTION_PATH))]
+    if kind == "sqlite":
+        return [SqliteChangeTrigger()]
+    if kind == "queue":
+        return [monitor_queue]
+    raise ValueError(f"Unknown monitor trigger: {kind}")
+
+
+# ============================================================================
+# Scheduler
+# ============================================================================
+
+class MonitorScheduler:
+    """Runs monitor.run_cycle() on triggers, backlog and idle backoff"""
+
+    def __init__(self, monitor, triggers: Optional[List[Trigger]] = None,
+                 workers: int = MAX_CONCURRENT_REPLAYS,
+                 min_idle: float = MONITOR_MIN_IDLE_SECONDS,
+                 max_idle: float = MONITORING_INTERVAL):
+        self.monitor = monitor
+        self.triggers = triggers or []
+        self.workers = workers
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.idle_wait = min_idle
+        self.cycles = 0
+        self.wakeups = 0
+
+    def wake(self):
+        self.wakeups += 1
+        self._wake.set()
+
+    def stop(self):
+        """Ask the loop to exit once the current cycle is done"""
+        self._stopping.set()
+        self._wake.set()
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+        previous = {}
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous[sig] = signal.signal(sig, lambda signum, frame: self.stop())
+        return previous
+
+    def run(self):
+        """Block until stop() (or SIGINT/SIGTERM)"""
+        previous_handlers = self._install_signal_handlers()
+        for trigger in self.triggers:
+            trigger.start(self.wake)
+        logger.info(f"Scheduler started: {len(self.triggers)} trigger(s), {self.workers} workers, "
+                    f"idle wait {self.min_idle:g}s-{self.max_idle:g}s")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="replay") as executor:
+                while not self._stopping.is_set():
+                    self._wake.clear()
+                    try:
+                        fetched = self.monitor.run_cycle(executor=executor)
+                    except Exception as e:
+                        logger.error(f"Error in monitoring cycle: {e}")
+                        fetched = 0
+                    self.cycles += 1
+
+                    if fetched and getattr(self.monitor, "source_has_more", False):
+                        continue  # Backlog: next page right away
+                    if fetched:
+                        self.idle_wait = self.min_idle
+                    else:
+                        logger.info(f"No new prompts. Waiting up to {self.idle_wait:g}s for new data...")
+
+                    if self._wake.wait(self.idle_wait):
+                        self.idle_wait = self.min_idle
+                    elif not fetched:
+                        self.idle_wait = min(self.idle_wait * 2, self.max_idle)
+        finally:
+            for trigger in self.triggers:
+                trigger.stop()
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            logger.info(f"Scheduler stopped after {self.cycles} cycles")
@@ -2,8 +2,7 @@
 Cost-Quality Optimizer - Analyzes results and generates recommendations
 """
 import logging
-from typing import List, Dict, Optional
-from statistics import mean, stdev
+from typing import Iterable, List, Dict, Optional, Sequence
 from models import (
     ModelEvaluation, 
     OptimizationRecommendation, 
@@ -11,6 +10,8 @@ from models import (
     QualityScore
 )
 from config import MIN_CONFIDENCE_SCORE, MIN_SAMPLE_SIZE
+from columnar_analytics import EvaluationColumns, analyze, grouped_metrics
+from bootstrap_stats import BootstrapEngine, bootstrap_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,9 +20,11 @@ logger = logging.getLogger(__name__)
 class CostQualityOptimizer:
     """Analyzes model performance and recommends optimal trade-offs"""
     
-    def __init__(self, min_confidence: float = MIN_CONFIDENCE_SCORE, min_samples: int = MIN_SAMPLE_SIZE):
+    def __init__(self, min_confidence: float = MIN_CONFIDENCE_SCORE, min_samples: int = MIN_SAMPLE_SIZE,
+                 bootstrap: Optional[BootstrapEngine] = None):
         self.min_confidence = min_confidence
         self.min_samples = min_samples
+        self.bootstrap = bootstrap or bootstrap_engine
     
     def create_evaluation(
         self,
@@ -47,61 +50,26 @@ class CostQualityOptimizer:
     
     def analyze_model_performance(
         self,
-        evaluations: List[ModelEvaluation]
+        evaluations: Iterable[ModelEvaluation]
     ) -> Dict[str, Dict]:
         """
-        Aggregate performance metrics across multiple evaluations per model
+        Aggregate performance metrics across multiple evaluations per model.
+        Vectorized over columnar arrays; PerformanceAccumulator is the
+        incremental form continuous mode keeps up to date.
         """
-        model_data = {}
-        
-        for eval in evaluations:
-            model = eval.model_name
-            
-            if model not in model_data:
-                model_data[model] = {
-                    "costs": [],
-                    "quality_scores": [],
-                    "latencies": [],
-                    "success_count": 0,
-                    "total_count": 0,
-                    "cost_quality_ratios": []
-                }
-            
-            data = model_data[model]
-            data["total_count"] += 1
-            
-            if eval.completion.success:
-                data["success_count"] += 1
-                data["costs"].append(eval.completion.cost)
-                data["quality_scores"].append(eval.quality.overall_score)
-                data["latencies"].append(eval.completion.latency_ms)
-                data["cost_quality_ratios"].append(eval.cost_quality_ratio)
-        
-        # Calculate aggregate metrics
-        metrics = {}
-        for model, data in model_data.items():
-            if data["success_count"] > 0:
-                metrics[model] = {
-                    "avg_cost": mean(data["costs"]),
-                    "avg_quality": mean(data["quality_scores"]),
-                    "avg_latency": mean(data["latencies"]),
-                    "avg_cost_quality_ratio": mean(data["cost_quality_ratios"]),
-                    "success_rate": data["success_count"] / data["total_count"],
-                    "sample_size": data["total_count"],
-                    "quality_stdev": stdev(data["quality_scores"]) if len(data["quality_scores"]) > 1 else 0
-                }
-            else:
-                metrics[model] = {
-                    "avg_cost": 0,
-                    "avg_quality": 0,
-                    "avg_latency": 0,
-                    "avg_cost_quality_ratio": float('inf'),
-                    "success_rate": 0,
-                    "sample_size": data["total_count"],
-                    "quality_stdev": 0
-                }
-        
-        return metrics
+        return grouped_metrics(EvaluationColumns.from_evaluations(evaluations))
+    
+    def analyze_columns(
+        self,
+        columns: EvaluationColumns,
+        percentiles: Sequence[float] = (50, 90, 95, 99),
+        bootstrap_resamples: int = 0
+    ) -> Dict[str, Dict]:
+        """
+        Per-model metrics plus quality/latency/cost percentiles (and, with
+        bootstrap_resamples, bootstrap CIs of the means) for a loaded history
+        """
+        return analyze(columns, percentiles, bootstrap_resamples)
     
     def recommend_optimization(
         self,
@@ -111,14 +79,29 @@ class CostQualityOptimizer:
         """
         Generate optimization recommendation for switching from current model
         """
+        columns = EvaluationColumns.from_evaluations(all_evaluations)
+        return self.recommend_from_metrics(current_model, grouped_metrics(columns), samples=columns)
+    
+    def recommend_from_metrics(
+        self,
+        current_model: str,
+        metrics: Dict[str, Dict],
+        samples: Optional[EvaluationColumns] = None
+    ) -> Optional[OptimizationRecommendation]:
+        """
+        Same as recommend_optimization, from per-model metrics that are
+        already aggregated (e.g. StateManager.performance().metrics()).
+        With the evaluations as columns in samples, the confidence is the
+        bootstrap probability that the switch improves cost per quality
+        point, and the bootstrap intervals are attached to metrics.
+        """
+        total_samples = sum(m["sample_size"] for m in metrics.values())
+        
         # Check minimum sample size
-        if len(all_evaluations) < self.min_samples:
-            logger.warning(f"Insufficient data: {len(all_evaluations)} samples (minimum: {self.min_samples})")
+        if total_samples < self.min_samples:
+            logger.warning(f"Insufficient data: {total_samples} samples (minimum: {self.min_samples})")
             return None
         
-        # Analyze performance
-        metrics = self.analyze_model_performance(all_evaluations)
-        
         if current_model not in metrics:
             logger.error(f"Current model {current_model} not found in evaluations")
             return None
@@ -160,14 +143,25 @@ class CostQualityOptimizer:
         quality_impact = ((recommended_metrics["avg_quality"] - current_metrics["avg_quality"]) 
                          / current_metrics["avg_quality"] * 100)
         
-        # Calculate confidence based on sample size and quality variance
-        sample_confidence = min(len(all_evaluations) / (self.min_samples * 2), 1.0)
-        variance_confidence = 1.0 - min(recommended_metrics["quality_stdev"] / 50, 1.0)
-        confidence = (sample_confidence + variance_confidence) / 2
+        # Confidence: share of bootstrap resamples in which the switch still
+        # pays off. Without the raw samples, fall back to the sample size and
+        # quality variance heuristic.
+        bootstrap = None
+        if samples is not None:
+            baseline = (samples.model_values(current_model, "quality"), samples.model_values(current_model, "cost"))
+            candidate = (samples.model_values(best_model, "quality"), samples.model_values(best_model, "cost"))
+            if len(baseline[0]) > 1 and len(candidate[0]) > 1:
+                bootstrap = self.bootstrap.compare(*baseline, *candidate)
+        if bootstrap is not None:
+            confidence = bootstrap["probability_better"]
+        else:
+            sample_confidence = min(total_samples / (self.min_samples * 2), 1.0)
+            variance_confidence = 1.0 - min(recommended_metrics["quality_stdev"] / 50, 1.0)
+            confidence = (sample_confidence + variance_confidence) / 2
         
         # Build reasoning
         reasoning = f"""
-Based on analysis of {len(all_evaluations)} prompts:
+Based on analysis of {total_samples} prompts:
 
 Current Model ({current_model}):
 - Average Cost: ${current_metrics['avg_cost']:.6f}
@@ -184,6 +178,13 @@ Recommended Model ({best_model}):
 The switch reduces costs by {abs(cost_reduction):.1f}% while {'improving' if quality_impact > 0 else 'reducing'} quality by {abs(quality_impact):.1f}%.
 Cost-quality efficiency improves by {best_improvement*100:.1f}%.
         """.strip()
+        if bootstrap is not None:
+            level = bootstrap["confidence"] * 100
+            quality_ci = bootstrap["quality_impact_percent"]
+            cost_ci = bootstrap["cost_reduction_percent"]
+            reasoning += (f"\n{level:.0f}% bootstrap intervals: cost reduction {cost_ci['low']:.1f}% to "
+                          f"{cost_ci['high']:.1f}%, quality impact {quality_ci['low']:.1f}% to "
+                          f"{quality_ci['high']:.1f}%.")
         
         return OptimizationRecommendation(
             current_model=current_model,
@@ -191,10 +192,12 @@ Cost-quality efficiency improves by {best_improvement*100:.1f}%.
             cost_reduction_percent=cost_reduction,
             quality_impact_percent=quality_impact,
             confidence_score=confidence,
-            sample_size=len(all_evaluations),
+            sample_size=total_samples,
             reasoning=reasoning,
             metrics={
                 "current": current_metrics,
-                "recommended": recommended_metrics
+                "recommended": recommended_metrics,
+                "confidence_method": "bootstrap" if bootstrap is not None else "heuristic",
+                "bootstrap": bootstrap
             }
         )
@@ -7,6 +7,9 @@ Layer 3: Verification & Evaluation
 import logging
 import json
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, wait, FIRST_COMPLETED
 from dataclasses import dataclass, asdict, field
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timezone
@@ -15,6 +18,11 @@ from enum import Enum
 from model_registry import model_registry, ModelEntry
 from user_metadata import user_service, UserMetadata
 from cache_manager import cache_manager, CacheKeys
+from config import MAX_CONCURRENT_REPLAYS
+from models import CompletionResult
+from sequential_test import SequentialQualityTest
+from bootstrap_stats import bootstrap_engine
+from run_journal import RunJournal, RunCheckpoints, RunStatus, run_journal
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("orchestrator")
@@ -31,6 +39,10 @@ class Thresholds:
     MAX_ITERATION_LOOPS = 3              # Max retries when quality too low
     MIN_SAMPLE_SIZE = 3                  # Minimum conversations for verification
     EXPLORATION_BUDGET_PERCENT = 5.0     # % of traffic for exploration
+    BASELINE_QUALITY_SCORE = 90.0        # Assumed judge score of the current model
+    MAX_VERIFICATION_SAMPLES = 10        # Max conversations replayed per candidate
+    SEQUENTIAL_TEST_ALPHA = 0.05         # Error rate of the early-stopping test
+    SEQUENTIAL_TEST_MIN_STD = 2.0        # Floor on judge score std dev (quality points)
 
 
 def utc_now() -> datetime:
@@ -334,27 +346,110 @@ class UseCaseFitAgent(BaseAgent):
 # ============================================================================
 # LAYER 3: VERIFICATION & EVALUATION AGENTS
 # ============================================================================
+class VerificationBudgetExceeded(Exception):
+    """Raised by a candidate verification cut short by the budget"""
+    
+    def __init__(self, result: Dict):
+        super().__init__(f"Verification budget exhausted for {result.get('model_id')}")
+        self.result = result
+
+
+class VerificationBudget:
+    """
+    Spend limit shared by every replay in one verification run.
+    Costs are charged atomically as completions arrive; the first charge that
+    crosses the limit cancels all replays that have not started yet.
+    """
+    
+    def __init__(self, limit_usd: float):
+        self.limit_usd = limit_usd
+        self.spent_usd = 0.0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+        self._exhausted = threading.Event()
+        self._pending: set = set()
+    
+    @property
+    def exhausted(self) -> bool:
+        return self._exhausted.is_set()
+    
+    def track(self, future: Future):
+        """Register a queued replay so it can be cancelled when the budget runs out"""
+        with self._lock:
+            exhausted = self._exhausted.is_set()
+            if not exhausted:
+                self._pending.add(future)
+        if not exhausted:
+            # Outside the lock: runs inline if the future has already finished
+            future.add_done_callback(self._untrack)
+            return
+        if future.cancel():
+            with self._lock:
+                self.cancelled += 1
+    
+    def _untrack(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+    
+    def charge(self, amount_usd: float) -> bool:
+        """Add a completed replay's cost; returns False once the limit is crossed"""
+        with self._lock:
+            self.spent_usd += amount_usd
+            if self.spent_usd <= self.limit_usd:
+                return True
+            if self._exhausted.is_set():
+                return False
+            self._exhausted.set()
+            pending = list(self._pending)
+        
+        cancelled = sum(1 for f in pending if f.cancel())
+        with self._lock:
+            self.cancelled += cancelled
+        return False
+
+
 class VerificationAgent(BaseAgent):
     """
     LAYER 3 ORCHESTRATOR
     Runs verification tests and evaluation pipeline
+    
+    Candidates are verified concurrently and their conversation replays share
+    one bounded pool, all charged against a single VerificationBudget.
     """
     
-    def __init__(self, replay_engine, quality_evaluator):
+    def __init__(self, replay_engine, quality_evaluator,
+                 max_workers: int = MAX_CONCURRENT_REPLAYS):
         super().__init__("VerificationAgent")
         self.replay_engine = replay_engine
         self.quality_evaluator = quality_evaluator
         self.iteration_count = 0
+        self._replay_pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="verify-replay"
+        )
     
     def execute(self, ranking_result: Dict, 
                 conversations: Optional[List[Dict]] = None,
-                iteration: int = 0) -> AgentResult:
+                iteration: int = 0,
+                verified: Optional[Dict[str, Dict]] = None,
+                checkpoints: Optional[RunCheckpoints] = None) -> AgentResult:
+        """
+        Verify and evaluate the ranked candidates.
+        verified maps model_id to evaluated results from earlier iterations of
+        the same run; those candidates are carried forward instead of being
+        verified again, and new results are added to it.
+        checkpoints, when given, journals every completed replay and judge
+        score so an interrupted run can resume without repeating them.
+        """
         start = time.time()
         self.iteration_count = iteration
         
         user = ranking_result["user"]
         current_model = ranking_result["current_model"]
-        candidates = ranking_result["top_candidates"]
+        ranked_candidates = ranking_result["top_candidates"]
+        verified = {} if verified is None else verified
+        candidates = [c for c in ranked_candidates if c["model_id"] not in verified]
+        if len(candidates) < len(ranked_candidates):
+            self.log(f"Reusing results for {len(ranked_candidates) - len(candidates)} already verified candidates")
         
         self.log(f"Starting verification (iteration {iteration})")
         
@@ -366,40 +461,77 @@ class VerificationAgent(BaseAgent):
             self.log("Insufficient conversation history, using synthetic tests", "warning")
             conversations = self._generate_synthetic_tests(user["use_case"])
         
-        # Run verification for each candidate
-        verification_results = []
-        total_cost = 0.0
+        # Run verification for all candidates concurrently under one budget
+        budget = VerificationBudget(Thresholds.MAX_VERIFICATION_BUDGET_USD)
+        conversation_hash = self._hash_conversations(conversations)
         
-        for candidate in candidates:
-            # Check cache first
+        def verify_with_cache(candidate: Dict) -> Tuple[Dict, str]:
             cache_key = cache_manager.generate_key(
                 CacheKeys.MODEL_OUTPUT,
                 model_id=candidate["model_id"],
-                conversation_hash=self._hash_conversations(conversations)
+                conversation_hash=conversation_hash
             )
             
-            cached = cache_manager.get(cache_key)
-            if cached:
-                self.log(f"Using cached results for {candidate['model_id']}")
-                verification_results.append(cached)
-                continue
+            def verify(run_budget: VerificationBudget, run_checkpoints: Optional[RunCheckpoints]) -> Dict:
+                result = self._verify_candidate(candidate, conversations, current_model,
+                                                run_budget, run_checkpoints)
+                result["candidate"] = candidate
+                if result["budget_exhausted"]:
+                    raise VerificationBudgetExceeded(result)  # never cache partial results
+                return result
             
-            # Run fresh verification
-            result = self._verify_candidate(candidate, conversations, current_model)
-            result["candidate"] = candidate
+            # A background refresh of a stale entry can outlive this run, so it
+            # gets a budget of its own and does not write into this run's journal
+            try:
+                return cache_manager.get_or_refresh(
+                    cache_key, lambda: verify(budget, checkpoints), ttl_seconds=3600,
+                    tags=[f"user:{user['user_id']}", f"model:{candidate['model_id']}"],
+                    refresh_loader=lambda: verify(VerificationBudget(Thresholds.MAX_VERIFICATION_BUDGET_USD), None)
+                )
+            except VerificationBudgetExceeded as e:
+                return e.result, "partial"
+        
+        verification_results = []
+        partial_ids = set()
+        total_cost = 0.0
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(candidates)),
+                                thread_name_prefix="verify-candidate") as pool:
+            outcomes = list(pool.map(verify_with_cache, candidates))
+        
+        for candidate, (result, status) in zip(candidates, outcomes):
+            if status in ("fresh", "stale"):
+                self.log(f"Using {status} cached results for {candidate['model_id']}")
+            else:
+                total_cost += result.get("verification_cost", 0)
+            if status == "partial":
+                if not result["completions"]:
+                    continue
+                partial_ids.add(candidate["model_id"])
             verification_results.append(result)
-            total_cost += result.get("verification_cost", 0)
-            
-            # Cache the result
-            cache_manager.set(cache_key, result, ttl_seconds=3600)
-            
-            # Check budget
-            if total_cost > Thresholds.MAX_VERIFICATION_BUDGET_USD:
-                self.log(f"Verification budget exceeded: ${total_cost:.4f}", "warning")
-                break
         
-        # Evaluate results
-        evaluated = self._evaluate_results(verification_results, current_model)
+        if budget.exhausted:
+            self.log(
+                f"Verification budget exceeded: ${budget.spent_usd:.4f}, "
+                f"cancelled {budget.cancelled} pending replays", "warning"
+            )
+        
+        # Evaluate new results, then merge with those carried forward. Carried
+        # results may come from another user with the same model and
+        # conversations, so the cost delta is always this user's own.
+        # Budget-truncated results count for this iteration only: they stay
+        # out of verified, so a later iteration verifies those candidates again.
+        partial = {}
+        for result in self._evaluate_results(verification_results, current_model):
+            if result["model_id"] in partial_ids:
+                partial[result["model_id"]] = dict(result, partial=True)
+            else:
+                verified[result["model_id"]] = result
+        evaluated = [
+            dict(verified.get(c["model_id"]) or partial[c["model_id"]],
+                 candidate=c, cost_delta=c.get("estimated_cost_delta", {}))
+            for c in ranked_candidates if c["model_id"] in verified or c["model_id"] in partial
+        ]
         
         # Check if any candidate meets thresholds
         acceptable = [
@@ -428,10 +560,22 @@ class VerificationAgent(BaseAgent):
     
     def _verify_candidate(self, candidate: Dict, 
                          conversations: List[Dict],
-                         current_model: str) -> Dict:
-        """Run verification for a single candidate"""
+                         current_model: str,
+                         budget: Optional[VerificationBudget] = None,
+                         checkpoints: Optional[RunCheckpoints] = None) -> Dict:
+        """
+        Run verification for a single candidate.
+        Conversation replays run on the shared replay pool, at most
+        MIN_SAMPLE_SIZE at a time, and each completion is judged as it
+        arrives. A sequential test stops the candidate as soon as it clearly
+        passes or fails; replays still queued then, or when the budget runs
+        out, are cancelled.
+        """
         from models import PromptData
         
+        if budget is None:
+            budget = VerificationBudget(Thresholds.MAX_VERIFICATION_BUDGET_USD)
+        
         results = {
             "model_id": candidate["model_id"],
             "completions": [],
@@ -439,9 +583,19 @@ class VerificationAgent(BaseAgent):
             "format_failures": 0,
             "refusals": 0,
             "total_cost": 0.0,
-            "total_latency_ms": 0.0
+            "cached_cost": 0.0,  # Original cost of completions served from the replay cache
+            "total_latency_ms": 0.0,
+            "budget_exhausted": False
         }
         
+        test = SequentialQualityTest(
+            threshold=Thresholds.BASELINE_QUALITY_SCORE - Thresholds.MAX_QUALITY_DROP_PERCENT,
+            min_samples=Thresholds.MIN_SAMPLE_SIZE,
+            max_samples=Thresholds.MAX_VERIFICATION_SAMPLES,
+            alpha=Thresholds.SEQUENTIAL_TEST_ALPHA,
+            min_std=Thresholds.SEQUENTIAL_TEST_MIN_STD
+        )
+        
         model_config = {
             "name": candidate["display_name"],
             "model": candidate["portkey_slug"],
@@ -450,49 +604,143 @@ class VerificationAgent(BaseAgent):
             "max_tokens": 1024
         }
         
-        for i, conv in enumerate(conversations[:10]):  # Limit to 10 for cost
-            messages = conv.get("messages", [{"role": "user", "content": "Hello"}])
+        def replay(prompt: PromptData):
+            """Returns (completion, journaled judge score or None), or None if skipped"""
+            # Checked again here: the budget may have run out while this was queued
+            if budget.exhausted:
+                return None
             
-            prompt = PromptData(
+            saved = checkpoints.get(self._replay_step(candidate, prompt)) if checkpoints else None
+            if saved:
+                completion = CompletionResult(**saved["completion"])
+            else:
+                completion = self.replay_engine.replay_prompt_on_model(prompt, model_config)
+                if checkpoints and completion.success:
+                    checkpoints.put(self._replay_step(candidate, prompt),
+                                    {"completion": self._completion_to_dict(completion)})
+            
+            # Cache hits cost nothing now; their cost is only the candidate's price
+            budget.charge(0.0 if completion.cached else completion.cost)
+            return completion, (saved or {}).get("score")
+        
+        prompts = [
+            PromptData(
                 id=f"verify_{candidate['model_id']}_{i}",
-                messages=messages,
+                messages=conv.get("messages", [{"role": "user", "content": "Hello"}]),
                 original_model=current_model
             )
-            
-            try:
-                completion = self.replay_engine.replay_prompt_on_model(prompt, model_config)
-                
-                # Convert completion to dict for caching compatibility
-                completion_dict = {
-                    "model_name": completion.model_name,
-                    "provider": getattr(completion, 'provider', 'unknown'),
-                    "response": completion.response,
-                    "tokens_input": completion.tokens_input,
-                    "tokens_output": completion.tokens_output,
-                    "latency_ms": completion.latency_ms,
-                    "cost": completion.cost,
-                    "success": completion.success,
-                    "is_refusal": getattr(completion, 'is_refusal', False),
-                    "error": getattr(completion, 'error', None)
-                }
-                results["completions"].append(completion_dict)
-                results["total_cost"] += completion.cost
-                results["total_latency_ms"] += completion.latency_ms
+            for i, conv in enumerate(conversations[:Thresholds.MAX_VERIFICATION_SAMPLES])
+        ]
+        queue = list(reversed(prompts))
+        pending: Dict[Future, PromptData] = {}
+        
+        def top_up():
+            while queue and len(pending) < Thresholds.MIN_SAMPLE_SIZE \
+                    and not test.decided and not budget.exhausted:
+                prompt = queue.pop()
+                future = self._replay_pool.submit(replay, prompt)
+                budget.track(future)
+                pending[future] = prompt
+        
+        top_up()
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                prompt = pending.pop(future)
+                try:
+                    outcome = future.result()
+                except CancelledError:
+                    outcome = None
+                except Exception as e:
+                    self.log(f"Verification error: {e}", "error")
+                    results["format_failures"] += 1
+                    continue
                 
-                if getattr(completion, 'is_refusal', False):
-                    results["refusals"] += 1
+                if outcome is None:
+                    # Skipped or cancelled; only a loss if the test still needed it
+                    if not test.decided:
+                        results["budget_exhausted"] = True
+                    continue
                 
-                # Quick format check
-                if not completion.success:
-                    results["format_failures"] += 1
-                    
-            except Exception as e:
-                self.log(f"Verification error: {e}", "error")
-                results["format_failures"] += 1
+                completion, score = outcome
+                self._record_completion(results, completion)
+                if score is None:
+                    score = self._judge(prompt, completion)
+                    if checkpoints and completion.success and score is not None:
+                        checkpoints.put(self._replay_step(candidate, prompt), {
+                            "completion": self._completion_to_dict(completion),
+                            "score": score
+                        })
+                if score is not None:
+                    test.add(score)
+                    # The reported average covers judged answers only, as before the
+                    # sequential test: failures and refusals have their own rates
+                    if completion.success and not getattr(completion, 'is_refusal', False):
+                        results["quality_scores"].append(score)
+            
+            if test.decided:
+                for future in list(pending):
+                    if future.cancel():
+                        pending.pop(future)
+            top_up()
+        
+        if budget.exhausted and queue and not test.decided:
+            results["budget_exhausted"] = True
         
+        results["sequential_test"] = test.summary()
+        results["samples_skipped"] = len(prompts) - len(results["completions"])
         results["verification_cost"] = results["total_cost"]
         return results
     
+    def _replay_step(self, candidate: Dict, prompt) -> str:
+        """Journal step name for one candidate/conversation replay"""
+        digest = hashlib.sha256(json.dumps(prompt.messages, sort_keys=True).encode()).hexdigest()[:16]
+        return f"replay:{candidate['model_id']}:{digest}"
+    
+    def _completion_to_dict(self, completion) -> Dict:
+        # Convert completion to dict for caching compatibility
+        return {
+            "model_name": completion.model_name,
+            "provider": getattr(completion, 'provider', 'unknown'),
+            "response": completion.response,
+            "tokens_input": completion.tokens_input,
+            "tokens_output": completion.tokens_output,
+            "latency_ms": completion.latency_ms,
+            "cost": completion.cost,
+            "success": completion.success,
+            "is_refusal": getattr(completion, 'is_refusal', False),
+            "error": getattr(completion, 'error', None)
+        }
+    
+    def _record_completion(self, results: Dict, completion) -> None:
+        """Append a completion to a candidate's verification results"""
+        results["completions"].append(self._completion_to_dict(completion))
+        if getattr(completion, 'cached', False):
+            results["cached_cost"] += completion.cost
+        else:
+            results["total_cost"] += completion.cost
+        results["total_latency_ms"] += completion.latency_ms
+        
+        if getattr(completion, 'is_refusal', False):
+            results["refusals"] += 1
+        
+        # Quick format check
+        if not completion.success:
+            results["format_failures"] += 1
+    
+    def _judge(self, prompt, completion) -> Optional[float]:
+        """
+        Score one completion for the sequential test.
+        Failures and refusals count as zero quality; judge errors are skipped.
+        """
+        if not completion.success or getattr(completion, 'is_refusal', False):
+            return 0.0
+        try:
+            return self.quality_evaluator.evaluate(prompt, completion).overall_score
+        except Exception as e:
+            self.log(f"Evaluation error: {e}", "warning")
+            return None
+    
     def _evaluate_results(self, results: List[Dict], current_model: str) -> List[Dict]:
         """Run multi-stage evaluation on verification results"""
         from models import PromptData
@@ -549,8 +797,11 @@ class VerificationAgent(BaseAgent):
                 avg_length = 0
             
             # Stage C: LLM Judge (only for survivors)
-            quality_scores = []
-            for completion in completions:
+            # Completions judged during verification carry their sequential
+            # test, which also supplies the confidence.
+            sequential = result.get("sequential_test")
+            quality_scores = list(result.get("quality_scores", [])) if sequential else []
+            for completion in ([] if sequential else completions):
                 # Handle both object and dict completions
                 is_success = completion.success if hasattr(completion, 'success') else completion.get('success', False)
                 is_refusal = completion.is_refusal if hasattr(completion, 'is_refusal') else completion.get('is_refusal', False)
@@ -572,15 +823,24 @@ class VerificationAgent(BaseAgent):
             
             avg_quality = sum(quality_scores) / max(len(quality_scores), 1) if quality_scores else 85.0
             
-            # Calculate deltas
-            # Assume current model has quality score of 90 (baseline)
-            baseline_quality = 90.0
-            quality_delta = avg_quality - baseline_quality
+            # Calculate deltas against the assumed current-model baseline
+            quality_delta = avg_quality - Thresholds.BASELINE_QUALITY_SCORE
             
             result["quality_score"] = avg_quality
             result["quality_delta"] = quality_delta
             result["cost_delta"] = candidate.get("estimated_cost_delta", {})
-            result["confidence"] = min(0.95, len(quality_scores) / 10) if quality_scores else 0.7
+            if sequential and sequential["samples"]:
+                result["confidence"] = sequential["confidence"]
+                result["sequential_decision"] = sequential["decision"]
+            elif len(quality_scores) > 1:
+                # Share of bootstrap resamples whose mean clears the quality bar
+                bar = Thresholds.BASELINE_QUALITY_SCORE - Thresholds.MAX_QUALITY_DROP_PERCENT
+                quality_ci = bootstrap_engine.mean_ci(quality_scores, threshold=bar)
+                result["quality_ci"] = quality_ci
+                result["confidence"] = min(0.95, quality_ci["probability_above"])
+            else:
+                # One score says nothing about spread
+                result["confidence"] = min(0.95, len(quality_scores) / 10) if quality_scores else 0.7
             result["format_failure_rate"] = format_failure_rate
             result["refusal_rate"] = refusal_rate
             result["avg_response_length"] = avg_length
@@ -590,7 +850,8 @@ class VerificationAgent(BaseAgent):
         
         return evaluated
     
-    def _generate_synthetic_tests(self, use_case: str) -> List[Dict]:
+    @staticmethod
+    def _generate_synthetic_tests(use_case: str) -> List[Dict]:
         """Generate synthetic test conversations for cold start"""
         templates = {
             "coding": [
@@ -621,46 +882,116 @@ class VerificationAgent(BaseAgent):
 # ============================================================================
 # MAIN ORCHESTRATOR
 # ============================================================================
+@dataclass
+class RunMemo:
+    """
+    Per-run memo shared by all retry iterations.
+    Layer 1 and Layer 2 run once; each iteration only selects a band from the
+    full ranking and verifies candidates it has not seen before.
+    """
+    discovery: Dict                      # Layer 1 output
+    ranking: List[Dict]                  # Every candidate scored by Layer 2, best fit first
+    verified: Dict[str, Dict] = field(default_factory=dict)  # model_id -> evaluated result
+    bands: List[List[str]] = field(default_factory=list)     # model_ids considered per iteration
+    newly_verified: List[List[str]] = field(default_factory=list)  # model_ids verified per iteration
+
+
 class CostQualityOrchestrator:
     """
     Main orchestrator that coordinates all 3 layers
     """
     
-    def __init__(self, replay_engine, quality_evaluator):
+    def __init__(self, replay_engine, quality_evaluator,
+                 journal: Optional[RunJournal] = None):
         self.layer1 = CandidateDiscoveryAgent()
         self.layer2 = UseCaseFitAgent()
         self.layer3 = VerificationAgent(replay_engine, quality_evaluator)
         self.logger = logging.getLogger("orchestrator.main")
+        self.journal = journal if journal is not None else run_journal
+        self.last_run: Optional[RunMemo] = None
     
     def run_optimization(self, user_id: str, 
                         k_candidates: int = 6,
-                        n_top: int = 3) -> Dict:
+                        n_top: int = 3,
+                        run_id: Optional[str] = None,
+                        verified: Optional[Dict[str, Dict]] = None) -> Dict:
         """
-        Run the complete 3-layer optimization pipeline
+        Run the complete 3-layer optimization pipeline.
+        Progress is journaled under run_id (a new one unless resuming), so
+        the run can be picked up again with resume(run_id).
+        verified optionally seeds (and collects) candidate verification
+        results shared with other runs over the same model and conversations.
         """
+        if run_id is None:
+            run_id = self.journal.start_run(user_id, {"k_candidates": k_candidates, "n_top": n_top})
+        
+        try:
+            result = self._execute_run(user_id, k_candidates, n_top, self.journal.bind(run_id), verified)
+        except Exception as e:
+            self.journal.finish_run(run_id, RunStatus.FAILED, error=str(e))
+            raise
+        
+        result["run_id"] = run_id
+        status = RunStatus.FAILED if result["status"] == "error" else RunStatus.COMPLETED
+        self.journal.finish_run(run_id, status, result=result, error=result.get("error"))
+        return result
+    
+    def resume(self, run_id: str) -> Dict:
+        """Continue an interrupted or failed run, skipping journaled work"""
+        run = self.journal.get_run(run_id)
+        if run is None:
+            return self._error_response(f"Unknown run_id {run_id}")
+        if run["status"] == RunStatus.COMPLETED:
+            return run["result"]
+        
+        self.logger.info(f"Resuming run {run_id} for user {run['user_id']}")
+        self.journal.reopen_run(run_id)
+        return self.run_optimization(run["user_id"], run_id=run_id, **run["params"])
+    
+    def _execute_run(self, user_id: str, k_candidates: int, n_top: int,
+                     checkpoints: RunCheckpoints,
+                     verified: Optional[Dict[str, Dict]] = None) -> Dict:
         start_time = time.time()
-        self.logger.info(f"Starting optimization for user {user_id}")
+        self.logger.info(f"Starting optimization for user {user_id} (run {checkpoints.run_id})")
         
         # LAYER 1: Candidate Discovery
         self.logger.info("=== LAYER 1: Candidate Discovery ===")
-        discovery_result = self.layer1.execute(user_id, k_candidates)
-        
-        if not discovery_result.success:
-            return self._error_response(f"Layer 1 failed: {discovery_result.error}")
+        discovery = checkpoints.get("layer1")
+        if discovery is None:
+            discovery_result = self.layer1.execute(user_id, k_candidates)
+            
+            if not discovery_result.success:
+                return self._error_response(f"Layer 1 failed: {discovery_result.error}")
+            
+            discovery = discovery_result.data
+            checkpoints.put("layer1", discovery)
         
-        if not discovery_result.data["candidates"]:
+        if not discovery["candidates"]:
             return self._no_recommendation_response(
                 "No cheaper candidates available",
-                discovery_result.data["user"],
-                discovery_result.data["current_model"]
+                discovery["user"],
+                discovery["current_model"]
             )
         
-        # LAYER 2: Use-Case Fit Ranking
+        # LAYER 2: Use-Case Fit Ranking (scores every candidate once for all iterations)
         self.logger.info("=== LAYER 2: Use-Case Fit Ranking ===")
-        ranking_result = self.layer2.execute(discovery_result.data, n_top)
+        full_ranking = checkpoints.get("layer2")
+        if full_ranking is None:
+            ranking_result = self.layer2.execute(discovery, n_top=len(discovery["candidates"]))
+            
+            if not ranking_result.success:
+                return self._error_response(f"Layer 2 failed: {ranking_result.error}")
+            
+            full_ranking = ranking_result.data
+            checkpoints.put("layer2", full_ranking)
         
-        if not ranking_result.success:
-            return self._error_response(f"Layer 2 failed: {ranking_result.error}")
+        memo = RunMemo(discovery=discovery, ranking=full_ranking["top_candidates"])
+        if verified is not None:
+            memo.verified = verified
+        for step, result in checkpoints.items("verified:").items():
+            memo.verified[step[len("verified:"):]] = result
+        self.last_run = memo
+        ranking = dict(full_ranking, top_candidates=memo.ranking[:n_top])
         
         # LAYER 3: Verification & Evaluation (with retry loop)
         self.logger.info("=== LAYER 3: Verification & Evaluation ===")
@@ -669,14 +1000,24 @@ class CostQualityOrchestrator:
         verification_result = None
         
         while iteration <= Thresholds.MAX_ITERATION_LOOPS:
+            band = [c["model_id"] for c in ranking["top_candidates"]]
+            memo.bands.append(band)
+            memo.newly_verified.append([m for m in band if m not in memo.verified])
+            
             verification_result = self.layer3.execute(
-                ranking_result.data,
-                iteration=iteration
+                ranking,
+                iteration=iteration,
+                verified=memo.verified,
+                checkpoints=checkpoints
             )
             
             if not verification_result.success:
                 return self._error_response(f"Layer 3 failed: {verification_result.error}")
             
+            for model_id in memo.newly_verified[-1]:
+                if model_id in memo.verified:
+                    checkpoints.put(f"verified:{model_id}", memo.verified[model_id])
+            
             if verification_result.data["acceptable_candidates"]:
                 self.logger.info(f"Found acceptable candidate at iteration {iteration}")
                 break
@@ -686,7 +1027,7 @@ class CostQualityOrchestrator:
             
             # Adjust to stronger candidate band
             self.logger.info(f"Quality too low, retrying with stronger candidates (iteration {iteration + 1})")
-            ranking_result = self._adjust_to_stronger_band(ranking_result, iteration + 1)
+            ranking = self._adjust_to_stronger_band(memo, iteration + 1, n_top)
             iteration += 1
         
         # Generate final recommendation
@@ -697,25 +1038,26 @@ class CostQualityOrchestrator:
             iteration
         )
     
-    def _adjust_to_stronger_band(self, ranking_result: Dict, iteration: int) -> AgentResult:
-        """Adjust candidate selection to include stronger (more expensive) models"""
-        # Re-run layer 1 with adjusted rank range
-        user_id = ranking_result.data["user"]["user_id"]
-        
-        # Include slightly more expensive models
-        discovery_result = self.layer1.execute(user_id, k_candidates=6)
-        
-        # Filter to include models closer to current rank
-        current_rank = discovery_result.data["current_rank"]
-        candidates = discovery_result.data["candidates"]
+    def _adjust_to_stronger_band(self, memo: RunMemo, iteration: int, n_top: int = 3) -> Dict:
+        """
+        Adjust candidate selection to include stronger (more expensive) models.
+        Works from the memoized Layer 1/2 results rather than re-running them.
+        """
+        current_rank = memo.discovery["current_rank"]
         
         # Shift the selection window toward more expensive models
         max_rank_delta = max(1, 6 - iteration)  # Shrink range with each iteration
-        filtered = [c for c in candidates if c["rank"] - current_rank <= max_rank_delta]
-        
-        discovery_result.data["candidates"] = filtered or candidates[:3]
+        band = [c for c in memo.ranking if c["rank"] - current_rank <= max_rank_delta]
+        if not band:
+            band = sorted(memo.ranking, key=lambda c: c["rank"])[:3]
+            band.sort(key=lambda c: c["fit_score"], reverse=True)
         
-        return self.layer2.execute(discovery_result.data, n_top=3)
+        return {
+            "user": memo.discovery["user"],
+            "current_model": memo.discovery["current_model"],
+            "top_candidates": band[:n_top],
+            "use_case": memo.discovery["user"]["use_case"]
+        }
     
     def _generate_recommendation(self, verification_data: Dict, 
                                 total_time: float,
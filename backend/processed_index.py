@@ -0,0 +1,94 @@
+"""
+Processed Prompt Index - Exact, set-based dedup for continuous monitoring
+
+ReplayState used to carry every processed prompt id in a list that was
+scanned per prompt and rewritten to replay_state.json on every save. The ids
+now live in a SQLite table keyed by prompt_id: membership checks are index
+lookups, a whole batch is checked in a few IN queries, and the state file
+only keeps counters and the high-water-mark timestamp.
+"""
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional, Set, Tuple
+
+from config import PROCESSED_INDEX_FILE
+
+# SQLite's default host parameter limit is 999
+_CHUNK_SIZE = 500
+
+
+class ProcessedPromptIndex:
+    """Set of processed prompt ids with their source timestamps"""
+
+    def __init__(self, path: str = PROCESSED_INDEX_FILE):
+        self.path = Path(path)
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_prompts (
+                prompt_id TEXT PRIMARY KEY,
+                prompt_timestamp TEXT,
+                processed_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+        conn.close()
+
+    def __contains__(self, prompt_id: str) -> bool:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT 1 FROM processed_prompts WHERE prompt_id = ?", (prompt_id,)
+        ).fetchone()
+        conn.close()
+        return row is not None
+
+    def find_processed(self, prompt_ids: Iterable[str]) -> Set[str]:
+        """The subset of prompt_ids already processed"""
+        ids = list(dict.fromkeys(prompt_ids))
+        found = set()
+        conn = self._connect()
+        for i in range(0, len(ids), _CHUNK_SIZE):
+            chunk = ids[i:i + _CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT prompt_id FROM processed_prompts WHERE prompt_id IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(row[0] for row in rows)
+        conn.close()
+        return found
+
+    def add_many(self, entries: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """Record (prompt_id, prompt_timestamp) pairs; returns how many were new"""
+        now = datetime.utcnow().isoformat()
+        conn = self._connect()
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO processed_prompts (prompt_id, prompt_timestamp, processed_at) VALUES (?, ?, ?)",
+            [(prompt_id, timestamp, now) for prompt_id, timestamp in entries]
+        )
+        added = conn.total_changes - before
+        conn.commit()
+        conn.close()
+        return added
+
+    def add(self, prompt_id: str, prompt_timestamp: Optional[str] = None) -> bool:
+        return self.add_many([(prompt_id, prompt_timestamp)]) == 1
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM processed_prompts").fetchone()[0]
+        conn.close()
+        return count
+
+    def high_water_mark(self) -> Optional[str]:
+        """Latest source timestamp among processed prompts"""
+        conn = self._connect()
+        row = conn.execute("SELECT MAX(prompt_timestamp) FROM processed_prompts").fetchone()
+        conn.close()
+        return row[0]
@@ -3,12 +3,14 @@ Historical Replay Engine - Replays prompts across multiple models
 """
 import time
 import logging
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Any
 from portkey_ai import Portkey
 from models import PromptData, CompletionResult
+from cache_manager import ConversationCache, conversation_cache
 from config import (
     PORTKEY_API_KEY, MAX_RETRIES, RETRY_DELAY, TIMEOUT,
-    MODELS_TO_TEST
+    MODELS_TO_TEST, REPLAY_CACHE_POLICY, REPLAY_CACHE_DETERMINISTIC_TEMPERATURE, REPLAY_TEMPERATURE
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -18,9 +20,25 @@ logger = logging.getLogger(__name__)
 class ReplayEngine:
     """Replays historical prompts across multiple models with Portkey"""
     
-    def __init__(self, api_key: str = PORTKEY_API_KEY):
+    CACHE_POLICIES = ("off", "read_through", "deterministic")
+    
+    def __init__(self, api_key: str = PORTKEY_API_KEY,
+                 cache_policy: str = REPLAY_CACHE_POLICY,
+                 cache: Optional[ConversationCache] = None):
+        if cache_policy not in self.CACHE_POLICIES:
+            raise ValueError(f"Unknown replay cache policy: {cache_policy}")
+        
         self.api_key = api_key
         self.models = MODELS_TO_TEST
+        self.cache_policy = cache_policy
+        self.cache = cache or conversation_cache
+        
+        self._stats_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_writes = 0
+        self.cost_saved_usd = 0.0
+        self.latency_saved_ms = 0.0
         
     def _create_client(self, model: str) -> Portkey:
         """Create a Portkey client"""
@@ -53,6 +71,29 @@ class ReplayEngine:
         response_lower = response.lower()
         return any(pattern.lower() in response_lower for pattern in refusal_patterns)
     
+    def _generation_params(self, model_config: Dict) -> Dict[str, Any]:
+        """
+        Parameters sent with the call; together with the slug they key the cache.
+        Configs without a temperature replay at REPLAY_TEMPERATURE, so under the
+        "deterministic" policy they are cacheable.
+        """
+        params = {"max_tokens": model_config.get("max_tokens", 1000)}
+        for name in ("temperature", "top_p"):
+            if model_config.get(name) is not None:
+                params[name] = model_config[name]
+        if "temperature" not in params and REPLAY_TEMPERATURE is not None:
+            params["temperature"] = REPLAY_TEMPERATURE
+        return params
+    
+    def _is_cacheable(self, generation_params: Dict[str, Any]) -> bool:
+        """Apply the cache policy to one call"""
+        if self.cache_policy == "off":
+            return False
+        if self.cache_policy == "deterministic":
+            temperature = generation_params.get("temperature")
+            return temperature is not None and temperature <= REPLAY_CACHE_DETERMINISTIC_TEMPERATURE
+        return True
+    
     def replay_prompt_on_model(
         self, 
         prompt: PromptData, 
@@ -60,8 +101,48 @@ class ReplayEngine:
         retry_count: int = 0
     ) -> CompletionResult:
         """
-        Replay a single prompt on a specific model with retry logic
+        Replay a single prompt on a specific model with retry logic.
+        Identical (conversation, model, generation params) calls are served
+        from the conversation cache when the cache policy allows it.
         """
+        generation_params = self._generation_params(model_config)
+        if retry_count > 0 or not self._is_cacheable(generation_params):
+            return self._call_model(prompt, model_config, generation_params, retry_count)
+        
+        conversation_hash = self.cache.hash_conversation(prompt.messages)
+        model_key = self.cache.model_key(model_config["model"], **generation_params)
+        
+        cached = self.cache.get_cached_output(conversation_hash, model_key)
+        if cached:
+            result = CompletionResult(**dict(cached["output"], cached=True))
+            with self._stats_lock:
+                self.cache_hits += 1
+                self.cost_saved_usd += result.cost
+                self.latency_saved_ms += result.latency_ms
+            logger.info(f"✓ {model_config['name']}: cache hit (saved ${result.cost:.6f})")
+            return result
+        
+        with self._stats_lock:
+            self.cache_misses += 1
+        
+        result = self._call_model(prompt, model_config, generation_params)
+        if result.success:
+            self.cache.cache_output(
+                conversation_hash, model_key, result.to_dict(),
+                None, result.cost, result.latency_ms
+            )
+            with self._stats_lock:
+                self.cache_writes += 1
+        return result
+    
+    def _call_model(
+        self,
+        prompt: PromptData,
+        model_config: Dict,
+        generation_params: Dict[str, Any],
+        retry_count: int = 0
+    ) -> CompletionResult:
+        """Call the model through Portkey, retrying on failure"""
         try:
             client = self._create_client(model_config["model"])
             
@@ -70,8 +151,8 @@ class ReplayEngine:
             response = client.chat.completions.create(
                 model=model_config["model"],  # e.g., @openai/gpt-4o-mini
                 messages=prompt.messages,
-                max_tokens=model_config.get("max_tokens", 1000),
-                timeout=TIMEOUT
+                timeout=TIMEOUT,
+                **generation_params
             )
             
             latency_ms = (time.time() - start_time) * 1000
@@ -110,7 +191,7 @@ class ReplayEngine:
             if retry_count < MAX_RETRIES:
                 logger.info(f"Retrying {model_config['name']} (attempt {retry_count + 1}/{MAX_RETRIES})")
                 time.sleep(RETRY_DELAY)
-                return self.replay_prompt_on_model(prompt, model_config, retry_count + 1)
+                return self._call_model(prompt, model_config, generation_params, retry_count + 1)
             
             return CompletionResult(
                 model_name=model_config["name"],
@@ -124,6 +205,20 @@ class ReplayEngine:
                 error=str(e)
             )
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Replay cache counters, including dollars and milliseconds not spent"""
+        with self._stats_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "policy": self.cache_policy,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "writes": self.cache_writes,
+                "hit_rate": self.cache_hits / lookups * 100 if lookups else 0,
+                "cost_saved_usd": self.cost_saved_usd,
+                "latency_saved_ms": self.latency_saved_ms
+            }
+    
     def replay_prompt_across_models(self, prompt: PromptData) -> List[CompletionResult]:
         """
         Replay a prompt across all configured models
@@ -0,0 +1,375 @@
+"""
+Replay Sampler - Budgeted, stratified sampling in front of continuous replay
+
+Replaying every logged prompt on every model does not scale with traffic.
+The sampler picks which prompts of a batch get replayed:
+
+1. Near-duplicates are skipped: a prompt whose embedding is within
+   SAMPLER_DUPLICATE_SIMILARITY of a recently seen prompt adds little.
+   Without sentence-transformers, only normalized exact repeats are skipped.
+2. Prompts are stratified by use case, current model, user and length
+   bucket, and each stratum keeps a reservoir (Algorithm R) over the batch.
+   Every stratum gets one slot before the rest is shared proportionally,
+   so rare strata are still represented.
+3. The number of slots follows a daily dollar budget. Spend is paced over
+   the UTC day, and the per-prompt replay cost is a running average of
+   what replays actually cost.
+
+Because each stratum is sampled at its own rate, sampling_error() weights
+strata by their traffic share and reports the standard error of the
+per-model quality and cost estimates that recommendations are built on.
+
+Memory stays bounded on an endless stream: a sampled prompt's stratum is
+forgotten once observe() has folded in its evaluations (or after
+SAMPLER_MAX_PENDING newer samples), and beyond SAMPLER_MAX_STRATA the
+least recently seen strata are dropped along with their estimates.
+"""
+import hashlib
+import logging
+import math
+import random
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    MODELS_TO_TEST, REPLAY_DAILY_BUDGET_USD, SAMPLER_BURST_FRACTION,
+    SAMPLER_DUPLICATE_SIMILARITY, SAMPLER_DUPLICATE_WINDOW, SAMPLER_MAX_PENDING, SAMPLER_MAX_STRATA
+)
+from models import ModelEvaluation, PromptData
+from routing_table import RoutingTable
+from running_stats import RunningStats
+from use_case_classifier import use_case_classifier
+
+logger = logging.getLogger(__name__)
+
+Stratum = Tuple[str, str, str, str]  # (use_case, current model, user, length bucket)
+Observed = Dict[str, Dict[Stratum, Tuple[RunningStats, RunningStats]]]  # model -> stratum -> (quality, cost)
+
+# Token counts assumed for a prompt before any replay cost has been observed
+_ASSUMED_TOKENS_INPUT = 500
+_ASSUMED_TOKENS_OUTPUT = 300
+
+
+def _default_replay_cost() -> float:
+    """Cost of replaying one typical prompt on every model in MODELS_TO_TEST"""
+    return sum(
+        _ASSUMED_TOKENS_INPUT / 1000 * m["expected_cost_per_1k_input"] +
+        _ASSUMED_TOKENS_OUTPUT / 1000 * m["expected_cost_per_1k_output"]
+        for m in MODELS_TO_TEST
+    )
+
+
+@dataclass
+class StratumStats:
+    seen: int = 0  # Unique prompts in this stratum since the sampler started
+    sampled: int = 0
+    last_batch: int = 0  # Most recent sample() call that saw this stratum
+
+
+class ReplaySampler:
+    """Chooses which new prompts are worth a full replay"""
+
+    def __init__(self, daily_budget_usd: float = REPLAY_DAILY_BUDGET_USD,
+                 duplicate_similarity: float = SAMPLER_DUPLICATE_SIMILARITY,
+                 duplicate_window: int = SAMPLER_DUPLICATE_WINDOW,
+                 burst_fraction: float = SAMPLER_BURST_FRACTION,
+                 max_strata: int = SAMPLER_MAX_STRATA, max_pending: int = SAMPLER_MAX_PENDING,
+                 embedder=None, rng: Optional[random.Random] = None,
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        self.daily_budget_usd = daily_budget_usd
+        self.duplicate_similarity = duplicate_similarity
+        self.burst_fraction = burst_fraction
+        self.max_strata = max_strata
+        self.max_pending = max_pending
+        self.rng = rng or random.Random()
+        self.clock = clock
+
+        self._vector_engine = embedder
+        self._vector_engine_failed = False
+        self._recent_vectors: deque = deque(maxlen=duplicate_window)
+        self._recent_key_order: deque = deque()  # Eviction order for _recent_keys
+        self._recent_keys = set()
+        self._duplicate_window = duplicate_window
+
+        self.replay_cost_estimate = _default_replay_cost()
+        self._day = self.clock().date()
+        self.spent_today = 0.0
+        self._spend_lock = threading.Lock()  # Replays report costs from worker threads
+
+        self.strata: Dict[Stratum, StratumStats] = {}
+        self.assignments: Dict[str, Stratum] = {}  # prompt_id -> stratum, for sampled prompts not yet observed
+        self._observed: Observed = {}  # Running stats of sampled prompts' evaluations
+        self._observe_lock = threading.Lock()
+        self.seen = 0
+        self.batches = 0
+        self.duplicates_skipped = 0
+        self.sampled = 0
+
+    def _embedder(self):
+        if self._vector_engine is None and not self._vector_engine_failed:
+            try:
+                from vector_engine import VectorEngine
+                self._vector_engine = VectorEngine()
+            except Exception as e:  # sentence-transformers not installed or model unavailable
+                logger.warning(f"Sampling without embedding dedup: {e}")
+                self._vector_engine_failed = True
+        return self._vector_engine
+
+    @staticmethod
+    def _text(prompt: PromptData) -> str:
+        return prompt.messages[-1]["content"] if prompt.messages else ""
+
+    def stratum(self, prompt: PromptData) -> Stratum:
+        text = self._text(prompt)
+        use_case = prompt.metadata.get("use_case") or use_case_classifier.classify(text).category
+        user = str(prompt.metadata.get("user_id") or "anonymous")
+        return (use_case, prompt.original_model, user, RoutingTable.length_bucket(text))
+
+    # ========================================================================
+    # Near-duplicate filtering
+    # ========================================================================
+
+    def _remember(self, key: str):
+        self._recent_keys.add(key)
+        self._recent_key_order.append(key)
+        if len(self._recent_key_order) > self._duplicate_window:
+            self._recent_keys.discard(self._recent_key_order.popleft())
+
+    def _drop_duplicates(self, prompts: List[PromptData]) -> List[PromptData]:
+        """Skip prompts that repeat (or nearly repeat) a recently seen one"""
+        unique = []
+        texts = [self._text(p) for p in prompts]
+        keys = [hashlib.sha256(re.sub(r"\s+", " ", t.lower()).strip().encode()).hexdigest() for t in texts]
+
+        vectors = None
+        if self._embedder() is not None and prompts:
+            vectors = np.array(self._vector_engine.embed_batch(texts), dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+        recent = np.array(self._recent_vectors) if vectors is not None and self._recent_vectors else None
+        accepted = []  # Vectors kept earlier in this batch
+        for i, prompt in enumerate(prompts):
+            if keys[i] in self._recent_keys:
+                self.duplicates_skipped += 1
+                continue
+            if vectors is not None:
+                best = float(np.max(recent @ vectors[i])) if recent is not None else -1.0
+                if accepted:
+                    best = max(best, float(np.max(np.array(accepted) @ vectors[i])))
+                if best >= self.duplicate_similarity:
+                    self.duplicates_skipped += 1
+                    continue
+                accepted.append(vectors[i])
+                self._recent_vectors.append(vectors[i])
+            self._remember(keys[i])
+            unique.append(prompt)
+        return unique
+
+    # ========================================================================
+    # Budget
+    # ========================================================================
+
+    def _roll_day(self):
+        today = self.clock().date()
+        if today != self._day:
+            self._day = today
+            self.spent_today = 0.0
+
+    def allowance(self) -> float:
+        """Dollars the sampler may commit now, pacing the budget over the UTC day"""
+        self._roll_day()
+        now = self.clock()
+        elapsed = (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+        paced = self.daily_budget_usd * min(1.0, elapsed + self.burst_fraction)
+        return max(0.0, paced - self.spent_today)
+
+    def record_replay_cost(self, cost: float):
+        """Feed back what one sampled prompt actually cost to replay"""
+        with self._spend_lock:
+            self._roll_day()
+            self.spent_today += cost
+            self.replay_cost_estimate = 0.9 * self.replay_cost_estimate + 0.1 * cost
+
+    # ========================================================================
+    # Sampling
+    # ========================================================================
+
+    def _allocate(self, sizes: Dict[Stratum, int], slots: int) -> Dict[Stratum, int]:
+        """One slot per stratum (random order if short), then proportional shares"""
+        allocation = {h: 0 for h in sizes}
+        order = list(sizes)
+        self.rng.shuffle(order)
+        for h in order[:slots]:
+            allocation[h] = 1
+
+        remaining = slots - sum(allocation.values())
+        while remaining > 0:
+            room = [h for h in sizes if allocation[h] < sizes[h]]
+            if not room:
+                break
+            total = sum(sizes[h] for h in room)
+            for h in room:
+                allocation[h] += min(sizes[h] - allocation[h], math.floor(remaining * sizes[h] / total))
+            # Hand out what rounding left over, largest strata first
+            left = slots - sum(allocation.values())
+            for h in sorted(room, key=lambda h: -sizes[h]):
+                if left == 0:
+                    break
+                if allocation[h] < sizes[h]:
+                    allocation[h] += 1
+                    left -= 1
+            remaining = slots - sum(allocation.values())
+        return allocation
+
+    def sample(self, prompts: List[PromptData]) -> List[PromptData]:
+        """Prompts from the batch to replay, within today's paced budget"""
+        unique = self._drop_duplicates(prompts)
+        self.batches += 1
+
+        # Reservoir per stratum (Algorithm R); capacity is decided after the pass
+        streams: Dict[Stratum, List[PromptData]] = {}
+        for prompt in unique:
+            h = self.stratum(prompt)
+            streams.setdefault(h, []).append(prompt)
+            stats = self.strata.setdefault(h, StratumStats())
+            stats.seen += 1
+            stats.last_batch = self.batches
+        self.seen += len(prompts)
+
+        if self.replay_cost_estimate > 0:
+            slots = int(self.allowance() / self.replay_cost_estimate + 1e-9)  # Tolerate float rounding
+        else:
+            slots = len(unique)
+        allocation = self._allocate({h: len(s) for h, s in streams.items()}, min(slots, len(unique)))
+
+        selected = []
+        for h, stream in streams.items():
+            k = allocation[h]
+            reservoir: List[PromptData] = []
+            for i, prompt in enumerate(stream):
+                if i < k:
+                    reservoir.append(prompt)
+                else:
+                    j = self.rng.randint(0, i)
+                    if j < k:
+                        reservoir[j] = prompt
+            for prompt in reservoir:
+                self.assignments[prompt.id] = h
+            self.strata[h].sampled += len(reservoir)
+            selected.extend(reservoir)
+
+        self.sampled += len(selected)
+        self._forget()
+        logger.info(f"Sampled {len(selected)}/{len(prompts)} prompts "
+                    f"({len(prompts) - len(unique)} duplicates, {len(streams)} strata)")
+        order = {p.id: i for i, p in enumerate(prompts)}
+        return sorted(selected, key=lambda p: order[p.id])
+
+    def _forget(self):
+        """Drop the oldest pending assignments and least recently seen strata beyond their caps"""
+        with self._observe_lock:
+            for prompt_id in list(self.assignments)[:max(0, len(self.assignments) - self.max_pending)]:
+                del self.assignments[prompt_id]
+            if len(self.strata) <= self.max_strata:
+                return
+            stale = sorted(self.strata, key=lambda h: self.strata[h].last_batch)[:len(self.strata) - self.max_strata]
+            for h in stale:
+                del self.strata[h]
+                for strata in self._observed.values():
+                    strata.pop(h, None)
+            self._observed = {model: strata for model, strata in self._observed.items() if strata}
+
+    # ========================================================================
+    # Reporting
+    # ========================================================================
+
+    def _group(self, evaluations: Iterable[ModelEvaluation], into: Observed):
+        for evaluation in evaluations:
+            h = self.assignments.get(evaluation.prompt_id)
+            if h is None or h not in self.strata or not evaluation.completion.success:
+                continue
+            quality, cost = into.setdefault(evaluation.model_name, {}).setdefault(
+                h, (RunningStats(), RunningStats())
+            )
+            quality.add(evaluation.quality.overall_score)
+            cost.add(evaluation.completion.cost)
+
+    def observe(self, evaluations: Iterable[ModelEvaluation]):
+        """
+        Fold new evaluations of sampled prompts into the running estimates.
+        Pass all of a prompt's evaluations at once: its assignment is
+        forgotten afterwards.
+        """
+        evaluations = list(evaluations)
+        with self._observe_lock:
+            self._group(evaluations, self._observed)
+            for evaluation in evaluations:
+                self.assignments.pop(evaluation.prompt_id, None)
+
+    @staticmethod
+    def _estimate(stats: List[RunningStats], sizes: List[int], pooled: RunningStats) -> Dict[str, float]:
+        covered = sum(sizes)
+        estimate = variance = 0.0
+        for s, N_h in zip(stats, sizes):
+            n_h, N_h = s.count, max(N_h, s.count)
+            weight = N_h / covered
+            s2 = s.variance if n_h > 1 else pooled.variance
+            estimate += weight * s.mean
+            variance += weight ** 2 * (1 - n_h / N_h) * s2 / n_h
+        se = math.sqrt(variance)
+        return {"estimate": estimate, "se": se, "margin_95": 1.96 * se}
+
+    def sampling_error(self, evaluations: Optional[Iterable[ModelEvaluation]] = None) -> Dict[str, Dict]:
+        """
+        Stratified estimates (and standard errors) of each model's mean
+        quality and cost over all traffic, not just the sampled prompts.
+        Only evaluations of prompts this sampler selected are used: the ones
+        passed in (not yet observed), or by default everything observe()
+        has seen.
+        """
+        if evaluations is None:
+            with self._observe_lock:
+                observed = {model: dict(strata) for model, strata in self._observed.items()}
+        else:
+            observed = {}
+            self._group(evaluations, observed)
+
+        total_seen = sum(s.seen for s in self.strata.values())
+        report = {}
+        for model, strata in observed.items():
+            sizes = [self.strata[h].seen for h in strata]
+            quality = [q for q, _ in strata.values()]
+            cost = [c for _, c in strata.values()]
+            pooled_quality, pooled_cost = RunningStats(), RunningStats()
+            for q, c in zip(quality, cost):
+                pooled_quality, pooled_cost = pooled_quality.merge(q), pooled_cost.merge(c)
+
+            covered = sum(sizes)
+            report[model] = {
+                "quality": self._estimate(quality, sizes, pooled_quality),
+                "cost": self._estimate(cost, sizes, pooled_cost),
+                "samples": pooled_quality.count,
+                "strata": len(strata),
+                "traffic_coverage": covered / total_seen if total_seen else 0.0
+            }
+        return report
+
+    def get_stats(self) -> Dict:
+        return {
+            "seen": self.seen,
+            "sampled": self.sampled,
+            "sample_rate": self.sampled / self.seen if self.seen else 0.0,
+            "duplicates_skipped": self.duplicates_skipped,
+            "strata": len(self.strata),
+            "pending_assignments": len(self.assignments),
+            "daily_budget_usd": self.daily_budget_usd,
+            "spent_today_usd": round(self.spent_today, 6),
+            "replay_cost_estimate_usd": round(self.replay_cost_estimate, 6),
+            "embedding_dedup": self._vector_engine is not None
+        }
@@ -0,0 +1,365 @@
+"""
+Routing Table - Offline-learned model choice for auto mode
+
+Auto mode used to replay every prompt on every model and judge all outputs
+before answering. The routing table is built offline from that accumulated
+history (completions + quality_evaluations) and predicts the best model for
+a new prompt from three features:
+
+- use case (UseCaseClassifier category)
+- prompt-embedding cluster (k-means over VectorEngine embeddings; a single
+  cluster when sentence-transformers is unavailable)
+- prompt length bucket (estimated tokens, ROUTING_LENGTH_BUCKETS)
+
+Cells with too few samples fall back to coarser ones, down to a global
+ranking. /auto calls only the predicted model, except for a small share of
+exploration traffic (Thresholds.EXPLORATION_BUDGET_PERCENT) that still fans
+out to every model and keeps the history fresh.
+
+Usage:
+    python routing_table.py build
+    python routing_table.py show
+"""
+import logging
+import random
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from auto_mode import auto_selector
+from config import ROUTING_LENGTH_BUCKETS, ROUTING_EMBEDDING_CLUSTERS, ROUTING_MIN_SAMPLES
+from orchestrator import Thresholds
+from use_case_classifier import use_case_classifier
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+ANY = "*"
+CellKey = Tuple[str, str, str]  # (use_case, cluster, length_bucket)
+
+
+# Prompt ids that older handlers reused for every prompt; their rows cannot
+# be tied to the prompt text they answered
+LEGACY_SHARED_PROMPT_IDS = ("auto_mode_prompt", "web_test_prompt", "optimize_analysis")
+
+
+def load_judged_history() -> List[Dict]:
+    """
+    One row per (prompt, model) completion with its judge score, oldest first.
+    A pair with several completions (a failed routed call that the fan-out
+    re-ran) contributes its latest completion and latest judgement.
+    """
+    placeholders = ", ".join("?" for _ in LEGACY_SHARED_PROMPT_IDS)
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(f"""
+        WITH latest AS (
+            SELECT MAX(id) AS id FROM completions GROUP BY prompt_id, model_name
+        ), judged AS (
+            SELECT q.prompt_id, q.model_name, q.overall_score
+            FROM quality_evaluations q
+            JOIN (SELECT MAX(id) AS id FROM quality_evaluations GROUP BY prompt_id, model_name) m ON m.id = q.id
+        )
+        SELECT c.prompt_id, p.content, c.model_name, c.cost, c.latency_ms, c.success, c.is_refusal,
+               j.overall_score AS quality
+        FROM latest l
+        JOIN completions c ON c.id = l.id
+        JOIN prompts p ON p.prompt_id = c.prompt_id
+        LEFT JOIN judged j ON j.prompt_id = c.prompt_id AND j.model_name = c.model_name
+        WHERE c.prompt_id NOT IN ({placeholders})
+        ORDER BY c.id
+    """, LEGACY_SHARED_PROMPT_IDS).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+@dataclass
+class RoutingDecision:
+    """Which model to call for a prompt, or that the prompt should fan out"""
+    model_name: Optional[str]  # None: replay on every model
+    explore: bool
+    key: CellKey
+    level: str  # "exact", "use_case+cluster", "use_case", "global" or "none"
+    candidates: List[Dict] = field(default_factory=list)  # Ranked cell stats
+
+    @property
+    def expected(self) -> Optional[Dict]:
+        return self.candidates[0] if self.candidates else None
+
+
+class RoutingTable:
+    """Per-cell model rankings learned from judged replay history"""
+
+    def __init__(self, exploration_percent: float = Thresholds.EXPLORATION_BUDGET_PERCENT,
+                 rng: Optional[random.Random] = None):
+        self.exploration_percent = exploration_percent
+        self.rng = rng or random.Random()
+        self._routes: Dict[CellKey, List[Dict]] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._vector_engine = None
+        self._vector_engine_failed = False
+        self._init_db()
+        self.load()
+
+    def _init_db(self):
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS routing_table (
+                use_case TEXT NOT NULL,
+                cluster TEXT NOT NULL,
+                length_bucket TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                samples INTEGER NOT NULL,
+                avg_quality REAL,
+                avg_cost REAL,
+                avg_latency_ms REAL,
+                success_rate REAL,
+                score REAL,
+                built_at TEXT NOT NULL,
+                PRIMARY KEY (use_case, cluster, length_bucket, model_name)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS routing_centroids (
+                cluster_id INTEGER PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        """)
+
+        conn.commit()
+        conn.close()
+
+    # ========================================================================
+    # Features
+    # ========================================================================
+
+    @staticmethod
+    def length_bucket(prompt: str) -> str:
+        tokens = len(prompt) / 4  # Rough chars-per-token estimate
+        for i, edge in enumerate(ROUTING_LENGTH_BUCKETS):
+            if tokens < edge:
+                return f"b{i}"
+        return f"b{len(ROUTING_LENGTH_BUCKETS)}"
+
+    def _embedder(self):
+        if self._vector_engine is None and not self._vector_engine_failed:
+            try:
+                from vector_engine import VectorEngine
+                self._vector_engine = VectorEngine()
+            except Exception as e:  # sentence-transformers not installed or model unavailable
+                logger.warning(f"Routing without embedding clusters: {e}")
+                self._vector_engine_failed = True
+        return self._vector_engine
+
+    def cluster(self, prompt: str) -> str:
+        if self._centroids is None or not len(self._centroids) or self._embedder() is None:
+            return "0"
+        vector = self._vector_engine.embed_text(prompt)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        return str(int(np.argmax(self._centroids @ vector)))
+
+    def features(self, prompt: str) -> CellKey:
+        return (
+            use_case_classifier.classify(prompt).category,
+            self.cluster(prompt),
+            self.length_bucket(prompt)
+        )
+
+    # ========================================================================
+    # Routing
+    # ========================================================================
+
+    def route(self, prompt: str) -> RoutingDecision:
+        """Pick the model for a prompt; explore (fan out) on a share of traffic"""
+        key = self.features(prompt)
+        if self.rng.random() * 100 < self.exploration_percent:
+            return RoutingDecision(None, True, key, "none", self.lookup(key)[1])
+
+        level, candidates = self.lookup(key)
+        if not candidates:
+            return RoutingDecision(None, False, key, "none")
+        return RoutingDecision(candidates[0]["model_name"], False, key, level, candidates)
+
+    def lookup(self, key: CellKey) -> Tuple[str, List[Dict]]:
+        """Most specific cell with a trusted model, falling back to coarser ones"""
+        use_case, cluster, bucket = key
+        for level, cell in (
+            ("exact", (use_case, cluster, bucket)),
+            ("use_case+cluster", (use_case, cluster, ANY)),
+            ("use_case", (use_case, ANY, ANY)),
+        ):
+            candidates = [c for c in self._routes.get(cell, []) if c["samples"] >= ROUTING_MIN_SAMPLES]
+            if candidates:
+                return level, candidates
+        # The global ranking is used with whatever data exists
+        candidates = self._routes.get((ANY, ANY, ANY), [])
+        return ("global", candidates) if candidates else ("none", [])
+
+    # ========================================================================
+    # Build / persistence
+    # ========================================================================
+
+    def _fit_clusters(self, prompts: List[str]) -> Dict[str, str]:
+        """k-means over prompt embeddings; returns prompt -> cluster id"""
+        self._centroids = None
+        if self._embedder() is None or not prompts:
+            return {p: "0" for p in prompts}
+
+        vectors = np.array(self._vector_engine.embed_batch(prompts))
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+        k = min(ROUTING_EMBEDDING_CLUSTERS, len(prompts))
+        centroids = vectors[np.random.default_rng(0).choice(len(prompts), k, replace=False)]
+
+        for _ in range(20):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for i in range(k):
+                members = vectors[assignment == i]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[i] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self._centroids = centroids
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        return {p: str(int(a)) for p, a in zip(prompts, assignment)}
+
+    def build(self) -> Dict:
+        """Rebuild the table from history and persist it"""
+        history = load_judged_history()
+        prompts = sorted({row["content"] for row in history})
+        clusters = self._fit_clusters(prompts)
+        prompt_keys = {
+            p: (use_case_classifier.classify(p).category, clusters[p], self.length_bucket(p))
+            for p in prompts
+        }
+
+        # cell -> model -> running sums
+        cells: Dict[CellKey, Dict[str, Dict]] = {}
+        for row in history:
+            use_case, cluster, bucket = prompt_keys[row["content"]]
+            for cell in ((use_case, cluster, bucket), (use_case, cluster, ANY),
+                         (use_case, ANY, ANY), (ANY, ANY, ANY)):
+                stats = cells.setdefault(cell, {}).setdefault(row["model_name"], {
+                    "completions": 0, "successes": 0, "samples": 0,
+                    "quality": 0.0, "cost": 0.0, "latency_ms": 0.0
+                })
+                stats["completions"] += 1
+                ok = bool(row["success"]) and not row["is_refusal"]
+                stats["successes"] += ok
+                stats["cost"] += row["cost"] or 0.0
+                stats["latency_ms"] += row["latency_ms"] or 0.0
+                if ok and row["quality"] is not None:
+                    stats["samples"] += 1
+                    stats["quality"] += row["quality"]
+
+        routes: Dict[CellKey, List[Dict]] = {}
+        for cell, models in cells.items():
+            ranked = []
+            for model_name, s in models.items():
+                if not s["samples"]:
+                    continue
+                entry = {
+                    "model_name": model_name,
+                    "samples": s["samples"],
+                    "avg_quality": s["quality"] / s["samples"],
+                    "avg_cost": s["cost"] / s["completions"],
+                    "avg_latency_ms": s["latency_ms"] / s["completions"],
+                    "success_rate": s["successes"] / s["completions"]
+                }
+                entry["score"] = auto_selector.score_metrics(
+                    entry["avg_quality"], entry["avg_cost"], entry["avg_latency_ms"], entry["success_rate"]
+                )
+                ranked.append(entry)
+            if ranked:
+                routes[cell] = sorted(ranked, key=lambda e: e["score"], reverse=True)
+
+        self._routes = routes
+        self._save()
+        summary = {
+            "history_rows": len(history),
+            "prompts": len(prompts),
+            "clusters": 0 if self._centroids is None else len(self._centroids),
+            "cells": len(routes)
+        }
+        logger.info(f"Routing table built: {summary}")
+        return summary
+
+    def _save(self):
+        now = datetime.utcnow().isoformat()
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM routing_table")
+        cursor.execute("DELETE FROM routing_centroids")
+        cursor.executemany("""
+            INSERT INTO routing_table (use_case, cluster, length_bucket, model_name, samples,
+                                       avg_quality, avg_cost, avg_latency_ms, success_rate, score, built_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (*cell, e["model_name"], e["samples"], e["avg_quality"], e["avg_cost"],
+             e["avg_latency_ms"], e["success_rate"], e["score"], now)
+            for cell, entries in self._routes.items() for e in entries
+        ])
+        if self._centroids is not None:
+            cursor.executemany(
+                "INSERT INTO routing_centroids (cluster_id, vector) VALUES (?, ?)",
+                [(i, c.astype(np.float32).tobytes()) for i, c in enumerate(self._centroids)]
+            )
+        conn.commit()
+        conn.close()
+
+    def load(self):
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM routing_table ORDER BY score DESC").fetchall()
+        centroids = conn.execute("SELECT vector FROM routing_centroids ORDER BY cluster_id").fetchall()
+        conn.close()
+
+        routes: Dict[CellKey, List[Dict]] = {}
+        for row in rows:
+            routes.setdefault((row["use_case"], row["cluster"], row["length_bucket"]), []).append({
+                "model_name": row["model_name"],
+                "samples": row["samples"],
+                "avg_quality": row["avg_quality"],
+                "avg_cost": row["avg_cost"],
+                "avg_latency_ms": row["avg_latency_ms"],
+                "success_rate": row["success_rate"],
+                "score": row["score"]
+            })
+        self._routes = routes
+        self._centroids = (
+            np.array([np.frombuffer(c["vector"], dtype=np.float32) for c in centroids])
+            if centroids else None
+        )
+
+    def get_stats(self) -> Dict:
+        return {
+            "cells": len(self._routes),
+            "clusters": 0 if self._centroids is None else len(self._centroids),
+            "exploration_percent": self.exploration_percent,
+            "global_ranking": [e["model_name"] for e in self._routes.get((ANY, ANY, ANY), [])]
+        }
+
+
+# Global instance
+routing_table = RoutingTable()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command == "build":
+        print(json.dumps(routing_table.build(), indent=2))
+    else:
+        for cell, entries in sorted(routing_table._routes.items()):
+            best = entries[0]
+            print(f"{'/'.join(cell):<28} -> {best['model_name']:<24} "
+                  f"q={best['avg_quality']:.1f} ${best['avg_cost']:.6f} n={best['samples']}")
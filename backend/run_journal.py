@@ -0,0 +1,268 @@
+"""
+Orchestrator Run Journal - SQLite checkpoints for resumable optimization runs
+
+Every run gets a run_id. Each layer's output, every completed conversation
+replay and every finished candidate verification is checkpointed as it
+happens, so a run interrupted by a crash or timeout can be resumed without
+paying for the same model calls again.
+
+Usage:
+    python run_journal.py list [--status running]
+    python run_journal.py resume <run_id>
+    python run_journal.py gc [--days 7]
+"""
+import argparse
+import json
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+
+class RunStatus:
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class RunCheckpoints:
+    """Checkpoint access bound to a single run"""
+
+    def __init__(self, journal: "RunJournal", run_id: str):
+        self.journal = journal
+        self.run_id = run_id
+
+    def get(self, step: str) -> Optional[Any]:
+        return self.journal.load_checkpoint(self.run_id, step)
+
+    def put(self, step: str, payload: Any):
+        self.journal.checkpoint(self.run_id, step, payload)
+
+    def items(self, prefix: str) -> Dict[str, Any]:
+        return self.journal.load_checkpoints(self.run_id, prefix)
+
+
+class RunJournal:
+    """
+    Persists orchestrator runs and their checkpoints.
+    Steps are free-form names; the orchestrator uses "layer1", "layer2",
+    "replay:<model_id>:<conversation hash>" and "verified:<model_id>".
+    """
+
+    def __init__(self):
+        self._init_db()
+
+    def _init_db(self):
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS orchestrator_runs (
+                run_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                params_json TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result_json TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS run_checkpoints (
+                run_id TEXT NOT NULL,
+                step TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, step)
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_orchestrator_runs_status
+            ON orchestrator_runs(status, updated_at)
+        """)
+
+        conn.commit()
+        conn.close()
+
+    def start_run(self, user_id: str, params: Dict[str, Any]) -> str:
+        """Register a new run and return its run_id"""
+        run_id = uuid.uuid4().hex[:16]
+        now = datetime.utcnow().isoformat()
+
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("""
+            INSERT INTO orchestrator_runs (run_id, user_id, params_json, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (run_id, user_id, json.dumps(params), RunStatus.RUNNING, now, now))
+        conn.commit()
+        conn.close()
+        return run_id
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM orchestrator_runs WHERE run_id = ?", (run_id,)).fetchone()
+        conn.close()
+        return self._row_to_run(row) if row else None
+
+    def list_runs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently updated runs first, with their checkpoint counts"""
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        query = """
+            SELECT r.*, (SELECT COUNT(*) FROM run_checkpoints c WHERE c.run_id = r.run_id) AS checkpoints
+            FROM orchestrator_runs r
+        """
+        args: List[Any] = []
+        if status:
+            query += " WHERE r.status = ?"
+            args.append(status)
+        query += " ORDER BY r.updated_at DESC LIMIT ?"
+        args.append(limit)
+        rows = conn.execute(query, args).fetchall()
+        conn.close()
+        return [dict(self._row_to_run(row), checkpoints=row["checkpoints"]) for row in rows]
+
+    def _row_to_run(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "run_id": row["run_id"],
+            "user_id": row["user_id"],
+            "params": json.loads(row["params_json"]),
+            "status": row["status"],
+            "result": json.loads(row["result_json"]) if row["result_json"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def finish_run(self, run_id: str, status: str,
+                   result: Optional[Dict] = None, error: Optional[str] = None):
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("""
+            UPDATE orchestrator_runs
+            SET status = ?, result_json = ?, error = ?, updated_at = ?
+            WHERE run_id = ?
+        """, (
+            status,
+            json.dumps(result, default=str) if result is not None else None,
+            error,
+            datetime.utcnow().isoformat(),
+            run_id
+        ))
+        conn.commit()
+        conn.close()
+
+    def reopen_run(self, run_id: str):
+        """Mark an interrupted or failed run as running again"""
+        self.finish_run(run_id, RunStatus.RUNNING)
+
+    def checkpoint(self, run_id: str, step: str, payload: Any):
+        """Record (or overwrite) one step's output"""
+        now = datetime.utcnow().isoformat()
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("""
+            INSERT OR REPLACE INTO run_checkpoints (run_id, step, payload_json, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (run_id, step, json.dumps(payload, default=str), now))
+        conn.execute("UPDATE orchestrator_runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+        conn.commit()
+        conn.close()
+
+    def load_checkpoint(self, run_id: str, step: str) -> Optional[Any]:
+        conn = sqlite3.connect(DB_PATH)
+        row = conn.execute(
+            "SELECT payload_json FROM run_checkpoints WHERE run_id = ? AND step = ?",
+            (run_id, step)
+        ).fetchone()
+        conn.close()
+        return json.loads(row[0]) if row else None
+
+    def load_checkpoints(self, run_id: str, prefix: str) -> Dict[str, Any]:
+        """All checkpoints of a run whose step starts with prefix"""
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute("""
+            SELECT step, payload_json FROM run_checkpoints
+            WHERE run_id = ? AND step >= ? AND step < ?
+        """, (run_id, prefix, prefix + "\uffff")).fetchall()
+        conn.close()
+        return {step: json.loads(payload) for step, payload in rows}
+
+    def bind(self, run_id: str) -> RunCheckpoints:
+        return RunCheckpoints(self, run_id)
+
+    def garbage_collect(self, older_than_days: float = 7,
+                        statuses: tuple = (RunStatus.COMPLETED, RunStatus.FAILED)) -> int:
+        """Delete finished runs (and their checkpoints) not updated for older_than_days"""
+        cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+        placeholders = ",".join("?" * len(statuses))
+
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT run_id FROM orchestrator_runs
+            WHERE updated_at < ? AND status IN ({placeholders})
+        """, (cutoff, *statuses))
+        run_ids = [row[0] for row in cursor.fetchall()]
+
+        cursor.executemany("DELETE FROM run_checkpoints WHERE run_id = ?", [(r,) for r in run_ids])
+        cursor.executemany("DELETE FROM orchestrator_runs WHERE run_id = ?", [(r,) for r in run_ids])
+        conn.commit()
+        conn.close()
+        return len(run_ids)
+
+
+# Global instance
+run_journal = RunJournal()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Inspect and manage orchestrator runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_cmd = sub.add_parser("list", help="List recent runs")
+    list_cmd.add_argument("--status", choices=[RunStatus.RUNNING, RunStatus.COMPLETED, RunStatus.FAILED])
+    list_cmd.add_argument("--limit", type=int, default=20)
+
+    resume_cmd = sub.add_parser("resume", help="Resume an interrupted run")
+    resume_cmd.add_argument("run_id")
+
+    gc_cmd = sub.add_parser("gc", help="Delete old finished runs")
+    gc_cmd.add_argument("--days", type=float, default=7)
+    gc_cmd.add_argument("--include-running", action="store_true",
+                        help="Also delete runs stuck in 'running' (abandoned)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        runs = run_journal.list_runs(status=args.status, limit=args.limit)
+        if not runs:
+            print("No runs recorded")
+        for run in runs:
+            print(f"{run['run_id']}  {run['status']:<10} user={run['user_id']:<16} "
+                  f"checkpoints={run['checkpoints']:<4} updated={run['updated_at']}")
+
+    elif args.command == "resume":
+        from replay_engine import ReplayEngine
+        from quality_evaluator import QualityEvaluator
+        from orchestrator import CostQualityOrchestrator
+
+        orchestrator = CostQualityOrchestrator(ReplayEngine(), QualityEvaluator(), journal=run_journal)
+        result = orchestrator.resume(args.run_id)
+        print(json.dumps(result, indent=2, default=str))
+
+    elif args.command == "gc":
+        statuses = (RunStatus.COMPLETED, RunStatus.FAILED)
+        if args.include_running:
+            statuses += (RunStatus.RUNNING,)
+        deleted = run_journal.garbage_collect(older_than_days=args.days, statuses=statuses)
+        print(f"Deleted {deleted} runs")
+
+
+if __name__ == "__main__":
+    main()
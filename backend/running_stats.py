@@ -0,0 +1,180 @@
+"""
+Running Statistics - Incremental per-model aggregates for recommendations
+
+CostQualityOptimizer used to rebuild every evaluation and recompute means
+and standard deviations from full lists, so each recommendation cost
+O(history). PerformanceAccumulator keeps per-model running statistics
+(Welford mean/variance for quality, sums for cost, latency and cost per
+quality point, success counts) that are updated once per new evaluation.
+Producing metrics from it costs O(models).
+
+StateManager persists the accumulator next to the results log together
+with the byte offset of the log it has absorbed, so a restart (or a crash
+between appending evaluations and saving the statistics) only replays the
+log's tail.
+"""
+import json
+import logging
+import math
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+from models import ModelEvaluation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunningStats:
+    """Welford's online mean and variance"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0  # Sum of squared deviations from the mean
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Combined statistics of both samples (Chan et al.)"""
+        count = self.count + other.count
+        if count == 0:
+            return RunningStats()
+        delta = other.mean - self.mean
+        return RunningStats(
+            count=count,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        )
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (ddof=1); 0 with fewer than two values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+@dataclass
+class ModelStats:
+    """Everything analyze_model_performance reports for one model"""
+    total_count: int = 0
+    success_count: int = 0
+    cost_sum: float = 0.0
+    latency_sum: float = 0.0
+    cost_quality_ratio_sum: float = 0.0
+    quality: RunningStats = field(default_factory=RunningStats)
+
+    def add(self, success: bool, cost: float, quality: float, latency_ms: float, cost_quality_ratio: float):
+        self.total_count += 1
+        if not success:
+            return
+        self.success_count += 1
+        self.cost_sum += cost
+        self.latency_sum += latency_ms
+        self.cost_quality_ratio_sum += cost_quality_ratio
+        self.quality.add(quality)
+
+    def metrics(self) -> Dict[str, float]:
+        if self.success_count == 0:
+            return {
+                "avg_cost": 0,
+                "avg_quality": 0,
+                "avg_latency": 0,
+                "avg_cost_quality_ratio": float('inf'),
+                "success_rate": 0,
+                "sample_size": self.total_count,
+                "quality_stdev": 0
+            }
+        return {
+            "avg_cost": self.cost_sum / self.success_count,
+            "avg_quality": self.quality.mean,
+            "avg_latency": self.latency_sum / self.success_count,
+            "avg_cost_quality_ratio": self.cost_quality_ratio_sum / self.success_count,
+            "success_rate": self.success_count / self.total_count,
+            "sample_size": self.total_count,
+            "quality_stdev": self.quality.stdev
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModelStats":
+        return cls(**{**data, "quality": RunningStats(**data["quality"])})
+
+
+class PerformanceAccumulator:
+    """Per-model ModelStats, updated one evaluation at a time"""
+
+    def __init__(self):
+        self.models: Dict[str, ModelStats] = {}
+        self.log_offset = 0  # Bytes of the results log already absorbed
+
+    @property
+    def evaluation_count(self) -> int:
+        return sum(stats.total_count for stats in self.models.values())
+
+    def add(self, evaluation: ModelEvaluation):
+        self.models.setdefault(evaluation.model_name, ModelStats()).add(
+            evaluation.completion.success, evaluation.completion.cost,
+            evaluation.quality.overall_score, evaluation.completion.latency_ms,
+            evaluation.cost_quality_ratio
+        )
+
+    def add_record(self, record: Dict[str, Any]):
+        """Same as add() for an evaluation dict as stored in the results log"""
+        completion = record["completion"]
+        self.models.setdefault(record["model_name"], ModelStats()).add(
+            completion["success"], completion["cost"], record["quality"]["overall_score"],
+            completion["latency_ms"], record["cost_quality_ratio"]
+        )
+
+    def update(self, evaluations: Iterable[ModelEvaluation]) -> "PerformanceAccumulator":
+        for evaluation in evaluations:
+            self.add(evaluation)
+        return self
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {model: stats.metrics() for model, stats in self.models.items()}
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "log_offset": self.log_offset,
+            "models": {model: asdict(stats) for model, stats in self.models.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PerformanceAccumulator":
+        accumulator = cls()
+        accumulator.log_offset = data.get("log_offset", 0)
+        accumulator.models = {model: ModelStats.from_dict(stats) for model, stats in data["models"].items()}
+        return accumulator
+
+    def save(self, path: Path):
+        """Atomically write the accumulator (json allows the inf ratio of zero-quality runs)"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "PerformanceAccumulator":
+        """Saved accumulator, or an empty one if the file is missing or unreadable"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning(f"Rebuilding unreadable {path}: {e}")
+            return cls()
@@ -0,0 +1,106 @@
+"""
+Sequential Testing for Candidate Verification
+Decides whether a candidate clears a quality threshold after as few judged
+samples as the data allows, instead of always replaying a fixed batch.
+"""
+import math
+from statistics import NormalDist
+from typing import Dict, Optional
+
+_NORMAL = NormalDist()
+
+
+class SequentialQualityTest:
+    """
+    Confidence-interval sequential test on a candidate's mean quality score.
+
+    After every sample (once min_samples is reached) a two-sided interval is
+    built around the running mean. The candidate passes when the interval
+    lies entirely above the threshold and fails when it lies entirely below.
+    The error rate alpha is split evenly across the max_samples looks
+    (Bonferroni), so peeking after each sample does not inflate it.
+
+    The score standard deviation is floored at min_std so that a handful of
+    identical judge scores cannot produce unlimited certainty.
+    """
+
+    PASS = "pass"
+    FAIL = "fail"
+    CONTINUE = "continue"
+    INCONCLUSIVE = "inconclusive"
+
+    def __init__(self, threshold: float, min_samples: int = 3, max_samples: int = 10,
+                 alpha: float = 0.05, min_std: float = 2.0):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.alpha = alpha
+        self.min_std = min_std
+        self._z = _NORMAL.inv_cdf(1 - alpha / (2 * max_samples))
+
+        # Welford running mean / variance
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._decision: Optional[str] = None
+
+    def add(self, score: float) -> str:
+        """Record one sample and return the current decision"""
+        self.n += 1
+        delta = score - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (score - self.mean)
+
+        # Decisions are final: samples that were already in flight when the
+        # test stopped are recorded but cannot flip the outcome.
+        if self._decision is None and self.n >= self.min_samples:
+            low, high = self.interval()
+            if low > self.threshold:
+                self._decision = self.PASS
+            elif high < self.threshold:
+                self._decision = self.FAIL
+        return self.decision
+
+    @property
+    def decision(self) -> str:
+        if self._decision is not None:
+            return self._decision
+        if self.n >= self.max_samples:
+            return self.INCONCLUSIVE
+        return self.CONTINUE
+
+    @property
+    def decided(self) -> bool:
+        """True once more samples would not change the outcome"""
+        return self.decision != self.CONTINUE
+
+    def std_error(self) -> float:
+        if self.n == 0:
+            return math.inf
+        variance = self._m2 / (self.n - 1) if self.n > 1 else 0.0
+        return max(math.sqrt(variance), self.min_std) / math.sqrt(self.n)
+
+    def interval(self):
+        """Two-sided interval on the mean at the per-look confidence level"""
+        margin = self._z * self.std_error()
+        return self.mean - margin, self.mean + margin
+
+    @property
+    def confidence(self) -> float:
+        """Probability that the true mean quality clears the threshold"""
+        if self.n == 0:
+            return 0.0
+        p = _NORMAL.cdf((self.mean - self.threshold) / self.std_error())
+        return min(0.99, max(0.01, p))
+
+    def summary(self) -> Dict:
+        low, high = self.interval() if self.n else (0.0, 0.0)
+        return {
+            "decision": self.decision,
+            "samples": self.n,
+            "mean": self.mean,
+            "ci_low": low,
+            "ci_high": high,
+            "threshold": self.threshold,
+            "confidence": self.confidence
+        }
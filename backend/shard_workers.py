@@ -0,0 +1,567 @@
+"""
+Sharded Replay Workers - Multi-process continuous mode
+
+A single ContinuousMonitor replays one prompt's fan-out at a time. In
+sharded mode the monitor process becomes a coordinator and the replays run
+in N worker processes:
+
+- The coordinator reads pages from the ingestion source, samples them and
+  enqueues each prompt into SQLite, sharded by a hash of its id.
+- Each worker holds a lease on its home shard, claims a batch of that
+  shard's tasks and replays it on its own thread pool (replay and judge
+  calls in parallel).
+- Leases are renewed by a heartbeat. When a worker dies, its lease expires
+  and any live worker takes the shard over, putting the tasks the old
+  holder had claimed back in the queue, so no shard is stranded. A
+  borrowed shard is handed back once its queue is empty.
+- A coordinator started with fewer workers than before moves the pending
+  tasks of the dropped shards onto the remaining ones.
+- Collected task rows are deleted after SHARD_TASK_RETENTION_SECONDS.
+- Workers write evaluations into the task row. The coordinator, the only
+  writer of the evaluation log and processed-prompt index, collects them.
+
+Delivery is at least once: a task whose worker died (or lost its lease)
+mid-replay is replayed by the next lease holder. The late result of a
+worker that lost its lease is discarded.
+
+Usage:
+    python shard_workers.py run --workers 4
+    python shard_workers.py progress
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import (
+    REPLAY_WORKERS, SHARD_LEASE_SECONDS, SHARD_TASK_BATCH, SHARD_TASK_RETENTION_SECONDS,
+    MAX_CONCURRENT_REPLAYS, MAX_RETRIES
+)
+from models import ModelEvaluation, PromptData
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent / "data" / "optimization.db"
+
+# evaluate(prompt) -> evaluations for every model
+Evaluate = Callable[[PromptData], List[ModelEvaluation]]
+
+
+class TaskStatus:
+    PENDING = "pending"
+    CLAIMED = "claimed"  # Being replayed by `worker`
+    DONE = "done"  # Replayed; waiting for the coordinator
+    COLLECTED = "collected"
+    FAILED = "failed"
+
+
+_STATUSES = (TaskStatus.PENDING, TaskStatus.CLAIMED, TaskStatus.DONE, TaskStatus.COLLECTED, TaskStatus.FAILED)
+
+
+def shard_for(prompt_id: str, num_shards: int) -> int:
+    """Stable hash partition (Python's hash() is salted per process)"""
+    return int(hashlib.sha1(prompt_id.encode()).hexdigest()[:8], 16) % num_shards
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_shard_tables(num_shards: int, db_path: Optional[Path] = None):
+    conn = _connect(db_path or DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS replay_shards (
+            shard INTEGER PRIMARY KEY,
+            owner TEXT,
+            lease_expires REAL DEFAULT 0,
+            heartbeat_at TEXT
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS replay_tasks (
+            prompt_id TEXT PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            payload_json TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            worker TEXT,
+            result_json TEXT,
+            error TEXT,
+            enqueued_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_replay_tasks_shard ON replay_tasks(shard, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_replay_tasks_status ON replay_tasks(status, finished_at)")
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO replay_shards (shard) VALUES (?)",
+        [(shard,) for shard in range(num_shards)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def shard_progress(num_shards: Optional[int] = None, db_path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Per-shard and total task counts, lease holders and recent throughput.
+    Read-only; num_shards=None reports every shard on record.
+    """
+    now = time.time()
+    conn = _connect(db_path or DB_PATH)
+    tables = {row["name"] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('replay_shards', 'replay_tasks')")}
+    if len(tables) < 2:
+        conn.close()
+        return {"shards": [], "totals": {status: 0 for status in _STATUSES},
+                "percent_complete": 100.0, "prompts_per_minute": 0}
+    counts = conn.execute("""
+        SELECT shard, status, COUNT(*) AS n FROM replay_tasks GROUP BY shard, status
+    """).fetchall()
+    shards = conn.execute("SELECT shard, owner, lease_expires FROM replay_shards ORDER BY shard").fetchall()
+    minute_ago = datetime.utcfromtimestamp(now - 60).isoformat()
+    recent = conn.execute("""
+        SELECT COUNT(*) FROM replay_tasks WHERE status IN (?, ?) AND finished_at >= ?
+    """, (TaskStatus.DONE, TaskStatus.COLLECTED, minute_ago)).fetchone()[0]
+    conn.close()
+
+    per_shard = {row["shard"]: {
+        "shard": row["shard"],
+        "owner": row["owner"] if row["lease_expires"] >= now else None,
+        **{status: 0 for status in _STATUSES}
+    } for row in shards if num_shards is None or row["shard"] < num_shards}
+    totals = {status: 0 for status in _STATUSES}
+    for row in counts:
+        if row["shard"] in per_shard:
+            per_shard[row["shard"]][row["status"]] += row["n"]
+        totals[row["status"]] += row["n"]
+
+    queued = sum(totals.values())
+    finished = queued - totals[TaskStatus.PENDING] - totals[TaskStatus.CLAIMED]
+    return {
+        "shards": list(per_shard.values()),
+        "totals": totals,
+        "percent_complete": round(100 * finished / queued, 1) if queued else 100.0,
+        "prompts_per_minute": recent
+    }
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+class ShardWorker:
+    """Replays the tasks of the shards it holds leases on"""
+
+    def __init__(self, home_shard: int, num_shards: int, evaluate: Optional[Evaluate] = None,
+                 worker_id: Optional[str] = None, db_path: Optional[Path] = None,
+                 lease_seconds: float = SHARD_LEASE_SECONDS, batch_size: int = SHARD_TASK_BATCH,
+                 threads: int = MAX_CONCURRENT_REPLAYS, clock: Callable[[], float] = time.time):
+        self.home_shard = home_shard
+        self.num_shards = num_shards
+        self.worker_id = worker_id or f"w{home_shard}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.db_path = db_path or DB_PATH
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.threads = threads
+        self.clock = clock
+        self._evaluate = evaluate
+        self._evaluate_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def evaluate(self, prompt: PromptData) -> List[ModelEvaluation]:
+        with self._evaluate_lock:
+            if self._evaluate is None:
+                # This process's own replay engine and judge
+                from continuous_monitor import ContinuousMonitor
+                monitor = ContinuousMonitor()
+                monitor.sampler = None  # Sampling happened in the coordinator
+                self._evaluate = monitor._evaluate_prompt
+        return self._evaluate(prompt)
+
+    # ========================================================================
+    # Leases
+    # ========================================================================
+
+    def claim_shards(self) -> List[int]:
+        """
+        Renew held leases, take the home shard if free and adopt any shard
+        whose lease expired, or that lies beyond num_shards (left by a run
+        with more workers) and still has pending tasks. Tasks other workers
+        claimed on the shards this worker now holds are requeued: their
+        claimant lost the lease. Returns the shards this worker now holds.
+        """
+        now = self.clock()
+        expires = now + self.lease_seconds
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                UPDATE replay_shards SET lease_expires = ?, heartbeat_at = ?
+                WHERE owner = ?
+            """, (expires, datetime.utcnow().isoformat(), self.worker_id))
+            conn.execute("""
+                UPDATE replay_shards SET owner = ?, lease_expires = ?, heartbeat_at = ?
+                WHERE (shard = ? AND (owner IS NULL OR lease_expires < ?))
+                   OR (owner IS NOT NULL AND owner != ? AND lease_expires < ?)
+                   OR (owner IS NULL AND shard >= ? AND EXISTS (
+                       SELECT 1 FROM replay_tasks t WHERE t.shard = replay_shards.shard AND t.status = ?
+                   ))
+            """, (self.worker_id, expires, datetime.utcnow().isoformat(),
+                  self.home_shard, now, self.worker_id, now, self.num_shards, TaskStatus.PENDING))
+            rows = conn.execute(
+                "SELECT shard FROM replay_shards WHERE owner = ? ORDER BY shard", (self.worker_id,)
+            ).fetchall()
+            conn.execute("""
+                UPDATE replay_tasks SET status = ?, worker = NULL
+                WHERE status = ? AND worker != ?
+                  AND shard IN (SELECT shard FROM replay_shards WHERE owner = ?)
+            """, (TaskStatus.PENDING, TaskStatus.CLAIMED, self.worker_id, self.worker_id))
+            conn.commit()
+        finally:
+            conn.close()
+        return [row["shard"] for row in rows]
+
+    def release_idle_borrowed(self, shards: List[int]):
+        """Hand back borrowed shards that have nothing left to replay"""
+        conn = _connect(self.db_path)
+        for shard in shards:
+            if shard == self.home_shard:
+                continue
+            conn.execute("""
+                UPDATE replay_shards SET owner = NULL, lease_expires = 0
+                WHERE shard = ? AND owner = ? AND NOT EXISTS (
+                    SELECT 1 FROM replay_tasks WHERE shard = ? AND status = ?
+                )
+            """, (shard, self.worker_id, shard, TaskStatus.PENDING))
+        conn.commit()
+        conn.close()
+
+    def release_all(self):
+        conn = _connect(self.db_path)
+        conn.execute("UPDATE replay_shards SET owner = NULL, lease_expires = 0 WHERE owner = ?",
+                     (self.worker_id,))
+        conn.commit()
+        conn.close()
+
+    # ========================================================================
+    # Tasks
+    # ========================================================================
+
+    def _claim_tasks(self, shards: List[int]) -> List[sqlite3.Row]:
+        """Mark the next batch of pending tasks on these shards as claimed by this worker"""
+        if not shards:
+            return []
+        placeholders = ",".join("?" * len(shards))
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(f"""
+                SELECT prompt_id, payload_json, attempts FROM replay_tasks
+                WHERE shard IN ({placeholders}) AND status = ?
+                ORDER BY enqueued_at LIMIT ?
+            """, (*shards, TaskStatus.PENDING, self.batch_size)).fetchall()
+            conn.executemany("UPDATE replay_tasks SET status = ?, worker = ? WHERE prompt_id = ?",
+                             [(TaskStatus.CLAIMED, self.worker_id, row["prompt_id"]) for row in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        return rows
+
+    def _run_task(self, row: sqlite3.Row):
+        prompt = PromptData(**json.loads(row["payload_json"]))
+        try:
+            evaluations = self.evaluate(prompt)
+            status, result, error = TaskStatus.DONE, json.dumps([e.to_dict() for e in evaluations]), None
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: {prompt.id} failed: {e}")
+            retry = row["attempts"] + 1 < MAX_RETRIES
+            status, result, error = (TaskStatus.PENDING if retry else TaskStatus.FAILED), None, str(e)
+
+        conn = _connect(self.db_path)
+        updated = conn.execute("""
+            UPDATE replay_tasks
+            SET status = ?, result_json = ?, error = ?, attempts = attempts + 1, finished_at = ?
+            WHERE prompt_id = ? AND status = ? AND worker = ?
+        """, (status, result, error, datetime.utcnow().isoformat(),
+              prompt.id, TaskStatus.CLAIMED, self.worker_id)).rowcount
+        conn.commit()
+        conn.close()
+        if not updated:
+            logger.warning(f"Worker {self.worker_id}: lost the lease on {prompt.id}; result discarded")
+
+    def step(self, executor: Optional[ThreadPoolExecutor] = None) -> int:
+        """Claim leases and replay one batch; returns the number of tasks run"""
+        shards = self.claim_shards()
+        rows = self._claim_tasks(shards)
+        if executor is None:
+            for row in rows:
+                self._run_task(row)
+        else:
+            list(executor.map(self._run_task, rows))
+        if not rows:
+            self.release_idle_borrowed(shards)
+        return len(rows)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.claim_shards()
+            except sqlite3.Error as e:
+                logger.warning(f"Worker {self.worker_id}: lease renewal failed: {e}")
+
+    def run(self, idle_seconds: float = 1.0):
+        """Work until stop(); leases are renewed in the background meanwhile"""
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="shard-replay") as executor:
+                while not self._stop.is_set():
+                    if not self.step(executor):
+                        self._stop.wait(idle_seconds)
+        finally:
+            self._stop.set()
+            heartbeat.join()
+            self.release_all()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _worker_main(home_shard: int, num_shards: int, db_path: str):
+    """Entry point of a worker process"""
+    import signal
+
+    logging.basicConfig(level=logging.INFO)
+    worker = ShardWorker(home_shard, num_shards, db_path=Path(db_path))
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+# ============================================================================
+# Coordinator
+# ============================================================================
+
+class ShardCoordinator:
+    """Feeds the shard queues from the monitor's source and collects results"""
+
+    def __init__(self, monitor=None, num_shards: int = REPLAY_WORKERS, db_path: Optional[Path] = None,
+                 lease_seconds: float = SHARD_LEASE_SECONDS):
+        if num_shards < 1:
+            raise ValueError("Sharded mode needs at least one worker")
+        self.monitor = monitor
+        self.num_shards = num_shards
+        self.db_path = db_path or DB_PATH
+        self.lease_seconds = lease_seconds
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.restarts = 0
+        self._stop = threading.Event()
+        init_shard_tables(num_shards, self.db_path)
+        self.reshard()
+
+    def reshard(self) -> int:
+        """
+        Move pending (or claimed, by workers of that run) tasks of shards
+        >= num_shards (left by a run with more workers) onto the current
+        shards and drop those shard rows. Returns the number of tasks moved.
+        """
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT prompt_id FROM replay_tasks WHERE shard >= ? AND status IN (?, ?)",
+                                (self.num_shards, TaskStatus.PENDING, TaskStatus.CLAIMED)).fetchall()
+            conn.executemany("UPDATE replay_tasks SET shard = ?, status = ?, worker = NULL WHERE prompt_id = ?",
+                             [(shard_for(row["prompt_id"], self.num_shards), TaskStatus.PENDING, row["prompt_id"])
+                              for row in rows])
+            conn.execute("DELETE FROM replay_shards WHERE shard >= ?", (self.num_shards,))
+            conn.commit()
+        finally:
+            conn.close()
+        if rows:
+            logger.info(f"Moved {len(rows)} pending tasks onto {self.num_shards} shards")
+        return len(rows)
+
+    def gc(self, retention_seconds: float = SHARD_TASK_RETENTION_SECONDS) -> int:
+        """Delete collected task rows older than retention_seconds; returns the number deleted"""
+        cutoff = datetime.utcfromtimestamp(time.time() - retention_seconds).isoformat()
+        conn = _connect(self.db_path)
+        deleted = conn.execute("DELETE FROM replay_tasks WHERE status = ? AND finished_at < ?",
+                               (TaskStatus.COLLECTED, cutoff)).rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    def enqueue(self, prompts: List[PromptData]) -> int:
+        """Queue prompts on their shards; prompts already queued are ignored"""
+        now = datetime.utcnow().isoformat()
+        conn = _connect(self.db_path)
+        before = conn.total_changes
+        conn.executemany("""
+            INSERT OR IGNORE INTO replay_tasks (prompt_id, shard, payload_json, status, enqueued_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(p.id, shard_for(p.id, self.num_shards), json.dumps(p.to_dict()), TaskStatus.PENDING, now)
+              for p in prompts])
+        added = conn.total_changes - before
+        conn.commit()
+        conn.close()
+        return added
+
+    def collect(self) -> int:
+        """Save finished tasks' evaluations and mark their prompts processed"""
+        conn = _connect(self.db_path)
+        rows = conn.execute("""
+            SELECT prompt_id, payload_json, result_json FROM replay_tasks
+            WHERE status = ? ORDER BY finished_at
+        """, (TaskStatus.DONE,)).fetchall()
+        conn.close()
+        if not rows:
+            return 0
+
+        state_manager = self.monitor.state_manager
+        sampler = getattr(self.monitor, "sampler", None)
+        evaluations = []
+        for row in rows:
+            prompt_evaluations = [ModelEvaluation.from_dict(r) for r in json.loads(row["result_json"])]
+            if sampler is not None:
+                sampler.record_replay_cost(sum(e.completion.cost for e in prompt_evaluations))
+                sampler.observe(prompt_evaluations)
+            evaluations.extend(prompt_evaluations)
+        state_manager.save_evaluations(evaluations)
+
+        state = state_manager.load_state()
+        state_manager.mark_prompts_processed(state, [PromptData(**json.loads(row["payload_json"])) for row in rows])
+        state_manager.save_state(state)
+
+        conn = _connect(self.db_path)
+        conn.executemany(
+            "UPDATE replay_tasks SET status = ?, result_json = NULL WHERE prompt_id = ?",
+            [(TaskStatus.COLLECTED, row["prompt_id"]) for row in rows]
+        )
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+    def ingest_once(self) -> int:
+        """Read one page from the source and enqueue the sampled prompts"""
+        monitor = self.monitor
+        state = monitor.state_manager.load_state()
+        prompts = monitor.fetch_new_prompts(state.last_processed_timestamp)
+        fetched = len(prompts)
+
+        prompts = monitor.state_manager.filter_unprocessed(prompts)
+        if prompts and monitor.sampler is not None:
+            prompts = monitor.sampler.sample(prompts)
+        self.enqueue(prompts)
+
+        # The page is durable in replay_tasks, so its cursor can move on
+        if monitor._next_cursor is not None:
+            state = monitor.state_manager.load_state()
+            monitor._commit_cursor(state)
+            monitor.state_manager.save_state(state)
+        return fetched
+
+    def progress(self) -> Dict[str, Any]:
+        """shard_progress() plus the state of this coordinator's worker processes"""
+        progress = shard_progress(self.num_shards, self.db_path)
+        progress["workers_alive"] = sum(1 for p in self.processes.values() if p.is_alive())
+        progress["worker_restarts"] = self.restarts
+        return progress
+
+    # ========================================================================
+    # Process management
+    # ========================================================================
+
+    def _spawn(self, shard: int):
+        context = multiprocessing.get_context("spawn")
+        process = context.Process(target=_worker_main, args=(shard, self.num_shards, str(self.db_path)),
+                                  name=f"replay-shard-{shard}", daemon=True)
+        process.start()
+        self.processes[shard] = process
+
+    def supervise(self):
+        """Start missing workers and restart dead ones"""
+        for shard in range(self.num_shards):
+            process = self.processes.get(shard)
+            if process is None:
+                self._spawn(shard)
+            elif not process.is_alive():
+                logger.warning(f"Worker for shard {shard} exited ({process.exitcode}); restarting")
+                self.restarts += 1
+                self._spawn(shard)
+
+    def run(self, idle_seconds: float = 2.0, progress_every: float = 30.0):
+        """Coordinate until stop(): ingest, collect, supervise, report"""
+        last_report = 0.0
+        try:
+            while not self._stop.is_set():
+                self.supervise()
+                fetched = self.ingest_once() if self.monitor.source is not None else 0
+                collected = self.collect()
+
+                if time.monotonic() - last_report >= progress_every:
+                    self.gc()
+                    progress = self.progress()
+                    totals = progress["totals"]
+                    logger.info(f"Shards: {progress['percent_complete']}% complete | "
+                                f"{totals['pending']} pending, {totals['done'] + totals['collected']} replayed, "
+                                f"{totals['failed']} failed | {progress['prompts_per_minute']}/min | "
+                                f"{progress['workers_alive']}/{self.num_shards} workers")
+                    last_report = time.monotonic()
+
+                if not (fetched and self.monitor.source_has_more) and not collected:
+                    self._stop.wait(idle_seconds)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self, timeout: float = 30.0):
+        """Ask workers to finish their batch, then collect what they finished"""
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: the worker stops after its current batch
+        for process in self.processes.values():
+            process.join(timeout)
+        self.collect()
+
+
+if __name__ == "__main__":
+    import signal
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Sharded continuous replay")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run the coordinator and N worker processes")
+    run.add_argument("--workers", type=int, default=REPLAY_WORKERS or 4)
+    progress_cmd = sub.add_parser("progress", help="Show shard progress (read-only)")
+    progress_cmd.add_argument("--workers", type=int, default=REPLAY_WORKERS or None,
+                              help="Only report shards below this count (default: every shard on record)")
+    args = parser.parse_args()
+
+    if args.command == "progress":
+        print(json.dumps(shard_progress(args.workers), indent=2))
+    else:
+        from continuous_monitor import ContinuousMonitor
+
+        coordinator = ShardCoordinator(ContinuousMonitor(), num_shards=args.workers)
+        signal.signal(signal.SIGTERM, lambda signum, frame: coordinator.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: coordinator.stop())
+        coordinator.run()
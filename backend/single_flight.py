@@ -0,0 +1,114 @@
+"""
+Single-Flight Request Coalescing
+Concurrent callers asking for the same key share one in-flight computation
+instead of each paying for a full replay + judge pipeline.
+"""
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+from config import SINGLE_FLIGHT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightTimeout(Exception):
+    """Raised to a follower when the leader does not finish in time"""
+
+
+class SingleFlight:
+    """
+    Coalesces duplicate in-flight calls by key.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running (followers) wait on the leader's future and
+    receive the same result, or the same exception.
+    """
+
+    def __init__(self, name: str, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+        self.leader_calls = 0
+        self.coalesced_calls = 0
+        self.follower_errors = 0
+        self.follower_timeouts = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args,
+           timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) once per key among concurrent callers"""
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+                self.leader_calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        if is_leader:
+            return self._lead(key, future, fn, *args, **kwargs)
+
+        logger.info(f"[{self.name}] Coalesced request onto in-flight key {key}")
+        wait = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeoutError:
+            with self._lock:
+                self.follower_timeouts += 1
+            raise SingleFlightTimeout(f"{self.name}: timed out after {wait}s waiting for key {key}")
+        except Exception:
+            with self._lock:
+                self.follower_errors += 1
+            raise
+
+    def _lead(self, key: str, future: Future, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Coalescing statistics"""
+        with self._lock:
+            total = self.leader_calls + self.coalesced_calls
+            return {
+                "name": self.name,
+                "in_flight": len(self._inflight),
+                "leader_calls": self.leader_calls,
+                "coalesced_calls": self.coalesced_calls,
+                "coalesced_rate": self.coalesced_calls / total * 100 if total else 0,
+                "follower_errors": self.follower_errors,
+                "follower_timeouts": self.follower_timeouts
+            }
+
+    def export_prometheus(self) -> str:
+        """Export coalescing counters in Prometheus format"""
+        stats = self.get_stats()
+        label = f'{{flight="{self.name}"}}'
+        return "\n".join([
+            f"single_flight_in_flight{label} {stats['in_flight']}",
+            f"single_flight_leader_calls_total{label} {stats['leader_calls']}",
+            f"single_flight_coalesced_calls_total{label} {stats['coalesced_calls']}",
+            f"single_flight_follower_errors_total{label} {stats['follower_errors']}",
+            f"single_flight_follower_timeouts_total{label} {stats['follower_timeouts']}"
+        ])
+
+
+# Global instance shared by /analyze, /auto and /api/optimize
+analysis_flight = SingleFlight("analysis")
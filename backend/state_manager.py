@@ -3,10 +3,16 @@ State Manager - Handles persistence and state tracking
 """
 import json
 import logging
-from typing import Dict, List, Optional
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
-from models import ReplayState, ModelEvaluation
-from config import STATE_FILE, RESULTS_FILE, CACHE_FILE
+from models import ReplayState, ModelEvaluation, PromptData
+from evaluation_store import EvaluationLog, EvaluationCacheLog, legacy_path
+from processed_index import ProcessedPromptIndex
+from running_stats import PerformanceAccumulator
+from columnar_analytics import EvaluationColumns
+from config import STATE_FILE, RESULTS_FILE, CACHE_FILE, PROCESSED_INDEX_FILE, BOOTSTRAP_WINDOW
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,11 +25,30 @@ class StateManager:
         self, 
         state_file: str = STATE_FILE,
         results_file: str = RESULTS_FILE,
-        cache_file: str = CACHE_FILE
+        cache_file: str = CACHE_FILE,
+        index_file: str = PROCESSED_INDEX_FILE,
+        stats_file: Optional[str] = None,
+        window: int = BOOTSTRAP_WINDOW
     ):
         self.state_file = Path(state_file)
         self.results_file = Path(results_file)
         self.cache_file = Path(cache_file)
+        self.results_log = EvaluationLog(self.results_file)
+        self.cache_log = EvaluationCacheLog(self.cache_file)
+        self.processed_index = ProcessedPromptIndex(index_file)
+        # Running per-model statistics derived from (and stored beside) the results log
+        self.stats_file = Path(stats_file) if stats_file else self.results_file.with_suffix(".stats.json")
+        self._performance: Optional[PerformanceAccumulator] = None
+        self._performance_lock = threading.Lock()
+        # Last `window` evaluations per model as (cost, quality, latency, ratio, success)
+        self.window = window
+        self._recent: Dict[str, Deque[Tuple]] = {}
+        self._recent_offset = 0
+        self._columns: Optional[EvaluationColumns] = None  # Built from _recent, reused until it changes
+        
+        for path in (self.results_file, self.cache_file):
+            if legacy_path(path).exists() and legacy_path(path) != path:
+                logger.warning(f"Legacy {legacy_path(path)} found; run 'python evaluation_store.py compact' to migrate it")
     
     def load_state(self) -> ReplayState:
         """Load state from disk or create new"""
@@ -31,8 +56,17 @@ class StateManager:
             try:
                 with open(self.state_file, 'r') as f:
                     data = json.load(f)
+                
+                # Older state files carried every processed id in a list
+                legacy_ids = data.pop('processed_prompt_ids', None)
+                state = ReplayState.from_dict(data)
+                if legacy_ids:
+                    added = self.processed_index.add_many((prompt_id, None) for prompt_id in legacy_ids)
+                    logger.info(f"Migrated {added} processed prompt ids into {self.processed_index.path}")
+                    self.save_state(state)
+                
                 logger.info(f"Loaded state: {data['total_prompts_processed']} prompts processed")
-                return ReplayState.from_dict(data)
+                return state
             except Exception as e:
                 logger.error(f"Failed to load state: {e}")
         
@@ -49,51 +83,77 @@ class StateManager:
             logger.error(f"Failed to save state: {e}")
     
     def save_evaluations(self, evaluations: List[ModelEvaluation]):
-        """Append evaluations to results file"""
+        """Append evaluations to the results log (only the new records are written)"""
         try:
-            # Load existing results
-            existing = []
-            if self.results_file.exists():
-                with open(self.results_file, 'r') as f:
-                    existing = json.load(f)
+            count = self.results_log.append(eval.to_dict() for eval in evaluations)
+            logger.info(f"Saved {count} evaluations")
+        except Exception as e:
+            logger.error(f"Failed to save evaluations: {e}")
+        self.performance()
+    
+    def performance(self) -> PerformanceAccumulator:
+        """
+        Per-model running statistics over every saved evaluation.
+        Only log records appended since the last call are read.
+        """
+        with self._performance_lock:
+            if self._performance is None:
+                self._performance = PerformanceAccumulator.load(self.stats_file)
+            accumulator = self._performance
+            if self.results_log.size() < accumulator.log_offset:
+                logger.info(f"{self.results_file} was rewritten; rebuilding {self.stats_file}")
+                accumulator = self._performance = PerformanceAccumulator()
             
-            # Append new evaluations
-            new_data = [eval.to_dict() for eval in evaluations]
-            existing.extend(new_data)
+            start = accumulator.log_offset
+            for record, offset in self.results_log.iter_from(start):
+                if record is not None:
+                    accumulator.add_record(record)
+                accumulator.log_offset = offset
+            if accumulator.log_offset != start:
+                try:
+                    accumulator.save(self.stats_file)
+                except OSError as e:
+                    logger.error(f"Failed to save performance stats: {e}")
+            return accumulator
+    
+    def recent_columns(self) -> EvaluationColumns:
+        """
+        The most recent `window` evaluations per model as columnar arrays
+        (bootstrap input). Memory and resampling cost stay bounded however
+        long the log grows. Without new records the same columns, and so the
+        same bootstrap fingerprint, are returned.
+        """
+        with self._performance_lock:
+            if self.results_log.size() < self._recent_offset:
+                self._recent, self._recent_offset, self._columns = {}, 0, None
             
-            # Save
-            with open(self.results_file, 'w') as f:
-                json.dump(existing, f, indent=2)
+            for record, offset in self.results_log.iter_from(self._recent_offset):
+                if record is not None:
+                    completion = record["completion"]
+                    rows = self._recent.setdefault(record["model_name"], deque(maxlen=self.window))
+                    rows.append((completion["cost"], record["quality"]["overall_score"],
+                                 completion["latency_ms"], record["cost_quality_ratio"], completion["success"]))
+                    self._columns = None
+                self._recent_offset = offset
             
-            logger.info(f"Saved {len(evaluations)} evaluations (total: {len(existing)})")
-        except Exception as e:
-            logger.error(f"Failed to save evaluations: {e}")
+            if self._columns is None:
+                names = [model for model, rows in self._recent.items() for _ in rows]
+                rows = [row for model_rows in self._recent.values() for row in model_rows]
+                cost, quality, latency, ratio, success = zip(*rows) if rows else ([], [], [], [], [])
+                self._columns = EvaluationColumns.from_arrays(names, cost, quality, latency, success, ratio)
+            return self._columns
     
-    def load_evaluations(self) -> List[Dict]:
-        """Load all evaluations from results file"""
-        if not self.results_file.exists():
-            return []
-        
+    def load_evaluations(self) -> Iterator[Dict]:
+        """Stream evaluations from the results log, oldest first"""
         try:
-            with open(self.results_file, 'r') as f:
-                data = json.load(f)
-            logger.info(f"Loaded {len(data)} evaluations")
-            return data
+            yield from self.results_log
         except Exception as e:
             logger.error(f"Failed to load evaluations: {e}")
-            return []
     
     def get_evaluation_cache(self, prompt_id: str, model_name: str) -> Optional[Dict]:
         """Check if evaluation exists in cache"""
-        if not self.cache_file.exists():
-            return None
-        
         try:
-            with open(self.cache_file, 'r') as f:
-                cache = json.load(f)
-            
-            cache_key = f"{prompt_id}:{model_name}"
-            return cache.get(cache_key)
+            return self.cache_log.get(f"{prompt_id}:{model_name}")
         except Exception as e:
             logger.error(f"Failed to read cache: {e}")
             return None
@@ -101,21 +161,35 @@ class StateManager:
     def save_to_cache(self, prompt_id: str, model_name: str, evaluation: Dict):
         """Save evaluation to cache"""
         try:
-            cache = {}
-            if self.cache_file.exists():
-                with open(self.cache_file, 'r') as f:
-                    cache = json.load(f)
-            
-            cache_key = f"{prompt_id}:{model_name}"
-            cache[cache_key] = evaluation
-            
-            with open(self.cache_file, 'w') as f:
-                json.dump(cache, f, indent=2)
+            self.cache_log.put(f"{prompt_id}:{model_name}", evaluation)
         except Exception as e:
             logger.error(f"Failed to save to cache: {e}")
     
-    def mark_prompt_processed(self, state: ReplayState, prompt_id: str):
+    def is_prompt_processed(self, prompt_id: str) -> bool:
+        """Exact membership check against the processed-prompt index"""
+        return prompt_id in self.processed_index
+    
+    def filter_unprocessed(self, prompts: List[PromptData]) -> List[PromptData]:
+        """Drop prompts that were already processed (or repeat earlier in the batch)"""
+        processed = self.processed_index.find_processed(p.id for p in prompts)
+        pending = []
+        for prompt in prompts:
+            if prompt.id not in processed:
+                processed.add(prompt.id)
+                pending.append(prompt)
+        return pending
+    
+    def mark_prompts_processed(self, state: ReplayState, prompts: List[PromptData]):
+        """Record prompts as processed and advance the high-water-mark cursor"""
+        added = self.processed_index.add_many((p.id, p.timestamp) for p in prompts)
+        state.total_prompts_processed += added
+        for prompt in prompts:
+            if prompt.timestamp and prompt.timestamp > state.last_processed_timestamp:
+                state.last_processed_timestamp = prompt.timestamp
+    
+    def mark_prompt_processed(self, state: ReplayState, prompt_id: str, prompt_timestamp: Optional[str] = None):
         """Mark a prompt as processed in state"""
-        if prompt_id not in state.processed_prompt_ids:
-            state.processed_prompt_ids.append(prompt_id)
+        if self.processed_index.add(prompt_id, prompt_timestamp):
             state.total_prompts_processed += 1
+        if prompt_timestamp and prompt_timestamp > state.last_processed_timestamp:
+            state.last_processed_timestamp = prompt_timestamp
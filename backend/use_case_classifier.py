@@ -0,0 +1,204 @@
+"""
+Use Case Classifier - Compiled keyword matcher with optional embedding fallback
+
+All keywords from config.USE_CASE_KEYWORDS are compiled into one prefix-trie
+regex, so a prompt is scanned once regardless of how many categories and
+keywords exist. Hits are weighted per category; the best-scoring category wins
+and the share of evidence it holds becomes the confidence.
+
+In "embedding" mode, prompts the keywords cannot classify confidently are
+compared against per-category centroids of a few seed prompts, embedded with
+VectorEngine's sentence-transformer model.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import (
+    USE_CASE_KEYWORDS, USE_CASE_LABELS, USE_CASE_KEYWORD_WEIGHTS,
+    USE_CASE_CLASSIFIER_MODE, USE_CASE_EMBEDDING_MIN_CONFIDENCE
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = "general"
+
+# Evidence needed before a keyword verdict is fully trusted; one hit alone gives 0.5
+CONFIDENCE_PRIOR = 1.0
+
+# Confidence when nothing matched at all
+NO_MATCH_CONFIDENCE = 0.2
+
+# Seed prompts that define the embedding centroids
+CENTROID_SEED_PROMPTS = {
+    "code": [
+        "Write a function that parses a CSV file",
+        "Why does this loop throw an index error?",
+        "Convert this class from Java to Go",
+    ],
+    "security": [
+        "Is this login form safe against SQL injection?",
+        "How should we store user passwords?",
+        "Check this server config for weaknesses",
+    ],
+    "creative": [
+        "Write a short poem about autumn",
+        "Come up with a plot for a mystery novel",
+        "Give me a funny toast for my brother's wedding",
+    ],
+    "analysis": [
+        "Which of these two pricing plans is better value?",
+        "Summarize the trends in these sales numbers",
+        "Compare the pros and cons of remote work",
+    ],
+    "documentation": [
+        "Explain how OAuth works step by step",
+        "Write a README section for installing the tool",
+        "Describe what this API endpoint does",
+    ],
+    "general": [
+        "What is the capital of Australia?",
+        "Give me a recipe for pancakes",
+        "Who won the world cup in 2018?",
+    ],
+}
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex alternation factored by shared prefixes ("co(?:de|mpare|...)"), so
+    each position in the prompt is tested against one character at a time
+    rather than against every keyword. Optional suffixes are greedy, so the
+    longest keyword wins ("how to" over "how").
+    """
+    trie: Dict[str, Dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Dict]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+@dataclass
+class UseCasePrediction:
+    category: str
+    confidence: float
+    method: str  # "keyword", "embedding" or "default"
+    matched_keywords: List[str]
+
+    @property
+    def label(self) -> str:
+        return USE_CASE_LABELS.get(self.category, self.category.title())
+
+
+class UseCaseClassifier:
+    """Classifies prompts into the USE_CASE_KEYWORDS categories"""
+
+    def __init__(self, keywords: Dict[str, List[str]] = USE_CASE_KEYWORDS,
+                 weights: Dict[str, float] = USE_CASE_KEYWORD_WEIGHTS,
+                 mode: str = USE_CASE_CLASSIFIER_MODE,
+                 embedding_min_confidence: float = USE_CASE_EMBEDDING_MIN_CONFIDENCE):
+        if mode not in ("keyword", "embedding"):
+            raise ValueError(f"Unknown use case classifier mode: {mode}")
+        self.mode = mode
+        self.embedding_min_confidence = embedding_min_confidence
+        self.weights = weights
+        # Earlier categories win ties, as in the config ordering
+        self._priority = {category: i for i, category in enumerate(keywords)}
+
+        self._keyword_category: Dict[str, str] = {}
+        for category, words in keywords.items():
+            for word in words:
+                self._keyword_category.setdefault(word.lower(), category)
+
+        self._pattern = re.compile(r"\b" + _trie_pattern(self._keyword_category))
+
+        self._vector_engine = None
+        self._centroids = None
+
+    def classify(self, prompt: str) -> UseCasePrediction:
+        prediction = self._classify_keywords(prompt)
+        if self.mode == "embedding" and prediction.confidence < self.embedding_min_confidence:
+            embedded = self._classify_embedding(prompt)
+            if embedded is not None and embedded.confidence > prediction.confidence:
+                return embedded
+        return prediction
+
+    def _classify_keywords(self, prompt: str) -> UseCasePrediction:
+        scores: Dict[str, float] = {}
+        matched = []
+        for keyword in self._pattern.findall(prompt.lower()):
+            category = self._keyword_category[keyword]
+            scores[category] = scores.get(category, 0.0) + self.weights.get(category, 1.0)
+            matched.append(keyword)
+
+        if not scores:
+            return UseCasePrediction(DEFAULT_CATEGORY, NO_MATCH_CONFIDENCE, "default", [])
+
+        best = max(scores, key=lambda c: (scores[c], -self._priority[c]))
+        confidence = scores[best] / (sum(scores.values()) + CONFIDENCE_PRIOR)
+        return UseCasePrediction(best, confidence, "keyword", matched)
+
+    # ========================================================================
+    # Embedding nearest-centroid mode
+    # ========================================================================
+
+    def _classify_embedding(self, prompt: str) -> Optional[UseCasePrediction]:
+        centroids = self._load_centroids()
+        if centroids is None:
+            return None
+        import numpy as np
+
+        vector = self._vector_engine.embed_text(prompt)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        categories = list(centroids)
+        similarities = np.array([float(np.dot(vector, centroids[c])) for c in categories])
+
+        # Softmax over cosine similarities; sharp enough that a clear winner dominates
+        weights = np.exp((similarities - similarities.max()) / 0.05)
+        probabilities = weights / weights.sum()
+        best = int(np.argmax(probabilities))
+        return UseCasePrediction(categories[best], float(probabilities[best]), "embedding", [])
+
+    def _load_centroids(self):
+        if self._centroids is not None:
+            return self._centroids or None
+        try:
+            import numpy as np
+            from vector_engine import VectorEngine
+            self._vector_engine = VectorEngine()
+        except Exception as e:  # sentence-transformers not installed or model unavailable
+            logger.warning(f"Embedding use case classification unavailable: {e}")
+            self._centroids = {}
+            return None
+
+        centroids = {}
+        for category, prompts in CENTROID_SEED_PROMPTS.items():
+            centroid = np.mean(self._vector_engine.embed_batch(prompts), axis=0)
+            centroids[category] = centroid / (np.linalg.norm(centroid) or 1.0)
+        self._centroids = centroids
+        return centroids
+
+
+# Global instance
+use_case_classifier = UseCaseClassifier()
+
+
+if __name__ == "__main__":
+    import sys
+
+    for text in sys.argv[1:] or ["Write a python function to reverse a list",
+                                 "Is our authentication flow secure?",
+                                 "Tell me a story about a dragon"]:
+        result = use_case_classifier.classify(text)
+        print(f"{result.label:<18} {result.confidence:.2f} ({result.method})  {text}")
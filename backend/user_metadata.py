@@ -165,6 +165,13 @@ class UserMetadataService:
             updated_at=row["updated_at"]
         )
     
+    def list_user_ids(self) -> List[str]:
+        """All known user IDs"""
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute("SELECT user_id FROM users ORDER BY user_id").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+    
     def update_user(self, user_id: str, updates: Dict[str, Any]) -> bool:
         """Update user metadata"""
         conn = sqlite3.connect(DB_PATH)
@@ -9,30 +9,19 @@ from models import PromptData
 from replay_engine import ReplayEngine
 from quality_evaluator import QualityEvaluator
 from optimizer import CostQualityOptimizer
-from config import USE_CASE_KEYWORDS, MODELS_TO_TEST
+from config import MODELS_TO_TEST
+from use_case_classifier import use_case_classifier
 
 app = Flask(__name__)
 CORS(app)
 
 logging.basicConfig(level=logging.WARNING)
 
-def detect_use_case(prompt: str) -> str:
-    """Detect the use case category from prompt"""
-    prompt_lower = prompt.lower()
-    
-    for category, keywords in USE_CASE_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in prompt_lower:
-                return category
-    
-    return "general"
-
-
 def analyze_prompt(prompt: str):
     """Analyze prompt and recommend best model"""
     
     # Detect use case
-    use_case = detect_use_case(prompt)
+    use_case = use_case_classifier.classify(prompt).category
     
     # Create prompt data
     prompt_data = PromptData(
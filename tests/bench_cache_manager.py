@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark CacheManager.get throughput for hot keys
+Compares the SQLite-only path (L1 disabled) with the two-tier cache.
+
+Run from the repo root: python tests/bench_cache_manager.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache_manager as cache_module
+from cache_manager import CacheManager
+
+HOT_KEYS = 32
+READS = 20000
+
+
+def run(label: str, cache: CacheManager) -> float:
+    keys = [cache.generate_key("bench", idx=i) for i in range(HOT_KEYS)]
+    for key in keys:
+        cache.set(key, {"model_id": "gpt-4o-mini", "quality_score": 88.5, "completions": [1, 2, 3]})
+
+    start = time.perf_counter()
+    for i in range(READS):
+        cache.get(keys[i % HOT_KEYS])
+    cache.flush_hit_counts()
+    elapsed = time.perf_counter() - start
+
+    rate = READS / elapsed
+    print(f"{label:<22} {READS} gets in {elapsed:.3f}s -> {rate:,.0f} gets/s")
+    return rate
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_module.DB_PATH = Path(tmp) / "bench.db"
+
+        print("=" * 60)
+        print("CacheManager.get hot-key throughput")
+        print("=" * 60)
+        sqlite_only = run("SQLite only (L1 off)", CacheManager(l1_max_entries=0))
+        two_tier = run("L1 + SQLite", CacheManager())
+        print(f"\nSpeedup: {two_tier / sqlite_only:.1f}x")
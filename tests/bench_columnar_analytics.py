@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-model analytics over 1M evaluations
+Compares the per-row Python paths (dict of lists with statistics.mean/stdev,
+and the incremental PerformanceAccumulator) with the columnar NumPy path,
+then times percentiles and bootstrap CIs on the columns.
+
+Run from the repo root: python tests/bench_columnar_analytics.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+from statistics import mean, stdev
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from columnar_analytics import EvaluationColumns, bootstrap_ci, grouped_metrics, grouped_percentiles
+from models import CompletionResult, ModelEvaluation, QualityScore
+from running_stats import PerformanceAccumulator
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+MODELS = ["GPT-4o", "GPT-4o-mini", "Claude-3.5-Sonnet", "Claude-3-Haiku", "Gemini-1.5-Flash", "Llama-3.1-70B"]
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<38} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def make_evaluations(rng):
+    codes = rng.integers(0, len(MODELS), ROWS)
+    cost = rng.uniform(0.0001, 0.02, ROWS)
+    quality = rng.uniform(40, 100, ROWS)
+    latency = rng.uniform(100, 3000, ROWS)
+    success = rng.random(ROWS) > 0.03
+    evaluations = []
+    for i in range(ROWS):
+        completion = CompletionResult(model_name=MODELS[codes[i]], provider="p", response="", tokens_input=0,
+                                      tokens_output=0, latency_ms=float(latency[i]), cost=float(cost[i]),
+                                      success=bool(success[i]))
+        score = QualityScore(overall_score=float(quality[i]), dimension_scores={}, reasoning="",
+                             confidence=1.0, evaluator_model="judge")
+        evaluations.append(ModelEvaluation(f"p{i}", MODELS[codes[i]], completion, score, cost[i] / quality[i]))
+    return evaluations
+
+
+def lists_and_statistics(evaluations):
+    """The original dict-of-lists aggregation"""
+    data = {}
+    for e in evaluations:
+        d = data.setdefault(e.model_name, {"costs": [], "quality": [], "latency": [], "ratio": [], "ok": 0, "n": 0})
+        d["n"] += 1
+        if e.completion.success:
+            d["ok"] += 1
+            d["costs"].append(e.completion.cost)
+            d["quality"].append(e.quality.overall_score)
+            d["latency"].append(e.completion.latency_ms)
+            d["ratio"].append(e.cost_quality_ratio)
+    return {m: (mean(d["costs"]), mean(d["quality"]), mean(d["latency"]), mean(d["ratio"]),
+                d["ok"] / d["n"], stdev(d["quality"])) for m, d in data.items()}
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print("=" * 60)
+    print(f"Optimizer analytics over {ROWS:,} evaluations, {len(MODELS)} models")
+    print("=" * 60)
+    evaluations, _ = timed("build ModelEvaluation objects", lambda: make_evaluations(rng))
+
+    _, baseline = timed("dict of lists + statistics", lambda: lists_and_statistics(evaluations))
+    timed("PerformanceAccumulator (per row)", lambda: PerformanceAccumulator().update(evaluations).metrics())
+    columns, load = timed("load columns", lambda: EvaluationColumns.from_evaluations(evaluations))
+    _, aggregate = timed("grouped_metrics (columnar)", lambda: grouped_metrics(columns))
+    timed("percentiles (quality+latency+cost)",
+          lambda: [grouped_percentiles(columns, f) for f in ("quality", "latency", "cost")])
+    timed("bootstrap CI, quality, 200 resamples", lambda: bootstrap_ci(columns, "quality", resamples=200, seed=0))
+
+    print(f"\nAggregation speedup on loaded columns: {baseline / aggregate:.0f}x "
+          f"({baseline / (load + aggregate):.1f}x including the load)")
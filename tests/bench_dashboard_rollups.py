@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark get_dashboard_data over 10M completions
+Bulk-loads prompts, completions and quality evaluations into a scratch
+database, then compares the original full-scan dashboard queries with the
+rollup-backed get_dashboard_data. Also times rebuild_rollups and the cost
+the rollup triggers add to inserts.
+
+Run from the repo root: python tests/bench_dashboard_rollups.py [completions]
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import database
+
+COMPLETIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+MODELS = ["GPT-4o", "GPT-4o-mini", "Claude-3.5-Sonnet", "Claude-3-Haiku", "Gemini-1.5-Flash"]
+TRIGGERS = ["completions_rollup_insert", "completions_rollup_delete", "quality_evaluations_rollup_insert",
+            "quality_evaluations_rollup_delete", "prompts_counter_insert", "prompts_counter_delete"]
+REPEATS = 5
+
+
+def timed(label: str, fn, repeats: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeats
+    print(f"{label:<38} {elapsed:10.4f}s")
+    return result, elapsed
+
+
+def _models_case(column: str) -> str:
+    return "CASE " + " ".join(f"WHEN {column} = {i} THEN '{m}'" for i, m in enumerate(MODELS)) + " END"
+
+
+def bulk_load(conn: sqlite3.Connection, completions: int):
+    """Rows generated inside SQLite, one completion (and evaluation) per prompt and model"""
+    prompts = completions // len(MODELS)
+    series = f"WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < {prompts})"
+    conn.execute(f"""{series}
+        INSERT INTO prompts (prompt_id, content, use_case, created_at)
+        SELECT 'p' || i, 'prompt ' || i, 'general', datetime('now', '-' || (i % 90) || ' days') FROM n""")
+    conn.execute(f"""{series}, m(j) AS (SELECT 0 UNION ALL SELECT j + 1 FROM m WHERE j + 1 < {len(MODELS)})
+        INSERT INTO completions (prompt_id, model_name, completion, latency_ms, cost, success, is_refusal,
+                                 timestamp)
+        SELECT 'p' || i, {_models_case("j")}, 'x', 100 + abs(random() % 2900), (j + 1) * 0.0005,
+               abs(random() % 100) >= 3, abs(random() % 100) < 1, datetime('now', '-' || (i % 90) || ' days')
+        FROM n, m""")
+    conn.execute("""
+        INSERT INTO quality_evaluations (prompt_id, model_name, overall_score, evaluated_at)
+        SELECT prompt_id, model_name, 40 + abs(random() % 61), timestamp FROM completions WHERE success = 1""")
+    conn.commit()
+
+
+def legacy_dashboard(db_path: Path):
+    """The full-scan aggregates get_dashboard_data ran before the rollups"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("SELECT COUNT(DISTINCT prompt_id) FROM prompts").fetchall()
+    conn.execute("SELECT COUNT(*) FROM completions WHERE success = 1").fetchall()
+    conn.execute("""SELECT model_name, COUNT(*), SUM(CASE WHEN is_refusal = 1 THEN 1 ELSE 0 END),
+                           SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END)
+                    FROM completions GROUP BY model_name""").fetchall()
+    conn.execute("SELECT model_name, AVG(overall_score), COUNT(*) FROM quality_evaluations GROUP BY model_name"
+                 ).fetchall()
+    conn.execute("""SELECT model_name, SUM(cost), AVG(latency_ms) FROM completions WHERE success = 1
+                    GROUP BY model_name""").fetchall()
+    conn.execute("SELECT * FROM recommendations ORDER BY created_at DESC LIMIT 10").fetchall()
+    conn.execute("""SELECT p.prompt_id, p.content, p.use_case, p.created_at, GROUP_CONCAT(c.model_name)
+                    FROM prompts p LEFT JOIN completions c ON p.prompt_id = c.prompt_id
+                    GROUP BY p.prompt_id ORDER BY p.created_at DESC LIMIT 20""").fetchall()
+    conn.close()
+
+
+def insert_rate(db_path: Path, rows: int = 100_000) -> float:
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO completions (prompt_id, model_name, completion, latency_ms, cost, success) "
+        "VALUES (?, ?, 'x', 250, 0.001, 1)",
+        ((f"w{i}", MODELS[i % len(MODELS)]) for i in range(rows)))
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.execute("DELETE FROM completions WHERE prompt_id LIKE 'w%'")
+    conn.commit()
+    conn.close()
+    return elapsed / rows * 1e6
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as scratch:
+        database.DB_PATH = Path(scratch) / "bench.db"
+        database.init_db()
+        print("=" * 60)
+        print(f"Dashboard over {COMPLETIONS:,} completions, {len(MODELS)} models")
+        print("=" * 60)
+
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("PRAGMA journal_mode = WAL")
+        for trigger in TRIGGERS:
+            conn.execute(f"DROP TRIGGER {trigger}")
+        timed("bulk load (triggers off)", lambda: bulk_load(conn, COMPLETIONS))
+        plain_insert = insert_rate(database.DB_PATH)
+        conn.close()
+
+        database.init_db()  # Recreates the triggers
+        timed("rebuild_rollups", database.rebuild_rollups)
+        rollup_insert = insert_rate(database.DB_PATH)
+
+        _, legacy = timed("full-scan dashboard queries", lambda: legacy_dashboard(database.DB_PATH), REPEATS)
+        data, rollups = timed("get_dashboard_data (rollups)", database.get_dashboard_data, REPEATS)
+        assert data["total_completions"] > 0 and len(data["model_costs"]) == len(MODELS)
+
+        print(f"\nInsert cost: {plain_insert:.1f}us/row plain, {rollup_insert:.1f}us/row with rollup triggers")
+        print(f"Dashboard speedup: {legacy / rollups:.0f}x ({legacy * 1000:.0f}ms -> {rollups * 1000:.1f}ms)")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark use case classification throughput and accuracy
+Compares per-keyword substring scans (first match, as in the former
+detect_use_case helpers, and counting every hit) with the compiled
+classifier, on the labelled set.
+
+Run from the repo root: python tests/bench_use_case_classifier.py
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from config import USE_CASE_KEYWORDS
+from use_case_classifier import UseCaseClassifier
+
+LABELLED_PROMPTS = Path(__file__).resolve().parent / "data" / "use_case_prompts.jsonl"
+ROUNDS = 500
+
+
+def substring_scan(prompt: str) -> str:
+    prompt_lower = prompt.lower()
+    for category, keywords in USE_CASE_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in prompt_lower:
+                return category
+    return "general"
+
+
+def substring_count(prompt: str) -> str:
+    """Per-keyword scans that count every hit, which confidence scoring needs"""
+    prompt_lower = prompt.lower()
+    scores = {c: sum(prompt_lower.count(k) for k in keywords) for c, keywords in USE_CASE_KEYWORDS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] else "general"
+
+
+def run(label: str, classify, examples) -> float:
+    prompts = [e["prompt"] for e in examples]
+    correct = sum(classify(e["prompt"]) == e["category"] for e in examples)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for prompt in prompts:
+            classify(prompt)
+    elapsed = time.perf_counter() - start
+
+    total = ROUNDS * len(prompts)
+    rate = total / elapsed
+    print(f"{label:<20} {total} prompts in {elapsed:.3f}s -> {rate:,.0f} prompts/s, "
+          f"accuracy {correct}/{len(examples)} ({correct / len(examples):.0%})")
+    return rate
+
+
+if __name__ == "__main__":
+    with open(LABELLED_PROMPTS) as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    classifier = UseCaseClassifier(mode="keyword")
+
+    print("=" * 60)
+    print("Use case classification")
+    print("=" * 60)
+    run("Substring, first hit", substring_scan, examples)
+    run("Substring, all hits", substring_count, examples)
+    run("Compiled regex", lambda p: classifier.classify(p).category, examples)
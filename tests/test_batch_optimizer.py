@@ -0,0 +1,137 @@
+"""
+Tests for fleet-wide batch optimization with shared verification
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import batch_optimizer as batch_module
+import cache_manager as cache_module
+import orchestrator
+import run_journal as journal_module
+import user_metadata as user_module
+from batch_optimizer import BatchOptimizer
+from cache_manager import CacheManager
+from models import CompletionResult, QualityScore
+from orchestrator import CostQualityOrchestrator
+from run_journal import RunJournal
+from user_metadata import UserConstraints, UserMetadata, UserMetadataService
+
+
+class FakeReplayEngine:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def replay_prompt_on_model(self, prompt, config):
+        with self._lock:
+            self.calls += 1
+        return CompletionResult(
+            model_name=config["name"], provider="openai", response="ok",
+            tokens_input=100, tokens_output=50, latency_ms=10, cost=0.001, success=True
+        )
+
+
+class FakeEvaluator:
+    def evaluate(self, prompt, completion):
+        return QualityScore(overall_score=95.0, dimension_scores={}, reasoning="",
+                            confidence=0.9, evaluator_model="fake")
+
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "opt.db")
+    monkeypatch.setattr(journal_module, "DB_PATH", tmp_path / "opt.db")
+    monkeypatch.setattr(user_module, "DB_PATH", tmp_path / "opt.db")
+    service = UserMetadataService()
+    monkeypatch.setattr(orchestrator, "user_service", service)
+    monkeypatch.setattr(batch_module, "user_service", service)
+    monkeypatch.setattr(orchestrator, "cache_manager", CacheManager())
+    return service
+
+
+def _add_user(service, user_id, current_model="gpt-4o", use_case="general", volume=10000):
+    service.create_user(UserMetadata(
+        user_id=user_id, current_model=current_model, use_case=use_case,
+        constraints=UserConstraints(), monthly_request_volume=volume
+    ))
+
+
+def _optimizer(engine, **kwargs):
+    return BatchOptimizer(CostQualityOrchestrator(engine, FakeEvaluator(), journal=RunJournal()), **kwargs)
+
+
+def test_users_are_grouped_by_model_use_case_and_conversations(users):
+    for uid in ("a", "b", "c"):
+        _add_user(users, uid)
+    _add_user(users, "coder", use_case="coding")
+    _add_user(users, "turbo", current_model="gpt-4-turbo")
+
+    groups = _optimizer(FakeReplayEngine()).group_users(
+        [users.get_user(uid) for uid in users.list_user_ids()]
+    )
+
+    assert sorted(sorted(g.user_ids) for g in groups) == [["a", "b", "c"], ["coder"], ["turbo"]]
+
+
+def test_group_is_verified_once_and_fanned_out(users, tmp_path, monkeypatch):
+    _add_user(users, "solo")
+    solo_engine = FakeReplayEngine()
+    _optimizer(solo_engine).run(["solo"])
+
+    for uid, volume in (("a", 1000), ("b", 50000), ("c", 10000)):
+        _add_user(users, uid, volume=volume)
+    # Fresh verification cache so the solo run's results are not reused
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "cache2.db")
+    monkeypatch.setattr(orchestrator, "cache_manager", CacheManager())
+    engine = FakeReplayEngine()
+    summary = _optimizer(engine).run(["a", "b", "c"])
+
+    assert engine.calls == solo_engine.calls
+    assert summary["stats"]["verifications_saved"] == 2 * summary["stats"]["verifications_run"]
+    recs = summary["users"]
+    assert {r["status"] for r in recs.values()} == {"success"}
+    # Shared verification, but each user's own business impact
+    savings = {uid: r["recommendation"]["business_impact"]["projected_monthly_savings_usd"]
+               for uid, r in recs.items()}
+    assert savings["b"] > savings["c"] > savings["a"]
+
+
+def test_progress_is_reported_until_complete(users):
+    for uid in ("a", "b"):
+        _add_user(users, uid)
+    _add_user(users, "coder", use_case="coding")
+    updates = []
+
+    summary = _optimizer(FakeReplayEngine(), max_workers=2, progress_callback=updates.append).run()
+
+    assert updates[0]["users_done"] == 0
+    assert updates[-1]["users_done"] == 3
+    assert updates[-1]["groups_done"] == 2
+    assert updates[-1]["percent_complete"] == 100
+    assert summary["stats"]["failed_users"] == 0
+
+
+def test_each_group_runs_on_its_own_orchestrator(users, monkeypatch):
+    for uid in ("a", "b"):
+        _add_user(users, uid)
+    _add_user(users, "coder", use_case="coding")
+    ran_on = {}
+    run_optimization = CostQualityOrchestrator.run_optimization
+
+    def recording(self, user_id, **kwargs):
+        ran_on[user_id] = self
+        return run_optimization(self, user_id, **kwargs)
+
+    monkeypatch.setattr(CostQualityOrchestrator, "run_optimization", recording)
+    optimizer = _optimizer(FakeReplayEngine(), max_workers=2)
+    optimizer.run()
+
+    assert ran_on["a"] is ran_on["b"]
+    assert ran_on["coder"] is not ran_on["a"]
+    assert optimizer.orchestrator not in ran_on.values()
+    assert ran_on["coder"].last_run.discovery["user"]["use_case"] == "coding"
@@ -0,0 +1,98 @@
+"""
+Tests for bootstrap confidence intervals behind recommendations
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache_manager as cache_module
+from bootstrap_stats import BootstrapEngine
+from cache_manager import CacheManager
+from models import CompletionResult, ModelEvaluation, QualityScore
+from optimizer import CostQualityOptimizer
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "cache.db")
+    return BootstrapEngine(resamples=500, workers=1, cache=CacheManager())
+
+
+def _samples(seed=0, n=200):
+    rng = np.random.default_rng(seed)
+    baseline = (rng.normal(88, 6, n), rng.normal(0.010, 0.002, n))
+    candidate = (rng.normal(85, 6, n), rng.normal(0.002, 0.0005, n))
+    return baseline, candidate
+
+
+def test_compare_brackets_the_effect_of_switching(engine):
+    (bq, bc), (cq, cc) = _samples()
+    result = engine.compare(bq, bc, cq, cc)
+
+    impact = result["quality_impact_percent"]
+    assert impact["low"] < impact["estimate"] < impact["high"]
+    assert impact["high"] < 0  # The candidate is clearly a little worse
+    assert result["cost_reduction_percent"]["low"] > 70
+    assert result["probability_better"] == 1.0
+    assert result["samples"] == {"baseline": 200, "candidate": 200}
+
+    # Swapping the roles makes the switch a clear loss
+    assert engine.compare(cq, cc, bq, bc)["probability_better"] == 0.0
+
+
+def test_results_are_cached_by_fingerprint(engine):
+    (bq, bc), (cq, cc) = _samples()
+    first = engine.compare(bq, bc, cq, cc)
+    again = engine.compare(bq.copy(), bc.copy(), cq.copy(), cc.copy())
+    assert again == first
+    assert (engine.computed, engine.cache_hits) == (1, 1)
+
+    engine.compare(bq, bc, cq, cc * 1.01)
+    assert engine.computed == 2
+
+
+def test_pool_and_in_process_resampling_agree():
+    groups = [np.random.default_rng(1).normal(80, 10, 20000)]
+    serial = BootstrapEngine(resamples=1000, workers=1, cache=None)
+    parallel = BootstrapEngine(resamples=1000, workers=2, parallel_min_work=0, cache=None)
+    try:
+        assert np.array_equal(serial.resample_means(groups, seed=7), parallel.resample_means(groups, seed=7))
+        assert parallel.parallel_runs == 1
+    finally:
+        parallel.shutdown()
+
+
+def test_mean_ci_reports_probability_above_threshold(engine):
+    values = np.random.default_rng(2).normal(90, 4, 60)
+    result = engine.mean_ci(values, threshold=85.0)
+    assert result["low"] < values.mean() < result["high"]
+    assert result["probability_above"] == 1.0
+    assert engine.mean_ci(values, threshold=90.5)["probability_above"] < 0.9
+
+
+def test_paired_comparison_needs_aligned_arrays(engine):
+    with pytest.raises(ValueError):
+        engine.compare([1, 2], [1, 2], [1, 2, 3], [1, 2, 3], paired=True)
+
+
+def test_recommendation_confidence_comes_from_bootstrap(engine):
+    (bq, bc), (cq, cc) = _samples(n=40)
+    evaluations = []
+    for i in range(40):
+        for model, quality, cost in (("GPT-4o", bq[i], bc[i]), ("GPT-4o-mini", cq[i], cc[i])):
+            completion = CompletionResult(model_name=model, provider="openai", response="x", tokens_input=1,
+                                          tokens_output=1, latency_ms=100, cost=float(cost), success=True)
+            score = QualityScore(overall_score=float(quality), dimension_scores={}, reasoning="",
+                                 confidence=1, evaluator_model="judge")
+            evaluations.append(ModelEvaluation(f"p{i}", model, completion, score, cost / quality))
+
+    recommendation = CostQualityOptimizer(bootstrap=engine).recommend_optimization("GPT-4o", evaluations)
+
+    assert recommendation.recommended_model == "GPT-4o-mini"
+    assert recommendation.metrics["confidence_method"] == "bootstrap"
+    assert recommendation.confidence_score == recommendation.metrics["bootstrap"]["probability_better"]
+    assert "bootstrap intervals" in recommendation.reasoning
@@ -0,0 +1,218 @@
+"""
+Tests for the two-tier CacheManager (in-process L1 over the SQLite cache table)
+"""
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache_manager as cache_module
+from cache_manager import CacheManager
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "cache.db")
+    return CacheManager(l1_max_entries=4, l1_ttl_seconds=60,
+                        hit_flush_interval=3600, hit_flush_threshold=1000)
+
+
+def _row(key):
+    conn = sqlite3.connect(cache_module.DB_PATH)
+    row = conn.execute("SELECT hit_count FROM cache WHERE cache_key = ?", (key,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_hot_reads_are_served_from_l1_without_sqlite(cache, monkeypatch):
+    cache.set("k", {"answer": 42})
+
+    def fail(*args, **kwargs):
+        raise AssertionError("SQLite should not be touched on an L1 hit")
+
+    monkeypatch.setattr(cache_module.sqlite3, "connect", fail)
+    assert cache.get("k") == {"answer": 42}
+    assert cache.get("k") == {"answer": 42}
+
+
+def test_l1_returns_independent_copies(cache):
+    cache.set("k", {"items": [1]})
+    first = cache.get("k")
+    first["items"].append(2)
+    assert cache.get("k") == {"items": [1]}
+
+
+def test_hit_counts_are_aggregated_and_flushed(cache):
+    cache.set("k", "v")
+    for _ in range(5):
+        cache.get("k")
+
+    assert _row("k")[0] == 0
+    assert cache.flush_hit_counts() == 1
+    assert _row("k")[0] == 5
+
+
+def test_version_change_is_checked_in_memory(cache):
+    cache.set("k", "v")
+    cache.registry_version = "2.0.0"
+    assert cache.get("k") is None
+    assert _row("k") is None
+
+
+def test_l2_is_read_through_into_l1(cache):
+    cache.set("k", "v")
+    cache._l1.clear()
+
+    assert cache.get("k") == "v"
+    assert "k" in cache._l1
+
+
+def test_lru_evicts_least_recently_used(cache):
+    for i in range(4):
+        cache.set(f"k{i}", i)
+    cache.get("k0")
+    cache.set("k4", 4)
+
+    assert "k0" in cache._l1
+    assert "k1" not in cache._l1
+    # Evicted entries are still served from SQLite
+    assert cache.get("k1") == 1
+
+
+def test_invalidate_removes_both_tiers(cache):
+    cache.set("k", "v")
+    assert cache.invalidate("k")
+    assert cache.get("k") is None
+
+
+def _log():
+    conn = sqlite3.connect(cache_module.DB_PATH)
+    row = conn.execute("""
+        SELECT invalidation_type, affected_keys FROM cache_invalidation_log
+        ORDER BY id DESC LIMIT 1
+    """).fetchone()
+    conn.close()
+    return row
+
+
+def test_prefix_invalidation_only_touches_matching_keys(cache):
+    output_key = cache.generate_key("model_output", model_id="a")
+    nested_key = cache.generate_key("model_output:v2", model_id="a")
+    eval_key = cache.generate_key("evaluation", model_id="a")
+    lookalike_key = cache.generate_key("model_outputs", model_id="a")
+    for key in (output_key, nested_key, eval_key, lookalike_key):
+        cache.set(key, key)
+
+    assert cache.invalidate_by_prefix("model_output") == 2
+    assert _log() == ("prefix_invalidation", 2)
+    assert cache.get(output_key) is None
+    assert cache.get(nested_key) is None
+    assert cache.get(eval_key) == eval_key
+    assert cache.get(lookalike_key) == lookalike_key
+
+
+def test_tag_invalidation_is_scoped_to_one_user(cache):
+    alice = cache.generate_key("model_output", model_id="a", conversation_hash="1")
+    bob = cache.generate_key("model_output", model_id="a", conversation_hash="2")
+    cache.set(alice, "alice", tags=["user:alice", "model:a"])
+    cache.set(bob, "bob", tags=["user:bob", "model:a"])
+
+    assert cache.invalidate_by_tag("user:alice") == 1
+    assert _log() == ("tag_invalidation", 1)
+    assert cache.get(alice) is None
+    assert cache.get(bob) == "bob"
+    assert cache.invalidate_by_tag("user:alice") == 0
+
+
+def test_shared_entry_keeps_every_users_tag(cache):
+    shared = cache.generate_key("model_output", model_id="a", conversation_hash="1")
+    cache.set(shared, "v1", tags=["user:alice", "model:a"])
+    cache.set(shared, "v2", tags=["user:bob", "model:a"])
+
+    assert cache.invalidate_by_tag("user:alice") == 1
+    assert cache.get(shared) is None
+
+
+def test_version_change_drops_entries_built_from_old_version(cache):
+    cache.set("model_output:x", "x")
+    assert cache.invalidate_on_version_change("pricing", "2025-01") == 1
+    assert _log() == ("tag_invalidation", 1)
+
+
+def test_stale_entry_is_served_while_refreshing_in_background(cache):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return f"v{len(loads)}"
+
+    value, status = cache.get_or_refresh("k", loader, ttl_seconds=0, stale_ttl_seconds=60)
+    assert (value, status) == ("v1", "loaded")
+
+    # Past TTL: the old value comes back immediately and one refresh is queued
+    assert cache.get_or_refresh("k", loader, ttl_seconds=60) == ("v1", "stale")
+    assert cache._refresher.wait(5)
+    assert cache.get_or_refresh("k", loader) == ("v2", "fresh")
+
+    stats = cache.get_stats()
+    assert stats["stale_served"] == 1
+    assert stats["refresh_completed"] == 1
+    assert stats["max_refresh_lag_seconds"] >= 0
+
+
+def test_background_refresh_can_use_its_own_loader(cache):
+    cache.set("k", "old", ttl_seconds=0, stale_ttl_seconds=60)
+
+    def inline():
+        raise AssertionError("inline loader used for a background refresh")
+
+    assert cache.get_or_refresh("k", inline, refresh_loader=lambda: "refreshed") == ("old", "stale")
+    assert cache._refresher.wait(5)
+    assert cache.get("k") == "refreshed"
+
+
+def test_concurrent_stale_reads_share_one_refresh(cache):
+    release = threading.Event()
+    cache.set("k", "old", ttl_seconds=0, stale_ttl_seconds=60)
+
+    def slow_loader():
+        release.wait(5)
+        return "new"
+
+    for _ in range(3):
+        assert cache.get_or_refresh("k", slow_loader) == ("old", "stale")
+    release.set()
+    assert cache._refresher.wait(5)
+
+    stats = cache.get_stats()
+    assert stats["refresh_queued"] == 1
+    assert stats["refresh_deduplicated"] == 2
+    assert cache.get("k") == "new"
+
+
+def test_plain_get_ignores_stale_entries_unless_allowed(cache):
+    cache.set("k", "old", ttl_seconds=0, stale_ttl_seconds=60)
+    assert cache.get("k") is None
+    assert cache.get("k", allow_stale=True) == "old"
+
+
+def test_conversation_cache_soft_and_hard_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "cache.db")
+    conv = cache_module.ConversationCache(soft_ttl_seconds=0, hard_ttl_seconds=3600)
+    conv.cache_output("h", "m", "old", 80.0, 0.01, 100.0)
+
+    def loader():
+        return {"output": "new", "quality_score": 90.0, "cost": 0.02, "latency_ms": 50.0}
+
+    entry, status = conv.get_or_refresh_output("h", "m", loader)
+    assert (entry["output"], status) == ("old", "stale")
+    assert conv._refresher.wait(5)
+    assert conv.get_cached_output("h", "m")["output"] == "new"
+    assert conv.get_stats()["refresh_completed"] == 1
+
+    conv.hard_ttl_seconds = -1
+    assert conv.get_cached_output("h", "m") is None
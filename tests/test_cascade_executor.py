@@ -0,0 +1,122 @@
+"""
+Tests for the cheapest-first cascade executor
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from cascade_executor import CascadeExecutor, model_ladder
+from models import CompletionResult, PromptData, QualityScore
+
+GOOD = "A list is mutable while a tuple is immutable, so tuples can be dictionary keys."
+
+LADDER = [
+    {"name": "Cheap", "model": "@test/cheap", "expected_cost_per_1k_input": 0.0001,
+     "expected_cost_per_1k_output": 0.0002, "max_tokens": 100},
+    {"name": "Mid", "model": "@test/mid", "expected_cost_per_1k_input": 0.001,
+     "expected_cost_per_1k_output": 0.002, "max_tokens": 100},
+    {"name": "Premium", "model": "@test/premium", "expected_cost_per_1k_input": 0.01,
+     "expected_cost_per_1k_output": 0.02, "max_tokens": 100},
+]
+
+
+class FakeReplayEngine:
+    """Returns scripted answers per model and records the call order"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def replay_prompt_on_model(self, prompt, model_config):
+        name = model_config["name"]
+        self.calls.append(name)
+        response, kwargs = self.answers.get(name, (GOOD, {}))
+        fields = dict(tokens_input=1000, tokens_output=50, success=True, is_refusal=False)
+        fields.update(kwargs)
+        cost = (fields["tokens_input"] / 1000 * model_config["expected_cost_per_1k_input"] +
+                fields["tokens_output"] / 1000 * model_config["expected_cost_per_1k_output"])
+        return CompletionResult(model_name=name, provider="test", response=response,
+                                latency_ms=100, cost=cost if fields["success"] else 0, **fields)
+
+
+class FakeEvaluator:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def evaluate(self, prompt, completion):
+        return QualityScore(overall_score=self.scores[completion.model_name], dimension_scores={},
+                            reasoning="", confidence=0.9, evaluator_model="fake")
+
+
+def _prompt(text="What is the difference between a list and a tuple?"):
+    return PromptData(id="p1", messages=[{"role": "user", "content": text}], original_model="test")
+
+
+def test_ladder_is_cheapest_rank_first():
+    ladder = model_ladder()
+    assert ladder[0]["model"] == "@openai/gpt-4o-mini"
+    assert ladder[-1]["model"] == "@openai/gpt-4-turbo"
+
+
+def test_stops_at_first_accepted_answer():
+    engine = FakeReplayEngine({})
+    result = CascadeExecutor(engine, ladder=LADDER).run(_prompt())
+
+    assert engine.calls == ["Cheap"]
+    assert result.accepted and result.completion.model_name == "Cheap"
+    assert result.fan_out_cost > result.cost
+
+
+@pytest.mark.parametrize("answer, reason", [
+    (("", {"success": False}), "call_failed"),
+    (("ok", {}), "too_short"),
+    ((GOOD, {"tokens_output": 100}), "truncated"),
+    (("I cannot help with that request, it is against my policy.", {"is_refusal": True}), "refusal"),
+    (("I don't have information about events after my training data ends.", {}), "knowledge_limit"),
+])
+def test_verifier_rejections_escalate(answer, reason):
+    engine = FakeReplayEngine({"Cheap": answer})
+    result = CascadeExecutor(engine, ladder=LADDER).run(_prompt())
+
+    assert engine.calls == ["Cheap", "Mid"]
+    assert result.steps[0].reason == reason
+    assert result.completion.model_name == "Mid"
+
+
+def test_judge_rejection_escalates_to_next_model():
+    engine = FakeReplayEngine({})
+    evaluator = FakeEvaluator({"Cheap": 40, "Mid": 65, "Premium": 90})
+    result = CascadeExecutor(engine, evaluator, ladder=LADDER, judge_min_quality=70).run(_prompt())
+
+    assert [s.reason for s in result.steps] == ["judge_rejected", "judge_rejected", "judge_accepted"]
+    assert result.quality.overall_score == 90
+    assert result.fan_out_cost == pytest.approx(result.cost)
+
+
+def test_nothing_accepted_returns_last_successful_answer():
+    short = ("no", {})
+    engine = FakeReplayEngine({"Cheap": short, "Mid": short, "Premium": ("", {"success": False})})
+    result = CascadeExecutor(engine, ladder=LADDER).run(_prompt())
+
+    assert not result.accepted
+    assert result.completion.model_name == "Mid"
+    assert result.models_tried == 3
+
+
+def test_stats_report_models_tried_and_savings():
+    engine = FakeReplayEngine({"Cheap": ("ok", {})})
+    executor = CascadeExecutor(engine, ladder=LADDER)
+    executor.run(_prompt())
+    engine.answers = {}
+    executor.run(_prompt())
+
+    stats = executor.get_stats()
+    assert stats["requests"] == 2
+    assert stats["avg_models_tried"] == 1.5
+    assert stats["fan_out_models"] == 3
+    assert stats["cost_saved_usd"] > 0
+    assert stats["accepted_by_model"] == {"Cheap": 1, "Mid": 1}
+    assert stats["rejections"] == {"too_short": 1}
@@ -0,0 +1,95 @@
+"""
+Tests for the vectorized (columnar) optimizer analytics
+"""
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from columnar_analytics import (
+    EvaluationColumns, bootstrap_ci, grouped_metrics, grouped_percentiles
+)
+from models import CompletionResult, ModelEvaluation, QualityScore
+from optimizer import CostQualityOptimizer
+from running_stats import PerformanceAccumulator
+
+
+def _evaluation(i, model, quality, cost, success=True, latency=100.0):
+    completion = CompletionResult(model_name=model, provider="openai", response="x", tokens_input=1,
+                                  tokens_output=1, latency_ms=latency, cost=cost, success=success)
+    score = QualityScore(overall_score=quality, dimension_scores={}, reasoning="", confidence=1,
+                         evaluator_model="judge")
+    return ModelEvaluation(f"p{i}", model, completion, score, cost / quality)
+
+
+def _history(n=300, seed=0):
+    rng = random.Random(seed)
+    evaluations = []
+    for i in range(n):
+        model = rng.choice(["GPT-4o", "GPT-4o-mini", "Claude-3-Haiku"])
+        evaluations.append(_evaluation(i, model, rng.uniform(40, 100), rng.uniform(0.0001, 0.01),
+                                       success=rng.random() > 0.1, latency=rng.uniform(100, 2000)))
+    evaluations.append(_evaluation(n, "Broken", 50.0, 0.01, success=False))
+    return evaluations
+
+
+def test_grouped_metrics_match_incremental_accumulator():
+    evaluations = _history()
+    columnar = grouped_metrics(EvaluationColumns.from_evaluations(evaluations))
+    incremental = PerformanceAccumulator().update(evaluations).metrics()
+
+    assert set(columnar) == set(incremental)
+    for model, values in incremental.items():
+        assert columnar[model] == pytest.approx(values)
+    assert columnar["Broken"]["success_rate"] == 0
+    assert grouped_metrics(EvaluationColumns.from_evaluations([])) == {}
+
+
+def test_records_and_evaluations_load_the_same_columns():
+    evaluations = _history(50)
+    from_objects = EvaluationColumns.from_evaluations(evaluations)
+    from_records = EvaluationColumns.from_records(e.to_dict() for e in evaluations)
+
+    assert from_records.models == from_objects.models
+    assert np.array_equal(from_records.model_code, from_objects.model_code)
+    assert np.array_equal(from_records.quality, from_objects.quality)
+
+
+def test_percentiles_match_numpy_per_model():
+    evaluations = _history(1000)
+    columns = EvaluationColumns.from_evaluations(evaluations)
+    report = grouped_percentiles(columns, "latency", (5, 50, 99))
+
+    for model in ("GPT-4o", "GPT-4o-mini", "Claude-3-Haiku"):
+        latencies = [e.completion.latency_ms for e in evaluations
+                     if e.model_name == model and e.completion.success]
+        assert report[model]["p5"] == pytest.approx(np.percentile(latencies, 5))
+        assert report[model]["p50"] == pytest.approx(np.percentile(latencies, 50))
+        assert report[model]["p99"] == pytest.approx(np.percentile(latencies, 99))
+    assert "Broken" not in report
+
+
+def test_bootstrap_interval_covers_mean_and_narrows_with_data():
+    rng = np.random.default_rng(4)
+
+    def width(n):
+        columns = EvaluationColumns.from_arrays(["M"] * n, np.full(n, 0.001), rng.normal(80, 10, n),
+                                                np.full(n, 100.0), np.ones(n, dtype=bool))
+        ci = bootstrap_ci(columns, "quality", resamples=400, seed=1)["M"]
+        assert ci["low"] < ci["mean"] < ci["high"]
+        return ci["high"] - ci["low"]
+
+    assert width(4000) < width(100) / 3
+
+
+def test_optimizer_analyze_columns_adds_percentiles_and_cis():
+    columns = EvaluationColumns.from_evaluations(_history(200))
+    metrics = CostQualityOptimizer().analyze_columns(columns, percentiles=(50,), bootstrap_resamples=100)
+
+    assert set(metrics["GPT-4o"]["quality_percentiles"]) == {"p50"}
+    assert metrics["GPT-4o"]["cost_ci"]["low"] <= metrics["GPT-4o"]["avg_cost"] <= metrics["GPT-4o"]["cost_ci"]["high"]
+    assert "latency_ci" not in metrics["Broken"]
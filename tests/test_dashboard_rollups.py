@@ -0,0 +1,141 @@
+"""
+Tests for the materialized rollups behind get_dashboard_data
+"""
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import database
+from database import (
+    get_dashboard_data, rebuild_rollups, save_completion, save_prompt, save_quality_evaluation
+)
+
+MODELS = ["GPT-4o", "GPT-4o-mini", "Claude-3-Haiku"]
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "dashboard.db")
+    database.init_db()
+
+
+def _populate(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        save_prompt(f"p{i}", f"prompt {i}", rng.choice(["code", "qa"]))
+        for model in MODELS:
+            success = rng.random() > 0.1
+            save_completion(f"p{i}", model, {
+                "completion": "x", "latency_ms": rng.uniform(100, 900), "cost": rng.uniform(0.0001, 0.01),
+                "success": success, "is_refusal": not success and rng.random() > 0.5
+            })
+            if success:
+                save_quality_evaluation(f"p{i}", model, {"overall_score": rng.randint(50, 100)})
+
+
+def _scanned():
+    """The per-model figures computed straight from the base tables"""
+    conn = sqlite3.connect(database.DB_PATH)
+    reliability = {m: (t, r, f) for m, t, r, f in conn.execute("""
+        SELECT model_name, COUNT(*), SUM(is_refusal = 1), SUM(success = 0) FROM completions GROUP BY model_name
+    """)}
+    quality = {m: (avg, n) for m, avg, n in conn.execute(
+        "SELECT model_name, AVG(overall_score), COUNT(*) FROM quality_evaluations GROUP BY model_name")}
+    costs = {m: (total, latency) for m, total, latency in conn.execute(
+        "SELECT model_name, SUM(cost), AVG(latency_ms) FROM completions WHERE success = 1 GROUP BY model_name")}
+    prompts = conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+    successes = conn.execute("SELECT COUNT(*) FROM completions WHERE success = 1").fetchone()[0]
+    conn.close()
+    return prompts, successes, reliability, quality, costs
+
+
+def _assert_matches_scan(data):
+    prompts, successes, reliability, quality, costs = _scanned()
+    assert data["total_prompts"] == prompts
+    assert data["total_completions"] == successes
+    assert {m: (v["total"], v["refusals"], v["failures"]) for m, v in data["model_reliability"].items()} == reliability
+    assert set(data["model_quality"]) == set(quality)
+    for model, (avg, n) in quality.items():
+        assert data["model_quality"][model]["avg_score"] == pytest.approx(avg)
+        assert data["model_quality"][model]["count"] == n
+    assert set(data["model_costs"]) == set(costs)
+    for model, (total, latency) in costs.items():
+        assert data["model_costs"][model]["total_cost"] == pytest.approx(total)
+        assert data["model_costs"][model]["avg_latency"] == pytest.approx(latency)
+
+
+def test_rollups_track_every_write():
+    _populate(40)
+    data = get_dashboard_data()
+    _assert_matches_scan(data)
+    assert data["total_prompts"] == 40
+
+    # Re-saving a known prompt is ignored and must not bump the counter
+    save_prompt("p0", "again")
+    assert get_dashboard_data()["total_prompts"] == 40
+
+
+def test_deletes_are_subtracted():
+    _populate(20)
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("DELETE FROM completions WHERE model_name = 'GPT-4o-mini' AND id % 2 = 0")
+    conn.execute("DELETE FROM quality_evaluations WHERE model_name = 'GPT-4o'")
+    conn.execute("DELETE FROM prompts WHERE prompt_id IN ('p1', 'p2')")
+    conn.commit()
+    conn.close()
+
+    data = get_dashboard_data()
+    _assert_matches_scan(data)
+    assert "GPT-4o" not in data["model_quality"]
+
+
+def test_rebuild_reproduces_incremental_rollups():
+    _populate(30, seed=4)
+    incremental = get_dashboard_data()
+
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("UPDATE model_rollups SET success_cost = 0, completions = 1")
+    conn.execute("DELETE FROM model_daily_rollups")
+    conn.commit()
+    conn.close()
+
+    assert rebuild_rollups() == {"models": 3, "model_days": 3}
+    rebuilt = get_dashboard_data()
+    _assert_matches_scan(rebuilt)
+    assert rebuilt["model_reliability"] == incremental["model_reliability"]
+    assert [(d["day"], d["model_name"], d["completions"]) for d in rebuilt["daily"]] == \
+        [(d["day"], d["model_name"], d["completions"]) for d in incremental["daily"]]
+
+
+def test_daily_rollup_splits_by_day():
+    save_prompt("p", "prompt")
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("""INSERT INTO completions (prompt_id, model_name, completion, cost, latency_ms, success, timestamp)
+                    VALUES ('p', 'GPT-4o', 'x', 0.5, 100, 1, datetime('now', '-2 days'))""")
+    conn.commit()
+    conn.close()
+    save_completion("p", "GPT-4o", {"cost": 0.25, "latency_ms": 300, "success": True})
+
+    daily = [d for d in get_dashboard_data()["daily"] if d["model_name"] == "GPT-4o"]
+    assert [d["total_cost"] for d in daily] == [0.5, 0.25]
+    assert daily[0]["day"] < daily[1]["day"]
+    assert get_dashboard_data()["model_costs"]["GPT-4o"] == {"total_cost": 0.75, "avg_latency": 200}
+
+
+def test_existing_database_is_backfilled(tmp_path, monkeypatch):
+    legacy = tmp_path / "legacy.db"
+    conn = sqlite3.connect(legacy)
+    conn.execute("CREATE TABLE prompts (prompt_id TEXT PRIMARY KEY, content TEXT, use_case TEXT, "
+                 "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO prompts (prompt_id, content) VALUES ('old', 'before rollups')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, "DB_PATH", legacy)
+    database.init_db()
+    assert get_dashboard_data()["total_prompts"] == 1
@@ -0,0 +1,101 @@
+"""
+Tests for the append-only evaluation store behind StateManager
+"""
+import json
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from evaluation_store import EvaluationCacheLog, EvaluationLog, compact
+from models import CompletionResult, ModelEvaluation, QualityScore
+from state_manager import StateManager
+
+
+def _evaluation(prompt_id, model="GPT-4o-mini", score=80.0):
+    completion = CompletionResult(model_name=model, provider="openai", response="answer",
+                                  tokens_input=10, tokens_output=20, latency_ms=300,
+                                  cost=0.0001, success=True)
+    quality = QualityScore(overall_score=score, dimension_scores={}, reasoning="",
+                           confidence=0.9, evaluator_model="judge")
+    return ModelEvaluation(prompt_id=prompt_id, model_name=model, completion=completion,
+                           quality=quality, cost_quality_ratio=0.0001 / score)
+
+
+def _manager(tmp_path):
+    return StateManager(state_file=tmp_path / "replay_state.json",
+                        results_file=tmp_path / "optimization_results.jsonl",
+                        cache_file=tmp_path / "evaluation_cache.jsonl",
+                        index_file=tmp_path / "processed_prompts.db")
+
+
+def test_save_appends_without_rewriting_history(tmp_path):
+    manager = _manager(tmp_path)
+    manager.save_evaluations([_evaluation("p1"), _evaluation("p2")])
+    first_bytes = manager.results_file.read_bytes()
+    manager.save_evaluations([_evaluation("p3")])
+
+    assert manager.results_file.read_bytes().startswith(first_bytes)
+    assert [e["prompt_id"] for e in manager.load_evaluations()] == ["p1", "p2", "p3"]
+
+
+def test_load_evaluations_is_a_generator(tmp_path):
+    manager = _manager(tmp_path)
+    assert isinstance(manager.load_evaluations(), types.GeneratorType)
+    assert list(manager.load_evaluations()) == []
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    log = EvaluationLog(tmp_path / "results.jsonl")
+    log.append([{"prompt_id": "p1"}])
+    with open(log.path, "a") as f:
+        f.write('{"prompt_id": "p2", "mod')
+
+    assert [r["prompt_id"] for r in log] == ["p1"]
+
+
+def test_cache_last_write_wins_and_survives_reload(tmp_path):
+    manager = _manager(tmp_path)
+    manager.save_to_cache("p1", "GPT-4o", {"score": 70})
+    manager.save_to_cache("p1", "GPT-4o", {"score": 85})
+
+    reloaded = _manager(tmp_path)
+    assert reloaded.get_evaluation_cache("p1", "GPT-4o") == {"score": 85}
+    assert reloaded.get_evaluation_cache("p2", "GPT-4o") is None
+
+
+def test_cache_compaction_drops_superseded_lines(tmp_path):
+    cache = EvaluationCacheLog(tmp_path / "cache.jsonl")
+    for score in range(5):
+        cache.put("p1:GPT-4o", {"score": score})
+    cache.put("p2:GPT-4o", {"score": 1})
+
+    assert cache.compact() == 4
+    assert len(cache.path.read_text().splitlines()) == 2
+    assert EvaluationCacheLog(cache.path).get("p1:GPT-4o") == {"score": 4}
+
+
+def test_compact_migrates_legacy_json_files(tmp_path):
+    results = tmp_path / "optimization_results.jsonl"
+    cache = tmp_path / "evaluation_cache.jsonl"
+    (tmp_path / "optimization_results.json").write_text(
+        json.dumps([_evaluation("old1").to_dict(), _evaluation("old2").to_dict()], indent=2))
+    (tmp_path / "evaluation_cache.json").write_text(
+        json.dumps({"old:GPT-4o": {"score": 1}, "p1:GPT-4o": {"score": 2}}, indent=2))
+    EvaluationCacheLog(cache).put("p1:GPT-4o", {"score": 3})  # Newer than the legacy entry
+
+    summary = compact(results, cache)
+
+    assert summary["evaluations_migrated"] == 2
+    assert summary["cache_entries_migrated"] == 2
+    assert not (tmp_path / "optimization_results.json").exists()
+    assert (tmp_path / "optimization_results.json.migrated").exists()
+
+    manager = _manager(tmp_path)
+    assert [e["prompt_id"] for e in manager.load_evaluations()] == ["old1", "old2"]
+    assert manager.get_evaluation_cache("old", "GPT-4o") == {"score": 1}
+    assert manager.get_evaluation_cache("p1", "GPT-4o") == {"score": 3}
+
+    # Running it again is a no-op
+    assert compact(results, cache)["evaluations_migrated"] == 0
@@ -0,0 +1,210 @@
+"""
+Tests for the SQLite-backed background job queue
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import job_queue as job_module
+from job_queue import JobQueue, JobStatus
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_module, "DB_PATH", tmp_path / "jobs.db")
+
+
+def _wait_for(queue, job_id, statuses=(JobStatus.COMPLETED, JobStatus.FAILED), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {queue.get_job(job_id)['status']}")
+
+
+def test_job_runs_and_records_progress():
+    queue = JobQueue("test", max_workers=1, poll_seconds=0.05)
+
+    def handler(payload, report):
+        report(0.5, "halfway")
+        return {"echo": payload["value"]}
+
+    queue.register("echo", handler)
+    queue.start()
+    job_id, deduplicated = queue.submit("echo", {"value": 42})
+    job = _wait_for(queue, job_id)
+    queue.stop()
+
+    assert not deduplicated
+    assert job["status"] == JobStatus.COMPLETED
+    assert job["result"] == {"echo": 42}
+    assert job["progress"] == 1.0
+
+    events = queue.get_events(job_id)
+    assert [e["event_type"] for e in events] == ["submitted", "started", "progress", "completed"]
+    assert events[2]["message"] == "halfway"
+    # Poll cursor only returns newer events
+    assert queue.get_events(job_id, since_id=events[1]["id"]) == events[2:]
+
+
+def test_failed_job_keeps_error():
+    queue = JobQueue("test", max_workers=1, poll_seconds=0.05)
+
+    def handler(payload, report):
+        raise RuntimeError("boom")
+
+    queue.register("fail", handler)
+    queue.start()
+    job_id, _ = queue.submit("fail", {})
+    job = _wait_for(queue, job_id)
+    queue.stop()
+
+    assert job["status"] == JobStatus.FAILED
+    assert job["error"] == "boom"
+
+
+def test_identical_pending_jobs_are_deduplicated():
+    queue = JobQueue("test", max_workers=1)
+    queue.register("echo", lambda payload, report: payload)
+
+    first, dup1 = queue.submit("echo", {"user_id": "a"})
+    second, dup2 = queue.submit("echo", {"user_id": "a"}, priority=5)
+    other, dup3 = queue.submit("echo", {"user_id": "b"})
+
+    assert (dup1, dup2, dup3) == (False, True, False)
+    assert first == second
+    assert other != first
+    # The more urgent duplicate bumped the queued job's priority
+    assert queue.get_job(first)["priority"] == 5
+
+    queue.start()
+    _wait_for(queue, first)
+    queue.stop()
+    # Once finished, the same request creates a new job
+    again, dup = queue.submit("echo", {"user_id": "a"})
+    assert not dup and again != first
+
+
+def test_higher_priority_runs_first():
+    queue = JobQueue("test", max_workers=1, poll_seconds=0.05)
+    order = []
+    queue.register("record", lambda payload, report: order.append(payload["name"]))
+
+    low, _ = queue.submit("record", {"name": "low"}, priority=0)
+    high, _ = queue.submit("record", {"name": "high"}, priority=10)
+    mid, _ = queue.submit("record", {"name": "mid"}, priority=5)
+    assert queue.get_job(low)["queue_position"] == 2
+
+    queue.start()
+    for job_id in (low, high, mid):
+        _wait_for(queue, job_id)
+    queue.stop()
+
+    assert order == ["high", "mid", "low"]
+
+
+def test_worker_concurrency_is_bounded():
+    queue = JobQueue("test", max_workers=2, poll_seconds=0.05)
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    def handler(payload, report):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.1)
+        with lock:
+            active["now"] -= 1
+
+    queue.register("slow", handler)
+    job_ids = [queue.submit("slow", {"i": i})[0] for i in range(6)]
+    queue.start()
+    for job_id in job_ids:
+        _wait_for(queue, job_id)
+    queue.stop()
+
+    assert active["max"] == 2
+
+
+def test_pending_and_interrupted_jobs_survive_restart():
+    first = JobQueue("test", max_workers=1)
+    first.register("echo", lambda payload, report: payload)
+    pending, _ = first.submit("echo", {"n": 1})
+    interrupted, _ = first.submit("echo", {"n": 2})
+    # Simulate a crash mid-job: claimed but never finished
+    claimed = first._claim()
+    assert claimed["job_id"] == pending
+
+    # The crashed instance never renews its heartbeat, so the claim goes stale
+    restarted = JobQueue("test", max_workers=1, poll_seconds=0.05, lease_seconds=0.2)
+    restarted.register("echo", lambda payload, report: payload)
+    restarted.start()
+    assert _wait_for(restarted, pending)["result"] == {"n": 1}
+    assert _wait_for(restarted, interrupted)["result"] == {"n": 2}
+    restarted.stop()
+
+
+def test_jobs_of_a_live_worker_are_not_requeued():
+    release = threading.Event()
+    busy = JobQueue("test", max_workers=1, poll_seconds=0.05, lease_seconds=0.3)
+    busy.register("block", lambda payload, report: release.wait(5))
+    job_id, _ = busy.submit("block", {})
+    busy.start()
+    _wait_for(busy, job_id, statuses=(JobStatus.RUNNING,))
+
+    # A second process starting up while the job runs past its lease
+    sibling = JobQueue("test", max_workers=1, poll_seconds=0.05, lease_seconds=0.3)
+    sibling.register("block", lambda payload, report: True)
+    sibling.start()
+    time.sleep(1.0)
+    assert sibling.requeue_orphans() == 0
+    assert busy.get_job(job_id)["status"] == JobStatus.RUNNING
+
+    release.set()
+    assert _wait_for(busy, job_id)["status"] == JobStatus.COMPLETED
+    busy.stop()
+    sibling.stop()
+
+
+def test_worker_that_lost_its_lease_does_not_overwrite_the_new_run():
+    stalled = JobQueue("test", max_workers=1)
+    stalled.register("echo", lambda payload, report: payload)
+    job_id, _ = stalled.submit("echo", {"n": 1})
+    stalled._claim()
+
+    # Requeued after missed heartbeats and claimed by another instance
+    taker = JobQueue("test", max_workers=1)
+    taker.register("echo", lambda payload, report: payload)
+    conn = stalled._connect()
+    conn.execute("UPDATE jobs SET status = 'pending', owner = NULL WHERE job_id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+    assert taker._claim()["job_id"] == job_id
+
+    stalled._finish(job_id, JobStatus.FAILED, error="stale")
+    assert stalled.get_job(job_id)["status"] == JobStatus.RUNNING
+    taker._finish(job_id, JobStatus.COMPLETED, result={"n": 1})
+    assert taker.get_job(job_id)["result"] == {"n": 1}
+
+
+def test_cancel_only_pending_jobs():
+    queue = JobQueue("test", max_workers=1)
+    queue.register("echo", lambda payload, report: payload)
+    job_id, _ = queue.submit("echo", {})
+
+    assert queue.cancel(job_id)
+    assert queue.get_job(job_id)["status"] == JobStatus.CANCELLED
+    assert not queue.cancel(job_id)
+
+
+def test_submit_requires_registered_handler():
+    queue = JobQueue("test")
+    with pytest.raises(ValueError):
+        queue.submit("unknown", {})
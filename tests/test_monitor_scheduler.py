@@ -0,0 +1,152 @@
+"""
+Tests for the event-driven continuous monitoring scheduler
+"""
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from monitor_scheduler import (
+    FileTailTrigger, MonitorQueue, MonitorScheduler, SqliteChangeTrigger, build_triggers
+)
+
+
+class FakeMonitor:
+    """run_cycle() returns scripted page sizes, then 0 (no new data)"""
+
+    def __init__(self, pages=(), has_more=()):
+        self.pages = list(pages)
+        self.has_more_flags = list(has_more)
+        self.source_has_more = False
+        self.cycle_times = []
+        self.executors = set()
+
+    def run_cycle(self, executor=None):
+        self.cycle_times.append(time.monotonic())
+        self.executors.add(executor)
+        fetched = self.pages.pop(0) if self.pages else 0
+        self.source_has_more = self.has_more_flags.pop(0) if self.has_more_flags else False
+        return fetched
+
+
+def _start(scheduler):
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_backlog_drains_without_waiting():
+    monitor = FakeMonitor(pages=[500, 500, 500, 20], has_more=[True, True, True, False])
+    scheduler = MonitorScheduler(monitor, workers=2, min_idle=10, max_idle=10)
+    thread = _start(scheduler)
+    _wait_for(lambda: len(monitor.cycle_times) >= 4)
+    scheduler.stop()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert monitor.cycle_times[3] - monitor.cycle_times[0] < 1.0
+    assert len(monitor.executors) == 1 and None not in monitor.executors
+
+
+def test_idle_wait_backs_off_and_resets_on_wake():
+    monitor = FakeMonitor()
+    scheduler = MonitorScheduler(monitor, min_idle=0.01, max_idle=0.08)
+    thread = _start(scheduler)
+    _wait_for(lambda: len(monitor.cycle_times) >= 6)
+    assert scheduler.idle_wait == pytest.approx(0.08)
+
+    scheduler.max_idle = scheduler.idle_wait = 30  # Only a wake can start the next cycle now
+    _wait_for(lambda: scheduler.idle_wait == 30 and len(monitor.cycle_times) >= 7)
+    cycles = len(monitor.cycle_times)
+    scheduler.wake()
+    _wait_for(lambda: len(monitor.cycle_times) > cycles)
+    assert scheduler.idle_wait <= 60
+
+    scheduler.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_queue_trigger_wakes_idle_scheduler():
+    notifications = MonitorQueue()
+    monitor = FakeMonitor()
+    scheduler = MonitorScheduler(monitor, [notifications], min_idle=30, max_idle=30)
+    thread = _start(scheduler)
+    _wait_for(lambda: len(monitor.cycle_times) == 1)
+
+    notifications.notify()
+    _wait_for(lambda: len(monitor.cycle_times) == 2, timeout=2)
+    scheduler.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_file_tail_trigger_fires_on_growth(tmp_path):
+    log = tmp_path / "gateway.jsonl"
+    log.write_text("{}\n")
+    trigger = FileTailTrigger(log, poll_seconds=0.01)
+    woke = threading.Event()
+    trigger.start(woke.set)
+    try:
+        assert not woke.wait(0.1)
+        with open(log, "a") as f:
+            f.write("{}\n")
+        assert woke.wait(2)
+    finally:
+        trigger.stop()
+
+
+def test_sqlite_trigger_sees_commits_from_other_connections(tmp_path):
+    db_path = tmp_path / "events.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE prompts (id INTEGER PRIMARY KEY)")
+    conn.commit()
+
+    trigger = SqliteChangeTrigger(db_path, poll_seconds=0.01)
+    woke = threading.Event()
+    trigger.start(woke.set)
+    try:
+        assert not woke.wait(0.1)
+        conn.execute("INSERT INTO prompts DEFAULT VALUES")
+        conn.commit()
+        assert woke.wait(2)
+    finally:
+        trigger.stop()
+        conn.close()
+
+
+def test_sigterm_stops_after_current_cycle():
+    monitor = FakeMonitor()
+    scheduler = MonitorScheduler(monitor, min_idle=30, max_idle=30)
+    previous = signal.getsignal(signal.SIGTERM)
+    threading.Timer(0.2, os.kill, args=(os.getpid(), signal.SIGTERM)).start()
+
+    scheduler.run()  # Main thread: installs the SIGTERM handler
+
+    assert len(monitor.cycle_times) == 1
+    assert signal.getsignal(signal.SIGTERM) is previous
+
+
+def test_auto_trigger_matches_ingestion_source(tmp_path):
+    class Source:
+        name = "jsonl"
+        path = tmp_path / "gateway.jsonl"
+
+    assert isinstance(build_triggers(Source(), "auto")[0], FileTailTrigger)
+    assert build_triggers(None, "auto") == []
+    with pytest.raises(ValueError):
+        build_triggers(None, "inotify")
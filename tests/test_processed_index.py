@@ -0,0 +1,109 @@
+"""
+Tests for set-based processed-prompt tracking and the high-water-mark cursor
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from continuous_monitor import ContinuousMonitor
+from models import PromptData
+from processed_index import ProcessedPromptIndex
+from state_manager import StateManager
+
+
+def _manager(tmp_path):
+    return StateManager(state_file=tmp_path / "replay_state.json",
+                        results_file=tmp_path / "optimization_results.jsonl",
+                        cache_file=tmp_path / "evaluation_cache.jsonl",
+                        index_file=tmp_path / "processed_prompts.db")
+
+
+def _prompt(prompt_id, timestamp):
+    return PromptData(id=prompt_id, messages=[{"role": "user", "content": "hi"}],
+                      original_model="GPT-4o", timestamp=timestamp)
+
+
+def test_index_batch_lookup_and_high_water_mark(tmp_path):
+    index = ProcessedPromptIndex(tmp_path / "index.db")
+    assert index.add_many((f"p{i}", f"2026-01-01T00:{i % 60:02d}:00") for i in range(1200)) == 1200
+    assert index.add("p5") is False
+
+    assert "p1199" in index and "p1200" not in index
+    assert index.find_processed(["p3", "x", "p1100", "p3"]) == {"p3", "p1100"}
+    assert len(index) == 1200
+    assert index.high_water_mark() == "2026-01-01T00:59:00"
+
+
+def test_mark_processed_advances_cursor_and_state_file_stays_small(tmp_path):
+    manager = _manager(tmp_path)
+    state = manager.load_state()
+    prompts = [_prompt(f"p{i}", f"2026-01-0{1 + i % 3}T12:00:00") for i in range(500)]
+    manager.mark_prompts_processed(state, prompts)
+    manager.mark_prompts_processed(state, prompts[:10])  # Re-marking is a no-op
+    manager.save_state(state)
+
+    reloaded = manager.load_state()
+    assert reloaded.total_prompts_processed == 500
+    assert reloaded.last_processed_timestamp == "2026-01-03T12:00:00"
+    assert "p499" not in manager.state_file.read_text()
+    assert manager.is_prompt_processed("p499")
+
+
+def test_filter_unprocessed_drops_known_and_repeated_prompts(tmp_path):
+    manager = _manager(tmp_path)
+    manager.mark_prompt_processed(manager.load_state(), "old", "2026-01-01T00:00:00")
+    batch = [_prompt("old", "t"), _prompt("new", "t"), _prompt("new", "t"), _prompt("other", "t")]
+
+    assert [p.id for p in manager.filter_unprocessed(batch)] == ["new", "other"]
+
+
+def test_legacy_state_file_ids_are_migrated(tmp_path):
+    legacy = {
+        "last_processed_timestamp": "2026-01-01T00:00:00",
+        "processed_prompt_ids": ["a", "b", "c"],
+        "active_evaluations": {},
+        "total_prompts_processed": 3,
+        "last_updated": "2026-01-01T00:00:00"
+    }
+    (tmp_path / "replay_state.json").write_text(json.dumps(legacy))
+    manager = _manager(tmp_path)
+
+    state = manager.load_state()
+    assert state.total_prompts_processed == 3
+    assert manager.filter_unprocessed([_prompt("a", "t"), _prompt("d", "t")])[0].id == "d"
+    assert "processed_prompt_ids" not in json.loads(manager.state_file.read_text())
+
+
+class _FakeReplay:
+    def __init__(self):
+        self.replayed = []
+
+    def replay_prompt_across_models(self, prompt):
+        self.replayed.append(prompt.id)
+        return []
+
+
+class _FakeEvaluator:
+    def evaluate_batch(self, prompt, completions):
+        return {}
+
+
+def test_monitor_skips_prompts_processed_in_earlier_batches(tmp_path):
+    monitor = ContinuousMonitor.__new__(ContinuousMonitor)
+    monitor.replay_engine = _FakeReplay()
+    monitor.evaluator = _FakeEvaluator()
+    monitor.optimizer = None
+    monitor.state_manager = _manager(tmp_path)
+    monitor.source = None
+    monitor._next_cursor = None
+    monitor.sampler = None
+
+    monitor.process_prompts([_prompt("p1", "2026-01-01T00:00:00"), _prompt("p2", "2026-01-02T00:00:00")])
+    monitor.process_prompts([_prompt("p2", "2026-01-02T00:00:00"), _prompt("p3", "2026-01-03T00:00:00")])
+
+    assert monitor.replay_engine.replayed == ["p1", "p2", "p3"]
+    state = monitor.state_manager.load_state()
+    assert state.total_prompts_processed == 3
+    assert state.last_processed_timestamp == "2026-01-03T00:00:00"
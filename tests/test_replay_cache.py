@@ -0,0 +1,151 @@
+"""
+Tests for the conversation cache in front of ReplayEngine model calls
+"""
+import sqlite3
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache_manager as cache_module
+from cache_manager import ConversationCache
+from models import PromptData
+from replay_engine import ReplayEngine
+
+MODEL = {
+    "name": "GPT-4o-mini",
+    "model": "@openai/gpt-4o-mini",
+    "expected_cost_per_1k_input": 0.00015,
+    "expected_cost_per_1k_output": 0.0006,
+    "max_tokens": 1024
+}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Paris"))],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=1000)
+        )
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "cache.db")
+    return ConversationCache()
+
+
+def _engine(cache, policy):
+    engine = ReplayEngine(api_key="test", cache_policy=policy, cache=cache)
+    client = FakeClient()
+    engine._create_client = lambda model: client
+    return engine, client
+
+
+def _prompt():
+    return PromptData(id="p1", messages=[{"role": "user", "content": "Capital of France?"}],
+                      original_model="gpt-4o")
+
+
+def test_read_through_serves_repeat_calls_from_cache(cache):
+    engine, client = _engine(cache, "read_through")
+
+    first = engine.replay_prompt_on_model(_prompt(), MODEL)
+    second = engine.replay_prompt_on_model(_prompt(), MODEL)
+
+    assert len(client.calls) == 1
+    assert second.response == first.response == "Paris"
+    assert second.cached and not first.cached
+    stats = engine.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 1)
+    assert stats["cost_saved_usd"] == pytest.approx(first.cost)
+    assert stats["latency_saved_ms"] == pytest.approx(first.latency_ms)
+
+
+def test_generation_params_are_part_of_the_key(cache):
+    engine, client = _engine(cache, "read_through")
+
+    engine.replay_prompt_on_model(_prompt(), MODEL)
+    engine.replay_prompt_on_model(_prompt(), {**MODEL, "max_tokens": 256})
+
+    assert len(client.calls) == 2
+    assert client.calls[1]["max_tokens"] == 256
+
+
+def test_off_policy_never_touches_the_cache(cache):
+    engine, client = _engine(cache, "off")
+
+    engine.replay_prompt_on_model(_prompt(), MODEL)
+    engine.replay_prompt_on_model(_prompt(), MODEL)
+
+    assert len(client.calls) == 2
+    assert engine.get_cache_stats()["writes"] == 0
+
+
+def test_deterministic_policy_only_caches_zero_temperature(cache):
+    engine, client = _engine(cache, "deterministic")
+
+    for _ in range(2):
+        engine.replay_prompt_on_model(_prompt(), {**MODEL, "temperature": 0.7})
+    for _ in range(2):
+        engine.replay_prompt_on_model(_prompt(), {**MODEL, "temperature": 0.0})
+
+    assert len(client.calls) == 3
+    assert engine.get_cache_stats()["hits"] == 1
+
+
+def test_default_policy_caches_configs_without_a_temperature(cache):
+    engine = ReplayEngine(api_key="test", cache=cache)
+    client = FakeClient()
+    engine._create_client = lambda model: client
+    assert engine.cache_policy == "deterministic"
+
+    for _ in range(2):
+        engine.replay_prompt_on_model(_prompt(), MODEL)  # No temperature: replayed at 0
+
+    assert len(client.calls) == 1
+    assert client.calls[0]["temperature"] == 0.0
+    assert engine.get_cache_stats()["hits"] == 1
+
+
+def test_outputs_for_different_models_coexist(cache):
+    cache.cache_output("h", "@openai/gpt-4o", "a", None, 0.01, 10)
+    cache.cache_output("h", "@openai/gpt-4o-mini", "b", None, 0.001, 5)
+
+    assert cache.get_cached_output("h", "@openai/gpt-4o")["output"] == "a"
+    assert cache.get_cached_output("h", "@openai/gpt-4o-mini")["output"] == "b"
+
+
+def test_legacy_single_key_table_is_migrated(tmp_path, monkeypatch):
+    db = tmp_path / "legacy.db"
+    monkeypatch.setattr(cache_module, "DB_PATH", db)
+    conn = sqlite3.connect(db)
+    conn.execute("""
+        CREATE TABLE conversation_cache (
+            conversation_hash TEXT PRIMARY KEY, model_id TEXT NOT NULL,
+            run_version TEXT NOT NULL, output_json TEXT NOT NULL,
+            quality_score REAL, cost REAL, latency_ms REAL, created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("INSERT INTO conversation_cache VALUES ('h', 'm1', '1.0.0', '\"a\"', NULL, 0, 0, datetime('now'))")
+    conn.commit()
+    conn.close()
+
+    cache = ConversationCache()
+    cache.cache_output("h", "m2", "b", None, 0, 0)
+
+    assert cache.get_cached_output("h", "m1")["output"] == "a"
+    assert cache.get_cached_output("h", "m2")["output"] == "b"
+
+
+def test_unknown_policy_is_rejected(cache):
+    with pytest.raises(ValueError):
+        ReplayEngine(api_key="test", cache_policy="sometimes", cache=cache)
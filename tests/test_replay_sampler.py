@@ -0,0 +1,158 @@
+"""
+Tests for the budgeted, stratified replay sampler
+"""
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from models import CompletionResult, ModelEvaluation, PromptData, QualityScore
+from replay_sampler import ReplaySampler
+
+NOON = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def _prompt(i, text=None, model="GPT-4o", user="u1"):
+    return PromptData(id=f"p{i}", messages=[{"role": "user", "content": text or f"Write a python function number {i}"}],
+                      original_model=model, metadata={"user_id": user})
+
+
+def _sampler(budget=1000.0, clock=lambda: NOON, **kwargs):
+    sampler = ReplaySampler(daily_budget_usd=budget, rng=random.Random(0), clock=clock,
+                            embedder=kwargs.pop("embedder", None), **kwargs)
+    sampler._vector_engine_failed = sampler._vector_engine is None  # No embedding model in tests
+    return sampler
+
+
+def test_everything_sampled_when_budget_allows():
+    sampler = _sampler()
+    prompts = [_prompt(i) for i in range(20)]
+    assert [p.id for p in sampler.sample(prompts)] == [p.id for p in prompts]
+
+
+def test_exact_repeats_are_skipped_across_batches():
+    sampler = _sampler()
+    sampler.sample([_prompt(1, "Explain  Python decorators")])
+    kept = sampler.sample([_prompt(2, "explain python decorators"), _prompt(3, "Explain generators")])
+    assert [p.id for p in kept] == ["p3"]
+    assert sampler.get_stats()["duplicates_skipped"] == 1
+
+
+class _FakeEmbedder:
+    """Prompts sharing a first word embed to the same direction"""
+
+    def embed_batch(self, texts):
+        vectors = []
+        for text in texts:
+            v = np.zeros(8)
+            v[sum(map(ord, text.split()[0])) % 7] = 1.0
+            v[-1] += 0.01 * len(text)
+            vectors.append(v)
+        return vectors
+
+
+def test_near_duplicates_skipped_with_embeddings():
+    sampler = _sampler(embedder=_FakeEmbedder())
+    kept = sampler.sample([_prompt(1, "Translate this sentence"), _prompt(2, "Translate this sentence please"),
+                           _prompt(3, "Summarize the report")])
+    assert [p.id for p in kept] == ["p1", "p3"]
+
+
+def test_budget_limits_sample_and_covers_every_stratum():
+    sampler = _sampler(budget=1.0)
+    sampler.replay_cost_estimate = 0.1  # Noon with 10% burst: $0.60 allowed -> 6 prompts
+    prompts = [_prompt(i, model="GPT-4o") for i in range(50)]
+    prompts += [_prompt(100 + i, model="GPT-4o-mini", user="u2") for i in range(3)]
+
+    kept = sampler.sample(prompts)
+    assert len(kept) == 6
+    assert {p.original_model for p in kept} == {"GPT-4o", "GPT-4o-mini"}
+
+
+def test_spend_paces_over_the_day_and_resets_at_midnight():
+    now = [datetime(2026, 3, 1, 0, 0, 0)]
+    sampler = _sampler(budget=10.0, clock=lambda: now[0], burst_fraction=0.0)
+    assert sampler.allowance() == 0.0
+
+    now[0] = datetime(2026, 3, 1, 6, 0, 0)
+    assert sampler.allowance() == pytest.approx(2.5)
+    sampler.record_replay_cost(2.0)
+    assert sampler.allowance() == pytest.approx(0.5)
+
+    now[0] = datetime(2026, 3, 2, 6, 0, 0)
+    assert sampler.allowance() == pytest.approx(2.5)
+
+
+def _evaluation(prompt_id, model, quality, cost):
+    completion = CompletionResult(model_name=model, provider="openai", response="x", tokens_input=1,
+                                  tokens_output=1, latency_ms=1, cost=cost, success=True)
+    score = QualityScore(overall_score=quality, dimension_scores={}, reasoning="", confidence=1,
+                         evaluator_model="judge")
+    return ModelEvaluation(prompt_id, model, completion, score, cost / quality)
+
+
+def test_sampling_error_weights_strata_by_traffic():
+    sampler = _sampler(budget=1.0)
+    sampler.replay_cost_estimate = 0.1
+    # 90 code prompts on GPT-4o, 10 on GPT-4o-mini: 6 slots spread over both strata
+    prompts = [_prompt(i, model="GPT-4o") for i in range(90)]
+    prompts += [_prompt(100 + i, model="GPT-4o-mini") for i in range(10)]
+    kept = sampler.sample(prompts)
+
+    evaluations = [
+        _evaluation(p.id, "Judge-Model", 90.0 if p.original_model == "GPT-4o" else 50.0, 0.001)
+        for p in kept
+    ]
+    report = sampler.sampling_error(evaluations)["Judge-Model"]
+
+    # Stratified estimate reflects the 90/10 traffic split, not the sample split
+    assert report["quality"]["estimate"] == pytest.approx(86.0)
+    assert report["strata"] == 2
+    assert report["traffic_coverage"] == 1.0
+    assert report["quality"]["se"] >= 0.0
+
+
+def test_sampling_error_shrinks_with_more_samples():
+    def margin(budget):
+        sampler = _sampler(budget=budget)
+        sampler.replay_cost_estimate = 0.1
+        rng = random.Random(1)
+        prompts = [_prompt(i) for i in range(200)]
+        kept = sampler.sample(prompts)
+        evaluations = [_evaluation(p.id, "M", rng.gauss(80, 10), 0.001) for p in kept]
+        return sampler.sampling_error(evaluations)["M"]["quality"]["margin_95"]
+
+    assert margin(budget=20.0) < margin(budget=2.0)
+
+
+def test_observed_evaluations_give_the_same_estimate():
+    sampler = _sampler(budget=5.0)
+    sampler.replay_cost_estimate = 0.1
+    rng = random.Random(2)
+    kept = sampler.sample([_prompt(i) for i in range(100)])
+    evaluations = [_evaluation(p.id, "M", rng.gauss(80, 10), 0.001) for p in kept]
+    passed_in = sampler.sampling_error(evaluations)["M"]
+    for i in range(0, len(evaluations), 7):
+        sampler.observe(evaluations[i:i + 7])
+
+    observed = sampler.sampling_error()["M"]
+    assert observed["quality"] == pytest.approx(passed_in["quality"])
+    assert observed["samples"] == len(kept)
+    assert sampler.assignments == {}  # Consumed by observe()
+
+
+def test_pending_assignments_and_strata_are_bounded():
+    sampler = _sampler(max_strata=3, max_pending=4)
+    for batch in range(5):
+        kept = sampler.sample([_prompt(10 * batch + i, user=f"u{batch}") for i in range(3)])
+        sampler.observe([_evaluation(kept[0].id, "M", 80.0, 0.001)])
+
+    assert sorted(sampler.assignments) == ["p32", "p41", "p42"]  # Capped at 4, then p40 observed
+    assert sorted(h[2] for h in sampler.strata) == ["u2", "u3", "u4"]
+    report = sampler.sampling_error()["M"]
+    assert report["strata"] == 3 and report["samples"] == 3
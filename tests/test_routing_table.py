@@ -0,0 +1,167 @@
+"""
+Tests for the offline-learned auto mode routing table
+"""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import database
+import routing_table as routing_module
+from auto_mode import auto_selector
+from config import ROUTING_MIN_SAMPLES
+from database import save_completion, save_prompt, save_quality_evaluation
+from models import CompletionResult
+from routing_table import RoutingTable
+
+CODE_PROMPTS = [f"Write a python function number {i}" for i in range(4)]
+CREATIVE_PROMPTS = [f"Write a poem and a story about topic {i}" for i in range(4)]
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "routing.db"
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    monkeypatch.setattr(routing_module, "DB_PATH", db_path)
+    # Cluster on a single bucket regardless of whether sentence-transformers is installed
+    monkeypatch.setattr(RoutingTable, "_embedder", lambda self: None)
+    database.init_db()
+
+
+def _record(prompt_id, prompt, model_name, quality, cost, latency_ms=500, success=True):
+    save_prompt(prompt_id, prompt)
+    save_completion(prompt_id, model_name, {
+        "completion": "answer", "latency_ms": latency_ms, "cost": cost, "success": success
+    })
+    if success:
+        save_quality_evaluation(prompt_id, model_name, {"overall_score": quality})
+
+
+def _seed_history():
+    for i, prompt in enumerate(CODE_PROMPTS):
+        _record(f"code{i}", prompt, "Premium", quality=95, cost=0.0005)
+        _record(f"code{i}", prompt, "Budget", quality=60, cost=0.0001)
+    for i, prompt in enumerate(CREATIVE_PROMPTS):
+        _record(f"creative{i}", prompt, "Premium", quality=80, cost=0.0005)
+        _record(f"creative{i}", prompt, "Budget", quality=82, cost=0.0001)
+
+
+def test_build_ranks_models_per_use_case():
+    _seed_history()
+    table = RoutingTable(exploration_percent=0)
+    summary = table.build()
+
+    assert summary["history_rows"] == 16
+    code = table.route("Write a python function that sorts")
+    creative = table.route("Write a poem about the sea and a story")
+
+    assert (code.model_name, code.level, code.explore) == ("Premium", "exact", False)
+    assert creative.model_name == "Budget"
+    assert code.expected["samples"] == len(CODE_PROMPTS)
+    assert code.expected["avg_quality"] == pytest.approx(95)
+
+
+def test_sparse_cells_fall_back_to_coarser_levels():
+    _seed_history()
+    table = RoutingTable(exploration_percent=0)
+    table.build()
+
+    # No long code prompts in history: drop the length bucket
+    long_code = table.route("Debug this python function " + "x" * 4000)
+    assert long_code.level == "use_case+cluster"
+    assert long_code.model_name == "Premium"
+
+    # No security history at all: global ranking
+    security = table.route("Check our authentication for vulnerability issues")
+    assert security.level == "global"
+
+
+def test_cells_need_min_samples():
+    for i in range(ROUTING_MIN_SAMPLES - 1):
+        _record(f"code{i}", CODE_PROMPTS[i], "Premium", quality=95, cost=0.0005)
+    table = RoutingTable(exploration_percent=0)
+    table.build()
+
+    assert table.route(CODE_PROMPTS[0]).level == "global"
+
+
+def test_no_history_fans_out():
+    table = RoutingTable(exploration_percent=0)
+    table.build()
+    decision = table.route("Write a python function")
+
+    assert decision.model_name is None
+    assert not decision.explore
+    assert decision.level == "none"
+
+
+def test_exploration_budget_fans_out_share_of_traffic():
+    _seed_history()
+    RoutingTable(exploration_percent=0).build()
+
+    always = RoutingTable(exploration_percent=100)
+    decision = always.route(CODE_PROMPTS[0])
+    assert decision.explore and decision.model_name is None
+
+    sampled = RoutingTable(exploration_percent=20, rng=random.Random(7))
+    explored = sum(sampled.route(CODE_PROMPTS[0]).explore for _ in range(1000))
+    assert 150 < explored < 250
+
+
+def test_failed_completions_lower_success_rate():
+    for i, prompt in enumerate(CODE_PROMPTS):
+        _record(f"code{i}", prompt, "Flaky", quality=95, cost=0.0001, success=i % 2 == 0)
+    table = RoutingTable(exploration_percent=0)
+    table.build()
+    entry = table.lookup(table.features(CODE_PROMPTS[0]))[1][0]
+
+    assert entry["samples"] == 2
+    assert entry["success_rate"] == 0.5
+
+
+def test_reused_prompt_ids_are_skipped():
+    # Legacy rows: one prompt id shared by different prompts
+    save_prompt("auto_mode_prompt", "Write a python function")
+    for _ in range(3):
+        save_completion("auto_mode_prompt", "Premium", {"completion": "a", "cost": 0.001, "success": True})
+    table = RoutingTable(exploration_percent=0)
+
+    assert table.build()["history_rows"] == 0
+
+
+def test_rerun_completions_keep_the_latest_row():
+    # A routed call failed and the fan-out re-ran the same prompt on that model
+    _record("auto_1", CODE_PROMPTS[0], "Premium", quality=0, cost=0.0005, success=False)
+    _record("auto_1", CODE_PROMPTS[0], "Premium", quality=93, cost=0.0005)
+    history = routing_module.load_judged_history()
+
+    assert len(history) == 1
+    assert history[0]["success"] == 1 and history[0]["quality"] == 93
+
+
+def test_table_persists_across_instances():
+    _seed_history()
+    RoutingTable(exploration_percent=0).build()
+    reloaded = RoutingTable(exploration_percent=0)
+
+    assert reloaded.route(CODE_PROMPTS[0]).model_name == "Premium"
+    assert reloaded.get_stats()["cells"] > 0
+
+
+def test_routed_summary_uses_expected_quality():
+    _seed_history()
+    table = RoutingTable(exploration_percent=0)
+    table.build()
+    decision = table.route(CODE_PROMPTS[0])
+    completion = CompletionResult(
+        model_name="Premium", provider="test", response="def f(): pass",
+        tokens_input=10, tokens_output=5, latency_ms=400, cost=0.003, success=True
+    )
+    summary = auto_selector.summarize_routed(completion, decision.candidates)
+
+    assert summary["quality_score"] == pytest.approx(95)
+    assert summary["quality_predicted"]
+    assert set(summary["all_scores"]) == {"Premium", "Budget"}
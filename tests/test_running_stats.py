@@ -0,0 +1,136 @@
+"""
+Tests for incremental per-model statistics behind recommendations
+"""
+import random
+import statistics
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bootstrap_stats import BootstrapEngine
+from continuous_monitor import ContinuousMonitor
+from models import CompletionResult, ModelEvaluation, QualityScore
+from optimizer import CostQualityOptimizer
+from running_stats import PerformanceAccumulator, RunningStats
+from state_manager import StateManager
+
+
+def _evaluation(prompt_id, model, quality, cost, success=True, latency=100.0):
+    completion = CompletionResult(model_name=model, provider="openai", response="x", tokens_input=1,
+                                  tokens_output=1, latency_ms=latency, cost=cost, success=success)
+    score = QualityScore(overall_score=quality, dimension_scores={}, reasoning="", confidence=1,
+                         evaluator_model="judge")
+    return ModelEvaluation(prompt_id, model, completion, score, cost / quality)
+
+
+def _history(n, seed=0):
+    rng = random.Random(seed)
+    evaluations = []
+    for i in range(n):
+        evaluations.append(_evaluation(f"p{i}", "GPT-4o", rng.gauss(85, 5), 0.01, latency=rng.uniform(200, 900)))
+        evaluations.append(_evaluation(f"p{i}", "GPT-4o-mini", rng.gauss(80, 8), 0.001,
+                                       success=rng.random() > 0.05, latency=rng.uniform(100, 400)))
+    return evaluations
+
+
+def _manager(tmp_path):
+    return StateManager(state_file=tmp_path / "replay_state.json",
+                        results_file=tmp_path / "optimization_results.jsonl",
+                        cache_file=tmp_path / "evaluation_cache.jsonl",
+                        index_file=tmp_path / "processed_prompts.db")
+
+
+def test_welford_matches_statistics_and_merges():
+    rng = random.Random(3)
+    values = [rng.uniform(0, 100) for _ in range(500)]
+    left, right = RunningStats(), RunningStats()
+    for value in values[:123]:
+        left.add(value)
+    for value in values[123:]:
+        right.add(value)
+    merged = left.merge(right)
+
+    assert merged.count == 500
+    assert merged.mean == pytest.approx(statistics.mean(values))
+    assert merged.stdev == pytest.approx(statistics.stdev(values))
+    assert RunningStats().stdev == 0.0
+
+
+def test_metrics_match_list_based_aggregation():
+    evaluations = _history(200)
+    metrics = CostQualityOptimizer().analyze_model_performance(evaluations)
+
+    mini = [e for e in evaluations if e.model_name == "GPT-4o-mini"]
+    ok = [e for e in mini if e.completion.success]
+    assert metrics["GPT-4o-mini"]["sample_size"] == 200
+    assert metrics["GPT-4o-mini"]["success_rate"] == pytest.approx(len(ok) / 200)
+    assert metrics["GPT-4o-mini"]["avg_quality"] == pytest.approx(statistics.mean(e.quality.overall_score for e in ok))
+    assert metrics["GPT-4o-mini"]["quality_stdev"] == pytest.approx(statistics.stdev(e.quality.overall_score for e in ok))
+    assert metrics["GPT-4o-mini"]["avg_latency"] == pytest.approx(statistics.mean(e.completion.latency_ms for e in ok))
+    assert metrics["GPT-4o-mini"]["avg_cost_quality_ratio"] == pytest.approx(
+        statistics.mean(e.cost_quality_ratio for e in ok))
+
+
+def test_state_manager_updates_and_persists_incrementally(tmp_path):
+    evaluations = _history(60)
+    manager = _manager(tmp_path)
+    manager.save_evaluations(evaluations[:50])
+    manager.save_evaluations(evaluations[50:])
+    assert manager.stats_file.exists()
+
+    # A crash after appending but before the stats were saved: the tail is caught up
+    manager.results_log.append(e.to_dict() for e in _history(5, seed=9))
+    restarted = _manager(tmp_path)
+    expected = PerformanceAccumulator().update(evaluations + _history(5, seed=9)).metrics()
+    actual = restarted.performance().metrics()
+    for model, values in expected.items():
+        assert actual[model] == pytest.approx(values)
+    assert restarted.performance().log_offset == manager.results_file.stat().st_size
+
+
+def test_rewritten_log_rebuilds_statistics(tmp_path):
+    manager = _manager(tmp_path)
+    manager.save_evaluations(_history(30))
+    manager.results_file.write_text("")
+    manager.save_evaluations([_evaluation("x", "GPT-4o", 90.0, 0.01)])
+
+    metrics = manager.performance().metrics()
+    assert list(metrics) == ["GPT-4o"]
+    assert metrics["GPT-4o"]["sample_size"] == 1
+
+
+def test_recommendations_do_not_reread_history(tmp_path, monkeypatch):
+    monitor = ContinuousMonitor.__new__(ContinuousMonitor)
+    monitor.optimizer = CostQualityOptimizer(min_samples=5, bootstrap=BootstrapEngine(resamples=200, cache=None))
+    monitor.state_manager = _manager(tmp_path)
+    monitor.sampler = None
+    monitor.state_manager.save_evaluations(_history(20))
+
+    def fail():
+        raise AssertionError("history reloaded")
+
+    monkeypatch.setattr(monitor.state_manager, "load_evaluations", fail)
+    recommendation = monitor.generate_recommendations("GPT-4o")
+
+    assert recommendation.recommended_model == "GPT-4o-mini"
+    assert recommendation.sample_size == 40
+    assert recommendation.metrics["confidence_method"] == "bootstrap"
+
+
+def test_recent_columns_follow_the_log_within_a_window(tmp_path):
+    manager = StateManager(state_file=tmp_path / "replay_state.json",
+                           results_file=tmp_path / "optimization_results.jsonl",
+                           cache_file=tmp_path / "evaluation_cache.jsonl",
+                           index_file=tmp_path / "processed_prompts.db", window=15)
+    manager.save_evaluations(_history(10))
+    columns = manager.recent_columns()
+    assert len(columns) == 20
+    assert manager.recent_columns() is columns  # Unchanged log: same arrays, same fingerprint
+
+    manager.save_evaluations(_history(10, seed=1) + [_evaluation("x", "Claude-3-Haiku", 70.0, 0.0005)])
+    columns = manager.recent_columns()
+    assert len(columns) == 31  # 15 per model kept, plus the new model
+    assert list(columns.model_values("Claude-3-Haiku", "quality")) == [70.0]
@@ -0,0 +1,53 @@
+"""
+Tests for the sequential quality test used to stop verification early
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from sequential_test import SequentialQualityTest
+
+
+def test_no_decision_before_minimum_samples():
+    test = SequentialQualityTest(threshold=85.0, min_samples=3)
+    assert test.add(99.0) == "continue"
+    assert test.add(99.0) == "continue"
+    assert test.add(99.0) == "pass"
+
+
+def test_noisy_scores_need_more_samples():
+    test = SequentialQualityTest(threshold=85.0, min_samples=3, max_samples=20)
+    decisions = [test.add(score) for score in [95, 80, 100, 85, 98, 90, 99, 92, 97, 94]]
+    assert decisions[2] == "continue"
+    assert "pass" in decisions
+
+
+def test_decision_is_final():
+    test = SequentialQualityTest(threshold=85.0, min_samples=3)
+    for _ in range(3):
+        test.add(20.0)
+    assert test.decision == "fail"
+    for _ in range(5):
+        test.add(100.0)
+    assert test.decision == "fail"
+
+
+def test_inconclusive_at_max_samples():
+    test = SequentialQualityTest(threshold=85.0, min_samples=3, max_samples=4)
+    for score in (80.0, 90.0, 80.0, 90.0):
+        test.add(score)
+    assert test.decision == "inconclusive"
+    assert test.confidence == pytest.approx(0.5)
+
+
+def test_running_mean_matches_summary():
+    test = SequentialQualityTest(threshold=85.0)
+    for score in (70.0, 80.0, 90.0):
+        test.add(score)
+    summary = test.summary()
+    assert summary["mean"] == pytest.approx(80.0)
+    assert summary["ci_low"] < 80.0 < summary["ci_high"]
+    assert summary["samples"] == 3
@@ -0,0 +1,230 @@
+"""
+Tests for sharded replay: hash partitioning, lease takeover and result collection
+"""
+import json
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from config import MAX_RETRIES
+from continuous_monitor import ContinuousMonitor
+from ingestion import JsonlLogSource
+from models import CompletionResult, ModelEvaluation, PromptData, QualityScore
+from shard_workers import ShardCoordinator, ShardWorker, TaskStatus, shard_for, shard_progress
+from state_manager import StateManager
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _prompt(i):
+    return PromptData(id=f"p{i}", messages=[{"role": "user", "content": f"question {i}"}],
+                      original_model="GPT-4o", timestamp=f"2026-01-01T00:00:{i % 60:02d}")
+
+
+def _evaluate(prompt):
+    completion = CompletionResult(model_name="m", provider="openai", response="x", tokens_input=1,
+                                  tokens_output=1, latency_ms=1, cost=0.01, success=True)
+    score = QualityScore(overall_score=80, dimension_scores={}, reasoning="", confidence=1,
+                         evaluator_model="judge")
+    return [ModelEvaluation(prompt.id, "m", completion, score, 0.01 / 80)]
+
+
+def _monitor(tmp_path, source=None):
+    monitor = ContinuousMonitor.__new__(ContinuousMonitor)
+    monitor.state_manager = StateManager(state_file=tmp_path / "replay_state.json",
+                                         results_file=tmp_path / "optimization_results.jsonl",
+                                         cache_file=tmp_path / "evaluation_cache.jsonl",
+                                         index_file=tmp_path / "processed_prompts.db")
+    monitor.source = source
+    monitor._next_cursor = None
+    monitor.sampler = None
+    monitor.source_has_more = False
+    return monitor
+
+
+def _coordinator(tmp_path, num_shards=2, source=None):
+    return ShardCoordinator(_monitor(tmp_path, source), num_shards=num_shards, db_path=tmp_path / "shards.db")
+
+
+def _worker(tmp_path, home, num_shards=2, clock=None, evaluate=_evaluate):
+    return ShardWorker(home, num_shards, evaluate=evaluate, worker_id=f"w{home}",
+                       db_path=tmp_path / "shards.db", lease_seconds=30, batch_size=100,
+                       clock=clock or Clock())
+
+
+def test_shards_are_stable_and_cover_every_partition():
+    shards = [shard_for(f"p{i}", 4) for i in range(400)]
+    assert shards == [shard_for(f"p{i}", 4) for i in range(400)]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_worker_replays_only_its_home_shard(tmp_path):
+    coordinator = _coordinator(tmp_path)
+    prompts = [_prompt(i) for i in range(20)]
+    assert coordinator.enqueue(prompts) == 20
+    assert coordinator.enqueue(prompts[:5]) == 0  # Already queued
+
+    replayed = []
+    worker = _worker(tmp_path, 0, evaluate=lambda p: replayed.append(p.id) or _evaluate(p))
+    assert worker.step() == sum(1 for p in prompts if shard_for(p.id, 2) == 0)
+    assert all(shard_for(prompt_id, 2) == 0 for prompt_id in replayed)
+    assert worker.step() == 0
+
+
+def test_expired_lease_is_taken_over_and_handed_back(tmp_path):
+    coordinator = _coordinator(tmp_path)
+    coordinator.enqueue([_prompt(i) for i in range(20)])
+    clock = Clock()
+    crashed = _worker(tmp_path, 1, clock=clock)
+    assert crashed.claim_shards() == [1]  # Then dies without replaying anything
+    survivor = _worker(tmp_path, 0, clock=clock)
+
+    assert survivor.claim_shards() == [0]  # Shard 1's lease is still live
+    clock.now += 31
+    assert survivor.claim_shards() == [0, 1]
+    survivor.step()
+    survivor.step()  # Nothing left on shard 1: the borrowed lease is released
+    assert shard_progress(2, tmp_path / "shards.db")["totals"][TaskStatus.PENDING] == 0
+
+    restarted = _worker(tmp_path, 1, clock=clock)
+    assert restarted.claim_shards() == [1]
+    assert survivor.claim_shards() == [0]
+
+
+def test_failing_prompt_is_retried_then_marked_failed(tmp_path):
+    coordinator = _coordinator(tmp_path, num_shards=1)
+    coordinator.enqueue([_prompt(1)])
+    calls = []
+
+    def broken(prompt):
+        calls.append(prompt.id)
+        raise RuntimeError("provider down")
+
+    worker = _worker(tmp_path, 0, num_shards=1, evaluate=broken)
+    for _ in range(MAX_RETRIES + 1):
+        worker.step()
+
+    assert len(calls) == MAX_RETRIES
+    assert shard_progress(1, tmp_path / "shards.db")["totals"][TaskStatus.FAILED] == 1
+
+
+def test_coordinator_ingests_and_collects_results(tmp_path):
+    log = tmp_path / "gateway.jsonl"
+    log.write_text("".join(json.dumps({"id": f"p{i}", "messages": [{"role": "user", "content": "hi"}],
+                                       "model": "GPT-4o", "timestamp": f"2026-01-0{1 + i % 3}T00:00:00"}) + "\n"
+                           for i in range(12)))
+    coordinator = _coordinator(tmp_path, source=JsonlLogSource(log))
+    assert coordinator.ingest_once() == 12
+    assert coordinator.monitor.state_manager.load_state().source_cursors["jsonl"] == str(log.stat().st_size)
+
+    workers = [_worker(tmp_path, shard) for shard in range(2)]
+    threads = [threading.Thread(target=worker.step) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert coordinator.collect() == 12
+    assert coordinator.collect() == 0
+    state_manager = coordinator.monitor.state_manager
+    assert len(list(state_manager.load_evaluations())) == 12
+    assert state_manager.load_state().total_prompts_processed == 12
+    assert state_manager.filter_unprocessed([_prompt(3)]) == []
+
+    progress = coordinator.progress()
+    assert progress["totals"][TaskStatus.COLLECTED] == 12
+    assert progress["percent_complete"] == 100.0
+    assert sum(s[TaskStatus.COLLECTED] for s in progress["shards"]) == 12
+
+
+def test_worker_run_stops_and_releases_leases(tmp_path):
+    coordinator = _coordinator(tmp_path, num_shards=1)
+    coordinator.enqueue([_prompt(i) for i in range(5)])
+    worker = ShardWorker(0, 1, evaluate=_evaluate, worker_id="w0", db_path=tmp_path / "shards.db", threads=2)
+    thread = threading.Thread(target=worker.run, kwargs={"idle_seconds": 0.01}, daemon=True)
+    thread.start()
+    coordinator_collected = 0
+    for _ in range(500):
+        coordinator_collected += coordinator.collect()
+        if coordinator_collected == 5:
+            break
+        thread.join(0.01)
+    worker.stop()
+    thread.join(timeout=5)
+
+    assert coordinator_collected == 5
+    assert not thread.is_alive()
+    assert shard_progress(1, tmp_path / "shards.db")["shards"][0]["owner"] is None
+
+
+def test_fewer_workers_take_over_the_dropped_shards(tmp_path):
+    _coordinator(tmp_path, num_shards=4).enqueue([_prompt(i) for i in range(20)])
+
+    coordinator = _coordinator(tmp_path, num_shards=2)
+    assert [s["shard"] for s in coordinator.progress()["shards"]] == [0, 1]
+    assert sum(_worker(tmp_path, shard).step() for shard in range(2)) == 20
+    assert coordinator.collect() == 20
+    assert coordinator.progress()["percent_complete"] == 100.0
+
+
+def test_workers_adopt_shards_beyond_their_count(tmp_path):
+    coordinator = _coordinator(tmp_path, num_shards=4)
+    coordinator.enqueue([_prompt(i) for i in range(20)])
+
+    worker = _worker(tmp_path, 0, num_shards=2)  # Started before any coordinator resharded
+    assert worker.claim_shards() == [0, 2, 3]  # Shard 1 is left to its home worker
+    worker.step()
+    worker.step()
+    shards = shard_progress(db_path=tmp_path / "shards.db")["shards"]
+    assert [s[TaskStatus.PENDING] for s in shards] == [0, shards[1][TaskStatus.PENDING], 0, 0]
+    assert _worker(tmp_path, 1, num_shards=2).step() > 0
+    assert coordinator.collect() == 20
+
+
+def test_gc_drops_old_collected_tasks(tmp_path):
+    coordinator = _coordinator(tmp_path, num_shards=1)
+    coordinator.enqueue([_prompt(i) for i in range(3)])
+    _worker(tmp_path, 0, num_shards=1).step()
+    coordinator.collect()
+
+    assert coordinator.gc(retention_seconds=3600) == 0
+    assert coordinator.gc(retention_seconds=-1) == 3
+    assert coordinator.progress()["totals"][TaskStatus.COLLECTED] == 0
+
+
+def test_progress_is_read_only(tmp_path):
+    db_path = tmp_path / "shards.db"
+    assert shard_progress(db_path=db_path)["shards"] == []
+    _coordinator(tmp_path, num_shards=3)
+    assert [s["shard"] for s in shard_progress(db_path=db_path)["shards"]] == [0, 1, 2]
+
+
+def test_claimed_tasks_are_not_replayed_twice(tmp_path):
+    coordinator = _coordinator(tmp_path, num_shards=1)
+    coordinator.enqueue([_prompt(i) for i in range(5)])
+    clock = Clock()
+    stalled = _worker(tmp_path, 0, num_shards=1, clock=clock)
+    in_flight = stalled._claim_tasks(stalled.claim_shards())
+    assert len(in_flight) == 5
+
+    replayed = []
+    taker = _worker(tmp_path, 0, num_shards=1, clock=clock,
+                    evaluate=lambda p: replayed.append(p.id) or _evaluate(p))
+    taker.worker_id = "taker"
+    assert taker.step() == 0  # The stalled worker still holds the lease
+    assert shard_progress(db_path=tmp_path / "shards.db")["totals"][TaskStatus.CLAIMED] == 5
+
+    clock.now += 31  # Lease lost: its claimed tasks go back in the queue
+    assert taker.step() == 5
+    for row in in_flight:
+        stalled._run_task(row)  # Late results are discarded
+    assert sorted(replayed) == [f"p{i}" for i in range(5)]
+    assert coordinator.collect() == 5
@@ -0,0 +1,94 @@
+"""
+Tests for single-flight coalescing of duplicate in-flight analyses
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from single_flight import SingleFlight, SingleFlightTimeout
+
+
+def _run_concurrently(n, target):
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_duplicate_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def pipeline():
+        calls.append(1)
+        release.wait(5)
+        return {"best": "gpt-4o-mini"}
+
+    def request():
+        return flight.do("hash-1", pipeline)
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = _run_concurrently(5, request)
+
+    assert len(calls) == 1
+    assert errors == [None] * 5
+    assert all(r == {"best": "gpt-4o-mini"} for r in results)
+    stats = flight.get_stats()
+    assert stats["leader_calls"] == 1
+    assert stats["coalesced_calls"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_leader_error_propagates_to_followers():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def pipeline():
+        release.wait(5)
+        raise RuntimeError("provider down")
+
+    threading.Timer(0.2, release.set).start()
+    _, errors = _run_concurrently(3, lambda: flight.do("hash-1", pipeline))
+
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.get_stats()["follower_errors"] == 2
+    # The key is released, so the next call runs again
+    assert flight.do("hash-1", lambda: "ok") == "ok"
+
+
+def test_follower_times_out():
+    flight = SingleFlight("test", timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("hash-1", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("hash-1", lambda: "never runs")
+
+    release.set()
+    leader.join()
+    assert flight.get_stats()["follower_timeouts"] == 1
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.get_stats()["coalesced_calls"] == 0
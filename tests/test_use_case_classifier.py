@@ -0,0 +1,81 @@
+"""
+Tests for the compiled use case classifier
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from config import USE_CASE_KEYWORDS, USE_CASE_LABELS
+from use_case_classifier import UseCaseClassifier
+
+LABELLED_PROMPTS = Path(__file__).resolve().parent / "data" / "use_case_prompts.jsonl"
+
+
+def _labelled():
+    with open(LABELLED_PROMPTS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_accuracy_on_labelled_set():
+    classifier = UseCaseClassifier(mode="keyword")
+    examples = _labelled()
+    correct = sum(classifier.classify(e["prompt"]).category == e["category"] for e in examples)
+
+    assert {e["category"] for e in examples} == set(USE_CASE_KEYWORDS)
+    assert correct / len(examples) >= 0.9
+
+
+def test_most_hits_wins_and_ties_follow_config_order():
+    classifier = UseCaseClassifier(mode="keyword")
+
+    # creative "write" vs code "python" + "function"
+    prediction = classifier.classify("Write a Python function that sorts a list")
+    assert prediction.category == "code"
+    assert prediction.matched_keywords == ["write", "python", "function"]
+
+    # One hit each: code is listed before analysis
+    assert classifier.classify("Review my code").category == "code"
+
+
+def test_keywords_match_at_word_starts_only():
+    classifier = UseCaseClassifier(mode="keyword")
+
+    assert classifier.classify("Help me with debugging").category == "code"
+    # "hack" inside "shacks" is not a security hit
+    assert classifier.classify("List beach shacks in Goa").method == "default"
+
+
+def test_confidence_reflects_evidence():
+    classifier = UseCaseClassifier(mode="keyword")
+
+    single = classifier.classify("Tell me a story")
+    strong = classifier.classify("Write a story, a poem and a haiku")
+    unmatched = classifier.classify("Recommend a good book")
+
+    assert strong.confidence > single.confidence > unmatched.confidence
+    assert 0 < unmatched.confidence < 0.5
+    assert unmatched.category == "general"
+
+
+def test_labels_cover_every_category():
+    classifier = UseCaseClassifier(mode="keyword")
+
+    assert set(USE_CASE_LABELS) == set(USE_CASE_KEYWORDS)
+    assert classifier.classify("Find the vulnerability").label == "Security Analysis"
+
+
+def test_embedding_mode_falls_back_to_keywords_without_model(monkeypatch):
+    classifier = UseCaseClassifier(mode="embedding")
+    monkeypatch.setattr(classifier, "_load_centroids", lambda: None)
+
+    prediction = classifier.classify("Recommend a good book")
+    assert prediction.method == "default"
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        UseCaseClassifier(mode="llm")
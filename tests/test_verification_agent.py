@@ -0,0 +1,344 @@
+"""
+Tests for Layer 3 verification: parallel replays under a shared budget
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache_manager as cache_module
+import orchestrator
+import run_journal as journal_module
+from cache_manager import CacheManager
+from models import CompletionResult, QualityScore
+from orchestrator import (
+    AgentResult, CostQualityOrchestrator, Thresholds, VerificationAgent, VerificationBudget
+)
+from run_journal import RunJournal
+
+
+class FakeReplayEngine:
+    def __init__(self, cost=0.001, delay=0.0, cached=False):
+        self.cost = cost
+        self.delay = delay
+        self.cached = cached
+        self.calls = 0
+        self.replayed = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def replay_prompt_on_model(self, prompt, config):
+        with self._lock:
+            self.calls += 1
+            self.replayed.append((config["name"], prompt.messages[0]["content"]))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return CompletionResult(
+            model_name=config["name"], provider="openai", response="ok " * 20,
+            tokens_input=100, tokens_output=50, latency_ms=self.delay * 1000,
+            cost=self.cost, success=True, cached=self.cached
+        )
+
+
+class FakeEvaluator:
+    def __init__(self, scores=(95.0,)):
+        self.scores = scores
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def evaluate(self, prompt, completion):
+        with self._lock:
+            score = self.scores[self.calls % len(self.scores)]
+            self.calls += 1
+        return QualityScore(
+            overall_score=score, dimension_scores={}, reasoning="",
+            confidence=0.9, evaluator_model="fake"
+        )
+
+
+def _candidate(model_id):
+    return {
+        "model_id": model_id,
+        "display_name": model_id,
+        "portkey_slug": f"@openai/{model_id}",
+        "pricing": {"input_price_per_1k": 0.001, "output_price_per_1k": 0.002},
+        "estimated_cost_delta": {"percent_saving": 50.0}
+    }
+
+
+def _ranking(n_candidates=3, n_conversations=5):
+    conversations = [
+        {"messages": [{"role": "user", "content": f"question {i}"}]}
+        for i in range(n_conversations)
+    ]
+    return {
+        "user": {"user_id": "u1", "use_case": "general", "last_n_conversations": conversations},
+        "current_model": "gpt-4o",
+        "top_candidates": [_candidate(f"model-{i}") for i in range(n_candidates)]
+    }
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "DB_PATH", tmp_path / "cache.db")
+    monkeypatch.setattr(orchestrator, "cache_manager", CacheManager())
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, "DB_PATH", tmp_path / "journal.db")
+    return RunJournal()
+
+
+def test_candidates_and_conversations_are_replayed_in_parallel():
+    engine = FakeReplayEngine(delay=0.05)
+    # Scores straddling the threshold keep the sequential test running
+    agent = VerificationAgent(engine, FakeEvaluator(scores=(70.0, 100.0)), max_workers=9)
+
+    start = time.time()
+    result = agent.execute(_ranking(n_candidates=3, n_conversations=5))
+    elapsed = time.time() - start
+
+    assert engine.calls == 15
+    assert engine.max_active > 3
+    assert elapsed < 15 * 0.05
+    assert [r["model_id"] for r in result.data["verification_results"]] == ["model-0", "model-1", "model-2"]
+    assert result.data["total_verification_cost"] == pytest.approx(15 * 0.001)
+
+
+def test_budget_cancels_pending_replays(monkeypatch):
+    monkeypatch.setattr(Thresholds, "MAX_VERIFICATION_BUDGET_USD", 0.5)
+    engine = FakeReplayEngine(cost=0.2, delay=0.02)
+    agent = VerificationAgent(engine, FakeEvaluator(), max_workers=2)
+
+    result = agent.execute(_ranking(n_candidates=3, n_conversations=10))
+
+    # Only replays already running when the limit was crossed can overshoot it
+    assert engine.calls < 30
+    assert result.data["total_verification_cost"] <= 0.5 + 2 * 0.2 + 1e-9
+    # Partial results are not cached, so the next run verifies again
+    calls_before = engine.calls
+    agent.execute(_ranking(n_candidates=3, n_conversations=10))
+    assert engine.calls > calls_before
+
+
+def test_partial_results_are_not_carried_forward(monkeypatch):
+    monkeypatch.setattr(Thresholds, "MAX_VERIFICATION_BUDGET_USD", 0.5)
+    engine = FakeReplayEngine(cost=0.2, delay=0.02)
+    agent = VerificationAgent(engine, FakeEvaluator(), max_workers=2)
+    verified = {}
+
+    result = agent.execute(_ranking(n_candidates=3, n_conversations=10), verified=verified)
+
+    partial = [r["model_id"] for r in result.data["verification_results"] if r.get("partial")]
+    assert partial
+    assert not set(partial) & set(verified)
+
+
+def test_replay_cache_hits_are_not_charged(monkeypatch):
+    monkeypatch.setattr(Thresholds, "MAX_VERIFICATION_BUDGET_USD", 0.5)
+    engine = FakeReplayEngine(cost=0.2, cached=True)
+    agent = VerificationAgent(engine, FakeEvaluator(), max_workers=2)
+
+    result = agent.execute(_ranking(n_candidates=3, n_conversations=10))
+
+    # Charged at $0.20, the budget would be gone after three replays
+    assert engine.calls >= 3 * Thresholds.MIN_SAMPLE_SIZE
+    results = result.data["verification_results"]
+    assert not any(r.get("partial") or r["budget_exhausted"] for r in results)
+    assert result.data["total_verification_cost"] == 0.0
+    assert sum(r["cached_cost"] for r in results) == pytest.approx(engine.calls * 0.2)
+
+
+def test_completed_verifications_are_served_from_cache():
+    engine = FakeReplayEngine()
+    agent = VerificationAgent(engine, FakeEvaluator())
+
+    agent.execute(_ranking())
+    calls = engine.calls
+    result = agent.execute(_ranking())
+
+    assert engine.calls == calls
+    assert result.data["total_verification_cost"] == 0
+
+
+def test_budget_charge_is_atomic():
+    budget = VerificationBudget(limit_usd=1.0)
+
+    def spend():
+        for _ in range(1000):
+            budget.charge(0.001)
+
+    threads = [threading.Thread(target=spend) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert budget.spent_usd == pytest.approx(4.0)
+    assert budget.exhausted
+
+
+def _single_candidate_run(scores):
+    engine = FakeReplayEngine()
+    agent = VerificationAgent(engine, FakeEvaluator(scores=scores), max_workers=4)
+    result = agent.execute(_ranking(n_candidates=1, n_conversations=10))
+    return engine, result.data["verification_results"][0]
+
+
+def test_clear_pass_stops_after_minimum_samples():
+    engine, result = _single_candidate_run(scores=(95.0,))
+
+    # At most MIN_SAMPLE_SIZE replays are in flight, so a few may overshoot
+    assert engine.calls < 2 * Thresholds.MIN_SAMPLE_SIZE
+    assert result["sequential_decision"] == "pass"
+    assert result["samples_skipped"] == 10 - engine.calls
+    assert result["confidence"] > 0.95
+
+
+def test_clear_fail_stops_early_with_low_confidence():
+    engine, result = _single_candidate_run(scores=(40.0,))
+
+    assert engine.calls < 2 * Thresholds.MIN_SAMPLE_SIZE
+    assert result["sequential_decision"] == "fail"
+    assert result["confidence"] < 0.05
+
+
+def test_borderline_candidate_uses_every_sample():
+    engine, result = _single_candidate_run(scores=(75.0, 95.0))
+
+    assert engine.calls == 10
+    assert result["sequential_decision"] == "inconclusive"
+    assert 0.3 < result["confidence"] < 0.7
+
+
+def test_refusals_are_left_out_of_the_reported_quality():
+    class RefusingEngine(FakeReplayEngine):
+        def replay_prompt_on_model(self, prompt, config):
+            completion = super().replay_prompt_on_model(prompt, config)
+            completion.is_refusal = prompt.messages[0]["content"] == "question 0"
+            return completion
+
+    agent = VerificationAgent(RefusingEngine(), FakeEvaluator(scores=(95.0,)), max_workers=1)
+    result = agent.execute(_ranking(n_candidates=1, n_conversations=10)).data["verification_results"][0]
+
+    # The refusal scores zero inside the sequential test only
+    assert result["refusal_rate"] > 0
+    assert result["quality_score"] == 95.0
+    assert result["sequential_test"]["mean"] < 95.0
+
+
+def _discovery(n_candidates=6):
+    ranking = _ranking(n_candidates=0, n_conversations=5)
+    candidates = []
+    for rank in range(2, 2 + n_candidates):
+        candidate = _candidate(f"rank-{rank}")
+        candidate["rank"] = rank
+        # Cheaper models save more and so rank higher on fit
+        candidate["estimated_cost_delta"] = {"percent_saving": 10.0 * rank}
+        candidates.append(candidate)
+    return {
+        "user": ranking["user"],
+        "current_model": "gpt-4o",
+        "current_rank": 1,
+        "candidates": candidates,
+        "total_candidates_found": n_candidates
+    }
+
+
+def test_retries_reuse_layer_1_and_2_and_verify_only_new_candidates(journal):
+    engine = FakeReplayEngine()
+    orch = CostQualityOrchestrator(engine, FakeEvaluator(scores=(40.0,)), journal=journal)
+    layer1_calls = []
+
+    def discover(user_id, k_candidates=6):
+        layer1_calls.append(user_id)
+        return AgentResult(success=True, data=_discovery())
+
+    orch.layer1.execute = discover
+    result = orch.run_optimization("u1")
+
+    assert result["status"] == "no_recommendation"
+    assert len(layer1_calls) == 1
+    memo = orch.last_run
+    assert len(memo.bands) == Thresholds.MAX_ITERATION_LOOPS + 1
+    assert memo.newly_verified == [["rank-7", "rank-6", "rank-5"], ["rank-4"], ["rank-3"], ["rank-2"]]
+    assert sorted(memo.verified) == [f"rank-{r}" for r in range(2, 8)]
+    # Each model was replayed in exactly one iteration
+    assert all(r["sequential_test"]["decision"] == "fail" for r in memo.verified.values())
+    assert engine.calls == sum(len(r["completions"]) for r in memo.verified.values())
+
+
+class Crash(BaseException):
+    """Simulates the process dying mid-run (not caught like an Exception)"""
+
+
+class CrashingEvaluator(FakeEvaluator):
+    def __init__(self, crash_after, **kwargs):
+        super().__init__(**kwargs)
+        self.crash_after = crash_after
+
+    def evaluate(self, prompt, completion):
+        if self.calls >= self.crash_after:
+            raise Crash()
+        return super().evaluate(prompt, completion)
+
+
+def _orchestrator(engine, evaluator, journal, layer1_calls):
+    orch = CostQualityOrchestrator(engine, evaluator, journal=journal)
+
+    def discover(user_id, k_candidates=6):
+        layer1_calls.append(user_id)
+        return AgentResult(success=True, data=_discovery())
+
+    orch.layer1.execute = discover
+    return orch
+
+
+def test_interrupted_run_resumes_without_repeating_paid_work(journal):
+    layer1_calls = []
+    first_engine = FakeReplayEngine()
+    crashing = _orchestrator(first_engine, CrashingEvaluator(crash_after=4, scores=(40.0,)),
+                             journal, layer1_calls)
+    with pytest.raises(Crash):
+        crashing.run_optimization("u1")
+    # Let replays already in flight at the crash land in the journal
+    crashing.layer3._replay_pool.shutdown(wait=True)
+
+    run = journal.list_runs()[0]
+    assert run["status"] == "running"
+    assert first_engine.calls > 0
+
+    second_engine = FakeReplayEngine()
+    resumed = _orchestrator(second_engine, FakeEvaluator(scores=(40.0,)), journal, layer1_calls)
+    result = resumed.resume(run["run_id"])
+
+    assert result["run_id"] == run["run_id"]
+    assert len(layer1_calls) == 1
+    # Nothing replayed before the crash is paid for again
+    assert second_engine.calls > 0
+    assert not set(first_engine.replayed) & set(second_engine.replayed)
+    assert journal.get_run(run["run_id"])["status"] == "completed"
+    # A completed run is served from the journal
+    assert resumed.resume(run["run_id"]) == journal.get_run(run["run_id"])["result"]
+
+
+def test_garbage_collect_removes_only_old_finished_runs(journal):
+    done = journal.start_run("u1", {})
+    journal.checkpoint(done, "layer1", {"x": 1})
+    journal.finish_run(done, "completed", result={})
+    running = journal.start_run("u2", {})
+
+    assert journal.garbage_collect(older_than_days=1) == 0
+    assert journal.garbage_collect(older_than_days=0) == 1
+    assert journal.get_run(done) is None
+    assert journal.load_checkpoint(done, "layer1") is None
+    assert journal.get_run(running)["status"] == "running"